@@ -3,9 +3,7 @@ Base agent class with common functionality and enhanced logging.
 """
 import logging
 import datetime
-import os  # Add the missing import
 from typing import Dict, Any, Optional, List
-from openai import OpenAI
 from utils.agent_logger import get_agent_logger, log_agent_call
 
 
@@ -25,7 +23,9 @@ class BaseAgent:
         self.logger = get_agent_logger(self.agent_name)
         self.logger.info(f"Agent initialized")
 
-        self.client = client or OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # No default client: agents that call the model are given (or create)
+        # their own async client, so none is built here just to be replaced
+        self.client = client
 
     @log_agent_call
     async def initialize(self, context=None) -> bool:
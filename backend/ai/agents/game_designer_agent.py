@@ -1,4 +1,4 @@
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, AsyncIterator
 import random
 import json
 import logging
@@ -9,13 +9,39 @@ from openai import AsyncOpenAI  # Direct import for type hints
 import os
 from pathlib import Path
 from .base_agent import BaseAgent
-from utils.language_utils import get_pt_avoid_examples
-from utils.agent_logger import log_agent_call
+from utils.language_utils import get_pt_avoid_examples, find_ptbr_terms_in_game
+from utils.agent_logger import agent_call, log_agent_call
+from ..server.token_accounting import PromptSection, count_tokens, fit_prompt
+from utils.json_stream import ArrayItemStream
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 
+# Game types offered at each difficulty level
+GAME_TYPES_BY_DIFFICULTY = {
+    "iniciante": [
+        "exercícios de pronúncia básica",
+        "jogos de rimas simples",
+        "reconhecimento de sons básicos",
+        "nomeação de objetos comuns"
+    ],
+    "médio": [
+        "exercícios de pronúncia de palavras compostas",
+        "reconhecimento de sons complexos",
+        "exercícios de oposição de sons",
+        "jogos de sequência de palavras"
+    ],
+    "avançado": [
+        "exercícios de pronúncia de frases completas",
+        "trava-línguas",
+        "narração de histórias curtas",
+        "exercícios de pronúncia rápida",
+        "discriminação auditiva avançada"
+    ]
+}
+
+
 class GameDesignerAgent(BaseAgent):
     def __init__(self, client: Optional[AsyncOpenAI] = None):
         super().__init__(name="GAME_DESIGNER")
@@ -42,38 +68,12 @@ class GameDesignerAgent(BaseAgent):
 
         try:
             # Criar prompt para o LLM
-            prompt = self._create_game_prompt(game_type, difficulty, language)
+            messages = self._game_messages(game_type, difficulty, language)
 
             # Log the difficulty and game type for debugging
             self.logger.info(
                 f"Creating game for user {user_id} with difficulty: {difficulty}, type: {game_type}")
 
-            # Create enhanced system prompt with PT-PT guidance
-            system_prompt = f"""És um especialista em fonoaudiologia e terapia da fala que cria jogos educativos para crianças e adultos em português europeu (PT-PT).
-
-Ao criar jogos para terapia da fala, considera sempre:
-1. Usar EXCLUSIVAMENTE português europeu (de Portugal, não do Brasil)
-2. Adaptar exercícios ao nível de desenvolvimento fonológico do utilizador
-3. Focar em sons problemáticos específicos (R, L, S, grupos consonantais)
-4. Criar exercícios que sejam envolventes e adequados para a idade
-
-IMPORTANTE - DIFERENÇAS ENTRE PORTUGUÊS EUROPEU E BRASILEIRO:
-Use APENAS palavras e expressões de Portugal (PT-PT), evitando brasileirismos (PT-BR).
-{self.pt_avoid_examples}
-
-Para cada nível de dificuldade:
-- INICIANTE: Palavras curtas (1-2 sílabas), sons simples, vocabulário básico do quotidiano
-- MÉDIO: Palavras com 2-3 sílabas, alguns encontros consonantais, distinção de sons semelhantes
-- AVANÇADO: Palavras complexas, frases completas, trava-línguas, narrativas curtas
-
-O conteúdo DEVE ser:
-- Culturalmente relevante para Portugal
-- Pedagogicamente validado
-- Motivador e recompensador
-- Progressivo em dificuldade
-
-Formata todos os jogos em JSON limpo e válido, com exercícios claros, instruções detalhadas e feedback construtivo."""
-
             # Enhanced logging before sending the request
             self.logger.info(
                 f"Sending request to language model for game creation")
@@ -81,25 +81,16 @@ Formata todos os jogos em JSON limpo e válido, com exercícios claros, instruç
             # Obter resposta do modelo usando o cliente async
             completion = await self.client.chat.completions.create(
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
+                messages=messages,
+                response_format={"type": "json_object"},
+                # Cada jogo deve ser novo, mesmo para pedidos iguais
+                cache=False
             )
 
             # Processar resposta
             game_data = json.loads(completion.choices[0].message.content)
 
-            # Adicionar metadados
-            game_data.update({
-                "game_id": str(uuid.uuid4()),
-                "user_id": user_id,
-                "created_at": datetime.datetime.utcnow().isoformat(),
-                "status": "active",
-                "game_type": game_type,
-                "difficulty": difficulty
-            })
+            self._finish_game(game_data, user_id, difficulty, game_type)
 
             # Log game creation success
             self.logger.info(
@@ -111,6 +102,107 @@ Formata todos os jogos em JSON limpo e válido, com exercícios claros, instruç
             self.logger.error(f"Error creating game: {str(e)}")
             raise
 
+    async def stream_game(self, user_id: str, difficulty: str = "iniciante",
+                          game_type: str = "exercícios de pronúncia",
+                          language: str = "pt-PT") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Creates a new game, streaming each exercise as soon as it is generated
+
+        Yields:
+            {"event": "exercise", "index": n, "exercise": {...}} for every
+            exercise as its JSON object closes, then {"event": "game",
+            "game": {...}} with the complete game
+        """
+        self.logger.info(
+            f"Streaming game for user {user_id} with difficulty: {difficulty}, type: {game_type}")
+
+        # Gerador assíncrono: log_agent_call não se aplica, atribuir o pedido
+        # aqui (com o mesmo nome de agente que o decorador usa)
+        with agent_call("GAMEDESIGNER", "stream_game"):
+            stream = await self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=self._game_messages(game_type, difficulty, language),
+                response_format={"type": "json_object"},
+                stream=True
+            )
+
+        parser = ArrayItemStream("exercises")
+        index = 0
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if not content:
+                continue
+            for exercise in parser.feed(content):
+                yield {"event": "exercise", "index": index, "exercise": exercise}
+                index += 1
+
+        game_data = parser.document()
+        self._finish_game(game_data, user_id, difficulty, game_type)
+        self.logger.info(
+            f"Game streamed successfully with {len(game_data.get('exercises', []))} exercises")
+        yield {"event": "game", "game": game_data}
+
+    def _game_messages(self, game_type: str, difficulty: str, language: str = "pt-PT") -> List[Dict[str, str]]:
+        """System and user messages for game generation"""
+        prompt = self._create_game_prompt(game_type, difficulty, language)
+
+        # Create enhanced system prompt with PT-PT guidance, in sections:
+        # the optional ones are dropped (lowest priority first) when the
+        # prompt exceeds the agent's token budget
+        sections = [
+            PromptSection("intro", """És um especialista em fonoaudiologia e terapia da fala que cria jogos educativos para crianças e adultos em português europeu (PT-PT).
+
+Ao criar jogos para terapia da fala, considera sempre:
+1. Usar EXCLUSIVAMENTE português europeu (de Portugal, não do Brasil)
+2. Adaptar exercícios ao nível de desenvolvimento fonológico do utilizador
+3. Focar em sons problemáticos específicos (R, L, S, grupos consonantais)
+4. Criar exercícios que sejam envolventes e adequados para a idade"""),
+            PromptSection("pt_avoid", f"""IMPORTANTE - DIFERENÇAS ENTRE PORTUGUÊS EUROPEU E BRASILEIRO:
+Use APENAS palavras e expressões de Portugal (PT-PT), evitando brasileirismos (PT-BR).
+{self.pt_avoid_examples}""", optional=True, priority=2),
+            PromptSection("levels", """Para cada nível de dificuldade:
+- INICIANTE: Palavras curtas (1-2 sílabas), sons simples, vocabulário básico do quotidiano
+- MÉDIO: Palavras com 2-3 sílabas, alguns encontros consonantais, distinção de sons semelhantes
+- AVANÇADO: Palavras complexas, frases completas, trava-línguas, narrativas curtas""",
+                          optional=True, priority=1),
+            PromptSection("style", """O conteúdo DEVE ser:
+- Culturalmente relevante para Portugal
+- Pedagogicamente validado
+- Motivador e recompensador
+- Progressivo em dificuldade""", optional=True, priority=0),
+            PromptSection("format", "Formata todos os jogos em JSON limpo e válido, com exercícios claros, instruções detalhadas e feedback construtivo."),
+        ]
+        system_prompt = fit_prompt(sections, reserved=count_tokens(prompt, "gpt-4o-mini"),
+                                   model="gpt-4o-mini")
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _finish_game(self, game_data: Dict[str, Any], user_id: str,
+                     difficulty: str, game_type: str):
+        """Adds metadata to a generated game and checks its vocabulary"""
+        # Adicionar metadados
+        game_data.update({
+            "game_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "created_at": datetime.datetime.utcnow().isoformat(),
+            "status": "active",
+            "game_type": game_type,
+            "difficulty": difficulty
+        })
+
+        # Validar o vocabulário: o jogo deve estar em PT-PT
+        ptbr_terms = find_ptbr_terms_in_game(game_data)
+        if ptbr_terms:
+            self.logger.warning(
+                "Generated game contains PT-BR terms: " +
+                ", ".join(f"{term['pt_br']} (use {term['pt_pt']})" for term in ptbr_terms))
+            game_data["language_warnings"] = ptbr_terms
+
     def _create_game_prompt(self, game_type: str, difficulty: str, language: str = "pt-PT") -> str:
         """Creates the prompt for game generation"""
         self.logger.info(
@@ -1,13 +1,15 @@
 from typing import Optional, Dict, Any, List
 import logging
-import re
 import json
 import base64
 from openai import AsyncOpenAI
 from ..server.openai_client import create_async_openai_client
 from .base_agent import BaseAgent
 from utils.agent_logger import log_agent_call
-from rapidfuzz import fuzz
+from utils.normalization import normalize_text
+from utils.evaluation_plan import exercise_plan
+import numpy as np
+from rapidfuzz import fuzz, process
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -32,104 +34,133 @@ class SpeechEvaluatorAgent(BaseAgent):
 
         Now also handles compound words with or without hyphens and normalizes them.
         """
-        if not text:
-            return ""
+        return normalize_text(text)
 
-        # Convert to lowercase
-        text = text.lower()
-
-        # Replace hyphens with spaces for compound word flexibility
-        text = text.replace('-', ' ')
-
-        # Remove punctuation except apostrophes (for contractions)
-        text = re.sub(r'[^\w\s\']', '', text)
-
-        # Replace multiple spaces with a single space and trim
-        text = re.sub(r'\s+', ' ', text).strip()
-
-        self.logger.debug(f"Normalized text: '{text}' (from original)")
-        return text
-
-    def _handle_compound_words(self, recognized: str, expected: str) -> tuple:
+    def _handle_compound_words(self, recognized: str, plan: Dict[str, Any]) -> tuple:
         """
         Special handling for compound words to improve matching.
         Returns both normalized versions and a flag indicating if compound word handling was applied.
         """
-        # Check if expected might be a compound word (contains hyphen or multiple words)
-        is_compound = '-' in expected or ' ' in expected.strip()
-        compound_normalized_expected = expected.replace(
-            '-', '').replace(' ', '')
-
-        # Try to detect if recognized might be the compound word written as separate words
-        normalized_recognized = recognized.replace(' ', '')
-
-        # Create no-space versions for direct comparison
-        no_space_recognized = recognized.replace(' ', '')
-        no_space_expected = expected.replace(' ', '').replace('-', '')
-
         # Check if removing spaces makes them identical
-        if no_space_recognized == no_space_expected:
+        no_space_recognized = recognized.replace(' ', '')
+        if no_space_recognized == plan["no_space"]:
             self.logger.info(
-                f"Compound word match detected: '{recognized}' matches '{expected}' when ignoring spaces/hyphens")
-            return normalized_recognized, no_space_expected, True
+                f"Compound word match detected: '{recognized}' matches '{plan['expected']}' when ignoring spaces/hyphens")
+            return no_space_recognized, plan["no_space"], True
 
-        self.logger.debug(
-            f"[AGENT:SPEECH_EVALUATOR] Compound word check: is_compound={is_compound}, match={no_space_recognized == no_space_expected}")
-        return recognized, expected, is_compound
+        return recognized, plan["normalized"], plan["is_compound"]
 
-    def _handle_sentence_comparison(self, recognized: str, expected: str) -> bool:
+    def _handle_sentence_comparison(self, recognized: str, plan: Dict[str, Any]) -> bool:
         """
         Special handling for longer phrases and tongue twisters with common recognition errors.
         Returns True if the phrases are similar enough to be considered correct.
         """
         # If they're almost identical, return early
-        if self._similarity_score(recognized, expected) > 90:
+        if fuzz.ratio(recognized, plan["normalized"]) > 90:
             return True
 
         # Handle common Portuguese recognition issues
         recognized_fixed = recognized
+        fixes = plan["fixes"]
 
         # Common mistake: "Globo" instead of "O lobo"
-        if "globo" in recognized.lower() and "o lobo" in expected.lower():
-            recognized_fixed = recognized.lower().replace("globo", "o lobo")
+        if "globo" in fixes and "globo" in recognized:
+            recognized_fixed = recognized.replace("globo", "o lobo")
             self.logger.info(
                 f"[AGENT:SPEECH_EVALUATOR] Applied Portuguese-specific fix: 'globo' -> 'o lobo'")
 
         # Common mistake: "Ou" instead of "O"
-        if expected.lower().startswith("o ") and recognized.lower().startswith("ou "):
+        if "leading_o" in fixes and recognized.startswith("ou "):
             recognized_fixed = "o " + recognized[3:]
             self.logger.info(
                 f"[AGENT:SPEECH_EVALUATOR] Applied Portuguese-specific fix: 'ou ' -> 'o '")
 
         # Common issue with articles
-        if expected.lower().startswith("a ") and not recognized.lower().startswith("a "):
+        if "leading_a" in fixes and not recognized.startswith("a "):
             recognized_fixed = "a " + recognized
             self.logger.info(
                 f"[AGENT:SPEECH_EVALUATOR] Added missing article 'a' at beginning")
 
-        # Check word count - if matching at least 80% of words in the right order, consider it correct
-        expected_words = expected.lower().split()
-        recognized_words = recognized_fixed.lower().split()
-
-        matching_words = 0
-        for i, word in enumerate(expected_words):
-            if i < len(recognized_words) and (
-                recognized_words[i] == word or
-                self._similarity_score(recognized_words[i], word) > 85
-            ):
-                matching_words += 1
+        # Check word count - if matching enough words in the right order, consider it correct
+        expected_words = plan["tokens"]
+        matching_words = self._count_aligned_words(
+            recognized_fixed.split(), expected_words)
 
         word_match_ratio = matching_words / \
             len(expected_words) if expected_words else 0
         self.logger.info(
             f"[AGENT:SPEECH_EVALUATOR] Word match ratio: {word_match_ratio:.2f} ({matching_words}/{len(expected_words)})")
 
-        # For tongue twisters, be more forgiving (threshold 0.7)
-        is_tongue_twister = len(expected_words) > 5 and len(
-            set(expected_words)) < len(expected_words) * 0.8
-        threshold = 0.7 if is_tongue_twister else 0.8
+        # Tongue twisters are judged more forgivingly (see the plan's threshold)
+        return word_match_ratio >= plan["sentence_threshold"]
+
+    def _count_aligned_words(self, recognized_words: List[str], expected_words: List[str]) -> int:
+        """
+        Number of expected words matched, in order, by the recognized words.
+
+        All word pairs are scored in one cdist call; the best monotonic
+        alignment (longest common subsequence over pairs scoring > 85) is
+        then found row by row with numpy, so a skipped or extra word does
+        not shift every following word out of place.
+        """
+        if not recognized_words or not expected_words:
+            return 0
+
+        matches = process.cdist(recognized_words, expected_words,
+                                scorer=fuzz.ratio) > 85
 
-        return word_match_ratio >= threshold
+        aligned = np.zeros(len(expected_words) + 1, dtype=np.int32)
+        for row in matches:
+            candidates = np.maximum(aligned[1:], aligned[:-1] + row)
+            aligned[1:] = np.maximum.accumulate(candidates)
+        return int(aligned[-1])
+
+    def score_hypotheses(self, hypotheses: List[str], expected_word: str,
+                         vocabulary: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Score ASR n-best hypotheses against the expected word and the other
+        words of the game in a single batched comparison.
+
+        Args:
+            hypotheses: Recognition alternatives, most confident first
+            expected_word: Word or phrase the user should have said
+            vocabulary: Other words of the game, to detect confusions
+
+        Returns:
+            Dict with the hypothesis closest to the expected word, its
+            similarity (0-100) and the game word it resembles most
+        """
+        candidates = [text for text in hypotheses if text and text.strip()]
+        normalized = [self._normalize_text(text) for text in candidates]
+        if not candidates:
+            return {"text": "", "similarity": 0.0,
+                    "closest_word": expected_word, "closest_similarity": 0.0}
+
+        targets = [expected_word]
+        seen = {exercise_plan(expected_word)["normalized"]}
+        for word in vocabulary or []:
+            if word and exercise_plan(word)["normalized"] not in seen:
+                seen.add(exercise_plan(word)["normalized"])
+                targets.append(word)
+        plans = [exercise_plan(word) for word in targets]
+        normalized_targets = [plan["normalized"] for plan in plans]
+
+        # Compare with and without spaces so compound words match either way
+        scores = np.maximum(
+            process.cdist(normalized, normalized_targets, scorer=fuzz.ratio),
+            process.cdist([text.replace(' ', '') for text in normalized],
+                          [plan["no_space"] for plan in plans],
+                          scorer=fuzz.ratio))
+
+        # Ties keep the most confident hypothesis
+        best = int(np.argmax(scores[:, 0]))
+        closest = int(np.argmax(scores[best]))
+        return {
+            "text": candidates[best],
+            "similarity": float(scores[best, 0]),
+            "closest_word": targets[closest],
+            "closest_similarity": float(scores[best, closest]),
+        }
 
     def _similarity_score(self, str1: str, str2: str) -> float:
         """Calculate similarity score between two strings (0-100)"""
@@ -137,14 +168,34 @@ class SpeechEvaluatorAgent(BaseAgent):
         return fuzz.ratio(str1.lower(), str2.lower())
 
     @log_agent_call
-    async def evaluate_pronunciation(self, recognized_text: str, expected_word: str) -> Dict[str, Any]:
+    async def evaluate_pronunciation(self, recognized_text: str, expected_word: str,
+                                     alternatives: Optional[List[str]] = None,
+                                     vocabulary: Optional[List[str]] = None,
+                                     plan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Evaluate pronunciation by comparing recognized text with expected word or phrase.
         Enhanced with better handling of sentences and tongue twisters.
+
+        When ASR alternatives are given, the hypothesis closest to the
+        expected word is evaluated; vocabulary (the other words of the game)
+        is used to report which word the user may have said instead. The
+        evaluation plan stored with the game is used when given, otherwise
+        it is compiled (and memoized) from the expected word.
         """
+        plan = plan or exercise_plan(expected_word)
+
         self.logger.info(
             f"Starting evaluation of: '{recognized_text}' vs expected '{expected_word}'")
 
+        n_best = None
+        if alternatives or vocabulary:
+            n_best = self.score_hypotheses(
+                [recognized_text] + list(alternatives or []), expected_word, vocabulary)
+            if n_best["text"] and n_best["text"] != recognized_text:
+                self.logger.info(
+                    f"[AGENT:SPEECH_EVALUATOR] Using n-best hypothesis '{n_best['text']}'")
+                recognized_text = n_best["text"]
+
         # If no recognized text, return failure immediately
         if not recognized_text:
             self.logger.warning(
@@ -155,17 +206,13 @@ class SpeechEvaluatorAgent(BaseAgent):
                 "feedback": f"Não consegui entender. Tente pronunciar '{expected_word}' novamente, de forma clara.",
             }
 
-        # Normalize both texts for comparison
+        # Normalize the recognized text; the expected side comes from the plan
         norm_recognized = self._normalize_text(recognized_text)
-        norm_expected = self._normalize_text(expected_word)
-
-        # Check if this is a sentence (more than 3 words)
-        is_sentence = len(norm_expected.split()) > 3
 
         # For sentences, use special handling
-        if is_sentence:
+        if plan["is_sentence"]:
             sentence_is_correct = self._handle_sentence_comparison(
-                norm_recognized, norm_expected)
+                norm_recognized, plan)
             self.logger.info(
                 f"[AGENT:SPEECH_EVALUATOR] Sentence evaluation result: {sentence_is_correct}")
 
@@ -186,7 +233,7 @@ class SpeechEvaluatorAgent(BaseAgent):
 
         # Apply special handling for compound words
         norm_recognized, norm_expected, is_compound = self._handle_compound_words(
-            norm_recognized, norm_expected)
+            norm_recognized, plan)
 
         # Log normalized versions for debugging
         self.logger.info(
@@ -203,14 +250,11 @@ class SpeechEvaluatorAgent(BaseAgent):
         self.logger.info(
             f"[AGENT:SPEECH_EVALUATOR] Word similarity score: {word_similarity}%")
 
-        # For compound words or short words, use a lower threshold
-        similarity_threshold = 80 if len(
-            norm_expected) <= 4 or is_compound else 90
-        is_similar = word_similarity >= similarity_threshold
+        # Compound and short words have a lower threshold
+        is_similar = word_similarity >= plan["similarity_threshold"]
 
         # Special case for compound words: check if removing spaces makes them match
-        no_space_match = norm_recognized.replace(
-            " ", "") == norm_expected.replace(" ", "").replace("-", "")
+        no_space_match = norm_recognized.replace(" ", "") == plan["no_space"]
 
         # Determine result based on various matching strategies
         if is_exact_match or no_space_match:
@@ -253,6 +297,8 @@ class SpeechEvaluatorAgent(BaseAgent):
             "is_compound_word": is_compound,
             "no_space_match": no_space_match
         }
+        if n_best:
+            debug_info["n_best"] = n_best
 
         # Return evaluation result
         result = {
@@ -0,0 +1,432 @@
+"""
+Template-driven game generator
+
+Builds games from the bundled templates (templates/*_template.json) and an
+indexed word bank, without calling a language model. Games follow the schema
+returned by GameDesignerAgent.create_game and are ready in a few milliseconds,
+so they can serve requests on their own or stand in while the model is slow.
+"""
+import os
+import re
+import json
+import time
+import random
+import logging
+import datetime
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+WORD_BANK_PATH = TEMPLATES_DIR / "word_bank.json"
+
+# Default generator for new games: "llm", "template" or "auto" (templates
+# while the model is slow or failing)
+GAME_GENERATOR = os.environ.get("GAME_GENERATOR", "auto").lower()
+
+# Smoothed model latency (seconds) above which "auto" switches to templates
+GAME_TEMPLATE_LATENCY_THRESHOLD = float(
+    os.environ.get("GAME_TEMPLATE_LATENCY_THRESHOLD", "8"))
+
+# While on templates, let one request through to the model this often (seconds)
+GAME_TEMPLATE_PROBE_INTERVAL = float(
+    os.environ.get("GAME_TEMPLATE_PROBE_INTERVAL", "60"))
+
+# Seconds the model needs at least: with less left before the request
+# deadline, "auto" requests go straight to templates
+GAME_LLM_MIN_BUDGET = float(os.environ.get("GAME_LLM_MIN_BUDGET", "5"))
+
+# Seconds kept before the deadline to build a template game if the model is late
+GAME_TEMPLATE_RESERVE = float(os.environ.get("GAME_TEMPLATE_RESERVE", "0.5"))
+
+GENERATORS = ("llm", "template", "auto")
+
+EXERCISES_PER_GAME = 5
+
+DIFFICULTY_LEVELS = ("iniciante", "médio", "avançado")
+
+# Sons trabalhados quando o pedido não indica nenhum
+PREFERRED_SOUNDS = ("r", "rr", "l", "lh", "nh", "s", "z", "ch", "j",
+                    "p", "b", "t", "d", "f", "v", "g", "c", "m")
+
+# Palavras-chave do tipo de jogo pedido e o modelo correspondente
+KIND_KEYWORDS = (
+    ("rima", "rimas"),
+    ("sílaba", "sílaba_tônica"),
+    ("tónica", "sílaba_tônica"),
+    ("discriminação", "sílaba_tônica"),
+    ("cruzada", "palavras_cruzadas"),
+    ("sequência", "palavras_cruzadas"),
+    ("adivinh", "adivinhações"),
+    ("reconhecimento", "adivinhações"),
+    ("imagem", "conjunto_de_imagens"),
+    ("imagens", "conjunto_de_imagens"),
+    ("nomeação", "conjunto_de_imagens"),
+    ("históri", "histórias_interativas"),
+    ("narração", "histórias_interativas"),
+    ("frase", "frases_contextuais"),
+    ("trava-línguas", "desafios_de_pronúncia"),
+    ("rápida", "desafios_de_pronúncia"),
+    ("desafio", "desafios_de_pronúncia"),
+)
+
+DEFAULT_KIND = "exercícios_de_pronúncia"
+
+TITLES = {
+    "adivinhações": "Adivinhas do Som '{sound}'",
+    "conjunto_de_imagens": "Imagens do Som '{sound}'",
+    "desafios_de_pronúncia": "Desafios do Som '{sound}'",
+    "exercícios_de_pronúncia": "Palavras do Som '{sound}'",
+    "frases_contextuais": "Frases com o Som '{sound}'",
+    "histórias_interativas": "Histórias do Som '{sound}'",
+    "palavras_cruzadas": "Cruzadas do Som '{sound}'",
+    "rimas": "Rimas do Som '{sound}'",
+    "sílaba_tônica": "Sílaba Tónica com o Som '{sound}'",
+}
+
+_LEADING_CONSONANTS = re.compile(r"^(?:qu|gu|[^aeiouáéíóúâêôãõàü])+")
+
+
+class WordEntry:
+    """A word bank entry with its phonology worked out once"""
+
+    __slots__ = ("word", "clue", "sentence", "syllables", "stressed",
+                 "sounds", "level", "rhyme")
+
+    def __init__(self, word: str, clue: str, sentence: str):
+        from speech.g2p import syllables, target_sounds
+
+        self.word = word
+        self.clue = clue
+        self.sentence = sentence
+        self.syllables, self.stressed = syllables(word)
+        self.sounds = target_sounds(word)
+        count = len(self.syllables)
+        self.level = "iniciante" if count <= 2 else "médio" if count == 3 else "avançado"
+        # Rima: do núcleo da sílaba tónica até ao fim da palavra
+        self.rhyme = ""
+        if self.stressed >= 0:
+            self.rhyme = _LEADING_CONSONANTS.sub("", self.syllables[self.stressed]) + \
+                "".join(self.syllables[self.stressed + 1:])
+
+
+class TemplateGameGenerator:
+    def __init__(self, templates_dir: Path = TEMPLATES_DIR,
+                 word_bank_path: Path = WORD_BANK_PATH, seed: Optional[int] = None):
+        """
+        Load the templates and index the word bank
+
+        Args:
+            templates_dir: Directory with the <kind>_template.json files
+            word_bank_path: JSON list of {word, clue, sentence} entries
+            seed: Seed for reproducible games (tests)
+        """
+        self._random = random.Random(seed)
+        self.templates = self._load_templates(Path(templates_dir))
+        self.words = [WordEntry(entry["word"], entry["clue"], entry["sentence"])
+                      for entry in json.loads(Path(word_bank_path).read_text(encoding="utf-8"))]
+
+        # Índices: (nível, som) e rima
+        self._by_level_sound: Dict[Tuple[str, str], List[WordEntry]] = defaultdict(list)
+        self._by_rhyme: Dict[str, List[WordEntry]] = defaultdict(list)
+        for entry in self.words:
+            for sound in entry.sounds:
+                self._by_level_sound[(entry.level, sound)].append(entry)
+            if entry.rhyme:
+                self._by_rhyme[entry.rhyme].append(entry)
+
+        self._builders: Dict[str, Callable[[WordEntry, str, int], Dict[str, Any]]] = {
+            "adivinhações": self._riddle_exercise,
+            "conjunto_de_imagens": self._picture_exercise,
+            "desafios_de_pronúncia": self._challenge_exercise,
+            "exercícios_de_pronúncia": self._word_exercise,
+            "frases_contextuais": self._phrase_exercise,
+            "histórias_interativas": self._story_exercise,
+            "palavras_cruzadas": self._crossword_exercise,
+            "rimas": self._rhyme_exercise,
+            "sílaba_tônica": self._stress_exercise,
+        }
+        logger.info(f"Loaded {len(self.templates)} game templates and "
+                    f"{len(self.words)} word bank entries")
+
+    @staticmethod
+    def _load_templates(templates_dir: Path) -> Dict[str, Dict[str, Any]]:
+        """Templates keyed by kind (file name without '_template.json')"""
+        templates = {}
+        for path in sorted(templates_dir.glob("*_template.json")):
+            kind = path.name[:-len("_template.json")]
+            templates[kind] = json.loads(path.read_text(encoding="utf-8"))
+        return templates
+
+    def template_kind(self, game_type: str) -> str:
+        """Template used for a requested game type (catalogue name or kind)"""
+        normalized = (game_type or "").strip().lower()
+        for kind in self.templates:
+            if normalized in (kind, kind.replace("_", " ")):
+                return kind
+        for keyword, kind in KIND_KEYWORDS:
+            if keyword in normalized and kind in self.templates:
+                return kind
+        return DEFAULT_KIND
+
+    def create_game(self, user_id: str, difficulty: str = "iniciante",
+                    game_type: str = "exercícios de pronúncia",
+                    target_sound: Optional[str] = None,
+                    count: int = EXERCISES_PER_GAME) -> Dict[str, Any]:
+        """
+        Creates a game from the templates, in the create_game schema
+
+        Args:
+            user_id: User the game is for
+            difficulty: 'iniciante', 'médio' or 'avançado'
+            game_type: Catalogue game type or template kind
+            target_sound: Therapy sound to practise (e.g. 'r', 'lh'); chosen
+                from the word bank when omitted
+            count: Number of exercises
+        """
+        started = time.perf_counter()
+        level = difficulty if difficulty in DIFFICULTY_LEVELS else "iniciante"
+        kind = self.template_kind(game_type)
+        template = self.templates.get(kind) or self.templates[DEFAULT_KIND]
+        eligible = self._eligibility(kind)
+
+        sound = (target_sound or "").strip().lower()
+        if not sound or not self._candidates(level, sound, eligible):
+            sound = self._choose_sound(level, eligible, count)
+        words = self._pick_words(level, sound, eligible, count)
+
+        build = self._builders[kind]
+        exercises = []
+        for index, entry in enumerate(words):
+            exercise = {
+                "word": entry.word,
+                "type": kind.replace("_", " "),
+                "feedback": {
+                    "correct": f"Muito bem! Disseste '{entry.word}' na perfeição.",
+                    "incorrect": f"Quase! Tenta outra vez, com atenção ao som '{sound}'."
+                }
+            }
+            exercise.update(build(entry, sound, index))
+            exercises.append(exercise)
+
+        template_sound = template.get("target_sound", "")
+        game_data = {
+            "title": TITLES.get(kind, TITLES[DEFAULT_KIND]).format(sound=sound.upper()),
+            "description": self._with_sound(template.get("description", ""), template_sound, sound),
+            "instructions": [self._with_sound(step, template_sound, sound)
+                             for step in template.get("instructions", [])],
+            "exercises": exercises,
+            "target_skills": [self._with_sound(skill, template_sound, sound)
+                              for skill in template.get("target_skills", [])],
+            "target_sound": sound,
+            "estimated_duration": template.get("estimated_duration", "5-10 minutos"),
+            "theme": template.get("theme", ""),
+            "visual_style": template.get("visual_style", ""),
+            "template": kind,
+            "game_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "created_at": datetime.datetime.utcnow().isoformat(),
+            "status": "active",
+            "game_type": game_type,
+            "difficulty": level
+        }
+        logger.info(f"Template game '{kind}' ({level}, sound '{sound}') built in "
+                    f"{(time.perf_counter() - started) * 1000:.1f}ms")
+        return game_data
+
+    def _eligibility(self, kind: str) -> Callable[[WordEntry], bool]:
+        """Which words a template can use"""
+        if kind == "rimas":
+            return lambda entry: len(self._by_rhyme.get(entry.rhyme, ())) > 1
+        if kind == "sílaba_tônica":
+            return lambda entry: len(entry.syllables) > 1
+        return lambda entry: True
+
+    def _candidates(self, level: str, sound: str,
+                    eligible: Callable[[WordEntry], bool]) -> List[WordEntry]:
+        return [entry for entry in self._by_level_sound.get((level, sound), ()) if eligible(entry)]
+
+    def _choose_sound(self, level: str, eligible: Callable[[WordEntry], bool],
+                      count: int) -> str:
+        """A target sound with enough words at the level (the richest one otherwise)"""
+        sizes = {sound: len(self._candidates(level, sound, eligible)) for sound in PREFERRED_SOUNDS}
+        enough = [sound for sound, size in sizes.items() if size >= count]
+        if enough:
+            return self._random.choice(enough)
+        return max(PREFERRED_SOUNDS, key=lambda sound: sizes[sound])
+
+    def _pick_words(self, level: str, sound: str, eligible: Callable[[WordEntry], bool],
+                    count: int) -> List[WordEntry]:
+        """
+        Words for a game: the level and sound first, then the same sound at
+        the nearest levels, then any word at the level
+        """
+        position = DIFFICULTY_LEVELS.index(level)
+        nearest = sorted(DIFFICULTY_LEVELS, key=lambda other: abs(
+            DIFFICULTY_LEVELS.index(other) - position))
+
+        chosen: List[WordEntry] = []
+        pools = [self._candidates(other, sound, eligible) for other in nearest]
+        pools.append([entry for entry in self.words if entry.level == level and eligible(entry)])
+        for pool in pools:
+            pool = [entry for entry in pool if entry not in chosen]
+            self._random.shuffle(pool)
+            chosen.extend(pool[:count - len(chosen)])
+            if len(chosen) >= count:
+                break
+        return chosen
+
+    @staticmethod
+    def _with_sound(text: str, template_sound: str, sound: str) -> str:
+        """Template text with its example sound replaced by the game's"""
+        if not template_sound:
+            return text
+        return text.replace(f"'{template_sound}'", f"'{sound}'")
+
+    # Um construtor por modelo: os campos próprios do modelo, mais prompt e dica
+
+    def _word_exercise(self, entry: WordEntry, sound: str, index: int) -> Dict[str, Any]:
+        return {
+            "prompt": f"Diz a palavra '{entry.word}' em voz alta.",
+            "hint": f"Divide-a em sílabas: {'-'.join(entry.syllables)}.",
+            "tip": f"Atenção ao som '{sound}'.",
+            "difficulty": DIFFICULTY_LEVELS.index(entry.level) + 1,
+            "image_hint": entry.clue
+        }
+
+    def _riddle_exercise(self, entry: WordEntry, sound: str, index: int) -> Dict[str, Any]:
+        clue = f"{entry.clue} O que é?"
+        return {
+            "clue": clue,
+            "answer": entry.word,
+            "prompt": f"Ouve a adivinha e diz a resposta: {clue}",
+            "hint": f"Começa por '{entry.word[0].upper()}' e tem "
+                    f"{len(entry.syllables)} sílaba{'s' if len(entry.syllables) > 1 else ''}."
+        }
+
+    def _picture_exercise(self, entry: WordEntry, sound: str, index: int) -> Dict[str, Any]:
+        return {
+            "image_description": entry.clue,
+            "target_word": entry.word,
+            "prompt": "Observa a imagem e diz o nome do que vês.",
+            "hint": f"A palavra diz-se assim: {'-'.join(entry.syllables)}."
+        }
+
+    def _challenge_exercise(self, entry: WordEntry, sound: str, index: int) -> Dict[str, Any]:
+        return {
+            "sentence": entry.sentence,
+            "challenge": f"Diz '{entry.word}' bem claro!",
+            "prompt": f"Lê a frase em voz alta: {entry.sentence}",
+            "hint": "Começa devagar e depois tenta mais depressa."
+        }
+
+    def _phrase_exercise(self, entry: WordEntry, sound: str, index: int) -> Dict[str, Any]:
+        return {
+            "situation": entry.clue,
+            "phrase": entry.sentence,
+            "target_sounds": [sound],
+            "prompt": f"Repete a frase: {entry.sentence}",
+            "hint": f"A palavra mais importante é '{entry.word}'."
+        }
+
+    def _story_exercise(self, entry: WordEntry, sound: str, index: int) -> Dict[str, Any]:
+        return {
+            "scenario": f"A Gigi encontrou algo especial: {entry.word}",
+            "target_phrase": entry.sentence,
+            "context": entry.clue,
+            "character": "Gigi",
+            "prompt": f"Ajuda a Gigi a contar a história: {entry.sentence}",
+            "hint": f"Diz '{entry.word}' com calma."
+        }
+
+    def _crossword_exercise(self, entry: WordEntry, sound: str, index: int) -> Dict[str, Any]:
+        letters = sum(1 for letter in entry.word if letter.isalpha())
+        return {
+            "clue": entry.clue,
+            "position": "horizontal" if index % 2 == 0 else "vertical",
+            "prompt": f"Descobre a palavra: {entry.clue}",
+            "hint": f"Tem {letters} letras e começa por '{entry.word[0].upper()}'."
+        }
+
+    def _rhyme_exercise(self, entry: WordEntry, sound: str, index: int) -> Dict[str, Any]:
+        rhymes = [other.word for other in self._by_rhyme.get(entry.rhyme, ()) if other is not entry]
+        return {
+            "starter": entry.word,
+            "rhymes": rhymes[:3],
+            "prompt": f"Diz '{entry.word}' e depois uma palavra que rime com ela.",
+            "hint": f"Por exemplo: {rhymes[0]}." if rhymes else "Procura um som igual no fim."
+        }
+
+    def _stress_exercise(self, entry: WordEntry, sound: str, index: int) -> Dict[str, Any]:
+        question = f"Ouve a palavra '{entry.word}'. Qual é a sílaba tónica?"
+        return {
+            "exercise": question,
+            "options": list(entry.syllables),
+            "correct_answer": entry.syllables[entry.stressed],
+            "prompt": question,
+            "hint": f"Diz '{entry.word}' devagar e repara na sílaba mais forte."
+        }
+
+
+class LatencyTracker:
+    def __init__(self, threshold: float = GAME_TEMPLATE_LATENCY_THRESHOLD,
+                 probe_interval: float = GAME_TEMPLATE_PROBE_INTERVAL, alpha: float = 0.3):
+        """
+        Smoothed latency of model-generated games, to decide when "auto"
+        requests are better served by templates
+
+        Args:
+            threshold: Smoothed latency (seconds) above which the model is slow
+            probe_interval: Seconds between model requests while it is slow
+            alpha: Weight of each new sample
+        """
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Record how long a model-generated game took"""
+        with self._lock:
+            self.latency = seconds if self.latency is None else \
+                self.alpha * seconds + (1 - self.alpha) * self.latency
+            self._last_attempt = time.monotonic()
+
+    def record_failure(self):
+        """A failed generation counts as twice the threshold"""
+        self.record(self.threshold * 2)
+
+    def use_templates(self) -> bool:
+        """Whether the next "auto" request should skip the model"""
+        with self._lock:
+            if self.latency is None or self.latency <= self.threshold:
+                return False
+            now = time.monotonic()
+            if now - self._last_attempt >= self.probe_interval:
+                # Deixar passar um pedido para medir de novo
+                self._last_attempt = now
+                return False
+            return True
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"latency": self.latency, "threshold": self.threshold,
+                "slow": self.latency is not None and self.latency > self.threshold}
+
+
+_generator: Optional[TemplateGameGenerator] = None
+_generator_lock = threading.Lock()
+
+
+def get_template_game_generator() -> TemplateGameGenerator:
+    """Shared generator, loading the templates and word bank on first use"""
+    global _generator
+    with _generator_lock:
+        if _generator is None:
+            _generator = TemplateGameGenerator()
+        return _generator
@@ -3,16 +3,32 @@ import json
 import logging
 import os
 import random
+import asyncio
 import datetime
 from openai import OpenAI
 from speech.synthesis import synthesize_speech
 from utils.agent_logger import log_agent_call
 from .base_agent import BaseAgent
+from ..server.deadline import DeadlineExceeded, has_budget, remaining
+from ..server.token_accounting import PromptSection, count_tokens, fit_prompt
 
 # Configuração adequada do logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# Tempo mínimo (segundos) até ao prazo do pedido para pedir as instruções ao
+# modelo; abaixo disso usam-se as instruções padrão
+TUTOR_MIN_LLM_BUDGET = float(os.environ.get("TUTOR_MIN_LLM_BUDGET", "2"))
+
+# Tempo mínimo para a segunda tentativa (sem modo JSON) depois de um erro
+TUTOR_MIN_RETRY_BUDGET = float(os.environ.get("TUTOR_MIN_RETRY_BUDGET", "4"))
+
+# Tempo mínimo para sintetizar a voz; abaixo disso as instruções seguem só em texto
+TTS_MIN_BUDGET = float(os.environ.get("TTS_MIN_BUDGET", "1"))
+
+# Margem deixada ao resto do pedido depois da síntese
+_TTS_DEADLINE_RESERVE = 0.2
+
 
 class TutorAgent(BaseAgent):
     def __init__(self, game_designer_agent=None, client=None):
@@ -101,6 +117,7 @@ class TutorAgent(BaseAgent):
         # Original method implementation here
         # ...
 
+    @log_agent_call
     async def create_instructions(self, user_profile: Dict[str, Any], difficulty: str) -> Dict[str, Any]:
         """Async version of create_instructions"""
         name = user_profile.get("name", "amigo")
@@ -121,20 +138,26 @@ class TutorAgent(BaseAgent):
                     last_session = sessions[-1]
                     user_context = f"Na última sessão em {last_session['date']}, {name} praticou {last_session['game_type']} com foco no som '{last_session['target_sound']}' e teve desempenho {last_session['performance']}."
 
-            prompt = f"""
-            Crie instruções em português de Portugal para {name}, {age} anos, nível {difficulty}.
-            {user_context}
-            Seja {persona['style']} em suas explicações.
-            Retorne JSON com 'greeting', 'explanation', 'encouragement' e 'tips'.
-            """
+            system_prompt = f"És um terapeuta da fala {persona['style']} que trabalha com crianças."
+
+            # O histórico é opcional: sai do prompt se exceder o orçamento de tokens
+            prompt = fit_prompt([
+                PromptSection(
+                    "request", f"Crie instruções em português de Portugal para {name}, {age} anos, nível {difficulty}."),
+                PromptSection("history", user_context, optional=True),
+                PromptSection("format", f"""Seja {persona['style']} em suas explicações.
+Retorne JSON com 'greeting', 'explanation', 'encouragement' e 'tips'.""")
+            ], reserved=count_tokens(system_prompt, "gpt-4o-mini"), model="gpt-4o-mini")
+
+            if not has_budget(TUTOR_MIN_LLM_BUDGET):
+                raise DeadlineExceeded("Not enough time left for the instructions completion")
 
             # Try with gpt-4o-mini first
             try:
                 response = await self.client.chat.completions.create(
                     model="gpt-4o-mini",
                     messages=[
-                        {"role": "system",
-                            "content": f"És um terapeuta da fala {persona['style']} que trabalha com crianças."},
+                        {"role": "system", "content": system_prompt},
                         {"role": "user", "content": prompt}
                     ],
                     response_format={"type": "json_object"},
@@ -143,12 +166,14 @@ class TutorAgent(BaseAgent):
                 instructions = json.loads(response.choices[0].message.content)
             except Exception as e:
                 self.logger.warning(f"Erro com gpt-4o-mini: {str(e)}")
+                # Sem tempo para outro pedido completo: instruções padrão
+                if not has_budget(TUTOR_MIN_RETRY_BUDGET):
+                    raise
                 # Fallback to gpt-4o-mini
                 response = await self.client.chat.completions.create(
                     model="gpt-4o-mini",
                     messages=[
-                        {"role": "system",
-                            "content": f"És um terapeuta da fala {persona['style']} que trabalha com crianças."},
+                        {"role": "system", "content": system_prompt},
                         {"role": "user", "content": prompt +
                             " Responda apenas com o objeto JSON, sem texto adicional."}
                     ],
@@ -177,28 +202,19 @@ class TutorAgent(BaseAgent):
                     voice_settings = self.voice_settings.get(persona["voice"],
                                                              {"voice_id": "Ines", "engine": "neural"})
 
-                    greeting_audio = await self._synthesize_speech_async(
-                        instructions["greeting"], voice_settings)
-                    explanation_audio = await self._synthesize_speech_async(
-                        instructions["explanation"], voice_settings)
-                    encouragement_audio = await self._synthesize_speech_async(
-                        instructions["encouragement"], voice_settings)
-
-                    # Sintetizar dicas opcionais
-                    tips_audio = None
+                    # Todos os segmentos em paralelo (e dicas opcionais)
+                    segments = {
+                        "greeting": instructions["greeting"],
+                        "explanation": instructions["explanation"],
+                        "encouragement": instructions["encouragement"]
+                    }
                     if "tips" in instructions and isinstance(instructions["tips"], list) and instructions["tips"]:
-                        tips_text = ". ".join(instructions["tips"])
-                        tips_audio = await self._synthesize_speech_async(
-                            tips_text, voice_settings)
+                        segments["tips"] = ". ".join(instructions["tips"])
+                    audio = await self._synthesize_segments(segments, voice_settings)
 
-                    if greeting_audio and explanation_audio and encouragement_audio:
+                    if audio["greeting"] and audio["explanation"] and audio["encouragement"]:
                         instructions["audio"] = {
-                            "greeting": greeting_audio,
-                            "explanation": explanation_audio,
-                            "encouragement": encouragement_audio
-                        }
-                        if tips_audio:
-                            instructions["audio"]["tips"] = tips_audio
+                            name: data for name, data in audio.items() if data}
                     else:
                         self.logger.warning(
                             "Alguns segmentos de áudio falharam na geração")
@@ -225,18 +241,81 @@ class TutorAgent(BaseAgent):
                     voice_settings = self.voice_settings.get(persona["voice"],
                                                              {"voice_id": "Ines", "engine": "neural"})
 
-                    default_instructions["audio"] = {
-                        "greeting": await self._synthesize_speech_async(default_instructions["greeting"], voice_settings),
-                        "explanation": await self._synthesize_speech_async(default_instructions["explanation"], voice_settings),
-                        "encouragement": await self._synthesize_speech_async(default_instructions["encouragement"], voice_settings)
-                    }
+                    default_instructions["audio"] = await self._synthesize_segments(
+                        {name: default_instructions[name]
+                         for name in ("greeting", "explanation", "encouragement")},
+                        voice_settings)
                 except Exception as e:
                     self.logger.error(
                         f"Falha ao gerar voz para instruções padrão: {str(e)}")
 
             return default_instructions
 
+    def _select_persona_for_user(self, user_id: str, age: int) -> Dict[str, Any]:
+        """Persona do tutor para o utilizador (fixa durante a vida do agente)"""
+        if user_id not in self.user_sessions:
+            if age <= 8:
+                persona_name = "animado"
+            elif age <= 12:
+                persona_name = "engraçado"
+            else:
+                persona_name = "calmo"
+            self.user_sessions[user_id] = {"persona": persona_name}
+        return self.tutor_personas[self.user_sessions[user_id]["persona"]]
+
+    def _record_session_start(self, user_id: str, difficulty: str):
+        """Regista o início de uma sessão no histórico do utilizador"""
+        history = self.interaction_history.setdefault(user_id, {"sessions": []})
+        history["sessions"].append({
+            "date": datetime.datetime.now().strftime("%d/%m/%Y"),
+            "difficulty": difficulty,
+            "game_type": "exercícios de pronúncia",
+            "target_sound": "vários",
+            "performance": "em curso"
+        })
+
     async def _synthesize_speech_async(self, text, voice_config):
-        """Async wrapper around speech synthesis"""
-        from speech.synthesis import synthesize_speech_async
-        return await synthesize_speech_async(text, voice_config)
+        """Async wrapper around speech synthesis (answered from the audio store when cached)"""
+        from speech.synthesis import synthesize_cached_async
+        return await synthesize_cached_async(text, voice_config)
+
+    async def _synthesize_segments(self, segments: Dict[str, str], voice_config) -> Dict[str, Any]:
+        """
+        Synthesize several instruction segments concurrently
+
+        The TTS backends' worker pools bound how many run at once; the call
+        returns when the slowest segment is done, or at the request deadline
+        with the segments finished by then.
+
+        Returns:
+            Audio for each segment name, or None for segments that failed
+            or did not finish in time
+        """
+        names = list(segments)
+        left = remaining()
+        if left is not None:
+            left -= _TTS_DEADLINE_RESERVE
+            if left < TTS_MIN_BUDGET:
+                self.logger.warning(
+                    "Sem tempo para sintetizar a voz: instruções só em texto")
+                return {name: None for name in names}
+
+        tasks = [asyncio.ensure_future(self._synthesize_speech_async(segments[name], voice_config))
+                 for name in names]
+        done, pending = await asyncio.wait(tasks, timeout=left)
+        for task in pending:
+            task.cancel()
+
+        audio = {}
+        for name, task in zip(names, tasks):
+            result = None
+            if task in pending:
+                self.logger.warning(
+                    f"Segmento '{name}' não ficou pronto antes do prazo do pedido")
+            elif task.exception() is not None:
+                self.logger.warning(
+                    f"Falha ao sintetizar o segmento '{name}': {str(task.exception())}")
+            else:
+                result = task.result()
+            audio[name] = result
+        return audio
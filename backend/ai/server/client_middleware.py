@@ -0,0 +1,135 @@
+"""
+Composable middleware around the OpenAI client's chat completions
+
+The completion cache, the rate governor and the token ledger all act on
+``chat.completions.create`` and nothing else. Each is a middleware: its
+``create`` (synchronous client) and ``acreate`` (asynchronous client) get
+the request arguments and ``call_next``, which sends the request on to the
+next layer and finally to the provider. MiddlewareClient does the proxying
+once: every other attribute of the client, of ``chat`` and of
+``chat.completions`` is forwarded unchanged.
+"""
+
+from typing import Any, Callable, List, Optional
+
+
+class CompletionMiddleware:
+    """Middleware that passes requests through; subclasses override the hooks"""
+
+    def create(self, call_next: Callable[..., Any], **kwargs) -> Any:
+        """Handle a request of the synchronous client"""
+        return call_next(**kwargs)
+
+    async def acreate(self, call_next: Callable[..., Any], **kwargs) -> Any:
+        """Handle a request of the asynchronous client"""
+        return await call_next(**kwargs)
+
+
+class _Delegate:
+    """Forwards every attribute it does not define to the wrapped object"""
+
+    def __init__(self, wrapped: Any):
+        self._wrapped = wrapped
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._wrapped, name)
+
+
+class _Completions(_Delegate):
+    def __init__(self, wrapped: Any, middleware: CompletionMiddleware):
+        super().__init__(wrapped)
+        self._middleware = middleware
+
+    def create(self, **kwargs) -> Any:
+        return self._middleware.create(self._wrapped.create, **kwargs)
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, **kwargs) -> Any:
+        return await self._middleware.acreate(self._wrapped.create, **kwargs)
+
+
+class _Chat(_Delegate):
+    def __init__(self, wrapped: Any, completions: _Completions):
+        super().__init__(wrapped)
+        self.completions = completions
+
+
+class MiddlewareClient(_Delegate):
+    """OpenAI client (sync or async) whose chat completions go through a middleware"""
+
+    def __init__(self, client: Any, middleware: CompletionMiddleware, is_async: bool):
+        super().__init__(client)
+        self.middleware = middleware
+        completions_class = _AsyncCompletions if is_async else _Completions
+        self.chat = _Chat(client.chat, completions_class(client.chat.completions, middleware))
+
+
+def wrap_client(client: Any, middlewares: List[CompletionMiddleware], is_async: bool) -> Any:
+    """Wrap a client in middlewares; the first one is the outermost"""
+    for middleware in reversed(middlewares):
+        client = MiddlewareClient(client, middleware, is_async)
+    return client
+
+
+class ObservedStream:
+    """
+    Streamed completion that reports its chunks and its end
+
+    ``on_chunk`` is called with every chunk and ``on_close`` once with
+    whether the stream failed, when it is exhausted, fails, or is dropped
+    unfinished.
+    """
+
+    def __init__(self, stream: Any, on_chunk: Optional[Callable[[Any], None]] = None,
+                 on_close: Optional[Callable[[bool], None]] = None):
+        self._wrapped = stream
+        self._on_chunk = on_chunk
+        self._on_close = on_close
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._wrapped, name)
+
+    def _chunk(self, chunk: Any):
+        if self._on_chunk is not None:
+            self._on_chunk(chunk)
+
+    def _close(self, error: bool):
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close(error)
+
+    def __iter__(self):
+        error = False
+        try:
+            for chunk in self._wrapped:
+                self._chunk(chunk)
+                yield chunk
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._close(error)
+
+    async def _chunks(self):
+        error = False
+        try:
+            async for chunk in self._wrapped:
+                self._chunk(chunk)
+                yield chunk
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._close(error)
+
+    def __aiter__(self):
+        return self._chunks()
+
+    def __del__(self):
+        # Never iterated (or abandoned): still report the end
+        if self.__dict__.get("_on_close") is not None:
+            try:
+                self._close(True)
+            except Exception:
+                pass
@@ -0,0 +1,276 @@
+"""
+Persistent cache of language model completions
+
+Tutor instructions and the AITools helpers often send exactly the same
+prompt again (same difficulty, persona and age). The cache wraps the shared
+OpenAI client: a chat completion whose model, messages, response format and
+sampling parameters were seen before is answered from a local SQLite file
+instead of the API. Entries expire after a TTL and the least recently used
+ones are dropped beyond a size bound.
+
+Calls that need a fresh answer every time (game creation) pass
+``cache=False`` to ``chat.completions.create``; streamed calls are never
+cached.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from openai.types.chat import ChatCompletion
+
+from .client_middleware import CompletionMiddleware, MiddlewareClient
+
+logger = logging.getLogger(__name__)
+
+COMPLETION_CACHE_ENABLED = os.environ.get(
+    "COMPLETION_CACHE_ENABLED", "true").lower() == "true"
+
+COMPLETION_CACHE_PATH = os.environ.get(
+    "COMPLETION_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "gigi_completions.sqlite3"))
+
+# Seconds a cached completion stays valid (default: one week)
+COMPLETION_CACHE_TTL = int(os.environ.get("COMPLETION_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Completions kept; the least recently used are dropped beyond this
+COMPLETION_CACHE_MAX_ENTRIES = int(os.environ.get("COMPLETION_CACHE_MAX_ENTRIES", "5000"))
+
+# Request options that do not change the completion (``lane`` is the rate
+# governor's per-call option, read further down the client stack)
+_UNKEYED_PARAMS = {"timeout", "extra_headers", "extra_query", "extra_body", "user", "lane"}
+
+# Writes between two pruning passes
+_PRUNE_EVERY = 50
+
+# Cache hits whose last-used time is recorded in one write
+_TOUCH_BATCH = 100
+
+
+def completion_key(params: Dict[str, Any]) -> str:
+    """
+    Canonical hash of a chat completion request
+
+    Model, messages, response format and sampling parameters are serialised
+    with sorted keys, so equal requests hash equally whatever the argument
+    order.
+    """
+    keyed = {name: value for name, value in params.items()
+             if name not in _UNKEYED_PARAMS}
+    payload = json.dumps(keyed, sort_keys=True, ensure_ascii=False,
+                         separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    def __init__(self, path: str = COMPLETION_CACHE_PATH,
+                 ttl: int = COMPLETION_CACHE_TTL,
+                 max_entries: int = COMPLETION_CACHE_MAX_ENTRIES):
+        """
+        Initialize the cache
+
+        Args:
+            path: SQLite file holding the completions
+            ttl: Seconds a completion stays valid
+            max_entries: Completions kept
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._writes = 0
+        # Last use of entries served since the last write, recorded in batches
+        self._touched: Dict[str, float] = {}
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database (again after a fork; caller holds the lock)"""
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5.0,
+                                         check_same_thread=False)
+            # Several workers share the file
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_used REAL NOT NULL)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS completions_last_used"
+                " ON completions (last_used)")
+            connection.commit()
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Cached response for a key, or None if absent or expired
+
+        Reads only: the entry's last use is kept in memory and written with
+        the next store, or once _TOUCH_BATCH hits are pending.
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT response, created_at FROM completions WHERE key = ?",
+                    (key,)).fetchone()
+                if row is None or now - row[1] > self.ttl:
+                    self.stats["misses"] += 1
+                    return None
+                self.stats["hits"] += 1
+                self._touched[key] = now
+                if len(self._touched) >= _TOUCH_BATCH:
+                    self._flush_touched(connection)
+                    connection.commit()
+                return row[0]
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Completion cache read failed: {str(e)}")
+            self.stats["errors"] += 1
+            return None
+
+    def _flush_touched(self, connection: sqlite3.Connection):
+        """Record the pending last-used times (caller holds the lock and commits)"""
+        if self._touched:
+            connection.executemany(
+                "UPDATE completions SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def put(self, key: str, response: str):
+        """Store a response, pruning expired and excess entries now and then"""
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                    (key, response, now, now))
+                self._flush_touched(connection)
+                self.stats["stores"] += 1
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 1:
+                    self._prune(connection, now)
+                connection.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Completion cache write failed: {str(e)}")
+            self.stats["errors"] += 1
+
+    def _prune(self, connection: sqlite3.Connection, now: float):
+        self._flush_touched(connection)
+        connection.execute("DELETE FROM completions WHERE created_at < ?",
+                           (now - self.ttl,))
+        connection.execute(
+            "DELETE FROM completions WHERE key IN (SELECT key FROM completions"
+            " ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def clear(self):
+        """Drop every cached completion"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM completions")
+            connection.commit()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Entry count and counters"""
+        with self._lock:
+            try:
+                entries = self._connect().execute(
+                    "SELECT COUNT(*) FROM completions").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+            return {"entries": entries, "ttl": self.ttl,
+                    "max_entries": self.max_entries, **self.stats}
+
+
+def _cache_key(cache: Optional[CompletionCache], kwargs: Dict[str, Any]) -> Optional[str]:
+    """Split the cache option off a request; its key, or None if not cacheable"""
+    use_cache = kwargs.pop("cache", True)
+    if cache is None or not use_cache or kwargs.get("stream"):
+        return None
+    return completion_key(kwargs)
+
+
+def _cached(cache: CompletionCache, key: str) -> Optional[ChatCompletion]:
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    try:
+        return ChatCompletion.model_validate_json(cached)
+    except ValueError:
+        # Written by another version of the client library
+        return None
+
+
+def _store(cache: CompletionCache, key: str, completion: Any):
+    if isinstance(completion, ChatCompletion):
+        cache.put(key, completion.model_dump_json())
+
+
+class CacheMiddleware(CompletionMiddleware):
+    """Answers repeated requests from the cache and stores new completions"""
+
+    def __init__(self, cache: Optional[CompletionCache]):
+        self.cache = cache
+
+    def create(self, call_next, **kwargs) -> Any:
+        key = _cache_key(self.cache, kwargs)
+        cached = _cached(self.cache, key) if key else None
+        if cached is not None:
+            return cached
+        completion = call_next(**kwargs)
+        if key:
+            _store(self.cache, key, completion)
+        return completion
+
+    async def acreate(self, call_next, **kwargs) -> Any:
+        key = _cache_key(self.cache, kwargs)
+        if not key:
+            return await call_next(**kwargs)
+        # The SQLite file may be busy with other workers: keep it off the event loop
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, _cached, self.cache, key)
+        if cached is not None:
+            return cached
+        completion = await call_next(**kwargs)
+        await loop.run_in_executor(None, _store, self.cache, key, completion)
+        return completion
+
+
+class CachedClient(MiddlewareClient):
+    """
+    OpenAI client (sync or async) whose chat completions go through the cache
+
+    ``chat.completions.create`` accepts an extra ``cache`` argument; pass
+    ``cache=False`` for calls that must not be served from the cache. With
+    no cache (caching disabled) the argument is accepted and ignored.
+    """
+
+    def __init__(self, client: Any, cache: Optional[CompletionCache], is_async: bool):
+        super().__init__(client, CacheMiddleware(cache), is_async)
+
+
+_completion_cache: Optional[CompletionCache] = None
+_completion_cache_lock = threading.Lock()
+
+
+def get_completion_cache() -> CompletionCache:
+    """Shared completion cache of this process"""
+    global _completion_cache
+    with _completion_cache_lock:
+        if _completion_cache is None:
+            _completion_cache = CompletionCache()
+        return _completion_cache
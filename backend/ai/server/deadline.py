@@ -0,0 +1,100 @@
+"""
+Request deadlines
+
+A request's deadline is set on its ModelContext. MCPServer.process_message
+binds it to a context variable for the duration of the handler, so agents,
+model calls, retries and speech synthesis below the handler can check the
+remaining budget without threading it through every signature. Tasks
+started while handling the message inherit it.
+
+Each stage decides what to do with the budget it is left: skip an optional
+step, pick a cheaper path, or stop. When the deadline arrives the handler is
+cancelled, so no tokens are spent on an answer nobody is waiting for.
+"""
+
+import time
+import asyncio
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Iterator, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when a request's deadline passes before its work is done"""
+
+
+def deadline_after(seconds: float) -> float:
+    """Deadline (monotonic clock) ``seconds`` from now"""
+    return time.monotonic() + seconds
+
+
+def current_deadline() -> Optional[float]:
+    """Deadline bound to the running request, or None"""
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the running request's deadline (None if unbounded)"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def has_budget(seconds: float) -> bool:
+    """Whether at least ``seconds`` are left (always true without a deadline)"""
+    left = remaining()
+    return left is None or left >= seconds
+
+
+def timeout_for(default: Optional[float]) -> Optional[float]:
+    """A timeout that also ends at the deadline"""
+    left = remaining()
+    if left is None:
+        return default
+    left = max(0.0, left)
+    return left if default is None else min(default, left)
+
+
+@contextmanager
+def bind_deadline(deadline: Optional[float]) -> Iterator[None]:
+    """Bind a deadline for the block; an earlier deadline already bound wins"""
+    current = _deadline.get()
+    if deadline is None or (current is not None and current <= deadline):
+        yield
+        return
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+async def within_deadline(awaitable: Awaitable[Any], reserve: float = 0.0,
+                          what: str = "request") -> Any:
+    """
+    Await ``awaitable``, cancelling it when the deadline arrives
+
+    Args:
+        awaitable: Work to run
+        reserve: Seconds to keep for the caller's degraded path
+        what: Name of the work, for the error message
+
+    Raises:
+        DeadlineExceeded: If the deadline (less the reserve) passes first
+    """
+    left = remaining()
+    if left is None:
+        return await awaitable
+    left -= reserve
+    if left <= 0:
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(f"No time left for {what}")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except DeadlineExceeded:
+        raise
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Deadline reached during {what}") from None
@@ -0,0 +1,249 @@
+"""
+Pool of pre-generated games
+
+Generating a game waits on a language model completion for several seconds.
+The pool keeps a few ready games for each (difficulty, game type) of the
+game designer's catalogue and tops itself up in the background as games are
+handed out, so a request for a catalogue game is normally answered at once.
+Generation runs on a dedicated event loop thread, away from request loops.
+
+The games each user received are remembered by fingerprint in a shared store
+(the database) when one is given, so a user is not handed the same game by
+another worker or after a restart; this worker's memory backs it up.
+"""
+
+import os
+import copy
+import json
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GAME_POOL_ENABLED = os.environ.get("GAME_POOL_ENABLED", "true").lower() == "true"
+
+# Fill the whole pool when the app starts, rather than on first use of each
+# entry. Every worker has its own pool, so with N workers this sends N times
+# the catalogue's completions at every deploy; off by default
+GAME_POOL_WARM = os.environ.get("GAME_POOL_WARM", "false").lower() == "true"
+
+# Ready games kept per (difficulty, game type)
+GAME_POOL_SIZE = int(os.environ.get("GAME_POOL_SIZE", "2"))
+
+# Games generated at the same time by the refill loop
+GAME_POOL_CONCURRENCY = int(os.environ.get("GAME_POOL_CONCURRENCY", "2"))
+
+# Games remembered per user to avoid handing out repeats
+GAME_POOL_SEEN_PER_USER = 200
+
+# Users whose seen games are remembered
+GAME_POOL_SEEN_USERS = 10000
+
+PoolKey = Tuple[str, str]
+
+
+def game_fingerprint(game: Dict[str, Any]) -> str:
+    """Identify a game by its content (title and exercise words)"""
+    words = sorted(str(exercise.get("word", "")).strip().lower()
+                   for exercise in game.get("exercises", []) if isinstance(exercise, dict))
+    payload = json.dumps([str(game.get("title", "")).strip().lower(), words],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GamePool:
+    def __init__(self, generate: Callable[[str, str], Awaitable[Dict[str, Any]]],
+                 catalogue: Dict[str, List[str]], size: int = GAME_POOL_SIZE,
+                 concurrency: int = GAME_POOL_CONCURRENCY, seen_store=None):
+        """
+        Initialize the pool
+
+        Args:
+            generate: Coroutine function creating a game for (difficulty, game_type);
+                it runs on the pool's own event loop
+            catalogue: Game types available for each difficulty
+            size: Ready games kept per (difficulty, game type)
+            concurrency: Games generated at the same time
+            seen_store: Shared record of the games users received, with
+                get_seen_games(user_id) and add_seen_game(user_id,
+                fingerprint, limit) (e.g. the database connector); its calls
+                block, so take() and mark_seen() run off event loops
+        """
+        self._generate = generate
+        self.catalogue = catalogue
+        self.size = size
+        self.concurrency = concurrency
+        self._games: Dict[PoolKey, List[Tuple[str, Dict[str, Any]]]] = {}
+        self._pending: Dict[PoolKey, int] = {}
+        self._seen: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._seen_store = seen_store
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pid = None
+        self.stats = {"hits": 0, "misses": 0, "generated": 0, "failures": 0,
+                      "skipped_seen": 0}
+
+    def keys(self) -> List[PoolKey]:
+        """Every (difficulty, game type) the pool keeps games for"""
+        return [(difficulty, game_type)
+                for difficulty, game_types in self.catalogue.items()
+                for game_type in game_types]
+
+    def take(self, user_id: str, difficulty: str,
+             game_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Hand out a ready game the user has not seen yet
+
+        Args:
+            user_id: User receiving the game
+            difficulty: Difficulty level
+            game_type: Catalogue game type, or None for any type of the level
+
+        Returns:
+            A copy of the game, or None if no suitable game is ready (the
+            caller generates one as before)
+        """
+        if game_type is None:
+            keys = [(difficulty, catalogue_type)
+                    for catalogue_type in self.catalogue.get(difficulty, [])]
+            random.shuffle(keys)
+        elif game_type in self.catalogue.get(difficulty, []):
+            keys = [(difficulty, game_type)]
+        else:
+            return None
+        if not keys:
+            return None
+
+        game = None
+        stored_seen = self._stored_seen(user_id)
+        with self._lock:
+            seen = stored_seen.union(self._seen.get(user_id, {}))
+            for key in keys:
+                games = self._games.get(key, [])
+                for index, (fingerprint, _) in enumerate(games):
+                    if fingerprint in seen:
+                        self.stats["skipped_seen"] += 1
+                        continue
+                    game = games.pop(index)[1]
+                    self._remember_seen(user_id, fingerprint)
+                    break
+                if game:
+                    break
+            self.stats["hits" if game else "misses"] += 1
+
+        if game:
+            self._store_seen(user_id, fingerprint)
+        self.refill(keys)
+        return copy.deepcopy(game) if game else None
+
+    def mark_seen(self, user_id: str, game: Dict[str, Any]):
+        """Record a game the user received from elsewhere"""
+        fingerprint = game_fingerprint(game)
+        with self._lock:
+            self._remember_seen(user_id, fingerprint)
+        self._store_seen(user_id, fingerprint)
+
+    def refill(self, keys: Optional[List[PoolKey]] = None):
+        """Schedule generation of the games missing from the pool"""
+        loop = self._ensure_loop()
+        to_generate = []
+        with self._lock:
+            for key in keys if keys is not None else self.keys():
+                missing = self.size - len(self._games.get(key, [])) - self._pending.get(key, 0)
+                if missing > 0:
+                    self._pending[key] = self._pending.get(key, 0) + missing
+                    to_generate.extend([key] * missing)
+
+        for key in to_generate:
+            asyncio.run_coroutine_threadsafe(self._generate_into(key), loop)
+
+    def warm(self):
+        """Fill the pool for every catalogue entry"""
+        self.refill()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Pool depth per (difficulty, game type) and counters"""
+        with self._lock:
+            depth = {f"{difficulty}/{game_type}": len(self._games.get((difficulty, game_type), []))
+                     for difficulty, game_type in self.keys()}
+            return {
+                "size": self.size,
+                "depth": depth,
+                "ready": sum(depth.values()),
+                "generating": sum(self._pending.values()),
+                "users_tracked": len(self._seen),
+                **self.stats
+            }
+
+    async def _generate_into(self, key: PoolKey):
+        """Pool loop: generate one game for a key"""
+        try:
+            async with self._semaphore:
+                game = await self._generate(*key)
+            if not game or "error" in game:
+                raise ValueError(game.get("error") if game else "empty game")
+
+            with self._lock:
+                self._games.setdefault(key, []).append((game_fingerprint(game), game))
+                self.stats["generated"] += 1
+        except Exception as e:
+            logger.warning(f"Could not generate pooled game {key}: {str(e)}")
+            with self._lock:
+                self.stats["failures"] += 1
+        finally:
+            with self._lock:
+                self._pending[key] = max(0, self._pending.get(key, 0) - 1)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the refill loop thread (again after a fork)"""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                if self._loop is not None:
+                    # Forked: the parent's refill thread did not come along
+                    self._pending.clear()
+                self._pid = os.getpid()
+                self._loop = asyncio.new_event_loop()
+                self._semaphore = None
+                threading.Thread(target=self._run_loop, args=(self._loop,),
+                                 name="game-pool", daemon=True).start()
+            return self._loop
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        loop.run_forever()
+
+    def _stored_seen(self, user_id: str) -> set:
+        """Fingerprints of the games the shared store says the user received"""
+        if self._seen_store is None:
+            return set()
+        try:
+            return set(self._seen_store.get_seen_games(user_id) or [])
+        except Exception as e:
+            logger.warning(f"Could not read the games seen by {user_id}: {str(e)}")
+            return set()
+
+    def _store_seen(self, user_id: str, fingerprint: str):
+        """Record a fingerprint for a user in the shared store"""
+        if self._seen_store is None:
+            return
+        try:
+            self._seen_store.add_seen_game(user_id, fingerprint, GAME_POOL_SEEN_PER_USER)
+        except Exception as e:
+            logger.warning(f"Could not record a game seen by {user_id}: {str(e)}")
+
+    def _remember_seen(self, user_id: str, fingerprint: str):
+        """Record a fingerprint for a user (caller holds the lock)"""
+        seen = self._seen.setdefault(user_id, OrderedDict())
+        self._seen.move_to_end(user_id)
+        seen[fingerprint] = None
+        while len(seen) > GAME_POOL_SEEN_PER_USER:
+            seen.popitem(last=False)
+        while len(self._seen) > GAME_POOL_SEEN_USERS:
+            self._seen.popitem(last=False)
@@ -1,4 +1,5 @@
 import os
+import time
 import uuid
 import logging
 import datetime
@@ -7,13 +8,18 @@ import sys
 import tempfile
 import subprocess
 import traceback
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 from pathlib import Path
 from bson import ObjectId
 from openai import OpenAI
 from dotenv import load_dotenv
-from ai.server.mcp_server import MCPServer, Message, ModelContext, Agent, Tool, ToolParam
+from ai.server.mcp_server import MCPServer, Message, ModelContext, Agent, Tool, ToolParam, WorkflowStep
 from ..server.openai_client import create_async_openai_client
+from ..server.rate_governor import BACKGROUND
+from ..server.deadline import has_budget, within_deadline
+from utils.evaluation_plan import find_plan
+from .game_pool import GamePool, GAME_POOL_ENABLED, GAME_POOL_WARM
+from .token_accounting import warm_encoding
 import asyncio
 
 # Add project root to Python path
@@ -22,7 +28,10 @@ if __name__ == "__main__":
     project_root = current_dir.parent.parent.parent
     sys.path.insert(0, str(project_root))
 
-from ai.agents.game_designer_agent import GameDesignerAgent
+from ai.agents.game_designer_agent import GameDesignerAgent, GAME_TYPES_BY_DIFFICULTY
+from ai.agents.template_game_generator import (
+    GAME_GENERATOR, GAME_LLM_MIN_BUDGET, GAME_TEMPLATE_RESERVE, GENERATORS,
+    LatencyTracker, get_template_game_generator)
 from ai.agents.progression_manager_agent import ProgressionManagerAgent
 from ai.agents.tutor_agent import TutorAgent
 from ai.agents.speech_evaluator_agent import SpeechEvaluatorAgent
@@ -33,6 +42,9 @@ from speech.synthesis import synthesize_speech
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# Prazo (segundos) para criar ou carregar uma sessão, partilhado por todos os passos
+SESSION_TIMEOUT = float(os.environ.get("SESSION_TIMEOUT", "60"))
+
 
 class MCPSystem:
     def __init__(self, api_key: str, db_connector: Any):
@@ -40,10 +52,33 @@ class MCPSystem:
         self.server = MCPServer()
         self.db_connector = db_connector
 
+        # Palavras e planos de avaliação do jogo de cada sessão
+        self._evaluation_contexts: Dict[str, tuple] = {}
+
         # Initialize OpenAI client
+        self.api_key = api_key
         self.client = create_async_openai_client(api_key)
         self.logger.info("OpenAI client initialized successfully.")
 
+        # Jogos pré-gerados por (dificuldade, tipo de jogo), repostos em segundo plano
+        self._pool_designer = None
+        # Os jogos já entregues a cada utilizador ficam na base de dados,
+        # partilhados entre workers
+        self.game_pool = GamePool(
+            self._generate_pool_game, GAME_TYPES_BY_DIFFICULTY,
+            seen_store=db_connector if hasattr(db_connector, "get_seen_games") else None
+        ) if GAME_POOL_ENABLED else None
+
+        # Latência dos jogos gerados pelo modelo: em "auto", acima do limite
+        # os jogos passam a ser gerados localmente a partir dos modelos
+        self.llm_game_latency = LatencyTracker()
+
+        # Agentes criados em initialize_agents; o worker só fica pronto
+        # (ready) depois do aquecimento em warm_up
+        self._agents_initialized = False
+        self.ready = False
+        self.warmup_seconds = None
+
         # Define tools
         self.logger.info("Defining tools...")
         self._define_tools()
@@ -67,24 +102,66 @@ class MCPSystem:
         """Initialize all agents asynchronously"""
         self.logger.info("Initializing agents...")
 
-        # Create agent instances
-        self._game_designer_instance = GameDesignerAgent(client=self.client)
-        self._speech_evaluator_instance = SpeechEvaluatorAgent(
-            client=self.client)
-        self._tutor_instance = TutorAgent(
-            self._game_designer_instance, client=self.client)
-        self._progression_manager_instance = ProgressionManagerAgent()
+        # Create agent instances (keeping any already provided)
+        factories = [
+            ("_game_designer_instance", lambda: GameDesignerAgent(client=self.client)),
+            ("_speech_evaluator_instance", lambda: SpeechEvaluatorAgent(client=self.client)),
+            ("_tutor_instance", lambda: TutorAgent(
+                self._game_designer_instance, client=self.client)),
+            ("_progression_manager_instance", ProgressionManagerAgent),
+        ]
+        created = []
+        for attribute, factory in factories:
+            if getattr(self, attribute, None) is None:
+                setattr(self, attribute, factory())
+                created.append(getattr(self, attribute))
 
         # Initialize all agents
-        await asyncio.gather(
-            self._game_designer_instance.initialize(),
-            self._speech_evaluator_instance.initialize(),
-            self._tutor_instance.initialize(),
-            self._progression_manager_instance.initialize()
-        )
+        await asyncio.gather(*(agent.initialize() for agent in created))
 
+        self._agents_initialized = True
         self.logger.info("All agents initialized successfully")
 
+    async def warm_up(self):
+        """
+        Prepara o worker antes de aceitar pedidos (uma vez, depois do fork)
+
+        Cria e inicializa os agentes, carrega o que o primeiro pedido pagaria
+        de outra forma (codificação de tokens, modelos de jogos e léxico) e
+        começa a encher o pool de jogos. Só depois o sistema fica pronto.
+        """
+        started = time.perf_counter()
+        await self.initialize_agents()
+
+        # Leitura de ficheiros e tokenizer: fora do event loop
+        await asyncio.get_running_loop().run_in_executor(None, self._warm_caches)
+
+        if self.game_pool is not None and GAME_POOL_WARM:
+            self.game_pool.warm()
+            self.logger.info("Pool de jogos a ser preenchido em segundo plano")
+
+        self.warmup_seconds = time.perf_counter() - started
+        self.ready = True
+        self.logger.info(f"Warm-up complete in {self.warmup_seconds:.2f}s")
+
+    def _warm_caches(self):
+        """Carrega as caches usadas nos pedidos (falhas só adiam o carregamento)"""
+        steps = [
+            ("token encoding", lambda: warm_encoding("gpt-4o-mini")),
+            ("game templates", get_template_game_generator),
+        ]
+        for name, step in steps:
+            try:
+                step()
+            except Exception as e:
+                self.logger.warning(f"Could not warm {name}: {str(e)}")
+
+    async def _ensure_agents(self):
+        """Agentes do aquecimento; sem ele (ex.: scripts e testes), criados agora"""
+        if not self._agents_initialized:
+            self.logger.warning("Agents used before warm-up, initializing them now")
+            await self.initialize_agents()
+
     def _define_tools(self):
         """Define all tools used by the agents."""
         self.logger.info("Defining tools...")
@@ -113,7 +190,9 @@ class MCPSystem:
                 ToolParam(name="game_type", type="string",
                           optional=True, description="The type of game"),
                 ToolParam(name="age_group", type="string", optional=True,
-                          description="The age group of the user")
+                          description="The age group of the user"),
+                ToolParam(name="generator", type="string", optional=True,
+                          description="'llm', 'template' or 'auto'")
             ]
         )
 
@@ -219,19 +298,7 @@ class MCPSystem:
 
         try:
             if message.tool == "create_game":
-                # Initialize GameDesignerAgent if needed
-                if not hasattr(self, '_game_designer_instance'):
-                    self._game_designer_instance = GameDesignerAgent(
-                        client=self.client)
-                    # Make sure to initialize the agent if it has an initialize method
-                    if hasattr(self._game_designer_instance, 'initialize'):
-                        await self._game_designer_instance.initialize()
-
-                # Initialize ProgressionManagerAgent if needed
-                if not hasattr(self, '_progression_manager_instance'):
-                    self._progression_manager_instance = ProgressionManagerAgent()
-                    if hasattr(self._progression_manager_instance, 'initialize'):
-                        await self._progression_manager_instance.initialize()
+                await self._ensure_agents()
 
                 # Extract parameters
                 user_id = message.params.get("user_id")
@@ -240,61 +307,54 @@ class MCPSystem:
                 game_type = message.params.get(
                     "game_type", "exercícios de pronúncia")
                 language = message.params.get("language", "pt-PT")
+                generator, fallback = self._choose_generator(
+                    message.params.get("generator"))
 
                 # Ensure we have required parameters
                 if not user_id:
                     raise ValueError("user_id is required")
 
-                # Get user profile from database to determine appropriate difficulty
+                # Determine the difficulty from the user's profile and progression
                 try:
-                    user_profile = None
-                    if hasattr(self.db_connector, 'get_user_by_id'):
-                        user_profile = self.db_connector.get_user_by_id(
-                            user_id)
-                        self.logger.info(
-                            f"Retrieved user profile for user: {user_id}")
-
-                    if not user_profile:
-                        self.logger.warning(
-                            f"User profile not found for {user_id}, using default")
-                        user_profile = {"id": user_id, "age": 7}
-
-                    # Use progression manager to determine appropriate difficulty
-                    self.logger.info(
-                        f"Using progression manager to determine difficulty for user {user_id}")
-                    determined_difficulty = await self._get_appropriate_difficulty(user_id, user_profile, requested_difficulty)
-
-                    self.logger.info(
-                        f"Difficulty determined by progression manager: {determined_difficulty}")
+                    determined_difficulty = await self._resolve_game_difficulty(
+                        user_id, requested_difficulty)
 
                     # Store the determined difficulty in context
                     context.set("determined_difficulty", determined_difficulty)
 
-                    # Choose game type based on user level
-                    varied_game_type = self._vary_game_type(
-                        determined_difficulty, game_type)
-                    self.logger.info(
-                        f"Varied game type based on difficulty: {varied_game_type}")
+                    # Use a pre-generated game when one is ready: any catalogue
+                    # type for the level, or the requested catalogue type
+                    # (unless templates were explicitly requested)
+                    game_data = None
+                    if generator == "llm" or fallback:
+                        game_data = await asyncio.to_thread(
+                            self._take_pooled_game, user_id, determined_difficulty, game_type)
+
+                    if game_data:
+                        source = "pool"
+                        varied_game_type = game_data.get("game_type", game_type)
+                    else:
+                        # Choose game type based on user level
+                        varied_game_type = self._vary_game_type(
+                            determined_difficulty, game_type)
+                        self.logger.info(
+                            f"Varied game type based on difficulty: {varied_game_type}")
 
-                    # Call create_game with the determined difficulty
-                    game_data = await self._game_designer_instance.create_game(
-                        user_id=user_id,
-                        difficulty=determined_difficulty,
-                        game_type=varied_game_type
-                    )
+                        # Create the game with the determined difficulty
+                        game_data, source = await self._design_game(
+                            user_id, determined_difficulty, varied_game_type,
+                            generator, fallback)
 
-                    if not game_data:
-                        raise ValueError(
-                            "No game data returned from create_game")
+                        if not game_data:
+                            raise ValueError(
+                                "No game data returned from create_game")
+                        if self.game_pool is not None and source == "llm":
+                            await asyncio.to_thread(self.game_pool.mark_seen, user_id, game_data)
 
                     # Add metadata about how the game was generated
-                    game_data["generation_metadata"] = {
-                        "requested_difficulty": requested_difficulty,
-                        "determined_difficulty": determined_difficulty,
-                        "requested_game_type": game_type,
-                        "varied_game_type": varied_game_type,
-                        "generation_timestamp": datetime.datetime.utcnow().isoformat()
-                    }
+                    game_data["generation_metadata"] = self._generation_metadata(
+                        requested_difficulty, determined_difficulty, game_type,
+                        varied_game_type, source)
 
                     return game_data
 
@@ -311,6 +371,193 @@ class MCPSystem:
             self.logger.error(f"Error in game designer handler: {str(e)}")
             return {"error": str(e)}
 
+    async def stream_game(self, user_id: str, requested_difficulty: str = "auto",
+                          game_type: str = "exercícios de pronúncia",
+                          generator: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Gera um jogo enviando cada exercício assim que está pronto
+
+        Um jogo do pool ou dos modelos locais é enviado de imediato; caso
+        contrário os exercícios chegam à medida que o modelo os gera.
+
+        Yields:
+            Eventos {"event": "exercise", "index", "exercise"} e, no fim,
+            {"event": "game", "game"} com o jogo completo
+        """
+        await self._ensure_agents()
+        determined_difficulty = await self._resolve_game_difficulty(
+            user_id, requested_difficulty)
+
+        generator, fallback = self._choose_generator(generator)
+        game_data = None
+        if generator == "llm" or fallback:
+            game_data = await asyncio.to_thread(
+                self._take_pooled_game, user_id, determined_difficulty, game_type)
+
+        if game_data:
+            source = "pool"
+            varied_game_type = game_data.get("game_type", game_type)
+        else:
+            varied_game_type = self._vary_game_type(determined_difficulty, game_type)
+
+        if not game_data and generator == "llm":
+            source = "llm"
+            started = time.perf_counter()
+            sent = 0
+            try:
+                async for event in self._game_designer_instance.stream_game(
+                        user_id=user_id, difficulty=determined_difficulty,
+                        game_type=varied_game_type):
+                    if event["event"] == "game":
+                        game_data = event["game"]
+                    else:
+                        sent += 1
+                        yield event
+            except Exception as e:
+                self.llm_game_latency.record_failure()
+                # Sem exercícios enviados ainda, os modelos locais substituem o modelo
+                if not fallback or sent:
+                    raise
+                self.logger.warning(
+                    f"LLM game stream failed ({str(e)}); using templates")
+            else:
+                self.llm_game_latency.record(time.perf_counter() - started)
+                if self.game_pool is not None:
+                    await asyncio.to_thread(self.game_pool.mark_seen, user_id, game_data)
+
+        if not game_data:
+            source = "template"
+            game_data = get_template_game_generator().create_game(
+                user_id=user_id, difficulty=determined_difficulty,
+                game_type=varied_game_type)
+
+        if source != "llm":
+            for index, exercise in enumerate(game_data.get("exercises", [])):
+                yield {"event": "exercise", "index": index, "exercise": exercise}
+
+        game_data["generation_metadata"] = self._generation_metadata(
+            requested_difficulty, determined_difficulty, game_type,
+            varied_game_type, source)
+        yield {"event": "game", "game": game_data}
+
+    async def _resolve_game_difficulty(self, user_id: str, requested_difficulty: str) -> str:
+        """Dificuldade do jogo: a pedida, ou a do progresso do utilizador ('auto')"""
+        user_profile = None
+        if hasattr(self.db_connector, 'get_user_by_id'):
+            # pymongo é síncrono: fora do event loop
+            user_profile = await asyncio.to_thread(
+                self.db_connector.get_user_by_id, user_id)
+            self.logger.info(
+                f"Retrieved user profile for user: {user_id}")
+
+        if not user_profile:
+            self.logger.warning(
+                f"User profile not found for {user_id}, using default")
+            user_profile = {"id": user_id, "age": 7}
+
+        # Use progression manager to determine appropriate difficulty
+        self.logger.info(
+            f"Using progression manager to determine difficulty for user {user_id}")
+        determined_difficulty = await self._get_appropriate_difficulty(user_id, user_profile, requested_difficulty)
+
+        self.logger.info(
+            f"Difficulty determined by progression manager: {determined_difficulty}")
+        return determined_difficulty
+
+    def _take_pooled_game(self, user_id: str, difficulty: str,
+                          game_type: str) -> Optional[Dict[str, Any]]:
+        """Jogo pré-gerado para o utilizador, com novos identificadores, ou None"""
+        if self.game_pool is None:
+            return None
+        game_data = self.game_pool.take(
+            user_id, difficulty,
+            None if game_type in ("", "exercícios de pronúncia") else game_type)
+        if game_data:
+            game_data.update({
+                "game_id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "created_at": datetime.datetime.utcnow().isoformat()
+            })
+            self.logger.info(
+                f"Using pre-generated game from pool: {game_data.get('game_type', game_type)}")
+        return game_data
+
+    def _generation_metadata(self, requested_difficulty: str, determined_difficulty: str,
+                             requested_game_type: str, varied_game_type: str,
+                             source: str) -> Dict[str, Any]:
+        """Metadados sobre a forma como o jogo foi gerado"""
+        return {
+            "requested_difficulty": requested_difficulty,
+            "determined_difficulty": determined_difficulty,
+            "requested_game_type": requested_game_type,
+            "varied_game_type": varied_game_type,
+            "source": source,
+            "generation_timestamp": datetime.datetime.utcnow().isoformat()
+        }
+
+    def _choose_generator(self, requested: Optional[str]) -> tuple:
+        """
+        Gerador de um novo jogo: o pedido, ou o configurado por omissão
+
+        Returns:
+            ("llm" | "template", fallback), em que fallback indica um pedido
+            "auto" (com pool e modelos locais se o modelo falhar)
+        """
+        mode = str(requested or GAME_GENERATOR).lower()
+        if mode not in GENERATORS:
+            mode = "auto"
+        if mode != "auto":
+            return mode, False
+        if not has_budget(GAME_LLM_MIN_BUDGET):
+            self.logger.info("Not enough time left before the deadline for the LLM, using templates")
+            return "template", True
+        if self.llm_game_latency.use_templates():
+            self.logger.info(
+                f"LLM game latency {self.llm_game_latency.latency:.1f}s above threshold, using templates")
+            return "template", True
+        return "llm", True
+
+    async def _design_game(self, user_id: str, difficulty: str, game_type: str,
+                           generator: str, fallback: bool) -> tuple:
+        """
+        Cria um jogo novo com o modelo ou com os modelos locais; devolve (jogo, origem)
+
+        Com fallback, o pedido ao modelo é cancelado pouco antes do prazo do
+        pedido, a tempo de gerar o jogo a partir dos modelos locais.
+        """
+        if generator == "llm":
+            started = time.perf_counter()
+            try:
+                game_data = await within_deadline(
+                    self._game_designer_instance.create_game(
+                        user_id=user_id,
+                        difficulty=difficulty,
+                        game_type=game_type
+                    ),
+                    reserve=GAME_TEMPLATE_RESERVE if fallback else 0.0,
+                    what="LLM game generation")
+                self.llm_game_latency.record(time.perf_counter() - started)
+                return game_data, "llm"
+            except Exception as e:
+                self.llm_game_latency.record_failure()
+                if not fallback:
+                    raise
+                self.logger.warning(
+                    f"LLM game generation failed ({str(e)}); using templates")
+
+        return get_template_game_generator().create_game(
+            user_id=user_id, difficulty=difficulty, game_type=game_type), "template"
+
+    async def _generate_pool_game(self, difficulty: str, game_type: str) -> Dict[str, Any]:
+        """Gera um jogo para o pool (corre no loop do próprio pool)"""
+        if self._pool_designer is None:
+            # Cliente próprio: o cliente assíncrono fica ligado ao loop onde é usado.
+            # Os pedidos do pool ficam na faixa de segundo plano do limitador
+            self._pool_designer = GameDesignerAgent(
+                client=create_async_openai_client(self.api_key, lane=BACKGROUND))
+        return await self._pool_designer.create_game(
+            user_id="game_pool", difficulty=difficulty, game_type=game_type)
+
     async def _get_appropriate_difficulty(self, user_id: str, user_profile: Dict[str, Any], requested_difficulty: str) -> str:
         """
         Determine the appropriate difficulty level based on user's progression
@@ -327,7 +574,8 @@ class MCPSystem:
                 # Get user history from database
                 try:
                     if hasattr(self.db_connector, 'get_user_history'):
-                        history = self.db_connector.get_user_history(user_id)
+                        history = await asyncio.to_thread(
+                            self.db_connector.get_user_history, user_id)
                         if history and not isinstance(history, dict):
                             history = {"completed_sessions": history}
 
@@ -355,36 +603,14 @@ class MCPSystem:
         """
         Vary the game type based on difficulty level to make games more diverse
         """
-        # Dictionary of game types by difficulty
-        game_types = {
-            "iniciante": [
-                "exercícios de pronúncia básica",
-                "jogos de rimas simples",
-                "reconhecimento de sons básicos",
-                "nomeação de objetos comuns"
-            ],
-            "médio": [
-                "exercícios de pronúncia de palavras compostas",
-                "reconhecimento de sons complexos",
-                "exercícios de oposição de sons",
-                "jogos de sequência de palavras"
-            ],
-            "avançado": [
-                "exercícios de pronúncia de frases completas",
-                "trava-línguas",
-                "narração de histórias curtas",
-                "exercícios de pronúncia rápida",
-                "discriminação auditiva avançada"
-            ]
-        }
-
         # If base type is specified and valid, use it as is
         if base_game_type and base_game_type != "exercícios de pronúncia":
             return base_game_type
 
         # Otherwise, choose randomly from appropriate list based on difficulty
         import random
-        available_types = game_types.get(difficulty, game_types["iniciante"])
+        available_types = GAME_TYPES_BY_DIFFICULTY.get(
+            difficulty, GAME_TYPES_BY_DIFFICULTY["iniciante"])
         return random.choice(available_types)
 
     async def _tutor_handler(self, message: Message, context: ModelContext) -> Dict[str, Any]:
@@ -393,11 +619,7 @@ class MCPSystem:
 
         try:
             if message.tool == "create_instructions":
-                # Initialize TutorAgent if needed
-                if not hasattr(self, '_tutor_instance'):
-                    self._tutor_instance = TutorAgent(client=self.client)
-                    if hasattr(self._tutor_instance, 'initialize'):
-                        await self._tutor_instance.initialize()
+                await self._ensure_agents()
 
                 # Get parameters for instructions
                 game_title = message.params.get("game_title", "")
@@ -424,6 +646,7 @@ class MCPSystem:
         """Handler for Progression Manager Agent tools."""
         self.logger.info(
             f"Handling message for progression_manager: {message.tool}")
+        await self._ensure_agents()
         agent = self._progression_manager_instance
 
         try:
@@ -449,12 +672,7 @@ class MCPSystem:
 
         try:
             if message.tool == "evaluate_pronunciation":
-                # Initialize SpeechEvaluatorAgent if needed
-                if not hasattr(self, '_speech_evaluator_instance'):
-                    self._speech_evaluator_instance = SpeechEvaluatorAgent(
-                        client=self.client)
-                    if hasattr(self._speech_evaluator_instance, 'initialize'):
-                        await self._speech_evaluator_instance.initialize()
+                await self._ensure_agents()
 
                 # Extract parameters
                 audio_data = message.params.get("audio_data")
@@ -467,220 +685,54 @@ class MCPSystem:
                 if not expected_word:
                     raise ValueError("expected_word is required")
 
-                # Escrever os dados de áudio em um arquivo temporário
-                temp_audio_file = None
-                try:
-                    import tempfile
-                    import os
-
-                    # Criar arquivo temporário para o áudio
-                    temp_fd, temp_audio_path = tempfile.mkstemp(suffix=".webm")
-                    os.close(temp_fd)
-
-                    with open(temp_audio_path, "wb") as f:
-                        f.write(audio_data)
-
-                    self.logger.info(
-                        f"Áudio salvo temporariamente em: {temp_audio_path}")
-
-                    # Verificar se o áudio tem conteúdo (não é silêncio)
-                    import wave
-                    import contextlib
-                    import subprocess
-
-                    # Converter WebM para WAV para análise
-                    wav_path = temp_audio_path.replace(".webm", ".wav")
-                    convert_cmd = ["ffmpeg", "-i",
-                                   temp_audio_path, "-y", wav_path]
-                    self.logger.info(
-                        f"Convertendo áudio: {' '.join(convert_cmd)}")
-
-                    try:
-                        subprocess.run(convert_cmd, check=True,
-                                       capture_output=True)
-                        self.logger.info(
-                            f"Áudio convertido para WAV: {wav_path}")
-
-                        # Verificar duração e intensidade do áudio
-                        has_speech = False
-                        duration = 0
-
-                        # Tentar obter a duração do arquivo WAV
-                        try:
-                            with contextlib.closing(wave.open(wav_path, 'r')) as wf:
-                                frames = wf.getnframes()
-                                rate = wf.getframerate()
-                                duration = frames / float(rate)
-                                self.logger.info(
-                                    f"Duração do áudio: {duration} segundos")
-
-                                # Se a duração for muito curta, provavelmente não há fala
-                                has_speech = duration > 0.5
-                        except Exception as e:
-                            self.logger.error(
-                                f"Erro ao analisar duração do WAV: {e}")
-
-                        # Se não conseguirmos verificar com wave, verificar com ffprobe
-                        if not has_speech:
-                            try:
-                                # Verificar se há áudio com ffprobe
-                                probe_cmd = ["ffprobe", "-i", temp_audio_path, "-show_streams",
-                                             "-select_streams", "a", "-loglevel", "error"]
-                                probe_result = subprocess.run(
-                                    probe_cmd, capture_output=True, text=True)
-
-                                # Se saída não estiver vazia, provavelmente tem áudio
-                                has_speech = len(
-                                    probe_result.stdout.strip()) > 0
-                                self.logger.info(
-                                    f"Detecção de áudio com ffprobe: {has_speech}")
-                            except Exception as e:
-                                self.logger.error(
-                                    f"Erro ao verificar áudio com ffprobe: {e}")
-
-                        # Verificar qual biblioteca de reconhecimento de fala está sendo usada
-                        if has_speech:
-                            try:
-                                # Importar a função de reconhecimento de fala
-                                from speech.recognition import recognize_speech
-
-                                # Verificar se há problemas de importação com a função
-                                self.logger.info(
-                                    f"Tipo da função recognize_speech: {type(recognize_speech)}")
-
-                                # Logar o caminho do arquivo antes do reconhecimento
-                                self.logger.info(
-                                    f"Tentando reconhecer áudio do arquivo: {wav_path}")
-                                self.logger.info(f"Com idioma: {language}")
-
-                                # Tente usar diretamente o reconhecedor do Google ou outra implementação
-                                import speech_recognition as sr
-                                recognizer = sr.Recognizer()
-
-                                try:
-                                    with sr.AudioFile(wav_path) as source:
-                                        # Ajustar para ruído ambiente
-                                        recognizer.adjust_for_ambient_noise(
-                                            source)
-                                        # Capturar o áudio
-                                        audio_data = recognizer.record(source)
-
-                                        # Tentar reconhecimento com Google (alternativa mais confiável)
-                                        try:
-                                            recognized_text = recognizer.recognize_google(
-                                                audio_data, language=language)
-                                            self.logger.info(
-                                                f"Google Speech Recognition: '{recognized_text}'")
-                                        except sr.UnknownValueError:
-                                            self.logger.warning(
-                                                "Google não reconheceu o áudio")
-                                            recognized_text = ""
-                                        except sr.RequestError as e:
-                                            self.logger.error(
-                                                f"Erro na API do Google: {e}")
-                                            # Tentar com a função original como fallback
-                                            recognition_result = recognize_speech(
-                                                wav_path, language)
-                                            if isinstance(recognition_result, str):
-                                                recognized_text = recognition_result.lower().strip()
-                                            else:
-                                                recognized_text = recognition_result.get(
-                                                    "text", "").lower().strip()
-                                except Exception as sr_err:
-                                    self.logger.error(
-                                        f"Erro com speech_recognition: {sr_err}")
-                                    # Ainda tentar com a função original
-                                    recognition_result = recognize_speech(
-                                        wav_path, language)
-                                    if isinstance(recognition_result, str):
-                                        recognized_text = recognition_result.lower().strip()
-                                    else:
-                                        recognized_text = recognition_result.get(
-                                            "text", "").lower().strip()
-
-                                # Verificar se o texto reconhecido não é apenas o código do idioma
-                                if recognized_text.lower() == language.lower():
-                                    self.logger.warning(
-                                        f"Texto reconhecido igual ao código do idioma ({language}). Isso indica um problema no reconhecimento.")
-                                    recognized_text = ""
-
-                                self.logger.info(
-                                    f"Texto reconhecido final: '{recognized_text}'")
-
-                            except Exception as e:
-                                self.logger.error(
-                                    f"Erro no reconhecimento de fala: {e}")
-                                recognized_text = ""
-                        else:
-                            self.logger.warning(
-                                "Nenhuma fala detectada no áudio")
-                            recognized_text = ""
-
-                        # Calcular a similaridade entre o texto reconhecido e a palavra esperada
-                        expected_lower = expected_word.lower().strip()
-
-                        # Verificar se a palavra esperada está contida no texto reconhecido
-                        is_exact_match = recognized_text == expected_lower
-                        is_contained = expected_lower in recognized_text
-
-                        # Se não houver fala detectada, a pronúncia está incorreta
-                        if not has_speech:
-                            is_correct = False
-                            score = 0
-                            feedback = "Não foi detectada nenhuma fala no áudio. Por favor, tente novamente falando mais alto."
-                            recognized_text = "(sem fala detectada)"
-                        # Se for correspondência exata, pronúncia perfeita
-                        elif is_exact_match:
-                            is_correct = True
-                            score = 10
-                            feedback = f"Excelente pronúncia de '{expected_word}'! Perfeito!"
-                        # Se a palavra estiver contida no texto reconhecido, pronúncia boa
-                        elif is_contained:
-                            is_correct = True
-                            score = 8
-                            feedback = f"Boa pronúncia de '{expected_word}'! Continue assim."
-                        # Se reconheceu algo, mas não a palavra esperada
-                        elif recognized_text:
-                            is_correct = False
-                            score = 3
-                            feedback = f"Tente novamente. Eu ouvi '{recognized_text}' mas esperava '{expected_word}'."
-                        # Fallback para caso o reconhecimento falhe
-                        else:
-                            is_correct = False
-                            score = 1
-                            feedback = f"Não consegui entender. Tente pronunciar '{expected_word}' novamente, de forma clara."
-
-                    except subprocess.CalledProcessError as e:
-                        self.logger.error(f"Erro ao converter áudio: {e}")
-                        is_correct = False
-                        score = 0
-                        feedback = "Erro ao processar o áudio. Por favor, tente novamente."
-                        recognized_text = ""
-
-                finally:
-                    # Limpar arquivos temporários
-                    try:
-                        if os.path.exists(temp_audio_path):
-                            os.remove(temp_audio_path)
-                            self.logger.info(
-                                f"Arquivo temporário removido: {temp_audio_path}")
-                        wav_path = temp_audio_path.replace(".webm", ".wav")
-                        if os.path.exists(wav_path):
-                            os.remove(wav_path)
-                            self.logger.info(
-                                f"Arquivo temporário WAV removido: {wav_path}")
-                    except Exception as e:
-                        self.logger.error(
-                            f"Erro ao limpar arquivos temporários: {e}")
+                # Conversão, deteção de fala e reconhecimento bloqueiam (ffmpeg,
+                # ficheiros temporários, pedido HTTP): correm numa thread
+                recognition = await asyncio.to_thread(
+                    self._recognize_audio, audio_data, language)
+                has_speech = recognition["has_speech"]
+                recognized_text = recognition["recognized_text"]
+                hypotheses = recognition["hypotheses"]
+
+                if recognition["conversion_failed"]:
+                    is_correct = False
+                    score = 0
+                    feedback = "Erro ao processar o áudio. Por favor, tente novamente."
+                    recognized_text = ""
+                # Se não houver fala detectada, a pronúncia está incorreta
+                elif not has_speech:
+                    is_correct = False
+                    score = 0
+                    feedback = "Não foi detectada nenhuma fala no áudio. Por favor, tente novamente falando mais alto."
+                    recognized_text = "(sem fala detectada)"
+                # Pontuar todas as hipóteses de uma vez contra a palavra esperada
+                # (e as outras palavras do jogo, para detetar trocas)
+                elif recognized_text:
+                    evaluation = await self._speech_evaluator_instance.evaluate_pronunciation(
+                        recognized_text, expected_word,
+                        alternatives=hypotheses[1:],
+                        vocabulary=message.params.get("vocabulary"),
+                        plan=message.params.get("plan"))
+                    is_correct = evaluation.get("isCorrect", False)
+                    score = evaluation.get("score", 1)
+                    feedback = evaluation.get("feedback", "")
+                    n_best = evaluation.get("debug_info", {}).get("n_best")
+                    if n_best and n_best.get("text"):
+                        recognized_text = n_best["text"]
+                # Fallback para caso o reconhecimento falhe
+                else:
+                    is_correct = False
+                    score = 1
+                    feedback = f"Não consegui entender. Tente pronunciar '{expected_word}' novamente, de forma clara."
 
                 # Gerar áudio para o feedback
                 audio_feedback = None
                 try:
-                    # Importar a função de síntese
-                    from speech.synthesis import synthesize_speech
+                    # Compor o feedback a partir de fragmentos já sintetizados
+                    from speech.feedback_audio import compose_feedback_audio
 
-                    # Sintetizar o feedback
-                    audio_bytes = synthesize_speech(
+                    # Sintetizar o feedback (síntese e disco: numa thread)
+                    audio_bytes = await asyncio.to_thread(
+                        compose_feedback_audio,
                         feedback,  # Texto do feedback já gerado anteriormente
                         voice_settings={
                             "language_code": language  # Usar o mesmo idioma da avaliação
@@ -726,6 +778,186 @@ class MCPSystem:
                 "audio_feedback": None
             }
 
+    def _recognize_audio(self, audio_data: bytes, language: str) -> Dict[str, Any]:
+        """
+        Converte o áudio, verifica se tem fala e reconhece-a (bloqueante)
+
+        Corre numa thread (ffmpeg, ficheiros temporários e o pedido HTTP ao
+        reconhecedor), nunca no event loop.
+
+        Returns:
+            Dict com has_speech, recognized_text, hypotheses (n-best) e
+            conversion_failed
+        """
+        import tempfile
+        import wave
+        import contextlib
+        import subprocess
+
+        result = {"has_speech": False, "recognized_text": "", "hypotheses": [],
+                  "conversion_failed": False}
+
+        # Criar arquivo temporário para o áudio
+        temp_fd, temp_audio_path = tempfile.mkstemp(suffix=".webm")
+        os.close(temp_fd)
+        # Converter WebM para WAV para análise
+        wav_path = temp_audio_path.replace(".webm", ".wav")
+        try:
+            with open(temp_audio_path, "wb") as f:
+                f.write(audio_data)
+
+            self.logger.info(
+                f"Áudio salvo temporariamente em: {temp_audio_path}")
+
+            convert_cmd = ["ffmpeg", "-i",
+                           temp_audio_path, "-y", wav_path]
+            self.logger.info(
+                f"Convertendo áudio: {' '.join(convert_cmd)}")
+
+            try:
+                subprocess.run(convert_cmd, check=True,
+                               capture_output=True)
+            except subprocess.CalledProcessError as e:
+                self.logger.error(f"Erro ao converter áudio: {e}")
+                result["conversion_failed"] = True
+                return result
+            self.logger.info(
+                f"Áudio convertido para WAV: {wav_path}")
+
+            # Verificar duração e intensidade do áudio
+            has_speech = False
+
+            # Tentar obter a duração do arquivo WAV
+            try:
+                with contextlib.closing(wave.open(wav_path, 'r')) as wf:
+                    frames = wf.getnframes()
+                    rate = wf.getframerate()
+                    duration = frames / float(rate)
+                    self.logger.info(
+                        f"Duração do áudio: {duration} segundos")
+
+                    # Se a duração for muito curta, provavelmente não há fala
+                    has_speech = duration > 0.5
+            except Exception as e:
+                self.logger.error(
+                    f"Erro ao analisar duração do WAV: {e}")
+
+            # Se não conseguirmos verificar com wave, verificar com ffprobe
+            if not has_speech:
+                try:
+                    # Verificar se há áudio com ffprobe
+                    probe_cmd = ["ffprobe", "-i", temp_audio_path, "-show_streams",
+                                 "-select_streams", "a", "-loglevel", "error"]
+                    probe_result = subprocess.run(
+                        probe_cmd, capture_output=True, text=True)
+
+                    # Se saída não estiver vazia, provavelmente tem áudio
+                    has_speech = len(
+                        probe_result.stdout.strip()) > 0
+                    self.logger.info(
+                        f"Detecção de áudio com ffprobe: {has_speech}")
+                except Exception as e:
+                    self.logger.error(
+                        f"Erro ao verificar áudio com ffprobe: {e}")
+
+            result["has_speech"] = has_speech
+            if not has_speech:
+                self.logger.warning(
+                    "Nenhuma fala detectada no áudio")
+                return result
+
+            recognized_text = ""
+            hypotheses = []
+            try:
+                # Importar a função de reconhecimento de fala
+                from speech.recognition import recognize_speech
+
+                # Logar o caminho do arquivo antes do reconhecimento
+                self.logger.info(
+                    f"Tentando reconhecer áudio do arquivo: {wav_path}")
+                self.logger.info(f"Com idioma: {language}")
+
+                # Tente usar diretamente o reconhecedor do Google ou outra implementação
+                import speech_recognition as sr
+                recognizer = sr.Recognizer()
+
+                try:
+                    with sr.AudioFile(wav_path) as source:
+                        # Ajustar para ruído ambiente
+                        recognizer.adjust_for_ambient_noise(
+                            source)
+                        # Capturar o áudio
+                        recorded = recognizer.record(source)
+
+                        # Tentar reconhecimento com Google (alternativa mais confiável),
+                        # pedindo todas as hipóteses (n-best) e não só a primeira
+                        try:
+                            response = recognizer.recognize_google(
+                                recorded, language=language, show_all=True)
+                            if isinstance(response, dict):
+                                hypotheses = [alternative.get("transcript", "")
+                                              for alternative in response.get("alternative", [])]
+                            recognized_text = hypotheses[0] if hypotheses else ""
+                            if recognized_text:
+                                self.logger.info(
+                                    f"Google Speech Recognition: '{recognized_text}' ({len(hypotheses)} hipóteses)")
+                            else:
+                                self.logger.warning(
+                                    "Google não reconheceu o áudio")
+                        except sr.UnknownValueError:
+                            self.logger.warning(
+                                "Google não reconheceu o áudio")
+                            recognized_text = ""
+                        except sr.RequestError as e:
+                            self.logger.error(
+                                f"Erro na API do Google: {e}")
+                            # Tentar com a função original como fallback
+                            recognized_text = self._fallback_recognition(
+                                recognize_speech, wav_path, language)
+                except Exception as sr_err:
+                    self.logger.error(
+                        f"Erro com speech_recognition: {sr_err}")
+                    # Ainda tentar com a função original
+                    recognized_text = self._fallback_recognition(
+                        recognize_speech, wav_path, language)
+
+                # Verificar se o texto reconhecido não é apenas o código do idioma
+                if recognized_text.lower() == language.lower():
+                    self.logger.warning(
+                        f"Texto reconhecido igual ao código do idioma ({language}). Isso indica um problema no reconhecimento.")
+                    recognized_text = ""
+
+                self.logger.info(
+                    f"Texto reconhecido final: '{recognized_text}'")
+
+            except Exception as e:
+                self.logger.error(
+                    f"Erro no reconhecimento de fala: {e}")
+                recognized_text = ""
+
+            result["recognized_text"] = recognized_text
+            result["hypotheses"] = hypotheses
+            return result
+
+        finally:
+            # Limpar arquivos temporários
+            for path in (temp_audio_path, wav_path):
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                        self.logger.info(
+                            f"Arquivo temporário removido: {path}")
+                except Exception as e:
+                    self.logger.error(
+                        f"Erro ao limpar arquivos temporários: {e}")
+
+    def _fallback_recognition(self, recognize_speech, wav_path: str, language: str) -> str:
+        """Texto reconhecido pela função de reconhecimento do projeto"""
+        recognition_result = recognize_speech(wav_path, language)
+        if isinstance(recognition_result, str):
+            return recognition_result.lower().strip()
+        return recognition_result.get("text", "").lower().strip()
+
     # --- Workflow Methods ---
 
     async def create_interactive_session(self, user_id: str) -> Dict[str, Any]:
@@ -735,7 +967,7 @@ class MCPSystem:
         and generating initial instructions.
         """
         self.logger.info(f"Creating interactive session for user: {user_id}")
-        context = ModelContext()
+        context = ModelContext(timeout=SESSION_TIMEOUT)
         session_id = str(uuid.uuid4())
         context.set("session_id", session_id)
         context.set("user_id", user_id)
@@ -756,75 +988,76 @@ class MCPSystem:
             context.set("user_info", user_info)
             self.logger.info(f"User info retrieved for {user_id}")
 
-            # 2. Select Persona (Tutor Agent) - Assuming a tool exists
-            persona_message = Message(
-                from_agent="system",
-                to_agent="tutor",  # Assuming tutor agent name
-                tool="select_persona",
-                params={"user_preferences": user_info.get("preferences", {})}
-            )
-            persona_result = await self.server.process_message(persona_message, context)
-            if isinstance(persona_result, dict) and persona_result.get("error"):
-                raise Exception(
-                    f"Persona selection failed: {persona_result['error']}")
-            results["persona"] = persona_result
-            context.set("persona", persona_result)
-            self.logger.info(f"Persona selected: {persona_result}")
+            # 2-5. Persona e dificuldade são independentes e correm em paralelo;
+            # o jogo precisa da dificuldade e as instruções precisam de tudo.
+            # Cada resultado fica no contexto com o nome do passo.
+            workflow = [
+                # Select Persona (Tutor Agent)
+                WorkflowStep(
+                    "persona",
+                    Message(
+                        from_agent="system",
+                        to_agent="tutor",
+                        tool="select_persona",
+                        params={"user_preferences": user_info.get("preferences", {})}
+                    ),
+                    description="Persona selection"),
+                # Determine Difficulty (Progression Manager)
+                WorkflowStep(
+                    "difficulty",
+                    Message(
+                        from_agent="system",
+                        to_agent="progression_manager",
+                        tool="determine_difficulty",
+                        params={"user_id": user_id, "user_info": user_info}
+                    ),
+                    description="Difficulty determination"),
+                # Create Game (Game Designer)
+                WorkflowStep(
+                    "current_game",
+                    lambda done: Message(
+                        from_agent="system",
+                        to_agent="game_designer",
+                        tool="create_game",
+                        params={
+                            "user_id": user_id,
+                            "difficulty": done["difficulty"],
+                            # Example default
+                            "age_group": user_info.get("age_group", "adultos")
+                        }
+                    ),
+                    depends_on=["difficulty"],
+                    description="Game creation"),
+                # Create Instructions (Tutor Agent)
+                WorkflowStep(
+                    "instructions",
+                    lambda done: Message(
+                        from_agent="system",
+                        to_agent="tutor",
+                        tool="create_instructions",
+                        params={
+                            "game_title": done["current_game"].get("title"),
+                            "game_type": done["current_game"].get("type"),
+                            "difficulty": done["difficulty"],
+                            "persona": done["persona"]
+                        }
+                    ),
+                    depends_on=["persona", "difficulty", "current_game"],
+                    description="Instruction creation")
+            ]
+            workflow_result = await self.server.run_workflow(workflow, context)
+            persona_result = workflow_result["results"]["persona"]
+            difficulty_result = workflow_result["results"]["difficulty"]
+            game_result = workflow_result["results"]["current_game"]
 
-            # 3. Determine Difficulty (Progression Manager)
-            difficulty_message = Message(
-                from_agent="system",
-                to_agent="progression_manager",
-                tool="determine_difficulty",
-                params={"user_id": user_id, "user_info": user_info}
-            )
-            difficulty_result = await self.server.process_message(difficulty_message, context)
-            if isinstance(difficulty_result, dict) and difficulty_result.get("error"):
-                raise Exception(
-                    f"Difficulty determination failed: {difficulty_result['error']}")
+            results["persona"] = persona_result
             results["difficulty"] = difficulty_result
-            context.set("difficulty", difficulty_result)
-            self.logger.info(f"Difficulty determined: {difficulty_result}")
-
-            # 4. Create Game (Game Designer)
-            game_message = Message(
-                from_agent="system",
-                to_agent="game_designer",
-                tool="create_game",
-                params={
-                    "user_id": user_id,
-                    "difficulty": difficulty_result,
-                    # Example default
-                    "age_group": user_info.get("age_group", "adultos")
-                }
-            )
-            game_result = await self.server.process_message(game_message, context)
-            if isinstance(game_result, dict) and game_result.get("error"):
-                raise Exception(
-                    f"Game creation failed: {game_result['error']}")
             results["game_data"] = game_result
-            context.set("current_game", game_result)  # Store game in context
-            self.logger.info(f"Game created: {game_result.get('game_id')}")
-
-            # 5. Create Instructions (Tutor Agent) - Assuming a tool exists
-            instructions_message = Message(
-                from_agent="system",
-                to_agent="tutor",  # Assuming tutor agent name
-                tool="create_instructions",
-                params={
-                    "game_title": game_result.get("title"),
-                    "game_type": game_result.get("type"),
-                    "difficulty": difficulty_result,
-                    "persona": persona_result
-                }
-            )
-            instructions_result = await self.server.process_message(instructions_message, context)
-            if isinstance(instructions_result, dict) and instructions_result.get("error"):
-                raise Exception(
-                    f"Instruction creation failed: {instructions_result['error']}")
-            results["instructions"] = instructions_result
-            context.set("instructions", instructions_result)
-            self.logger.info("Instructions created.")
+            results["instructions"] = workflow_result["results"]["instructions"]
+            results["timings"] = workflow_result["timings"]
+            self.logger.info(
+                f"Session steps done in {workflow_result['total']}s "
+                f"(game {game_result.get('game_id')})")
 
             # 6. Save Session State
             session_data_to_save = {
@@ -870,12 +1103,13 @@ class MCPSystem:
 
         try:
             # Create session context
-            context = ModelContext()
+            context = ModelContext(timeout=SESSION_TIMEOUT)
             context.set("user_id", user_id)
             context.set("game_id", game_id)
 
             # Get game data
-            game_data = self.db_connector.get_game(game_id)
+            # pymongo é síncrono: consultas fora do event loop
+            game_data = await asyncio.to_thread(self.db_connector.get_game, game_id)
             if not game_data:
                 raise ValueError(f"Game not found: {game_id}")
 
@@ -883,7 +1117,7 @@ class MCPSystem:
                 f"Found game: {game_data.get('title', 'Untitled')}")
 
             # Get user info
-            user_info = self.db_connector.get_user_by_id(user_id)
+            user_info = await asyncio.to_thread(self.db_connector.get_user_by_id, user_id)
             if not user_info:
                 raise ValueError(f"User not found: {user_id}")
 
@@ -927,7 +1161,7 @@ class MCPSystem:
                 "status": "active",
                 "context": context._data
             }
-            self.db_connector.save_session(session_data)
+            await asyncio.to_thread(self.db_connector.save_session, session_data)
 
             # Format response exactly as frontend expects
             game_response = {
@@ -1005,7 +1239,48 @@ class MCPSystem:
                 "error": f"Erro na leitura do arquivo de áudio: {str(e)}"
             }
 
-    async def evaluate_pronunciation(self, audio_file, expected_word, user_id=None, session_id=None):
+    def _game_evaluation_context(self, session_id) -> tuple:
+        """
+        Palavras e planos de avaliação do jogo associado a uma sessão
+
+        Returns:
+            Tuplo (palavras dos exercícios, planos por palavra normalizada)
+        """
+        if not session_id or not hasattr(self.db_connector, 'get_session'):
+            return [], {}
+
+        cached = self._evaluation_contexts.get(session_id)
+        if cached is not None:
+            return cached
+
+        try:
+            session = self.db_connector.get_session(session_id)
+            game_id = session.get("game_id") if session else None
+            game_data = self.db_connector.get_game(game_id) if game_id else None
+            if not game_data:
+                return [], {}
+
+            exercises = game_data.get("exercises")
+            if exercises is None:
+                content = game_data.get("content", [])
+                exercises = content.get("exercises", []) if isinstance(
+                    content, dict) else content
+            vocabulary = [exercise.get("word") for exercise in exercises
+                          if isinstance(exercise, dict) and exercise.get("word")]
+            context = (vocabulary, game_data.get("evaluation_plan") or {})
+        except Exception as e:
+            self.logger.warning(
+                f"Não foi possível obter o jogo da sessão {session_id}: {e}")
+            return [], {}
+
+        # O jogo de uma sessão não muda: guardar para as próximas tentativas
+        if len(self._evaluation_contexts) >= 256:
+            self._evaluation_contexts.pop(next(iter(self._evaluation_contexts)))
+        self._evaluation_contexts[session_id] = context
+        return context
+
+    async def evaluate_pronunciation(self, audio_file, expected_word, user_id=None, session_id=None,
+                                     idempotency_key=None, vocabulary=None):
         """
         Avalia a pronúncia do usuário comparando com a palavra esperada.
 
@@ -1014,6 +1289,9 @@ class MCPSystem:
             expected_word: Palavra que o usuário deveria pronunciar
             user_id: ID do usuário (opcional)
             session_id: ID da sessão de jogo (opcional)
+            idempotency_key: Chave do pedido, para não gravar a mesma avaliação duas vezes (opcional)
+            vocabulary: Outras palavras do jogo, para detetar trocas; por omissão
+                vêm do jogo da sessão (opcional)
 
         Returns:
             Dict contendo os resultados da avaliação
@@ -1045,9 +1323,14 @@ class MCPSystem:
                 context.set("session_id", session_id)
             context.set("expected_word", expected_word)
 
+            # Palavras e planos de avaliação do jogo, compilados ao guardá-lo
+            # (consultas à base de dados e leitura do upload: numa thread)
+            game_vocabulary, game_plans = await asyncio.to_thread(
+                self._game_evaluation_context, session_id)
+
             # Ler os dados do arquivo - O objeto audio_file já é um file-like object
             # que podemos ler diretamente
-            audio_data = audio_file.read()
+            audio_data = await asyncio.to_thread(audio_file.read)
 
             # Enviar solicitação para o Speech Evaluator Agent
             self.logger.info(
@@ -1059,7 +1342,9 @@ class MCPSystem:
                 params={
                     "audio_data": audio_data,
                     "expected_word": expected_word,
-                    "language": "pt-PT"  # Por padrão português europeu
+                    "language": "pt-PT",  # Por padrão português europeu
+                    "vocabulary": vocabulary if vocabulary is not None else game_vocabulary,
+                    "plan": find_plan(game_plans, expected_word)
                 }
             )
 
@@ -1175,13 +1460,14 @@ class MCPSystem:
                 self.logger.info(
                     f"[COORDINATOR] 🔊 Generating feedback audio for text: '{feedback_text}'")
                 try:
-                    # Use the system synthesize_speech function
-                    from speech.synthesis import synthesize_speech
+                    # Splice cached template fragments, synthesizing only what is new
+                    from speech.feedback_audio import compose_feedback_audio
                     self.logger.info(
-                        f"[COORDINATOR] Calling synthesize_speech for feedback audio")
+                        f"[COORDINATOR] Composing feedback audio")
 
-                    # Create audio for the feedback
-                    audio_bytes = synthesize_speech(
+                    # Create audio for the feedback (blocking TTS and disk, in a thread)
+                    audio_bytes = await asyncio.to_thread(
+                        compose_feedback_audio,
                         feedback_text,
                         voice_settings={
                             "language_code": "pt-PT",
@@ -1221,7 +1507,7 @@ class MCPSystem:
 
                         mp3_fp = io.BytesIO()
                         tts = gTTS(text=feedback_text, lang='pt', slow=False)
-                        tts.write_to_fp(mp3_fp)
+                        await asyncio.to_thread(tts.write_to_fp, mp3_fp)
                         mp3_fp.seek(0)
 
                         audio_base64 = base64.b64encode(
@@ -1266,18 +1552,21 @@ class MCPSystem:
                                     "recognized_text", ""),
                                 is_correct=result.get("isCorrect", False),
                                 score=result.get("score", 0),
-                                timestamp=datetime.datetime.now().isoformat()
+                                timestamp=datetime.datetime.now().isoformat(),
+                                idempotency_key=idempotency_key
                             )
                         else:
-                            # Se o método for síncrono, chamar diretamente
-                            self.db_connector.save_pronunciation_evaluation(
+                            # Se o método for síncrono, chamar numa thread
+                            await asyncio.to_thread(
+                                self.db_connector.save_pronunciation_evaluation,
                                 session_id=session_id,
                                 expected_word=expected_word,
                                 recognized_text=result.get(
                                     "recognized_text", ""),
                                 is_correct=result.get("isCorrect", False),
                                 score=result.get("score", 0),
-                                timestamp=datetime.datetime.now().isoformat()
+                                timestamp=datetime.datetime.now().isoformat(),
+                                idempotency_key=idempotency_key
                             )
 
                         self.logger.info(
@@ -1,7 +1,9 @@
 import asyncio
 import logging
+import time
 import uuid
-from typing import Dict, Any, List, Optional, Callable, Awaitable
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Union
+from .deadline import bind_deadline, deadline_after, within_deadline
 
 
 class ToolParam:
@@ -44,9 +46,23 @@ class Message:
 class ModelContext:
     """Context for storing and retrieving data across agent calls"""
 
-    def __init__(self):
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        Args:
+            timeout: Seconds the request may take; messages processed with
+                this context (and everything they call) share the deadline
+        """
         self.id = str(uuid.uuid4())
         self._data = {}
+        self.deadline = deadline_after(timeout) if timeout is not None else None
+
+    def set_timeout(self, timeout: float) -> None:
+        """Set the deadline ``timeout`` seconds from now"""
+        self.deadline = deadline_after(timeout)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None without one"""
+        return None if self.deadline is None else self.deadline - time.monotonic()
 
     def set(self, key: str, value: Any) -> None:
         self._data[key] = value
@@ -62,6 +78,35 @@ class ModelContext:
             del self._data[key]
 
 
+class WorkflowStep:
+    """Step of a workflow: a message and the steps whose results it needs"""
+
+    def __init__(self, name: str,
+                 message: Union[Message, Callable[[Dict[str, Any]], Message]],
+                 depends_on: Optional[List[str]] = None,
+                 description: Optional[str] = None):
+        """
+        Args:
+            name: Step name; its result is stored in the context under this key
+            message: Message to send, or a function building it from the
+                results of the steps it depends on
+            depends_on: Names of the steps that must finish first
+            description: Used in error messages ("<description> failed: ...")
+        """
+        self.name = name
+        self.message = message
+        self.depends_on = depends_on or []
+        self.description = description or name
+
+
+class WorkflowError(Exception):
+    """Raised when a workflow step fails or returns an error"""
+
+    def __init__(self, step: str, message: str):
+        super().__init__(message)
+        self.step = step
+
+
 class Agent:
     """Agent definition"""
 
@@ -84,9 +129,110 @@ class MCPServer:
         self.logger.info(f"Registered handler for agent: {agent_name}")
 
     async def process_message(self, message: Message, context: ModelContext) -> Any:
-        """Process a message by routing it to the appropriate agent handler"""
+        """
+        Process a message by routing it to the appropriate agent handler
+
+        The context's deadline is bound while the handler runs, and the
+        handler is cancelled when it passes.
+
+        Raises:
+            DeadlineExceeded: If the context's deadline passes first
+        """
         if message.to_agent not in self.agents:
             raise ValueError(
                 f"No handler registered for agent: {message.to_agent}")
 
-        return await self.agents[message.to_agent](message, context)
+        deadline = context.deadline if isinstance(context, ModelContext) else None
+        with bind_deadline(deadline):
+            return await within_deadline(
+                self.agents[message.to_agent](message, context),
+                what=f"{message.to_agent}.{message.tool}")
+
+
+    async def run_workflow(self, steps: List[WorkflowStep], context: ModelContext) -> Dict[str, Any]:
+        """
+        Run a graph of messages, each step as soon as its dependencies finish
+
+        Independent steps run concurrently; each result is stored in the
+        context under the step name before dependent steps start.
+
+        Returns:
+            {"results": {step: result}, "timings": {step: {"start", "duration"}},
+             "total": seconds}
+
+        Raises:
+            ValueError: If a dependency is unknown or the steps form a cycle
+            WorkflowError: If a step raises or returns {"error": ...}; the
+                remaining steps are cancelled
+        """
+        by_name = {step.name: step for step in steps}
+        for step in steps:
+            for dependency in step.depends_on:
+                if dependency not in by_name:
+                    raise ValueError(
+                        f"Step {step.name} depends on unknown step {dependency}")
+        self._check_acyclic(by_name)
+
+        started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        timings: Dict[str, Dict[str, float]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_step(step: WorkflowStep) -> Any:
+            if step.depends_on:
+                await asyncio.gather(*(tasks[name] for name in step.depends_on))
+            message = step.message
+            if callable(message):
+                message = message({name: results[name] for name in step.depends_on})
+
+            step_started = time.perf_counter()
+            try:
+                result = await self.process_message(message, context)
+            except Exception as e:
+                raise WorkflowError(step.name, f"{step.description} failed: {str(e)}") from e
+            if isinstance(result, dict) and result.get("error"):
+                raise WorkflowError(step.name, f"{step.description} failed: {result['error']}")
+
+            timings[step.name] = {
+                "start": round(step_started - started, 4),
+                "duration": round(time.perf_counter() - step_started, 4)
+            }
+            results[step.name] = result
+            context.set(step.name, result)
+            return result
+
+        for step in steps:
+            tasks[step.name] = asyncio.ensure_future(run_step(step))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        total = round(time.perf_counter() - started, 4)
+        self.logger.info(
+            f"Workflow finished in {total}s: " +
+            ", ".join(f"{name}={timing['duration']}s" for name, timing in timings.items()))
+        return {"results": results, "timings": timings, "total": total}
+
+    @staticmethod
+    def _check_acyclic(by_name: Dict[str, WorkflowStep]):
+        """Raise ValueError if the steps' dependencies form a cycle"""
+        state: Dict[str, str] = {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(
+                    f"Workflow steps form a cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dependency in by_name[name].depends_on:
+                visit(dependency, path + [name])
+            state[name] = "done"
+
+        for name in by_name:
+            visit(name, [])
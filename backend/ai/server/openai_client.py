@@ -1,11 +1,21 @@
 import os
 import logging
 from openai import OpenAI, AsyncOpenAI  # Add AsyncOpenAI import
+from .client_middleware import wrap_client
+from .completion_cache import (COMPLETION_CACHE_ENABLED, CacheMiddleware,
+                               get_completion_cache)
+from .rate_governor import (RATE_GOVERNOR_ENABLED, INTERACTIVE, GovernorMiddleware,
+                            get_rate_governor)
+from .token_accounting import TOKEN_ACCOUNTING_ENABLED, MeterMiddleware, get_token_ledger
 
 logger = logging.getLogger(__name__)
 
+# OpenAI-compatible endpoint to use instead of api.openai.com (e.g. the
+# stand-in server in tests/mocks/openai_mock.py for offline load tests)
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
 
-def create_openai_client(api_key=None):
+
+def create_openai_client(api_key=None, lane=INTERACTIVE, base_url=None):
     """Creates a synchronous OpenAI client"""
     try:
         # Explicitly load environment variables
@@ -33,16 +43,25 @@ def create_openai_client(api_key=None):
         # Log first few characters for debugging
         print(f"Using API key: {api_key[:8]}...")
 
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, base_url=base_url or OPENAI_BASE_URL)
         logger.info("OpenAI client initialized successfully")
-        return client
+        return _wrap_client(client, lane, is_async=False)
     except Exception as e:
         logger.error(f"Error initializing OpenAI client: {str(e)}")
         return None
 
 
-def create_async_openai_client(api_key=None):
-    """Creates an asynchronous OpenAI client"""
+def create_async_openai_client(api_key=None, lane=INTERACTIVE, base_url=None):
+    """
+    Creates an asynchronous OpenAI client
+
+    Args:
+        api_key: OpenAI API key (defaults to OPENAI_API_KEY)
+        lane: Rate governor lane of the client's requests ("interactive", or
+            "background" for work nobody is waiting for)
+        base_url: OpenAI-compatible endpoint (defaults to OPENAI_BASE_URL,
+            then api.openai.com)
+    """
     try:
         # Reuse API key loading logic
         api_key = api_key or os.environ.get("OPENAI_API_KEY")
@@ -52,10 +71,27 @@ def create_async_openai_client(api_key=None):
 
         client = AsyncOpenAI(
             api_key=api_key,
+            base_url=base_url or OPENAI_BASE_URL,
             timeout=60.0  # Increased timeout for longer responses
         )
         logger.info("Async OpenAI client initialized successfully")
-        return client
+        return _wrap_client(client, lane, is_async=True)
     except Exception as e:
         logger.error(f"Error initializing async OpenAI client: {str(e)}")
         return None
+
+
+def _wrap_client(client, lane, is_async):
+    """
+    Route chat completions through the completion cache, then the rate governor,
+    then the token ledger
+
+    Cache hits never reach the governor, so they do not use the rate limits;
+    the ledger only counts requests actually sent to the provider.
+    """
+    cache = get_completion_cache() if COMPLETION_CACHE_ENABLED else None
+    governor = get_rate_governor() if RATE_GOVERNOR_ENABLED else None
+    ledger = get_token_ledger() if TOKEN_ACCOUNTING_ENABLED else None
+    return wrap_client(client, [CacheMiddleware(cache),
+                                GovernorMiddleware(governor, lane),
+                                MeterMiddleware(ledger)], is_async=is_async)
@@ -0,0 +1,555 @@
+"""
+Admission control for language model requests
+
+Every agent shares the provider's requests-per-minute and tokens-per-minute
+limits, so a spike of sessions used to fan straight out into 429s and
+timeouts. The governor sits around the OpenAI client and admits a request
+only when both token buckets (RPM and TPM) and the in-flight limit allow it.
+
+Requests belong to a lane: interactive requests (a user is waiting) always
+go first, and background requests (game pool refills) wait while any
+interactive request is queued and never dip into the share of the buckets
+reserved for interactive traffic. When a lane's queue is full, or the wait
+would exceed the limit, the request is rejected at once with
+RateLimitRejected rather than left to time out.
+
+Requests made under a deadline (see deadline.py) wait for admission at most
+until the deadline, and are sent with a timeout that ends at it.
+
+The limits belong to the account, not to one worker: the RPM and TPM
+buckets are kept in a SQLite file that every worker process updates, so
+N workers together stay under the limits. While the file cannot be used,
+each worker keeps to 1/N of the limits and tries the file again every few
+seconds. The in-flight limit and the lane queues stay per worker.
+"""
+
+import os
+import time
+import sqlite3
+import tempfile
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+from .client_middleware import CompletionMiddleware, MiddlewareClient, ObservedStream
+from .deadline import DeadlineExceeded, remaining
+
+logger = logging.getLogger(__name__)
+
+RATE_GOVERNOR_ENABLED = os.environ.get("RATE_GOVERNOR_ENABLED", "true").lower() == "true"
+
+# Provider limits for the account (requests and tokens per minute)
+OPENAI_RPM_LIMIT = int(os.environ.get("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.environ.get("OPENAI_TPM_LIMIT", "200000"))
+
+# Requests sent to the provider at the same time
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "16"))
+
+# Requests waiting per lane before new ones are rejected
+OPENAI_MAX_QUEUE = int(os.environ.get("OPENAI_MAX_QUEUE", "64"))
+
+# Seconds a request may wait for admission
+OPENAI_MAX_QUEUE_WAIT = float(os.environ.get("OPENAI_MAX_QUEUE_WAIT", "10"))
+
+# Share of each bucket that background requests leave for interactive ones
+OPENAI_BACKGROUND_RESERVE = float(os.environ.get("OPENAI_BACKGROUND_RESERVE", "0.3"))
+
+# SQLite file holding the buckets shared by the workers (empty: per process).
+# Its own file: every request takes a write lock on it
+OPENAI_RATE_STATE_PATH = os.environ.get(
+    "OPENAI_RATE_STATE_PATH",
+    os.path.join(tempfile.gettempdir(), "gigi_rate_limits.sqlite3"))
+
+# Worker processes sharing the limits; while the shared state is unavailable
+# each worker keeps to its share of them
+OPENAI_RATE_WORKERS = int(os.environ.get(
+    "OPENAI_RATE_WORKERS", os.environ.get("GUNICORN_WORKERS", "4")))
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)
+
+# Completion tokens assumed when a request sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 800
+
+# Longest sleep between two admission attempts
+_POLL_INTERVAL = 0.05
+
+# Seconds before the shared state is tried again after it failed
+_STATE_RETRY_SECONDS = 5.0
+
+
+class RateLimitRejected(Exception):
+    """Raised when a request is not admitted (queue full or wait too long)"""
+
+
+def _prompt_tokens(params: Dict[str, Any]) -> int:
+    characters = 0
+    for message in params.get("messages", []):
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            characters += len(content)
+    return characters // 4
+
+
+def estimate_tokens(params: Dict[str, Any]) -> int:
+    """Rough token count of a chat completion request (prompt and completion)"""
+    return _prompt_tokens(params) + int(params.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """Bucket refilled continuously up to its per-minute capacity"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def level_at(self, now: float, level: Optional[float] = None,
+                 updated: Optional[float] = None) -> float:
+        """Level at ``now``, from this bucket's state or a stored (level, updated)"""
+        if level is None:
+            level, updated = self.level, self._updated
+        return min(self.capacity, level + (now - updated) * self.rate)
+
+    def refill(self, now: float):
+        self.level = self.level_at(now)
+        self._updated = now
+
+    def delay_for(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until ``amount`` can be taken leaving ``reserve`` (0 if now)"""
+        # A request larger than the bucket waits for a full bucket
+        missing = min(amount + reserve, self.capacity) - self.level
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+
+class RateGovernor:
+    def __init__(self, rpm: int = OPENAI_RPM_LIMIT, tpm: int = OPENAI_TPM_LIMIT,
+                 max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+                 max_queue: int = OPENAI_MAX_QUEUE,
+                 max_wait: float = OPENAI_MAX_QUEUE_WAIT,
+                 background_reserve: float = OPENAI_BACKGROUND_RESERVE,
+                 state_path: Optional[str] = None, workers: int = OPENAI_RATE_WORKERS):
+        """
+        Initialize the governor
+
+        Args:
+            rpm: Requests per minute
+            tpm: Tokens per minute
+            max_concurrency: Requests in flight at the same time
+            max_queue: Requests waiting per lane
+            max_wait: Seconds a request may wait for admission
+            background_reserve: Share of each bucket kept for interactive requests
+            state_path: SQLite file sharing the buckets between processes
+                (None: buckets of this governor only)
+            workers: Processes sharing the state file; while it fails this
+                one admits up to 1/workers of the limits
+        """
+        self.state_path = state_path or None
+        # Shared buckets are timed with the wall clock, which every process agrees on
+        self._clock = time.time if self.state_path else time.monotonic
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        # This worker's share, used while the shared state is unavailable
+        workers = max(1, workers)
+        self._fallback = (TokenBucket(max(1, rpm // workers)), TokenBucket(max(1, tpm // workers)))
+        for bucket in (self.requests, self.tokens, *self._fallback):
+            bucket._updated = self._clock()
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.background_reserve = background_reserve
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._state_failed = False
+        self._retry_at = 0.0
+        self._in_flight = 0
+        self._waiting = {lane: 0 for lane in LANES}
+        self.stats = {lane: {"admitted": 0, "rejected": 0, "wait_total": 0.0,
+                             "wait_max": 0.0} for lane in LANES}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the state file (again after a fork; caller holds the lock)"""
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.state_path))
+            os.makedirs(directory, exist_ok=True)
+            # Transactions are managed explicitly (BEGIN IMMEDIATE)
+            connection = sqlite3.connect(self.state_path, timeout=1.0,
+                                         check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                " name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)")
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _state_error(self, error: Exception):
+        """The state file failed: use this worker's share until the next retry"""
+        if not self._state_failed:
+            logger.warning(f"Shared rate limit state unavailable, admitting this worker's "
+                           f"share of the limits for {_STATE_RETRY_SECONDS:.0f}s: {error}")
+        self._state_failed = True
+        self._retry_at = time.monotonic() + _STATE_RETRY_SECONDS
+
+    def _state_available(self) -> bool:
+        return bool(self.state_path) and time.monotonic() >= self._retry_at
+
+    def _begin_shared(self) -> Optional[sqlite3.Connection]:
+        """Start a write transaction and load the shared buckets, or None"""
+        if not self._state_available():
+            return None
+        connection = None
+        try:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            rows = {name: (level, updated) for name, level, updated in connection.execute(
+                "SELECT name, level, updated FROM rate_buckets")}
+            for name, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                if name in rows:
+                    bucket.level, bucket._updated = rows[name]
+            return connection
+        except sqlite3.Error as e:
+            self._state_error(e)
+            self._rollback(connection)
+            return None
+
+    def _commit_shared(self, connection: sqlite3.Connection):
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO rate_buckets (name, level, updated)"
+                " VALUES (?, ?, ?)",
+                [("requests", self.requests.level, self.requests._updated),
+                 ("tokens", self.tokens.level, self.tokens._updated)])
+            connection.execute("COMMIT")
+            if self._state_failed:
+                logger.info("Shared rate limit state available again")
+            self._state_failed = False
+        except sqlite3.Error as e:
+            self._state_error(e)
+            self._rollback(connection)
+
+    @contextmanager
+    def _buckets(self):
+        """
+        Refilled (requests, tokens) buckets to admit against (caller holds the lock)
+
+        Shared buckets are loaded and written back in one write transaction,
+        so concurrent workers never take the same capacity twice. While the
+        state file fails (a lock timeout under load included), this worker's
+        share of the limits is used and the file is tried again after
+        _STATE_RETRY_SECONDS.
+        """
+        connection = self._begin_shared()
+        if connection is None and self.state_path:
+            buckets = self._fallback
+        else:
+            buckets = (self.requests, self.tokens)
+        now = self._clock()
+        for bucket in buckets:
+            bucket.refill(now)
+        try:
+            yield buckets
+        finally:
+            if connection is not None:
+                self._commit_shared(connection)
+
+    def _bucket_metrics(self) -> Dict[str, Any]:
+        """Limits and levels of the buckets in use, read without writing (caller holds the lock)"""
+        now = self._clock()
+        buckets, rows, shared = (self.requests, self.tokens), {}, False
+        if self._state_available():
+            try:
+                rows = {name: (level, updated) for name, level, updated in self._connect().execute(
+                    "SELECT name, level, updated FROM rate_buckets")}
+                shared = True
+            except sqlite3.Error as e:
+                self._state_error(e)
+        if self.state_path and not shared:
+            buckets = self._fallback
+        requests, tokens = buckets
+        # Shared buckets nobody has used yet are full
+        full = (float("inf"), now)
+        return {
+            "rpm_limit": int(requests.capacity),
+            "tpm_limit": int(tokens.capacity),
+            "requests_available": round(requests.level_at(now, *rows.get("requests", full))
+                                        if shared else requests.level_at(now), 1),
+            "tokens_available": round(tokens.level_at(now, *rows.get("tokens", full))
+                                      if shared else tokens.level_at(now)),
+            "shared": shared
+        }
+
+    @staticmethod
+    def _rollback(connection: Optional[sqlite3.Connection]):
+        if connection is not None and connection.in_transaction:
+            try:
+                connection.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    def _enter(self, lane: str):
+        with self._lock:
+            if self._waiting[lane] >= self.max_queue:
+                self.stats[lane]["rejected"] += 1
+                raise RateLimitRejected(f"{lane} queue is full ({self.max_queue} waiting)")
+            self._waiting[lane] += 1
+
+    def _try_admit(self, lane: str, tokens: int) -> float:
+        """Admit the request now (returns 0) or return how long to wait"""
+        with self._lock:
+            if self._in_flight >= self.max_concurrency:
+                return _POLL_INTERVAL
+            if lane == BACKGROUND and self._waiting[INTERACTIVE]:
+                return _POLL_INTERVAL
+
+            with self._buckets() as (requests, token_bucket):
+                if lane == BACKGROUND:
+                    request_reserve = requests.capacity * self.background_reserve
+                    token_reserve = token_bucket.capacity * self.background_reserve
+                else:
+                    request_reserve = token_reserve = 0.0
+                delay = max(requests.delay_for(1, request_reserve),
+                            token_bucket.delay_for(tokens, token_reserve))
+                if delay > 0:
+                    return delay
+
+                requests.level -= 1
+                token_bucket.level -= tokens
+                self._in_flight += 1
+                return 0.0
+
+    def _leave(self, lane: str, waited: Optional[float]):
+        """Leave the lane's queue, admitted after ``waited`` seconds or not (None)"""
+        with self._lock:
+            self._waiting[lane] -= 1
+            stats = self.stats[lane]
+            if waited is None:
+                stats["rejected"] += 1
+                return
+            stats["admitted"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+
+    def _next_sleep(self, lane: str, delay: float, started: float,
+                    max_wait: Optional[float] = None) -> float:
+        """Sleep before the next attempt; rejects when the wait would be too long"""
+        limit = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        waited = time.monotonic() - started
+        if waited + delay > limit:
+            raise RateLimitRejected(f"{lane} request would wait {waited + delay:.1f}s "
+                                    f"(limit {limit:.1f}s)")
+        return min(delay, _POLL_INTERVAL * 4)
+
+    async def acquire_async(self, lane: str, tokens: int, max_wait: Optional[float] = None):
+        """
+        Wait until a request may be sent
+
+        Args:
+            max_wait: Shorter wait limit for this request (e.g. its deadline)
+
+        Raises:
+            RateLimitRejected: If the lane's queue is full or the wait too long
+        """
+        self._enter(lane)
+        started = time.monotonic()
+        waited = None
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if self.state_path:
+                    # The state file may be locked by another worker
+                    delay = await loop.run_in_executor(None, self._try_admit, lane, tokens)
+                else:
+                    delay = self._try_admit(lane, tokens)
+                if not delay:
+                    waited = time.monotonic() - started
+                    return
+                await asyncio.sleep(self._next_sleep(lane, delay, started, max_wait))
+        finally:
+            self._leave(lane, waited)
+
+    def acquire(self, lane: str, tokens: int, max_wait: Optional[float] = None):
+        """Blocking version of acquire_async, for the synchronous client"""
+        self._enter(lane)
+        started = time.monotonic()
+        waited = None
+        try:
+            while True:
+                delay = self._try_admit(lane, tokens)
+                if not delay:
+                    waited = time.monotonic() - started
+                    return
+                time.sleep(self._next_sleep(lane, delay, started, max_wait))
+        finally:
+            self._leave(lane, waited)
+
+    def release(self, estimated: int, used: Optional[int] = None):
+        """
+        A request finished: free its slot and correct the token estimate
+
+        Args:
+            estimated: Tokens taken when the request was admitted
+            used: Tokens the provider reported, if known
+        """
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if used is not None and used != estimated:
+                with self._buckets() as (_, tokens):
+                    tokens.level = min(tokens.capacity, tokens.level + estimated - used)
+
+    def release_soon(self, estimated: int, used: Optional[int] = None):
+        """release() for the event loop: shared state is written from a thread"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or not self.state_path:
+            self.release(estimated, used)
+        else:
+            loop.run_in_executor(None, self.release, estimated, used)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Bucket levels, queue lengths and per-lane wait statistics"""
+        with self._lock:
+            lanes = {}
+            for lane, stats in self.stats.items():
+                admitted = stats["admitted"]
+                lanes[lane] = {
+                    "waiting": self._waiting[lane],
+                    "admitted": admitted,
+                    "rejected": stats["rejected"],
+                    "avg_wait": round(stats["wait_total"] / admitted, 4) if admitted else 0.0,
+                    "max_wait": round(stats["wait_max"], 4)
+                }
+            return {
+                **self._bucket_metrics(),
+                "in_flight": self._in_flight,
+                "lanes": lanes
+            }
+
+
+def _tokens_used(completion: Any) -> Optional[int]:
+    used = getattr(getattr(completion, "usage", None), "total_tokens", None)
+    return used if isinstance(used, int) else None
+
+
+def _apply_deadline(kwargs: Dict[str, Any]) -> Optional[float]:
+    """
+    End the request's timeout at the running request's deadline
+
+    Returns:
+        Seconds left, or None without a deadline
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    left = remaining()
+    if left is None:
+        return None
+    if left <= 0:
+        raise DeadlineExceeded("Deadline passed before the completion request")
+    timeout = kwargs.get("timeout")
+    kwargs["timeout"] = min(timeout, left) if isinstance(timeout, (int, float)) else left
+    return left
+
+
+class _StreamUsage:
+    """Tokens of a streamed completion, estimated from its text (streams report no usage)"""
+
+    def __init__(self, params: Dict[str, Any]):
+        self.prompt = _prompt_tokens(params)
+        self.characters = 0
+
+    def chunk(self, chunk: Any):
+        choices = getattr(chunk, "choices", None) or []
+        content = getattr(getattr(choices[0], "delta", None), "content", None) if choices else None
+        if isinstance(content, str):
+            self.characters += len(content)
+
+    def total(self) -> int:
+        return self.prompt + self.characters // 4
+
+
+class GovernorMiddleware(CompletionMiddleware):
+    """
+    Admits every request through the governor in the request's lane
+
+    A request holds its slot until the completion is received or, for a
+    stream, until the stream is closed; the token estimate is then replaced
+    by the tokens used.
+    """
+
+    def __init__(self, governor: Optional[RateGovernor], lane: str = INTERACTIVE):
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+        self.governor = governor
+        self.lane = lane
+
+    def _finish(self, completion: Any, params: Dict[str, Any], estimated: int,
+                release) -> Any:
+        if not params.get("stream"):
+            release(estimated, _tokens_used(completion))
+            return completion
+        usage = _StreamUsage(params)
+        return ObservedStream(completion, on_chunk=usage.chunk,
+                              on_close=lambda error: release(estimated, usage.total()))
+
+    def create(self, call_next, **kwargs) -> Any:
+        lane = kwargs.pop("lane", None) or self.lane
+        left = _apply_deadline(kwargs)
+        if self.governor is None:
+            return call_next(**kwargs)
+        estimated = estimate_tokens(kwargs)
+        self.governor.acquire(lane, estimated, max_wait=left)
+        try:
+            completion = call_next(**kwargs)
+        except BaseException:
+            self.governor.release(estimated)
+            raise
+        return self._finish(completion, kwargs, estimated, self.governor.release)
+
+    async def acreate(self, call_next, **kwargs) -> Any:
+        lane = kwargs.pop("lane", None) or self.lane
+        left = _apply_deadline(kwargs)
+        if self.governor is None:
+            return await call_next(**kwargs)
+        estimated = estimate_tokens(kwargs)
+        await self.governor.acquire_async(lane, estimated, max_wait=left)
+        try:
+            completion = await call_next(**kwargs)
+        except BaseException:
+            self.governor.release_soon(estimated)
+            raise
+        return self._finish(completion, kwargs, estimated, self.governor.release_soon)
+
+
+class GovernedClient(MiddlewareClient):
+    """
+    OpenAI client (sync or async) whose chat completions are admitted by a governor
+
+    Requests use the client's lane; ``chat.completions.create`` also accepts
+    ``lane=`` to override it for one call. With no governor (disabled) the
+    argument is accepted and ignored. A request deadline, when bound, still
+    sets the request timeout.
+    """
+
+    def __init__(self, client: Any, governor: Optional[RateGovernor],
+                 lane: str = INTERACTIVE, is_async: bool = True):
+        super().__init__(client, GovernorMiddleware(governor, lane), is_async)
+
+
+_rate_governor: Optional[RateGovernor] = None
+_rate_governor_lock = threading.Lock()
+
+
+def get_rate_governor() -> RateGovernor:
+    """Governor shared by every client of this process"""
+    global _rate_governor
+    with _rate_governor_lock:
+        if _rate_governor is None:
+            _rate_governor = RateGovernor(state_path=OPENAI_RATE_STATE_PATH)
+        return _rate_governor
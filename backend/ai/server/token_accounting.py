@@ -0,0 +1,333 @@
+"""
+Token accounting and prompt budgets for language model calls
+
+Every chat completion sent to the provider is counted: prompt tokens
+(counted with tiktoken before sending, corrected by the usage the provider
+reports), completion tokens, latency and, for streams, time to the first
+chunk. Calls are attributed to the agent method running them (set by
+utils.agent_logger.log_agent_call) and exported per call and per
+(agent, method).
+
+Agents build prompts from sections; optional sections (style guides,
+vocabulary lists, history) are dropped, lowest priority first, while the
+prompt is over the budget configured for the agent method.
+
+Counting needs tiktoken's encoding files, which are downloaded on first use
+(set TIKTOKEN_CACHE_DIR to ship them with the image). When they cannot be
+loaded, tokens are estimated from the text length.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.agent_logger import current_agent_call
+
+from .client_middleware import CompletionMiddleware, MiddlewareClient, ObservedStream
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ACCOUNTING_ENABLED = os.environ.get("TOKEN_ACCOUNTING_ENABLED", "true").lower() == "true"
+
+# Per-call records kept for export
+TOKEN_METRICS_RECENT = int(os.environ.get("TOKEN_METRICS_RECENT", "500"))
+
+# Prompt token budgets by "AGENT.method" or "AGENT", as JSON; overrides the defaults
+DEFAULT_PROMPT_BUDGETS = {
+    "GAMEDESIGNER": 1100,
+    "TUTOR": 350,
+}
+PROMPT_TOKEN_BUDGETS = {**DEFAULT_PROMPT_BUDGETS,
+                        **json.loads(os.environ.get("PROMPT_TOKEN_BUDGETS") or "{}")}
+
+# Tokens added by the chat format for each message and for the reply
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_PER_REPLY = 3
+
+_encodings: Dict[str, Any] = {}
+_encodings_unavailable = False
+_encodings_lock = threading.Lock()
+
+
+def _encoding(model: Optional[str]) -> Any:
+    """tiktoken encoding for a model, or None when it cannot be loaded"""
+    global _encodings_unavailable
+    key = model or ""
+    with _encodings_lock:
+        if _encodings_unavailable:
+            return None
+        if key in _encodings:
+            return _encodings[key]
+        try:
+            import tiktoken
+
+            try:
+                encoding = tiktoken.encoding_for_model(model or "gpt-4o-mini")
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # Not retried: the download would block every call
+            logger.warning(f"tiktoken encoding unavailable ({str(e)}); estimating tokens")
+            _encodings_unavailable = True
+            return None
+        _encodings[key] = encoding
+        return encoding
+
+
+def warm_encoding(model: Optional[str] = None) -> bool:
+    """Load the model's encoding now (at worker start) rather than on the first call"""
+    return _encoding(model) is not None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Tokens in a text for the model's encoding"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: Iterable[Any], model: Optional[str] = None) -> int:
+    """Prompt tokens of chat messages, including the chat format overhead"""
+    total = _TOKENS_PER_REPLY
+    for message in messages or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        total += _TOKENS_PER_MESSAGE
+        if isinstance(content, str):
+            total += count_tokens(content, model)
+    return total
+
+
+class PromptSection:
+    """Part of a prompt; optional sections may be dropped to meet the budget"""
+
+    def __init__(self, name: str, text: str, optional: bool = False, priority: int = 0):
+        """
+        Args:
+            name: Reported when the section is dropped
+            text: Section text
+            optional: Whether the prompt still works without it
+            priority: Optional sections with lower priority are dropped first
+        """
+        self.name = name
+        self.text = text
+        self.optional = optional
+        self.priority = priority
+
+
+def prompt_budget(agent: Optional[str] = None, method: Optional[str] = None) -> Optional[int]:
+    """Prompt token budget of an agent method (the running one by default)"""
+    if agent is None:
+        agent, method = current_agent_call()
+    budget = PROMPT_TOKEN_BUDGETS.get(f"{agent}.{method}", PROMPT_TOKEN_BUDGETS.get(agent))
+    return int(budget) if budget else None
+
+
+def fit_prompt(sections: List[PromptSection], budget: Optional[int] = None,
+               reserved: int = 0, model: Optional[str] = None) -> str:
+    """
+    Join prompt sections, dropping optional ones while over the budget
+
+    Args:
+        sections: Sections in prompt order
+        budget: Token budget (default: the running agent method's budget)
+        reserved: Tokens of the rest of the request (other messages)
+        model: Model whose encoding counts the tokens
+
+    Returns:
+        The prompt; required sections are always kept, even over budget
+    """
+    budget = prompt_budget() if budget is None else budget
+    kept = list(sections)
+    if budget:
+        sizes = {id(section): count_tokens(section.text, model) for section in sections}
+        # Sections join with a blank line (about one token each)
+        total = reserved + sum(sizes.values()) + len(sections)
+        dropped = []
+        for section in sorted((s for s in sections if s.optional), key=lambda s: s.priority):
+            if total <= budget:
+                break
+            if not section.text:
+                continue
+            kept.remove(section)
+            total -= sizes[id(section)]
+            dropped.append(section.name)
+        if dropped:
+            agent, method = current_agent_call()
+            logger.info(f"{agent}.{method} prompt over its {budget} token budget: "
+                        f"dropped {', '.join(dropped)}")
+            if TOKEN_ACCOUNTING_ENABLED:
+                get_token_ledger().record_trim(agent, method, dropped)
+    return "\n\n".join(section.text for section in kept if section.text)
+
+
+class TokenLedger:
+    def __init__(self, recent: int = TOKEN_METRICS_RECENT):
+        """
+        Initialize the ledger
+
+        Args:
+            recent: Per-call records kept for export
+        """
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._recent = deque(maxlen=recent)
+
+    def _entry(self, agent: str, method: str) -> Dict[str, Any]:
+        return self._totals.setdefault((agent, method), {
+            "calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "max_prompt_tokens": 0, "latency_total": 0.0, "latency_max": 0.0,
+            "trimmed": {}})
+
+    def record(self, agent: str, method: str, model: Optional[str], prompt_tokens: int,
+               completion_tokens: int, latency: float, first_token: Optional[float] = None,
+               error: bool = False):
+        """Record one completion request"""
+        with self._lock:
+            entry = self._entry(agent, method)
+            entry["calls"] += 1
+            entry["errors"] += int(error)
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["max_prompt_tokens"] = max(entry["max_prompt_tokens"], prompt_tokens)
+            entry["latency_total"] += latency
+            entry["latency_max"] = max(entry["latency_max"], latency)
+            self._recent.append({
+                "agent": agent, "method": method, "model": model,
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "latency": round(latency, 4),
+                "first_token": None if first_token is None else round(first_token, 4),
+                "error": error, "timestamp": time.time()})
+
+    def record_trim(self, agent: str, method: str, sections: List[str]):
+        """Record prompt sections dropped to meet the budget"""
+        with self._lock:
+            trimmed = self._entry(agent, method)["trimmed"]
+            for name in sections:
+                trimmed[name] = trimmed.get(name, 0) + 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Totals per agent method and the most recent calls"""
+        with self._lock:
+            methods = []
+            for (agent, method), entry in sorted(self._totals.items()):
+                calls = entry["calls"]
+                methods.append({
+                    "agent": agent, "method": method,
+                    "calls": calls, "errors": entry["errors"],
+                    "prompt_tokens": entry["prompt_tokens"],
+                    "completion_tokens": entry["completion_tokens"],
+                    "avg_prompt_tokens": round(entry["prompt_tokens"] / calls, 1) if calls else 0.0,
+                    "max_prompt_tokens": entry["max_prompt_tokens"],
+                    "avg_latency": round(entry["latency_total"] / calls, 4) if calls else 0.0,
+                    "max_latency": round(entry["latency_max"], 4),
+                    "budget": prompt_budget(agent, method),
+                    "trimmed": dict(entry["trimmed"])})
+            return {"methods": methods, "recent": list(self._recent)}
+
+
+def _content_of(completion: Any) -> str:
+    choices = getattr(completion, "choices", None) or []
+    message = getattr(choices[0], "message", None) if choices else None
+    content = getattr(message, "content", None)
+    return content if isinstance(content, str) else ""
+
+
+class _Metered:
+    """Measures one request and records it in the ledger"""
+
+    def __init__(self, ledger: "TokenLedger", kwargs: Dict[str, Any]):
+        self.ledger = ledger
+        self.agent, self.method = current_agent_call()
+        self.model = kwargs.get("model")
+        self.prompt_tokens = count_message_tokens(kwargs.get("messages", []), self.model)
+        self.started = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.streamed: List[str] = []
+
+    def chunk(self, chunk: Any):
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+        choices = getattr(chunk, "choices", None) or []
+        content = getattr(getattr(choices[0], "delta", None), "content", None) if choices else None
+        if isinstance(content, str):
+            self.streamed.append(content)
+
+    def finish(self, completion: Any = None, error: bool = False):
+        usage = getattr(completion, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if not isinstance(prompt_tokens, int):
+            prompt_tokens = self.prompt_tokens
+        if not isinstance(completion_tokens, int):
+            text = "".join(self.streamed) if self.streamed else _content_of(completion)
+            completion_tokens = count_tokens(text, self.model)
+        self.ledger.record(self.agent, self.method, self.model, prompt_tokens,
+                           completion_tokens, time.perf_counter() - self.started,
+                           first_token=self.first_token, error=error)
+
+
+class MeterMiddleware(CompletionMiddleware):
+    """Records every request in the ledger; with no ledger calls pass straight through"""
+
+    def __init__(self, ledger: Optional[TokenLedger]):
+        self.ledger = ledger
+
+    def _observe(self, completion: Any, meter: _Metered, stream: bool) -> Any:
+        if stream:
+            return ObservedStream(completion, on_chunk=meter.chunk,
+                                  on_close=lambda error: meter.finish(error=error))
+        meter.finish(completion)
+        return completion
+
+    def create(self, call_next, **kwargs) -> Any:
+        if self.ledger is None:
+            return call_next(**kwargs)
+        meter = _Metered(self.ledger, kwargs)
+        try:
+            completion = call_next(**kwargs)
+        except Exception:
+            meter.finish(error=True)
+            raise
+        return self._observe(completion, meter, kwargs.get("stream"))
+
+    async def acreate(self, call_next, **kwargs) -> Any:
+        if self.ledger is None:
+            return await call_next(**kwargs)
+        meter = _Metered(self.ledger, kwargs)
+        try:
+            completion = await call_next(**kwargs)
+        except Exception:
+            meter.finish(error=True)
+            raise
+        return self._observe(completion, meter, kwargs.get("stream"))
+
+
+class MeteredClient(MiddlewareClient):
+    """
+    OpenAI client (sync or async) whose chat completions are recorded in a ledger
+
+    With no ledger (accounting disabled) calls pass straight through.
+    """
+
+    def __init__(self, client: Any, ledger: Optional[TokenLedger], is_async: bool):
+        super().__init__(client, MeterMiddleware(ledger), is_async)
+
+
+_token_ledger: Optional[TokenLedger] = None
+_token_ledger_lock = threading.Lock()
+
+
+def get_token_ledger() -> TokenLedger:
+    """Token ledger shared by every client of this process"""
+    global _token_ledger
+    with _token_ledger_lock:
+        if _token_ledger is None:
+            _token_ledger = TokenLedger()
+        return _token_ledger
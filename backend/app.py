@@ -1,5 +1,8 @@
 from pathlib import Path
 from routes.api import api_bp
+from routes.audio import (audio_bp, audio_response, audio_json, wants_binary_audio,
+                          GTTS_VOICE_SETTINGS, lipsync_generator, queue_full_response,
+                          synthesize_with_jobs)
 import time
 from gtts import gTTS
 import io
@@ -17,6 +20,7 @@ import base64
 import tempfile
 import subprocess
 import asyncio
+import threading
 from asgiref.sync import async_to_sync
 from functools import wraps
 from functools import lru_cache
@@ -25,17 +29,23 @@ from config import DEBUG, OPENAI_API_KEY, app, JWT_SECRET_KEY
 from bson import ObjectId
 from flask.json import JSONEncoder
 import jwt
-from flask import Flask, request, jsonify, g, send_from_directory, Response
+from flask import Flask, request, jsonify, g, send_from_directory, send_file, Response, stream_with_context
 from flask_cors import CORS
 from speech.recognition import recognize_speech
 from speech.synthesis import synthesize_speech, get_example_word_for_phoneme
+from speech.tts_jobs import TTSQueueFullError
 from speech.lipsync import LipsyncGenerator
+from speech.feedback_audio import prerender_fragments
 from ai.server.mcp_coordinator import MCPSystem
+from ai.server.rate_governor import RATE_GOVERNOR_ENABLED, get_rate_governor
+from ai.server.token_accounting import TOKEN_ACCOUNTING_ENABLED, get_token_ledger
 from ai.server.mcp_server import Message, ModelContext
 from ai.agents.game_designer_agent import GameDesignerAgent as GameGenerator
 from auth.auth_service import AuthService
 from auth.auth_middleware import token_required
 from database.db_connector import DatabaseConnector
+from utils.idempotency import IdempotencyCache
+from services import evaluation as evaluation_service, games as game_service
 from dotenv import load_dotenv
 from openai import OpenAI
 
@@ -50,6 +60,26 @@ if __name__ == "__main__":
     sys.path.insert(0, str(project_root))
 
 
+def iterate_async(agen):
+    """Consome um gerador assíncrono a partir de código síncrono (um loop próprio)"""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+
+def sse_event(event, data):
+    """Formata um evento Server-Sent Events"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
 def async_route(f):
     """Wrapper for async route handlers"""
     @wraps(f)
@@ -76,6 +106,7 @@ app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
 app.register_blueprint(api_bp, url_prefix='/api')
+app.register_blueprint(audio_bp, url_prefix='/api')
 
 CORS(app,
      resources={r"/*": {"origins": "*"}},
@@ -129,25 +160,95 @@ def health_check():
 
 auth_service = AuthService()
 db = DatabaseConnector()
+evaluation_cache = IdempotencyCache(db_connector=db)
 
 game_generator = None
 mcp_coordinator = None
 
-lipsync_generator = LipsyncGenerator()
 
 
-@app.before_request
-def initialize_services():
-    global game_generator, mcp_coordinator, db
+# Pré-sintetizar no aquecimento as partes fixas do áudio de feedback (pedidos TTS)
+WARMUP_PRERENDER_FEEDBACK = os.environ.get(
+    "WARMUP_PRERENDER_FEEDBACK", "false").lower() == "true"
+
+
+def warm_up_feedback_audio():
+    """Partes fixas do áudio de feedback no armazenamento de áudio, se configurado"""
+    if WARMUP_PRERENDER_FEEDBACK:
+        prerender_fragments(GTTS_VOICE_SETTINGS)
+        print("🔊 Fragmentos de áudio de feedback pré-sintetizados")
+
+
+# Segundos entre tentativas de inicialização depois de uma falha
+SERVICES_RETRY_SECONDS = float(os.environ.get("SERVICES_RETRY_SECONDS", "10"))
+
+_services_lock = threading.Lock()
+_services_last_attempt = None
+
+
+def init_services():
+    """
+    Cria e aquece os serviços do worker: sistema MCP, agentes, clientes e caches
+
+    Chamado uma vez por worker, depois do fork (gunicorn.conf.py) ou no arranque
+    do servidor de desenvolvimento; se falhar (MongoDB ou OpenAI indisponíveis),
+    os pedidos seguintes voltam a tentar (ensure_services). /api/ready responde
+    503 até terminar.
 
-    if game_generator is None or mcp_coordinator is None:
+    Returns:
+        bool: Se os serviços estão disponíveis
+    """
+    global game_generator, mcp_coordinator, _services_last_attempt
+
+    with _services_lock:
+        if mcp_coordinator is not None:
+            return True
+        _services_last_attempt = time.monotonic()
         try:
-            game_generator = GameGenerator()
-            mcp_coordinator = MCPSystem(
-                api_key=OPENAI_API_KEY, db_connector=db)
-            print("MCP System initialized with database connection")
+            coordinator = MCPSystem(api_key=OPENAI_API_KEY, db_connector=db)
+            # O cliente assíncrono não fica ligado a este loop: não faz pedidos
+            asyncio.run(coordinator.warm_up())
+            warm_up_feedback_audio()
+            game_generator = GameGenerator(client=coordinator.client)
+            mcp_coordinator = coordinator
+            print(f"✅ Serviços inicializados (pid {os.getpid()}, "
+                  f"aquecimento {coordinator.warmup_seconds:.2f}s)")
+            return True
         except Exception as e:
             print(f"Error initializing services: {str(e)}")
+            traceback.print_exc()
+            return False
+
+
+@app.before_request
+def ensure_services():
+    """Inicialização preguiçosa: enquanto os serviços faltarem, volta a tentar"""
+    if mcp_coordinator is not None:
+        return
+    last_attempt = _services_last_attempt
+    if last_attempt is None or time.monotonic() - last_attempt >= SERVICES_RETRY_SECONDS:
+        init_services()
+
+
+def services_unavailable():
+    """Resposta para rotas que precisam do sistema MCP quando ele não existe"""
+    return jsonify({
+        "success": False,
+        "message": "Serviço temporariamente indisponível. Tente novamente.",
+        "error_code": "SERVICE_UNAVAILABLE"
+    }), 503
+
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Prontidão do worker: 503 até o aquecimento dos serviços terminar"""
+    if mcp_coordinator is None or not mcp_coordinator.ready:
+        return jsonify({"status": "warming_up"}), 503
+    return jsonify({
+        "status": "ready",
+        "pid": os.getpid(),
+        "warmup_seconds": round(mcp_coordinator.warmup_seconds, 2)
+    })
 
 
 if os.environ.get('SENTRY_DSN'):
@@ -387,43 +488,20 @@ def update_user_profile(user_id, requesting_user_id):
 @token_required
 @async_route
 async def start_game(user_id):
-    try:
-        data = request.get_json()
-        game_id = data.get('game_id')
-
-        if not game_id:
-            return jsonify({
-                "success": False,
-                "message": "No game_id provided"
-            }), 400
-
-        print(f"========== INICIANDO SESSÃO DE JOGO (Rota -> Coordenador) ==========")
-        print(f"User ID: {user_id}")
-        print(
-            f"Dados recebidos: game_id={game_id}, título={data.get('title')}, dificuldade={data.get('difficulty')}")
-
-        session_result = await mcp_coordinator.load_existing_game_session(user_id, game_id)
+    if mcp_coordinator is None:
+        return services_unavailable()
 
-        print(f"Response structure: {json.dumps(session_result, indent=2)}")
-
-        if not session_result.get("success"):
-            raise Exception(session_result.get(
-                "error", "Unknown error loading game session"))
-
-        return jsonify(session_result)
-
-    except Exception as e:
-        print(f"❌ Erro na rota /api/start_game: {str(e)}")
-        traceback.print_exc()
-        return jsonify({
-            "success": False,
-            "message": f"Failed to start game: {str(e)}"
-        }), 500
+    body, status = await game_service.start_game_session(
+        mcp_coordinator, user_id, request.get_json(silent=True) or {})
+    return jsonify(body), status
 
 
 @app.route('/api/submit_response', methods=['POST'])
 @token_required
 def submit_response(user_id):
+    if mcp_coordinator is None:
+        return services_unavailable()
+
     session_id = request.json.get('session_id')
     recognized_text = request.json.get('recognized_text')
 
@@ -525,22 +603,18 @@ def synthesize_with_polly(user_id):
             'sample_rate': data.get('sample_rate', '22050')
         }
 
-        # Use AWS Polly via the synthesis module
-        audio_data = synthesize_speech(text, voice_settings)
-
-        if not audio_data:
-            return jsonify({'error': 'Failed to generate audio with AWS Polly'}), 500
-
-        # Fix for bytes serialization issue - ensure we have string data
-        if isinstance(audio_data, bytes):
-            audio_b64 = base64.b64encode(audio_data).decode('utf-8')
-        else:
-            # If it's already a string, use it directly
-            audio_b64 = audio_data
+        # Polly can return viseme speech marks in the same job
+        with_visemes = bool(data.get('visemes'))
 
-        print(f"✅ Áudio Polly gerado: {len(audio_b64)} caracteres")
-
-        return jsonify({'success': True, 'audio': audio_b64})
+        # Use AWS Polly via the synthesis module
+        audio_hash = synthesize_with_jobs(text, voice_settings, with_visemes)
+        print(f"✅ Áudio Polly gerado: {audio_hash}")
+
+        if wants_binary_audio():
+            return audio_response(audio_hash, immutable=False)
+        return audio_json(audio_hash, 'audio', with_visemes)
+    except TTSQueueFullError as e:
+        return queue_full_response(e)
     except Exception as e:
         print(f"❌ Erro na síntese com Polly: {str(e)}")
         traceback.print_exc()
@@ -556,74 +630,27 @@ def synthesize_speech_endpoint():
 
         if not data or 'text' not in data:
             print("❌ Dados de entrada inválidos")
-            return Response(
-                json.dumps(
-                    {'success': False, 'error': 'Missing text parameter'}),
-                mimetype='application/json',
-                status=400
-            )
+            return jsonify({'success': False, 'error': 'Missing text parameter'}), 400
 
         text = data.get('text', '').strip()
         if not text:
             print("❌ Texto vazio")
-            return Response(
-                json.dumps({'success': False, 'error': 'Empty text'}),
-                mimetype='application/json',
-                status=400
-            )
+            return jsonify({'success': False, 'error': 'Empty text'}), 400
 
         print(f"📝 Texto para síntese: '{text}'")
 
-        try:
-            from gtts import gTTS
-            import io
-
-            mp3_fp = io.BytesIO()
-            tts = gTTS(text=text, lang='pt', slow=False)
-            tts.write_to_fp(mp3_fp)
-            mp3_fp.seek(0)
-
-            audio_bytes = mp3_fp.read()
-
-            if not audio_bytes:
-                print("❌ Falha ao gerar áudio - nenhum dado retornado")
-                return Response(
-                    json.dumps(
-                        {'success': False, 'error': 'Failed to generate audio'}),
-                    mimetype='application/json',
-                    status=500
-                )
-
-            audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
-            print(
-                f"✅ Áudio gerado com sucesso: {len(audio_bytes)} bytes ({len(audio_b64)} caracteres em base64)")
+        audio_hash = synthesize_with_jobs(text, GTTS_VOICE_SETTINGS)
+        print(f"✅ Áudio gerado com sucesso: {audio_hash}")
 
-            result = {'success': True, 'audio_data': audio_b64}
-            json_str = json.dumps(result)
-
-            return Response(
-                json_str,
-                mimetype='application/json',
-                status=200
-            )
-        except Exception as e:
-            print(f"❌ Erro interno de síntese: {str(e)}")
-            traceback.print_exc()
-            return Response(
-                json.dumps(
-                    {'success': False, 'error': f'Synthesis error: {str(e)}'}),
-                mimetype='application/json',
-                status=500
-            )
+        if wants_binary_audio():
+            return audio_response(audio_hash, immutable=False)
+        return audio_json(audio_hash, 'audio_data')
+    except TTSQueueFullError as e:
+        return queue_full_response(e)
     except Exception as e:
-        print(f"❌ Erro geral no endpoint: {str(e)}")
+        print(f"❌ Erro interno de síntese: {str(e)}")
         traceback.print_exc()
-        return Response(
-            json.dumps(
-                {'success': False, 'error': f'General error: {str(e)}'}),
-            mimetype='application/json',
-            status=500
-        )
+        return jsonify({'success': False, 'error': f'Synthesis error: {str(e)}'}), 500
 
 
 @app.route('/api/tts-simple', methods=['POST', 'OPTIONS'])
@@ -640,40 +667,26 @@ def simple_tts_endpoint():
     try:
         data = request.json
         if not data or 'text' not in data:
-            return Response('{"success":false,"error":"Missing text parameter"}',
-                            mimetype='application/json', status=400)
+            return jsonify({'success': False, 'error': 'Missing text parameter'}), 400
 
         text = data.get('text', '').strip()
         if not text:
-            return Response('{"success":false,"error":"Empty text"}',
-                            mimetype='application/json', status=400)
+            return jsonify({'success': False, 'error': 'Empty text'}), 400
 
         print(f"Texto para TTS simples: '{text}'")
 
-        from gtts import gTTS
-        import io
+        audio_hash = synthesize_with_jobs(text, GTTS_VOICE_SETTINGS)
+        print(f"TTS simples: Áudio gerado {audio_hash}")
 
-        mp3_fp = io.BytesIO()
-        tts = gTTS(text=text, lang='pt')
-        tts.write_to_fp(mp3_fp)
-        mp3_fp.seek(0)
-
-        audio_b64 = base64.b64encode(mp3_fp.read()).decode('utf-8')
-        print(f"TTS simples: Áudio gerado com {len(audio_b64)} caracteres")
-
-        return Response(
-            '{"success":true,"audio_data":"' + audio_b64 + '"}',
-            mimetype='application/json',
-            status=200
-        )
+        if wants_binary_audio():
+            return audio_response(audio_hash, immutable=False)
+        return audio_json(audio_hash, 'audio_data')
+    except TTSQueueFullError as e:
+        return queue_full_response(e)
     except Exception as e:
         print(f"❌ Erro no TTS simples: {str(e)}")
         traceback.print_exc()
-        return Response(
-            '{"success":false,"error":"' + str(e).replace('"', '\\"') + '"}',
-            mimetype='application/json',
-            status=500
-        )
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/evaluate-pronunciation', methods=['POST'])
@@ -681,107 +694,16 @@ def simple_tts_endpoint():
 @async_route
 async def evaluate_pronunciation(user_id):
     """Endpoint para avaliar a pronúncia do usuário"""
-    try:
-        if 'audio' not in request.files:
-            print("❌ Nenhum arquivo de áudio na requisição")
-            return jsonify({
-                "success": False,
-                "message": "No audio file provided",
-                "error_code": "NO_AUDIO"
-            }), 400
-
-        audio_file = request.files['audio']
-        expected_word = request.form.get('expected_word', '').strip()
-        session_id = request.form.get('session_id')
-
-        if not expected_word:
-            print("❌ Palavra esperada não fornecida")
-            return jsonify({
-                "success": False,
-                "message": "Expected word not provided",
-                "error_code": "NO_EXPECTED_WORD"
-            }), 400
-
-        print(f"📊 Avaliando pronúncia:")
-        print(
-            f"- Arquivo de áudio: {audio_file.filename} ({audio_file.content_type})")
-        print(f"- Palavra esperada: '{expected_word}'")
-        print(f"- ID do usuário: {user_id}")
-        if session_id:
-            print(f"- ID da sessão: {session_id}")
-
-        audio_file.seek(0, os.SEEK_END)
-        file_size = audio_file.tell()
-        audio_file.seek(0)
-
-        print(f"- Tamanho do arquivo: {file_size} bytes")
-        if file_size < 100:
-            print("❌ Arquivo de áudio muito pequeno")
-            return jsonify({
-                "success": False,
-                "message": "Audio file is too small",
-                "error_code": "SMALL_AUDIO"
-            }), 400
-
-        try:
-            evaluation_result = await mcp_coordinator.evaluate_pronunciation(
-                audio_file=audio_file,
-                expected_word=expected_word,
-                user_id=user_id,
-                session_id=session_id
-            )
-
-            if not evaluation_result:
-                print("❌ Resultado da avaliação vazio")
-                return jsonify({
-                    "success": False,
-                    "message": "Empty evaluation result from coordinator",
-                    "error_code": "EMPTY_RESULT"
-                }), 500
-
-            log_result = evaluation_result.copy() if isinstance(
-                evaluation_result, dict) else {"error": "Non-dict result"}
-
-            if "audio_feedback" in log_result and isinstance(log_result["audio_feedback"], str):
-                audio_len = len(log_result["audio_feedback"])
-                log_result["audio_feedback"] = f"<audio_data: {audio_len} chars>"
-
-            print(
-                f"✅ Resultado da avaliação: {json.dumps(log_result, indent=2)}")
-
-            if not evaluation_result.get("audio_feedback") and evaluation_result.get("feedback"):
-                feedback_text = evaluation_result.get("feedback")
-                print(f"🔊 Gerando áudio de feedback para: '{feedback_text}'")
-                try:
-                    from gtts import gTTS
-                    import io
-
-                    audio_io = io.BytesIO()
-                    tts = gTTS(text=feedback_text, lang='pt', slow=False)
-                    tts.write_to_fp(audio_io)
-                    audio_io.seek(0)
-
-                    audio_bytes = audio_io.read()
-                    evaluation_result["audio_feedback"] = base64.b64encode(
-                        audio_bytes).decode('utf-8')
-                    print(
-                        f"✅ Áudio de feedback gerado: {len(evaluation_result['audio_feedback'])} caracteres")
-                except Exception as tts_error:
-                    print(
-                        f"⚠️ Erro ao gerar áudio de feedback: {str(tts_error)}")
-
-            status_code = 200 if evaluation_result.get("success") else 500
-            return jsonify(evaluation_result), status_code
-
-        except Exception as coord_error:
-            print(f"❌ Erro ao chamar o coordenador: {str(coord_error)}")
-            traceback.print_exc()
-            return jsonify({
-                "success": False,
-                "message": f"Coordinator error: {str(coord_error)}",
-                "error_code": "COORDINATOR_ERROR"
-            }), 500
+    if mcp_coordinator is None:
+        return services_unavailable()
 
+    try:
+        body, status, headers = await evaluation_service.evaluate_pronunciation(
+            mcp_coordinator, evaluation_cache, user_id,
+            audio_file=request.files.get('audio'),
+            expected_word=request.form.get('expected_word', ''),
+            session_id=request.form.get('session_id'))
+        return jsonify(body), status, headers
     except Exception as e:
         print(f"❌ Erro geral na avaliação de pronúncia: {str(e)}")
         traceback.print_exc()
@@ -796,123 +718,15 @@ async def evaluate_pronunciation(user_id):
 @token_required
 def gigi_game_post(user_id):
     """Handler para requisições POST no endpoint de geração de jogos Gigi"""
-    try:
-        print(f"✅ Iniciando geração de jogo via Gigi para usuário: {user_id}")
-
-        # Obter parâmetros da requisição
-        data = request.get_json() or {}
-        print(f"📝 Dados da requisição: {data}")
-
-        # Get difficulty - 'auto' means use progression manager
-        # If explicitly specified, use the requested difficulty
-        requested_difficulty = data.get('difficulty', 'auto')
-
-        # Mapear dificuldade se especificada explicitamente
-        difficulty_map = {
-            'advanced': 'avançado',
-            'medium': 'médio',
-            'beginner': 'iniciante',
-            'auto': 'auto'  # Special value to let progression manager decide
-        }
-
-        difficulty = difficulty_map.get(
-            requested_difficulty.lower(), 'auto')  # Default to auto if not recognized
-
-        # Mapear o tipo de jogo
-        game_type = data.get('game_type', "exercícios de pronúncia")
-
-        print(
-            f"🔄 Preparando solicitação de jogo: dificuldade={difficulty} (auto=usar progressão do usuário), tipo={game_type}")
-
-        # Verificar inicialização do MCP
-        global mcp_coordinator
-        if not mcp_coordinator:
-            print("❌ MCP Coordinator não inicializado!")
-            return jsonify({
-                "success": False,
-                "message": "Sistema de geração de jogos não disponível no momento."
-            }), 500
-
-        # Restante do código permanece igual, apenas passamos os parâmetros para o MCP
-        # O MCP agora consultará o ProgressionManagerAgent quando difficulty='auto'
-
-        @async_to_sync
-        async def process_game_request():
-            try:
-                # Set a shorter timeout for OpenAI request to ensure request doesn't hang too long
-                import asyncio
-                print("⏱️ Configurando timeout para criação de jogo: 40 segundos")
-
-                # Process request with timeout
-                try:
-                    # Create a task with timeout
-                    game_task = asyncio.create_task(generate_game_with_mcp())
-                    game_data = await asyncio.wait_for(game_task, timeout=40.0)
-                except asyncio.TimeoutError:
-                    print("⏰ Timeout na geração do jogo após 40 segundos")
-                    return {
-                        "success": False,
-                        "message": "A geração do jogo excedeu o tempo limite. Por favor, tente novamente."
-                    }
-
-                # Verificar se há erros
-                if isinstance(game_data, dict) and "error" in game_data:
-                    raise Exception(f"Erro do MCP: {game_data['error']}")
-
-                # Salvar jogo no banco de dados
-                print(f"💾 Salvando jogo gerado no banco de dados")
-                game_id = db.store_game(user_id, game_data)
-
-                # Retornar dados do jogo
-                return {
-                    "success": True,
-                    "game": {
-                        "game_id": str(game_id),
-                        "title": game_data.get("title", "Novo Jogo"),
-                        "difficulty": game_data.get("difficulty", difficulty),
-                        "game_type": game_data.get("game_type", game_type),
-                        "content": game_data.get("exercises", [])
-                    }
-                }
-            except Exception as inner_error:
-                print(
-                    f"❌ Erro ao processar solicitação de jogo: {str(inner_error)}")
-                traceback.print_exc()
-                return {
-                    "success": False,
-                    "message": f"Falha na geração do jogo: {str(inner_error)}"
-                }
-
-        async def generate_game_with_mcp():
-            # Preparar contexto e mensagem para o agente de design de jogos
-            context = ModelContext()
-            context.set("user_id", user_id)
-
-            # Criar mensagem para o MCP
-            game_message = Message(
-                from_agent="api",
-                to_agent="game_designer",
-                tool="create_game",
-                params={
-                    "user_id": user_id,
-                    "difficulty": difficulty,  # Now can be 'auto'
-                    "game_type": game_type
-                }
-            )
-
-            # Enviar solicitação para o MCP e aguardar resposta
-            print(f"🔄 Processando mensagem: {game_message.tool}")
-            return await mcp_coordinator.server.process_message(game_message, context)
-
-        # Executar a função aninhada
-        result = process_game_request()
-
-        # Verificar sucesso da operação
-        if result.get("success"):
-            return jsonify(result), 200
-        else:
-            return jsonify(result), 500
+    print(f"✅ Iniciando geração de jogo via Gigi para usuário: {user_id}")
+    if mcp_coordinator is None:
+        print("❌ MCP Coordinator não inicializado!")
+        return services_unavailable()
 
+    try:
+        body, status = async_to_sync(game_service.generate_game)(
+            mcp_coordinator, db, user_id, request.get_json(silent=True) or {})
+        return jsonify(body), status
     except Exception as e:
         print(f"❌ Erro global na rota /api/gigi/generate-game: {str(e)}")
         traceback.print_exc()
@@ -922,6 +736,56 @@ def gigi_game_post(user_id):
         }), 500
 
 
+@app.route('/api/gigi/generate-game/stream', methods=['POST'])
+@token_required
+def gigi_game_stream(user_id):
+    """
+    Geração de jogo em streaming (Server-Sent Events)
+
+    Cada exercício é enviado (evento 'exercise') assim que o modelo o termina;
+    no fim o jogo é guardado e o evento 'game' traz o game_id, no mesmo
+    formato da resposta de /api/gigi/generate-game.
+    """
+    if mcp_coordinator is None:
+        return services_unavailable()
+    data = request.get_json(silent=True) or {}
+
+    def generate():
+        events = game_service.stream_game_events(mcp_coordinator, db, user_id, data)
+        for event, payload in iterate_async(events):
+            yield sse_event(event, payload)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/gigi/game-pool', methods=['GET'])
+@token_required
+def game_pool_metrics(user_id):
+    """Métricas do pool de jogos pré-gerados (profundidade por dificuldade e tipo)"""
+    if not mcp_coordinator or mcp_coordinator.game_pool is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **mcp_coordinator.game_pool.metrics()}), 200
+
+
+@app.route('/api/gigi/llm-governor', methods=['GET'])
+@token_required
+def llm_governor_metrics(user_id):
+    """Métricas do limitador de pedidos ao modelo (baldes RPM/TPM, filas e esperas)"""
+    if not RATE_GOVERNOR_ENABLED:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **get_rate_governor().metrics()}), 200
+
+
+@app.route('/api/gigi/llm-tokens', methods=['GET'])
+@token_required
+def llm_token_metrics(user_id):
+    """Tokens e latência dos pedidos ao modelo, por agente e método, e últimos pedidos"""
+    if not TOKEN_ACCOUNTING_ENABLED:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **get_token_ledger().metrics()}), 200
+
+
 @app.route('/api/games/<game_id>', methods=['GET', 'OPTIONS'])
 def get_game_endpoint(game_id):
     """Endpoint para obter os detalhes de um jogo específico"""
@@ -1245,6 +1109,7 @@ if __name__ == "__main__":
         DEBUG = False
 
     port = int(os.environ.get('PORT', 5001))
+    init_services()
     print(f"Starting server with Uvicorn (via app.py) on port {port}...")
 
     asgi_app = WsgiToAsgi(app)
@@ -0,0 +1,164 @@
+"""
+Servidor ASGI do backend
+
+Cada worker corre um único event loop de longa duração: o sistema MCP, os
+agentes, os clientes OpenAI e o pool de jogos são criados uma vez no arranque
+(lifespan) e as rotas mais usadas (geração de jogos, avaliação de pronúncia,
+início de jogo) correm diretamente nesse loop, sem async_to_sync. As chamadas
+ao modelo e ao TTS, que passam a maior parte do tempo à espera de I/O,
+sobrepõem-se entre pedidos em vez de ocuparem um worker cada.
+
+As restantes rotas continuam na aplicação Flask, montada por baixo via
+WsgiToAsgi, e partilham as mesmas instâncias. A lógica das rotas duplicadas
+está em services/; aqui fica só o transporte e a autenticação.
+
+Se o aquecimento falhar no lifespan, o worker não arranca e o gunicorn
+substitui-o.
+
+Arranque:
+    gunicorn -c gunicorn.conf.py asgi:app
+    python asgi.py    (desenvolvimento)
+"""
+import os
+import json
+from contextlib import asynccontextmanager
+
+from asgiref.wsgi import WsgiToAsgi
+from fastapi import FastAPI, File, Form, Header, Request, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+
+import app as flask_backend
+from ai.server.mcp_coordinator import MCPSystem
+from ai.agents.game_designer_agent import GameDesignerAgent as GameGenerator
+from auth.auth_middleware import AuthError, authenticate_header
+from config import OPENAI_API_KEY
+from services import evaluation as evaluation_service, games as game_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Cria os serviços uma vez por worker, no loop que os vai usar"""
+    mcp_coordinator = MCPSystem(api_key=OPENAI_API_KEY, db_connector=flask_backend.db)
+    # O servidor só aceita pedidos quando o lifespan termina: o primeiro
+    # utilizador de cada worker não paga o arranque a frio
+    await mcp_coordinator.warm_up()
+    await run_in_threadpool(flask_backend.warm_up_feedback_audio)
+
+    # As rotas Flask montadas usam as mesmas instâncias
+    flask_backend.mcp_coordinator = mcp_coordinator
+    flask_backend.game_generator = GameGenerator(client=mcp_coordinator.client)
+    app.state.mcp = mcp_coordinator
+    print(f"✅ Serviços ASGI inicializados (pid {os.getpid()}, "
+          f"aquecimento {mcp_coordinator.warmup_seconds:.2f}s)")
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+# O frontend chama a API de outra origem: as mesmas regras CORS da aplicação
+# Flask (app.py), também para as rotas nativas. Os cabeçalhos definidos aqui
+# substituem os que a aplicação Flask montada já envia, sem os duplicar
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+)
+
+
+def json_response(content, status_code=200, headers=None):
+    """Resposta JSON (ObjectId e datas serializados como texto)"""
+    return Response(json.dumps(content, ensure_ascii=False, default=str),
+                    status_code=status_code, headers=headers,
+                    media_type="application/json")
+
+
+async def authenticated_user(authorization):
+    """user_id do token, ou a resposta de erro a devolver"""
+    try:
+        # A verificação consulta a base de dados (síncrona)
+        return await run_in_threadpool(authenticate_header, authorization), None
+    except AuthError as e:
+        return None, json_response({"message": e.message}, e.status_code)
+
+
+async def request_json(request):
+    """Corpo JSON do pedido ({} se vazio ou inválido)"""
+    try:
+        return await request.json() or {}
+    except ValueError:
+        return {}
+
+
+@app.post("/api/gigi/generate-game")
+async def gigi_game_post(request: Request, authorization: str = Header(None)):
+    """Geração de jogos Gigi (mesmo contrato da rota Flask)"""
+    user_id, error = await authenticated_user(authorization)
+    if error:
+        return error
+
+    body, status = await game_service.generate_game(
+        app.state.mcp, flask_backend.db, user_id, await request_json(request))
+    return json_response(body, status)
+
+
+@app.post("/api/gigi/generate-game/stream")
+async def gigi_game_stream(request: Request, authorization: str = Header(None)):
+    """Geração de jogo em streaming (Server-Sent Events), como na rota Flask"""
+    user_id, error = await authenticated_user(authorization)
+    if error:
+        return error
+
+    events = game_service.stream_game_events(
+        app.state.mcp, flask_backend.db, user_id, await request_json(request))
+
+    async def generate():
+        async for event, payload in events:
+            yield flask_backend.sse_event(event, payload)
+
+    return StreamingResponse(generate(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/api/evaluate-pronunciation")
+async def evaluate_pronunciation(authorization: str = Header(None),
+                                 audio: UploadFile = File(None),
+                                 expected_word: str = Form(""),
+                                 session_id: str = Form(None)):
+    """Avaliação da pronúncia (mesmo contrato da rota Flask)"""
+    user_id, error = await authenticated_user(authorization)
+    if error:
+        return error
+
+    body, status, headers = await evaluation_service.evaluate_pronunciation(
+        app.state.mcp, flask_backend.evaluation_cache, user_id,
+        audio_file=audio.file if audio is not None else None,
+        expected_word=expected_word, session_id=session_id)
+    return json_response(body, status, headers)
+
+
+@app.post("/api/start_game")
+async def start_game(request: Request, authorization: str = Header(None)):
+    """Inicia a sessão de um jogo existente (mesmo contrato da rota Flask)"""
+    user_id, error = await authenticated_user(authorization)
+    if error:
+        return error
+
+    body, status = await game_service.start_game_session(
+        app.state.mcp, user_id, await request_json(request))
+    return json_response(body, status)
+
+
+# Todas as outras rotas: aplicação Flask
+app.mount("/", WsgiToAsgi(flask_backend.app))
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 5001))
+    print(f"Starting ASGI server on port {port}...")
+    uvicorn.run("asgi:app", host="0.0.0.0", port=port, log_level="info")
@@ -8,47 +8,69 @@ from database.db_connector import DatabaseConnector
 db = DatabaseConnector()
 
 
+class AuthError(Exception):
+    """Raised when a request cannot be authenticated"""
+
+    def __init__(self, message, status_code=401):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def authenticate_header(auth_header):
+    """
+    Valida o cabeçalho Authorization ('Bearer <token>') e devolve o user_id
+
+    Raises:
+        AuthError: Token em falta, malformado ou inválido (401), ou
+            utilizador inexistente (404)
+    """
+    token = None
+    if auth_header:
+        try:
+            token = auth_header.split(" ")[1]
+        except IndexError:
+            raise AuthError("Bearer token malformed")
+
+    if not token:
+        raise AuthError("Token is missing")
+
+    try:
+        print(f"Token recebido: {token[:15]}...")
+        print(f"Decodificando token com chave: {JWT_SECRET_KEY[:10]}...")
+
+        # Decodificar o token
+        data = jwt.decode(token, JWT_SECRET_KEY, algorithms=["HS256"])
+        user_id = data['user_id']
+        print(f"Token decodificado: {data}")
+        print(f"User ID extraído do token: {user_id}")
+
+        # Verificar se o usuário existe no banco de dados
+        user = db.get_user_by_id(user_id)
+    except Exception as e:
+        print(f"Erro ao decodificar token: {str(e)}")
+        raise AuthError(f"Token inválido: {str(e)}")
+
+    if not user:
+        print(
+            f"Autenticação falhou: Usuário com ID {user_id} não encontrado no banco de dados")
+        raise AuthError("Usuário não encontrado", 404)
+    return user_id
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        auth_header = request.headers.get('Authorization')
-
-        if auth_header:
-            try:
-                token = auth_header.split(" ")[1]
-            except IndexError:
-                return jsonify({"message": "Bearer token malformed"}), 401
+        try:
+            user_id = authenticate_header(request.headers.get('Authorization'))
+        except AuthError as e:
+            return jsonify({"message": e.message}), e.status_code
 
-        if not token:
-            return jsonify({"message": "Token is missing"}), 401
+        # Armazenar o ID do usuário em g para uso em outras partes da aplicação
+        g.user_id = user_id
 
-        try:
-            print(f"Token recebido: {token[:15]}...")
-            print(f"Decodificando token com chave: {JWT_SECRET_KEY[:10]}...")
-
-            # Decodificar o token
-            data = jwt.decode(token, JWT_SECRET_KEY, algorithms=["HS256"])
-            user_id = data['user_id']
-            print(f"Token decodificado: {data}")
-            print(f"User ID extraído do token: {user_id}")
-
-            # Verificar se o usuário existe no banco de dados
-            user = db.get_user_by_id(user_id)
-            if not user:
-                print(
-                    f"Autenticação falhou: Usuário com ID {user_id} não encontrado no banco de dados")
-                return jsonify({"message": "Usuário não encontrado"}), 404
-
-            # Armazenar o ID do usuário em g para uso em outras partes da aplicação
-            g.user_id = user_id
-
-            # Passar o user_id para a função decorada
-            kwargs['user_id'] = user_id
-            return f(*args, **kwargs)
-
-        except Exception as e:
-            print(f"Erro ao decodificar token: {str(e)}")
-            return jsonify({"message": f"Token inválido: {str(e)}"}), 401
+        # Passar o user_id para a função decorada
+        kwargs['user_id'] = user_id
+        return f(*args, **kwargs)
 
     return decorated
@@ -4,9 +4,10 @@ from pymongo import MongoClient
 import logging
 import uuid
 from typing import Dict, List, Any, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from config import MONGODB_URI
 from bson.objectid import ObjectId
+from utils.evaluation_plan import compile_game_plan
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +33,26 @@ class DatabaseConnector:
             print("Using in-memory database instead")
             self.connected = False
 
+        if self.connected:
+            self._ensure_indexes()
+
+    def _ensure_indexes(self):
+        """Create the indexes idempotency relies on; a failure only logs"""
+        try:
+            # Expire idempotency entries automatically
+            self.db.idempotency_cache.create_index(
+                "expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Could not create the idempotency cache TTL index: {str(e)}")
+
+        try:
+            # Two concurrent retries of one request cannot both insert an evaluation
+            self.db.pronunciation_evaluations.create_index(
+                "idempotency_key", unique=True,
+                partialFilterExpression={"idempotency_key": {"$type": "string"}})
+        except Exception as e:
+            logger.warning(f"Could not create the evaluation idempotency index: {str(e)}")
+
     def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user by ID"""
         if self.connected:
@@ -350,6 +371,13 @@ class DatabaseConnector:
                 "completed": False
             }
 
+            # Compilar o plano de avaliação de cada exercício (formas normalizadas,
+            # limiares, fonemas) para não o recalcular a cada tentativa
+            try:
+                game["evaluation_plan"] = compile_game_plan(game_data)
+            except Exception as e:
+                logger.warning(f"Não foi possível compilar o plano de avaliação: {str(e)}")
+
             # Inserir jogo no banco
             result = self.db.games.insert_one(game)
 
@@ -573,7 +601,8 @@ class DatabaseConnector:
             traceback.print_exc()
             return []
 
-    def save_pronunciation_evaluation(self, session_id, expected_word, recognized_text, is_correct, score, timestamp=None):
+    def save_pronunciation_evaluation(self, session_id, expected_word, recognized_text, is_correct, score, timestamp=None,
+                                      idempotency_key=None):
         """
         Salva o resultado de uma avaliação de pronúncia.
 
@@ -584,6 +613,8 @@ class DatabaseConnector:
             is_correct: Se a pronúncia foi considerada correta
             score: Pontuação da pronúncia (0-10)
             timestamp: Data/hora da avaliação (opcional)
+            idempotency_key: Chave do pedido; um reenvio com a mesma chave
+                não cria uma segunda avaliação (opcional)
         """
         if not timestamp:
             timestamp = datetime.now().isoformat()
@@ -598,9 +629,28 @@ class DatabaseConnector:
         }
 
         try:
-            # Salvar no banco de dados
-            evaluation_id = self.db.pronunciation_evaluations.insert_one(
-                evaluation_data).inserted_id
+            if idempotency_key:
+                # Upsert so a retried request never inserts twice
+                evaluation_data["idempotency_key"] = idempotency_key
+                try:
+                    update = self.db.pronunciation_evaluations.update_one(
+                        {"idempotency_key": idempotency_key},
+                        {"$setOnInsert": evaluation_data},
+                        upsert=True
+                    )
+                    upserted_id = update.upserted_id
+                except pymongo.errors.DuplicateKeyError:
+                    # A concurrent retry inserted it first (unique index)
+                    upserted_id = None
+                if upserted_id is None:
+                    existing = self.db.pronunciation_evaluations.find_one(
+                        {"idempotency_key": idempotency_key}, {"_id": 1})
+                    return str(existing["_id"]) if existing else None
+                evaluation_id = upserted_id
+            else:
+                # Salvar no banco de dados
+                evaluation_id = self.db.pronunciation_evaluations.insert_one(
+                    evaluation_data).inserted_id
 
             # Atualizar a sessão com esta avaliação
             self.db.sessions.update_one(
@@ -613,6 +663,127 @@ class DatabaseConnector:
             print(f"Erro ao salvar avaliação de pronúncia: {e}")
             return None
 
+    def get_idempotent_result(self, key):
+        """
+        Obtém o resultado guardado para um pedido repetido.
+
+        Args:
+            key: Chave de idempotência do pedido
+
+        Returns:
+            O resultado guardado ou None se não existir ou tiver expirado
+        """
+        if not self.connected:
+            return None
+        try:
+            entry = self.db.idempotency_cache.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+            # Um pedido ainda em processamento não tem resultado
+            return entry.get("result") if entry else None
+        except Exception as e:
+            print(f"Erro ao ler cache de idempotência: {e}")
+            return None
+
+    def save_idempotent_result(self, key, result, ttl_seconds):
+        """
+        Guarda o resultado de um pedido para reenvios durante ttl_seconds.
+        """
+        if not self.connected:
+            return False
+        try:
+            self.db.idempotency_cache.replace_one(
+                {"_id": key},
+                {"_id": key, "status": "done", "result": result,
+                 "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            print(f"Erro ao guardar cache de idempotência: {e}")
+            return False
+
+    def get_seen_games(self, user_id):
+        """
+        Impressões digitais dos jogos pré-gerados já entregues ao utilizador,
+        por qualquer worker.
+
+        Returns:
+            Lista de impressões digitais (vazia sem MongoDB ou em caso de erro)
+        """
+        if not self.connected:
+            return []
+        try:
+            entry = self.db.game_pool_seen.find_one({"_id": str(user_id)}, {"fingerprints": 1})
+            return entry.get("fingerprints", []) if entry else []
+        except Exception as e:
+            print(f"Erro ao ler jogos já vistos: {e}")
+            return []
+
+    def add_seen_game(self, user_id, fingerprint, limit):
+        """
+        Regista um jogo entregue ao utilizador, guardando só os últimos limit.
+        """
+        if not self.connected:
+            return False
+        try:
+            self.db.game_pool_seen.update_one(
+                {"_id": str(user_id)},
+                {"$push": {"fingerprints": {"$each": [fingerprint], "$slice": -limit}}},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            print(f"Erro ao registar jogo visto: {e}")
+            return False
+
+    def claim_idempotent_request(self, key, lease_seconds):
+        """
+        Marca um pedido como em processamento, se nenhum worker o tiver.
+
+        O _id único garante que só um worker fica com o pedido; uma marca
+        expirada (worker que falhou a meio) pode ser retomada.
+
+        Args:
+            key: Chave de idempotência do pedido
+            lease_seconds: Tempo ao fim do qual a marca pode ser retomada
+
+        Returns:
+            True se este worker deve processar o pedido, False se outro o
+            está a processar ou já guardou o resultado
+        """
+        if not self.connected:
+            return True
+        now = datetime.utcnow()
+        processing = {"status": "processing",
+                      "expires_at": now + timedelta(seconds=lease_seconds)}
+        try:
+            try:
+                self.db.idempotency_cache.insert_one({"_id": key, **processing})
+                return True
+            except pymongo.errors.DuplicateKeyError:
+                # Retoma marcas e resultados expirados que o índice TTL ainda não apagou
+                update = self.db.idempotency_cache.update_one(
+                    {"_id": key, "expires_at": {"$lte": now}},
+                    {"$set": processing, "$unset": {"result": ""}})
+                return update.modified_count == 1
+        except Exception as e:
+            print(f"Erro ao marcar pedido em processamento: {e}")
+            return True
+
+    def release_idempotent_request(self, key):
+        """
+        Retira a marca de processamento de um pedido que falhou, para que
+        um reenvio o possa processar.
+        """
+        if not self.connected:
+            return False
+        try:
+            self.db.idempotency_cache.delete_one({"_id": key, "status": "processing"})
+            return True
+        except Exception as e:
+            print(f"Erro ao libertar pedido em processamento: {e}")
+            return False
+
 
 # Funções para atender às requisições da API
 def get_user_history(user_id):
@@ -0,0 +1,34 @@
+"""
+Configuração do gunicorn
+
+Cada worker aquece os seus serviços (agentes, clientes, léxicos e caches)
+depois do fork e antes de aceitar pedidos; nunca no processo principal, porque
+threads, event loops e ligações não sobrevivem ao fork:
+- workers uvicorn (asgi:app): no lifespan da aplicação ASGI;
+- workers WSGI (app:app): no post_fork abaixo.
+
+/api/ready responde 503 até o aquecimento do worker terminar.
+
+Arranque:
+    gunicorn -c gunicorn.conf.py asgi:app
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Workers (um event loop cada)
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+
+# O aquecimento tem de caber neste prazo: o worker só dá sinal de vida ao árbitro depois dele
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    """Aquecimento dos workers WSGI (os workers ASGI aquecem no lifespan)"""
+    if "uvicorn" in server.cfg.worker_class_str.lower():
+        return
+
+    import app
+    app.init_services()
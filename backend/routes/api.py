@@ -2,7 +2,9 @@ from flask import Blueprint, jsonify, request
 from auth.auth_middleware import token_required
 from database.db_connector import get_user_history, get_user_statistics, get_user_achievements
 # Importando a função de síntese do módulo speech
-from speech.synthesis import synthesize_speech
+from speech.tts_jobs import TTSQueueFullError
+from routes.audio import (audio_json, audio_response, queue_full_response,
+                          synthesize_with_jobs, wants_binary_audio)
 import time
 
 api_bp = Blueprint('api', __name__)
@@ -140,7 +142,8 @@ def user_journey(user_id):
 def synthesize_speech_endpoint():
     """
     Endpoint para sintetizar fala usando AWS Polly.
-    Recebe um texto e retorna o áudio em formato base64.
+    Recebe um texto e retorna o áudio em formato base64, ou em audio/mpeg
+    quando o cliente pede esse formato no cabeçalho Accept.
     """
     try:
         data = request.get_json()
@@ -158,21 +161,16 @@ def synthesize_speech_endpoint():
         print(f"🔊 Configurações de voz: {voice_settings}")
 
         # Usar o serviço de síntese para gerar o áudio
-        audio_data = synthesize_speech(text, voice_settings)
-
-        if not audio_data:
-            return jsonify({
-                'success': False,
-                'message': 'Falha ao sintetizar o texto'
-            }), 500
+        with_visemes = bool(data.get('visemes'))
+        audio_hash = synthesize_with_jobs(text, voice_settings, with_visemes)
 
         print(f"✅ Áudio sintetizado com sucesso.")
-        return jsonify({
-            'success': True,
-            'audio_data': audio_data,
-            'text': text,
-            'timestamp': int(time.time())
-        })
+        if wants_binary_audio():
+            return audio_response(audio_hash, immutable=False)
+        return audio_json(audio_hash, 'audio_data', with_visemes,
+                          text=text, timestamp=int(time.time()))
+    except TTSQueueFullError as e:
+        return queue_full_response(e, 'message')
     except Exception as e:
         return jsonify({
             'success': False,
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import base64
+import threading
+import traceback
+
+from flask import Blueprint, Response, jsonify, request, send_file, stream_with_context
+from speech.audio_store import audio_store
+from speech.lipsync import LipsyncGenerator
+from speech.tts_jobs import TTSQueueFullError, tts_jobs
+
+audio_bp = Blueprint('audio', __name__)
+
+lipsync_generator = LipsyncGenerator()
+
+# Audio is addressed by content hash, so a URL always returns the same bytes
+AUDIO_MAX_AGE = 365 * 24 * 3600
+
+# Voice settings used by the gTTS-only endpoints
+GTTS_VOICE_SETTINGS = {'language_code': 'pt-PT'}
+
+# Longest text GET /api/tts/audio synthesizes (characters): the text is part
+# of the URL, and every distinct text costs a TTS call and a stored clip
+MAX_TTS_AUDIO_TEXT = int(os.environ.get("MAX_TTS_AUDIO_TEXT", "500"))
+
+# Polly settings GET /api/tts/audio accepts; they are part of the cache key,
+# so arbitrary values would each synthesize and store another clip
+TTS_AUDIO_VOICES = {'Ines', 'Cristiano'}
+TTS_AUDIO_ENGINES = {'standard', 'neural'}
+TTS_AUDIO_LANGUAGES = {'pt-PT'}
+TTS_AUDIO_SAMPLE_RATES = {'8000', '16000', '22050', '24000'}
+
+# Upper bounds for long-poll and server-sent events, in seconds. Both hold
+# the worker while waiting, so they are kept short.
+MAX_JOB_WAIT = 25
+MAX_JOB_STREAM = 60
+
+# Long-polls and event streams waiting at the same time in this worker. Each
+# one holds a request thread (also under asgi.py, where these routes run in
+# the mounted Flask app), so past the cap a long-poll answers at once and an
+# event stream is refused with 503: clients fall back to plain polling.
+MAX_JOB_WAITERS = int(os.environ.get("MAX_JOB_WAITERS", "8"))
+_job_waiters = threading.BoundedSemaphore(MAX_JOB_WAITERS)
+
+# Longest wait for a synthesis requested by the synchronous endpoints
+# (/api/synthesize-speech, /api/tts-simple), in seconds
+MAX_INLINE_SYNTHESIS_WAIT = float(os.environ.get("MAX_INLINE_SYNTHESIS_WAIT", "30"))
+
+
+class SynthesisError(Exception):
+    """Raised when a synthesis requested through the job queue fails"""
+
+
+def audio_response(audio_hash, immutable=True):
+    """
+    Serve a stored clip as audio/mpeg.
+
+    Supports ETag revalidation (304) and HTTP Range requests (206).
+    """
+    path = audio_store.path(audio_hash)
+    if not path:
+        return jsonify({'success': False, 'error': 'Audio not found'}), 404
+
+    response = send_file(path, mimetype='audio/mpeg', conditional=True,
+                         etag=audio_hash, max_age=AUDIO_MAX_AGE if immutable else 0)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Location'] = f'/api/audio/{audio_hash}'
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def wants_binary_audio():
+    """Whether the client asked for audio/mpeg instead of JSON"""
+    best = request.accept_mimetypes.best_match(
+        ['application/json', 'audio/mpeg'])
+    return best == 'audio/mpeg' or request.args.get('format') == 'binary'
+
+
+def audio_json(audio_hash, audio_field, with_visemes=False, **extra):
+    """JSON variant kept for older clients: base64 plus the binary URL"""
+    audio_b64 = base64.b64encode(audio_store.get(audio_hash)).decode('utf-8')
+    if with_visemes:
+        extra['lipsync'] = lipsync_for_audio(audio_hash)
+    return jsonify({
+        'success': True,
+        audio_field: audio_b64,
+        'audio_hash': audio_hash,
+        'audio_url': f'/api/audio/{audio_hash}',
+        **extra
+    })
+
+
+def synthesize_with_jobs(text, voice_settings=None, with_visemes=False):
+    """
+    Synthesize through the background job queue and wait for the audio.
+
+    The synchronous endpoints use this instead of synthesizing in the request:
+    the queue bounds how many syntheses run at once, identical concurrent
+    requests share one job, and a full queue is reported instead of piling up.
+
+    Returns:
+        Content hash of the stored audio
+
+    Raises:
+        TTSQueueFullError: If the queue is full
+        SynthesisError: If the job failed or did not finish in time
+    """
+    job = tts_jobs.submit(text, voice_settings, with_visemes)
+    if job['status'] != 'done':
+        job = tts_jobs.wait(job['job_id'], MAX_INLINE_SYNTHESIS_WAIT)
+    if job is None or job['status'] != 'done':
+        error = (job or {}).get('error') or 'synthesis did not finish in time'
+        raise SynthesisError(error)
+    return job['audio_hash']
+
+
+def queue_full_response(error, message_field='error'):
+    """503 with Retry-After for a full TTS job queue"""
+    response = jsonify({'success': False, message_field: str(error)})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
+
+def lipsync_for_audio(audio_hash):
+    """
+    Lipsync cues for a stored clip.
+
+    Uses the TTS speech marks stored with the clip when available, otherwise
+    analyses the audio once and keeps the result next to it.
+    """
+    marks = audio_store.get_metadata(audio_hash, 'visemes')
+    if marks:
+        return lipsync_generator.lipsync_from_speech_marks(marks)
+
+    cues = audio_store.get_metadata(audio_hash, 'lipsync')
+    if cues is None:
+        cues = lipsync_generator.generate_lipsync(audio_store.path(audio_hash))
+        audio_store.put_metadata(audio_hash, 'lipsync', cues)
+    return cues
+
+
+@audio_bp.route('/audio/<audio_hash>', methods=['GET'])
+def get_audio(audio_hash):
+    """
+    Endpoint que serve áudio sintetizado pelo hash do conteúdo.
+    """
+    return audio_response(audio_hash)
+
+
+@audio_bp.route('/tts/audio', methods=['GET'])
+def tts_audio():
+    """
+    Endpoint que sintetiza (ou reutiliza) o áudio de ?text= e o devolve
+    diretamente como audio/mpeg.
+    """
+    text = request.args.get('text', '').strip()
+    if not text:
+        return jsonify({'success': False, 'error': 'Missing text parameter'}), 400
+    if len(text) > MAX_TTS_AUDIO_TEXT:
+        return jsonify({'success': False,
+                        'error': f'Text longer than {MAX_TTS_AUDIO_TEXT} characters'}), 400
+
+    voice_settings = dict(GTTS_VOICE_SETTINGS)
+    if request.args.get('voice_id'):
+        voice_settings = {
+            'voice_id': request.args.get('voice_id'),
+            'engine': request.args.get('engine', 'standard'),
+            'language_code': request.args.get('language_code', 'pt-PT'),
+            'sample_rate': request.args.get('sample_rate', '22050')
+        }
+        allowed = {'voice_id': TTS_AUDIO_VOICES, 'engine': TTS_AUDIO_ENGINES,
+                   'language_code': TTS_AUDIO_LANGUAGES,
+                   'sample_rate': TTS_AUDIO_SAMPLE_RATES}
+        for name, values in allowed.items():
+            if voice_settings[name] not in values:
+                return jsonify({'success': False,
+                                'error': f'Unsupported {name}: {voice_settings[name]}'}), 400
+
+    try:
+        audio_hash = synthesize_with_jobs(text, voice_settings)
+    except TTSQueueFullError as e:
+        return queue_full_response(e)
+    except Exception as e:
+        print(f"❌ Erro na síntese de áudio binário: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': f'Synthesis error: {str(e)}'}), 500
+
+    # The text-to-clip mapping may change (new voices), the clip itself won't
+    return audio_response(audio_hash, immutable=False)
+
+
+@audio_bp.route('/audio/<audio_hash>/lipsync', methods=['GET'])
+def get_audio_lipsync(audio_hash):
+    """
+    Endpoint que devolve os visemas (lipsync) de um áudio sintetizado.
+    """
+    if not audio_store.path(audio_hash):
+        return jsonify({'success': False, 'error': 'Audio not found'}), 404
+
+    response = jsonify({'success': True, 'lipsync': lipsync_for_audio(audio_hash)})
+    response.cache_control.public = True
+    response.cache_control.max_age = AUDIO_MAX_AGE
+    return response
+
+
+def _job_json(job):
+    """Public view of a TTS job"""
+    body = {
+        'success': job['status'] != 'failed',
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'status_url': f"/api/tts/jobs/{job['job_id']}",
+        'events_url': f"/api/tts/jobs/{job['job_id']}/events"
+    }
+    if job.get('audio_hash'):
+        body['audio_hash'] = job['audio_hash']
+        body['audio_url'] = f"/api/audio/{job['audio_hash']}"
+        body['lipsync_url'] = f"/api/audio/{job['audio_hash']}/lipsync"
+    if job.get('error'):
+        body['error'] = job['error']
+    return body
+
+
+@audio_bp.route('/tts/jobs', methods=['POST'])
+def create_tts_job():
+    """
+    Endpoint que agenda uma síntese de fala em segundo plano.
+
+    Devolve logo o URL do áudio se já estiver em cache; caso contrário
+    devolve 202 com o id do trabalho, a consultar por long-poll ou SSE.
+    """
+    data = request.get_json(silent=True) or {}
+    text = (data.get('text') or '').strip()
+    if not text:
+        return jsonify({'success': False, 'error': 'Missing text parameter'}), 400
+
+    voice_settings = data.get('voice_settings') or dict(GTTS_VOICE_SETTINGS)
+    try:
+        job = tts_jobs.submit(text, voice_settings, bool(data.get('visemes')))
+    except TTSQueueFullError as e:
+        return queue_full_response(e)
+
+    return jsonify(_job_json(job)), 200 if job['status'] == 'done' else 202
+
+
+@audio_bp.route('/tts/jobs/<job_id>', methods=['GET'])
+def get_tts_job(job_id):
+    """
+    Endpoint que devolve o estado de um trabalho de síntese.
+
+    Com ?wait=N espera até N segundos pelo fim do trabalho (long-poll);
+    com MAX_JOB_WAITERS pedidos já à espera, responde logo com o estado atual.
+    """
+    wait = min(request.args.get('wait', 0, type=float), MAX_JOB_WAIT)
+    if wait > 0 and _job_waiters.acquire(blocking=False):
+        try:
+            job = tts_jobs.wait(job_id, wait)
+        finally:
+            _job_waiters.release()
+    else:
+        job = tts_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(_job_json(job))
+
+
+@audio_bp.route('/tts/jobs/<job_id>/events', methods=['GET'])
+def tts_job_events(job_id):
+    """
+    Endpoint que envia o estado do trabalho por server-sent events até
+    terminar (ou um evento 'gone' se o trabalho expirar entretanto).
+    """
+    if tts_jobs.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if not _job_waiters.acquire(blocking=False):
+        response = jsonify({'success': False, 'error': 'Too many open event streams, poll instead',
+                            'status_url': f'/api/tts/jobs/{job_id}'})
+        response.headers['Retry-After'] = '2'
+        return response, 503
+
+    def generate():
+        deadline = time.monotonic() + MAX_JOB_STREAM
+        while True:
+            job = tts_jobs.wait(job_id, min(5, max(0, deadline - time.monotonic())))
+            if job is None:
+                # Expirou entretanto (ou o worker que o corria foi reiniciado)
+                yield f"event: gone\ndata: {json.dumps({'job_id': job_id})}\n\n"
+                return
+            yield f"event: status\ndata: {json.dumps(_job_json(job))}\n\n"
+            if job['status'] in ('done', 'failed'):
+                return
+            if time.monotonic() >= deadline:
+                yield "event: timeout\ndata: {}\n\n"
+                return
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Also when the client disconnects before the stream ends
+    response.call_on_close(_job_waiters.release)
+    return response
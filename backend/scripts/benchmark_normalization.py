@@ -0,0 +1,53 @@
+"""
+Micro-benchmark for text normalization.
+
+Compares the previous re.sub chain with utils.normalization (translate
+table, and the memoized path used for expected words).
+
+Usage: python scripts/benchmark_normalization.py [iterations]
+"""
+import re
+import sys
+import os
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.normalization import normalize_expected, normalize_text
+
+SAMPLES = [
+    "Rato",
+    "guarda-chuva",
+    "O rato roeu a roupa do rei de Roma!",
+    "Três pratos de trigo para três tigres tristes.",
+    "  Olá,   como estás?  ",
+]
+
+
+def regex_normalize(text):
+    """The normalization previously duplicated in the agent and utils"""
+    if not text:
+        return ""
+    text = text.lower()
+    text = text.replace('-', ' ')
+    text = re.sub(r'[^\w\s\']', '', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    for sample in SAMPLES:
+        assert regex_normalize(sample) == normalize_text(sample), sample
+
+    for name, function in [("re.sub chain", regex_normalize),
+                           ("translate", normalize_text),
+                           ("memoized", normalize_expected)]:
+        seconds = timeit.timeit(
+            lambda: [function(sample) for sample in SAMPLES], number=iterations)
+        per_call = seconds / (iterations * len(SAMPLES)) * 1e9
+        print(f"{name:<14} {per_call:8.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
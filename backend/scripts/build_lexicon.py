@@ -0,0 +1,25 @@
+"""
+Compile speech/words_pt_ptbr.json into the memory-mapped lexicon.
+
+Workers rebuild the lexicon on their own when it is missing or older than
+the JSON, but building it at deploy time keeps that off the first request.
+
+Usage: python scripts/build_lexicon.py [source.json] [output.lex]
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.lexicon import LEXICON_PATH, LEXICON_SOURCE, build_lexicon
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else LEXICON_SOURCE
+    path = sys.argv[2] if len(sys.argv) > 2 else LEXICON_PATH
+    count = build_lexicon(source, path)
+    print(f"Compiled {count} entries from {source} into {path}")
+
+
+if __name__ == "__main__":
+    main()
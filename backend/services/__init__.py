@@ -0,0 +1 @@
+# Serviços partilhados pelas rotas Flask (app.py) e ASGI (asgi.py)
@@ -0,0 +1,109 @@
+"""
+Avaliação da pronúncia, partilhada pelas rotas Flask e ASGI
+
+evaluate_pronunciation valida o pedido, devolve o resultado já calculado de
+uma gravação reenviada, chama o coordenador e junta o áudio de feedback. As
+rotas só leem o pedido e transformam o resultado em resposta HTTP.
+"""
+import json
+import base64
+import asyncio
+import traceback
+from typing import Any, Dict, Optional, Tuple
+
+from routes.audio import GTTS_VOICE_SETTINGS
+from speech.feedback_audio import compose_feedback_audio
+from utils.idempotency import make_idempotency_key
+
+# Tamanho mínimo (bytes) de uma gravação aceite
+MIN_AUDIO_BYTES = 100
+
+
+def _error(message: str, error_code: str, status: int) -> Tuple[Dict[str, Any], int, Dict[str, str]]:
+    return {"success": False, "message": message, "error_code": error_code}, status, {}
+
+
+def _log_result(evaluation_result: Dict[str, Any]):
+    log_result = dict(evaluation_result)
+    if isinstance(log_result.get("audio_feedback"), str):
+        log_result["audio_feedback"] = f"<audio_data: {len(log_result['audio_feedback'])} chars>"
+    print(f"✅ Resultado da avaliação: {json.dumps(log_result, indent=2, default=str)}")
+
+
+async def evaluate_pronunciation(mcp, evaluation_cache, user_id: str, audio_file,
+                                 expected_word: str,
+                                 session_id: Optional[str] = None
+                                 ) -> Tuple[Dict[str, Any], int, Dict[str, str]]:
+    """
+    Avalia uma gravação (POST /api/evaluate-pronunciation)
+
+    Args:
+        mcp: Sistema MCP do worker
+        evaluation_cache: IdempotencyCache das avaliações
+        audio_file: Ficheiro enviado (objeto de upload do Flask/FastAPI, com
+            read e seek), ou None se faltar
+        expected_word: Palavra que o usuário deveria pronunciar
+
+    Returns:
+        (corpo, código HTTP, cabeçalhos) da resposta
+    """
+    if audio_file is None:
+        print("❌ Nenhum arquivo de áudio na requisição")
+        return _error("No audio file provided", "NO_AUDIO", 400)
+    expected_word = (expected_word or "").strip()
+    if not expected_word:
+        print("❌ Palavra esperada não fornecida")
+        return _error("Expected word not provided", "NO_EXPECTED_WORD", 400)
+
+    # Leitura do upload (pode estar em disco): fora do event loop
+    audio_bytes = await asyncio.to_thread(audio_file.read)
+    print(f"📊 Avaliando pronúncia: '{expected_word}' ({len(audio_bytes)} bytes, "
+          f"usuário {user_id}, sessão {session_id})")
+    if len(audio_bytes) < MIN_AUDIO_BYTES:
+        print("❌ Arquivo de áudio muito pequeno")
+        return _error("Audio file is too small", "SMALL_AUDIO", 400)
+    audio_file.seek(0)
+
+    # A resubmitted recording gets the stored result, without reprocessing;
+    # one still being evaluated (here or in another worker) is waited for
+    idempotency_key = make_idempotency_key(audio_bytes, expected_word, session_id, user_id)
+    cached_result = await asyncio.to_thread(evaluation_cache.claim, idempotency_key)
+    if cached_result is not None:
+        print("♻️ Pedido repetido: devolvendo avaliação já calculada")
+        return cached_result, 200, {"Idempotent-Replayed": "true"}
+
+    stored = False
+    try:
+        evaluation_result = await mcp.evaluate_pronunciation(
+            audio_file=audio_file,
+            expected_word=expected_word,
+            user_id=user_id,
+            session_id=session_id,
+            idempotency_key=idempotency_key
+        )
+        if not evaluation_result:
+            print("❌ Resultado da avaliação vazio")
+            return _error("Empty evaluation result from coordinator", "EMPTY_RESULT", 500)
+        _log_result(evaluation_result)
+
+        if not evaluation_result.get("audio_feedback") and evaluation_result.get("feedback"):
+            try:
+                audio_feedback = await asyncio.to_thread(
+                    compose_feedback_audio, evaluation_result["feedback"], GTTS_VOICE_SETTINGS)
+                evaluation_result["audio_feedback"] = base64.b64encode(
+                    audio_feedback).decode('utf-8')
+            except Exception as tts_error:
+                print(f"⚠️ Erro ao gerar áudio de feedback: {str(tts_error)}")
+
+        if evaluation_result.get("success"):
+            await asyncio.to_thread(evaluation_cache.set, idempotency_key, evaluation_result)
+            stored = True
+        return evaluation_result, 200 if evaluation_result.get("success") else 500, {}
+    except Exception as e:
+        print(f"❌ Erro ao chamar o coordenador: {str(e)}")
+        traceback.print_exc()
+        return _error(f"Coordinator error: {str(e)}", "COORDINATOR_ERROR", 500)
+    finally:
+        # Sem resultado guardado, um reenvio à espera volta a avaliar
+        if not stored:
+            await asyncio.to_thread(evaluation_cache.release, idempotency_key)
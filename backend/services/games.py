@@ -0,0 +1,152 @@
+"""
+Geração de jogos e início de sessões, partilhados pelas rotas Flask e ASGI
+
+As funções recebem o sistema MCP e a base de dados do worker e devolvem o
+corpo e o código HTTP da resposta; as rotas só tratam do transporte e da
+autenticação. As operações síncronas (pymongo) correm fora do event loop.
+"""
+import os
+import time
+import asyncio
+import traceback
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from ai.server.mcp_server import Message, ModelContext
+
+# Tempo máximo de geração de um jogo (segundos)
+GAME_GENERATION_TIMEOUT = float(os.environ.get("GAME_GENERATION_TIMEOUT", "40"))
+
+# Dificuldades aceites pela API; 'auto' deixa o ProgressionManagerAgent decidir
+DIFFICULTY_MAP = {
+    'advanced': 'avançado',
+    'medium': 'médio',
+    'beginner': 'iniciante',
+    'auto': 'auto'
+}
+
+DEFAULT_GAME_TYPE = "exercícios de pronúncia"
+
+
+def game_request(data: Dict[str, Any]) -> Tuple[str, str, Any]:
+    """Dificuldade, tipo de jogo e gerador pedidos ('auto' se a dificuldade for desconhecida)"""
+    data = data or {}
+    difficulty = DIFFICULTY_MAP.get(str(data.get('difficulty', 'auto')).lower(), 'auto')
+    return difficulty, data.get('game_type', DEFAULT_GAME_TYPE), data.get('generator')
+
+
+async def _store_game(db, user_id: str, game_data: Dict[str, Any],
+                      difficulty: str, game_type: str) -> Dict[str, Any]:
+    """Guarda o jogo gerado e devolve-o no formato das respostas da API"""
+    print(f"💾 Salvando jogo gerado no banco de dados")
+    game_id = await asyncio.to_thread(db.store_game, user_id, game_data)
+    return {
+        "success": True,
+        "game": {
+            "game_id": str(game_id),
+            "title": game_data.get("title", "Novo Jogo"),
+            "difficulty": game_data.get("difficulty", difficulty),
+            "game_type": game_data.get("game_type", game_type),
+            "content": game_data.get("exercises", [])
+        }
+    }
+
+
+async def generate_game(mcp, db, user_id: str, data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    Gera e guarda um jogo (POST /api/gigi/generate-game)
+
+    O prazo fica no contexto MCP e segue até aos agentes, que optam por
+    caminhos mais rápidos quando falta tempo.
+    """
+    difficulty, game_type, generator = game_request(data)
+    print(f"🔄 Preparando solicitação de jogo: dificuldade={difficulty} "
+          f"(auto=usar progressão do usuário), tipo={game_type}")
+
+    context = ModelContext(timeout=GAME_GENERATION_TIMEOUT)
+    context.set("user_id", user_id)
+    game_message = Message(
+        from_agent="api",
+        to_agent="game_designer",
+        tool="create_game",
+        params={
+            "user_id": user_id,
+            "difficulty": difficulty,
+            "game_type": game_type,
+            # 'llm', 'template' (sem modelo) ou 'auto'
+            "generator": generator
+        }
+    )
+
+    try:
+        try:
+            game_data = await mcp.server.process_message(game_message, context)
+        except asyncio.TimeoutError:
+            print(f"⏰ Timeout na geração do jogo após {GAME_GENERATION_TIMEOUT:.0f} segundos")
+            return {
+                "success": False,
+                "message": "A geração do jogo excedeu o tempo limite. Por favor, tente novamente."
+            }, 500
+
+        if isinstance(game_data, dict) and "error" in game_data:
+            raise Exception(f"Erro do MCP: {game_data['error']}")
+
+        return await _store_game(db, user_id, game_data, difficulty, game_type), 200
+    except Exception as e:
+        print(f"❌ Erro ao processar solicitação de jogo: {str(e)}")
+        traceback.print_exc()
+        return {
+            "success": False,
+            "message": f"Falha na geração do jogo: {str(e)}"
+        }, 500
+
+
+async def stream_game_events(mcp, db, user_id: str,
+                             data: Dict[str, Any]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Geração de jogo em streaming (POST /api/gigi/generate-game/stream)
+
+    Yields:
+        (evento, dados): 'exercise' para cada exercício assim que o modelo o
+        termina, 'game' com o jogo guardado (formato de generate_game) ou
+        'error'
+    """
+    difficulty, game_type, generator = game_request(data)
+    started = time.time()
+    try:
+        async for event in mcp.stream_game(user_id, difficulty, game_type, generator):
+            if event["event"] == "exercise":
+                if event["index"] == 0:
+                    print(f"⚡ Primeiro exercício em {time.time() - started:.2f}s")
+                yield "exercise", {"index": event["index"], "exercise": event["exercise"]}
+                continue
+
+            yield "game", await _store_game(db, user_id, event["game"], difficulty, game_type)
+            print(f"✅ Jogo completo em {time.time() - started:.2f}s")
+    except Exception as e:
+        print(f"❌ Erro na geração do jogo em streaming: {str(e)}")
+        traceback.print_exc()
+        yield "error", {
+            "success": False,
+            "message": f"Falha na geração do jogo: {str(e)}"
+        }
+
+
+async def start_game_session(mcp, user_id: str, data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Inicia a sessão de um jogo existente (POST /api/start_game)"""
+    try:
+        game_id = (data or {}).get('game_id')
+        if not game_id:
+            return {"success": False, "message": "No game_id provided"}, 400
+
+        print(f"========== INICIANDO SESSÃO DE JOGO (Rota -> Coordenador) ==========")
+        print(f"User ID: {user_id}, game_id={game_id}")
+
+        session_result = await mcp.load_existing_game_session(user_id, game_id)
+        if not session_result.get("success"):
+            raise Exception(session_result.get(
+                "error", "Unknown error loading game session"))
+        return session_result, 200
+    except Exception as e:
+        print(f"❌ Erro na rota /api/start_game: {str(e)}")
+        traceback.print_exc()
+        return {"success": False, "message": f"Failed to start game: {str(e)}"}, 500
@@ -0,0 +1,367 @@
+"""
+Content-addressed store for synthesized audio
+
+Audio is saved once under the sha256 of its bytes, so the same clip can be
+served as a plain binary response with a strong ETag and long-lived cache
+headers. Small JSON metadata such as viseme speech marks can be kept next to
+a clip. A second index maps synthesis requests (text + voice settings) to
+the content hash so repeated requests skip the TTS call entirely, and the
+state of background synthesis jobs is kept alongside so every worker sees
+it.
+
+The clips on disk are kept under a byte budget: when a write takes the
+directory past it, the least recently used clips (by modification time,
+refreshed when a clip is read) are removed with their metadata and index
+entries. Every worker shares the directory, so the total is recounted from
+disk before evicting.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+AUDIO_CACHE_DIR = os.environ.get(
+    "AUDIO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "speech_audio_cache"))
+
+# Number of clips kept in memory on top of the files on disk
+AUDIO_MEMORY_ITEMS = int(os.environ.get("AUDIO_MEMORY_ITEMS", "256"))
+
+# Bytes of clips kept on disk; least recently used clips are removed past it
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Synthesis requests whose clip hash is kept in memory
+AUDIO_INDEX_ITEMS = int(os.environ.get("AUDIO_INDEX_ITEMS", "4096"))
+
+# Eviction goes down to this fraction of the budget, so it runs rarely
+_EVICT_TO = 0.9
+
+# A clip's last use is written at most this often (seconds)
+_TOUCH_INTERVAL = 3600
+
+# Writes between recounts of the directory, which other workers also fill
+_RECOUNT_WRITES = 100
+
+_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class AudioStore:
+    def __init__(self, directory: str = AUDIO_CACHE_DIR,
+                 memory_items: int = AUDIO_MEMORY_ITEMS,
+                 max_bytes: int = AUDIO_CACHE_MAX_BYTES,
+                 index_items: int = AUDIO_INDEX_ITEMS):
+        """
+        Initialize the audio store
+
+        Args:
+            directory: Directory where audio files and the request index live
+            memory_items: Number of recently used clips kept in memory
+            max_bytes: Budget for the clips on disk
+            index_items: Number of synthesis requests remembered in memory
+        """
+        self.directory = directory
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.index_items = index_items
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._index: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        # Bytes on disk as last counted plus this worker's writes since
+        self._disk_bytes: Optional[int] = None
+        self._writes_since_count = 0
+
+        os.makedirs(os.path.join(self.directory, "index"), exist_ok=True)
+        os.makedirs(os.path.join(self.directory, "jobs"), exist_ok=True)
+
+    @staticmethod
+    def content_hash(audio_bytes: bytes) -> str:
+        """Hash that addresses a clip"""
+        return hashlib.sha256(audio_bytes).hexdigest()
+
+    @staticmethod
+    def synthesis_key(text: str, voice_settings: Optional[Dict] = None) -> str:
+        """Key identifying a synthesis request"""
+        payload = json.dumps({"text": text, "voice": voice_settings or {}},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_valid_hash(audio_hash: str) -> bool:
+        """Whether a string looks like a content hash (guards file paths)"""
+        return bool(audio_hash) and bool(_HASH_PATTERN.match(audio_hash))
+
+    def path(self, audio_hash: str) -> Optional[str]:
+        """
+        Path of a stored clip
+
+        Returns:
+            The file path, or None if the hash is invalid or unknown
+        """
+        if not self.is_valid_hash(audio_hash):
+            return None
+        path = os.path.join(self.directory, f"{audio_hash}.mp3")
+        return path if os.path.exists(path) else None
+
+    def put(self, audio_bytes: bytes) -> str:
+        """
+        Store a clip
+
+        Args:
+            audio_bytes: MP3 data
+
+        Returns:
+            Content hash of the clip
+        """
+        audio_hash = self.content_hash(audio_bytes)
+        path = os.path.join(self.directory, f"{audio_hash}.mp3")
+        if os.path.exists(path):
+            self._touch(path)
+        else:
+            self._write_atomic(path, audio_bytes)
+            self._account(len(audio_bytes))
+        self._remember_bytes(audio_hash, audio_bytes)
+        return audio_hash
+
+    def get(self, audio_hash: str) -> Optional[bytes]:
+        """Bytes of a stored clip, or None if unknown"""
+        with self._lock:
+            if audio_hash in self._memory:
+                self._memory.move_to_end(audio_hash)
+                return self._memory[audio_hash]
+
+        path = self.path(audio_hash)
+        if not path:
+            return None
+        try:
+            with open(path, "rb") as f:
+                audio_bytes = f.read()
+        except OSError:
+            # Evicted by another worker in the meantime
+            return None
+        self._touch(path)
+        self._remember_bytes(audio_hash, audio_bytes)
+        return audio_bytes
+
+    def put_metadata(self, audio_hash: str, kind: str, data):
+        """
+        Store JSON data alongside a clip (e.g. kind='visemes')
+
+        Args:
+            audio_hash: Content hash of a stored clip
+            kind: Name of the metadata
+            data: JSON-serializable value
+        """
+        if not self.path(audio_hash):
+            raise KeyError(f"Unknown audio hash: {audio_hash}")
+        path = os.path.join(self.directory, f"{audio_hash}.{kind}.json")
+        self._write_atomic(path, json.dumps(data).encode("utf-8"))
+
+    def get_metadata(self, audio_hash: str, kind: str):
+        """JSON data stored alongside a clip, or None"""
+        if not self.is_valid_hash(audio_hash) or not kind.isalnum():
+            return None
+        path = os.path.join(self.directory, f"{audio_hash}.{kind}.json")
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, text: str, voice_settings: Optional[Dict] = None) -> Optional[str]:
+        """
+        Content hash of a previously synthesized request
+
+        Returns:
+            The hash, or None if the request was never stored
+        """
+        return self.lookup_key(self.synthesis_key(text, voice_settings))
+
+    def lookup_key(self, key: str) -> Optional[str]:
+        """Content hash stored for a synthesis key, or None"""
+        if not self.is_valid_hash(key):
+            return None
+        with self._lock:
+            audio_hash = self._index.get(key)
+        if audio_hash is None:
+            index_path = os.path.join(self.directory, "index", key)
+            try:
+                with open(index_path, "r") as f:
+                    audio_hash = f.read().strip()
+            except OSError:
+                return None
+            self._remember_index(key, audio_hash)
+
+        return audio_hash if self.path(audio_hash) else None
+
+    def remember(self, text: str, voice_settings: Optional[Dict], audio_hash: str):
+        """Record which clip a synthesis request produced"""
+        key = self.synthesis_key(text, voice_settings)
+        self._remember_index(key, audio_hash)
+        self._write_atomic(os.path.join(self.directory, "index", key),
+                           audio_hash.encode("ascii"))
+
+    def put_job_state(self, job_id: str, state: Dict):
+        """Record the state of a background synthesis job (keyed by its synthesis key)"""
+        if not self.is_valid_hash(job_id):
+            raise KeyError(f"Invalid job id: {job_id}")
+        self._write_atomic(os.path.join(self.directory, "jobs", f"{job_id}.json"),
+                           json.dumps(state).encode("utf-8"))
+
+    def get_job_state(self, job_id: str) -> Optional[Dict]:
+        """State of a background synthesis job recorded by any worker, or None"""
+        if not self.is_valid_hash(job_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, "jobs", f"{job_id}.json"), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def forget_job_state(self, job_id: str):
+        """Remove the recorded state of a job"""
+        if not self.is_valid_hash(job_id):
+            return
+        try:
+            os.remove(os.path.join(self.directory, "jobs", f"{job_id}.json"))
+        except OSError:
+            pass
+
+    def _remember_bytes(self, audio_hash: str, audio_bytes: bytes):
+        """Keep a clip in the in-memory LRU"""
+        with self._lock:
+            self._memory[audio_hash] = audio_bytes
+            self._memory.move_to_end(audio_hash)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _remember_index(self, key: str, audio_hash: str):
+        """Keep a synthesis request's clip hash in the in-memory LRU"""
+        with self._lock:
+            self._index[key] = audio_hash
+            self._index.move_to_end(key)
+            while len(self._index) > self.index_items:
+                self._index.popitem(last=False)
+
+    def _touch(self, path: str):
+        """Mark a clip as recently used (at most once per _TOUCH_INTERVAL)"""
+        try:
+            if time.time() - os.path.getmtime(path) > _TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _clips(self, metadata: Optional[Dict[str, list]] = None):
+        """
+        (mtime, size, hash) of every clip on disk
+
+        Args:
+            metadata: If given, filled with the metadata file names of each clip
+        """
+        clips = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                name, extension = os.path.splitext(entry.name)
+                if extension == ".json" and metadata is not None:
+                    metadata.setdefault(name.split(".")[0], []).append(entry.name)
+                if extension != ".mp3" or not self.is_valid_hash(name):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                clips.append((stat.st_mtime, stat.st_size, name))
+        return clips
+
+    def _account(self, size: int):
+        """Count a new clip against the budget and evict past it"""
+        with self._lock:
+            self._writes_since_count += 1
+            recount = (self._disk_bytes is None or
+                       self._writes_since_count >= _RECOUNT_WRITES)
+            if not recount:
+                self._disk_bytes += size
+                over_budget = self._disk_bytes > self.max_bytes
+
+        if recount:
+            disk_bytes = sum(clip[1] for clip in self._clips())
+            with self._lock:
+                self._disk_bytes = disk_bytes
+                self._writes_since_count = 0
+            over_budget = disk_bytes > self.max_bytes
+
+        # One eviction at a time; a write arriving meanwhile does not wait
+        if over_budget and self._evict_lock.acquire(blocking=False):
+            try:
+                self._evict()
+            finally:
+                self._evict_lock.release()
+
+    def _evict(self):
+        """Remove least recently used clips down to _EVICT_TO of the budget"""
+        metadata: Dict[str, list] = {}
+        clips = sorted(self._clips(metadata))
+        total = sum(clip[1] for clip in clips)
+        target = self.max_bytes * _EVICT_TO
+        evicted = set()
+        for _, size, audio_hash in clips:
+            if total <= target:
+                break
+            for name in [f"{audio_hash}.mp3"] + metadata.get(audio_hash, []):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+            evicted.add(audio_hash)
+            total -= size
+
+        with self._lock:
+            for audio_hash in evicted:
+                self._memory.pop(audio_hash, None)
+            for key in [key for key, audio_hash in self._index.items() if audio_hash in evicted]:
+                del self._index[key]
+            self._disk_bytes = total
+            self._writes_since_count = 0
+
+        if evicted:
+            self._drop_index_entries(evicted)
+            logger.info(f"Evicted {len(evicted)} audio clips, {total} bytes left on disk")
+
+    def _drop_index_entries(self, evicted):
+        """Remove the index files of synthesis requests whose clip was evicted"""
+        index_directory = os.path.join(self.directory, "index")
+        with os.scandir(index_directory) as entries:
+            names = [entry.name for entry in entries if self.is_valid_hash(entry.name)]
+        for name in names:
+            path = os.path.join(index_directory, name)
+            try:
+                with open(path, "r") as f:
+                    if f.read().strip() in evicted:
+                        os.remove(path)
+            except OSError:
+                pass
+
+    def _write_atomic(self, path: str, data: bytes):
+        """Write a file so concurrent workers never see partial content"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing audio cache file {path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# Shared store used by the API and the agents
+audio_store = AudioStore()
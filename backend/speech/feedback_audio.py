@@ -0,0 +1,129 @@
+"""
+Feedback audio composed from cached phrase fragments
+
+Feedback messages follow a handful of templates where only the word
+changes ("Boa pronúncia de '{word}'! Continue assim."). Instead of sending
+every message to TTS, the fixed parts are rendered once and spliced
+frame-by-frame with the (also cached) audio of the word. Messages that do
+not match a template, or whose parts cannot be spliced, are synthesized
+in full.
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional
+
+from .audio_store import audio_store
+from .mp3_frames import splice
+from .synthesis import synthesize_speech, synthesize_to_store
+
+logger = logging.getLogger(__name__)
+
+# Feedback templates used by the speech evaluator and the coordinator
+FEEDBACK_TEMPLATES = [
+    "Excelente pronúncia de '{word}'! Perfeito!",
+    "Boa pronúncia de '{word}'! Quase perfeito.",
+    "Boa pronúncia de '{word}'! Continue assim.",
+    "Boa pronúncia de '{word}'! Reconheci corretamente.",
+    "Reconheci '{word}' na sua pronúncia. Continue praticando!",
+    "Tente novamente. Eu ouvi '{heard}' mas esperava '{word}'.",
+    "Não consegui entender. Tente pronunciar '{word}' novamente, de forma clara.",
+    "Tente novamente prestando atenção na pronúncia correta de '{word}'.",
+]
+
+# Slots longer than this are unusual (e.g. a whole misrecognized sentence)
+# and read better when synthesized in one go
+MAX_SLOT_WORDS = 4
+
+# Short pause between fragments, in seconds
+FRAGMENT_GAP_SECONDS = 0.08
+
+_SLOT_PATTERN = re.compile(r"'\{(\w+)\}'")
+
+
+def _compile_template(template: str):
+    """Turn a template into a regex and its list of fixed fragments"""
+    # Punctuation right after a slot would start a fragment with "!" or "."
+    fixed = [part.strip().lstrip("!.,? ") for part in _SLOT_PATTERN.split(template)[0::2]]
+    pattern = "".join(
+        re.escape(part) if index % 2 == 0 else "'(?P<%s>[^']+)'" % part
+        for index, part in enumerate(_SLOT_PATTERN.split(template)))
+    return re.compile(f"^{pattern}$"), fixed
+
+
+_COMPILED_TEMPLATES = [_compile_template(template) for template in FEEDBACK_TEMPLATES]
+
+
+def split_feedback(text: str) -> Optional[List[str]]:
+    """
+    Split a feedback message into the fragments to splice
+
+    Returns:
+        Fragments in reading order (fixed parts and slot values), or None if
+        the message does not match a template or is unusual
+    """
+    for pattern, fixed in _COMPILED_TEMPLATES:
+        match = pattern.match(text.strip())
+        if not match:
+            continue
+
+        slots = list(match.groups())
+        if any(len(slot.split()) > MAX_SLOT_WORDS for slot in slots):
+            return None
+
+        fragments = []
+        for index, part in enumerate(fixed):
+            if part:
+                fragments.append(part)
+            if index < len(slots):
+                fragments.append(slots[index])
+        return fragments
+
+    return None
+
+
+def prerender_fragments(voice_settings: Optional[Dict] = None):
+    """Synthesize the fixed parts of every template into the audio store"""
+    for _, fixed in _COMPILED_TEMPLATES:
+        for part in fixed:
+            if part:
+                try:
+                    synthesize_to_store(part, voice_settings)
+                except Exception as e:
+                    logger.warning(f"Could not prerender '{part}': {str(e)}")
+
+
+def compose_feedback_audio(text: str, voice_settings: Optional[Dict] = None) -> bytes:
+    """
+    Audio for a feedback message
+
+    Args:
+        text: Feedback message
+        voice_settings: Voice settings passed to the synthesis layer
+
+    Returns:
+        MP3 bytes, spliced from cached fragments when possible
+    """
+    audio_hash = audio_store.lookup(text, voice_settings)
+    if audio_hash:
+        return audio_store.get(audio_hash)
+
+    audio_bytes = None
+    fragments = split_feedback(text)
+    if fragments:
+        try:
+            clips = [audio_store.get(synthesize_to_store(fragment, voice_settings))
+                     for fragment in fragments]
+            audio_bytes = splice(clips, FRAGMENT_GAP_SECONDS)
+        except Exception as e:
+            logger.warning(f"Could not splice feedback audio: {str(e)}")
+            audio_bytes = None
+
+        if audio_bytes is None:
+            logger.info("Feedback fragments could not be spliced, synthesizing in full")
+
+    if audio_bytes is None:
+        audio_bytes = synthesize_speech(text, voice_settings)
+
+    audio_store.remember(text, voice_settings, audio_store.put(audio_bytes))
+    return audio_bytes
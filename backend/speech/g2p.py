@@ -0,0 +1,460 @@
+"""
+Rule-based grapheme-to-phoneme conversion for European Portuguese (PT-PT)
+
+Words are converted once and memoized, so lipsync, exercise indexing and
+scoring can share the same phoneme representation instead of re-deriving
+sounds from spelling on every call. Phonemes are IPA strings.
+"""
+import re
+import logging
+import unicodedata
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+VOWELS = set("aeiouáéíóúâêôãõàü")
+FRONT_VOWELS = set("eiéêí")
+STRESS_ACCENTS = set("áéíóúâêô")
+NASAL_ACCENTS = set("ãõ")
+
+# Words ending like this are stressed on the penultimate syllable
+PAROXYTONE_ENDINGS = ("a", "e", "o", "as", "es", "os", "am", "em", "ens")
+
+STRESSED_VOWELS = {
+    "a": "a", "á": "a", "à": "a", "â": "ɐ",
+    "e": "ɛ", "é": "ɛ", "ê": "e",
+    "i": "i", "í": "i",
+    "o": "ɔ", "ó": "ɔ", "ô": "o",
+    "u": "u", "ú": "u", "ü": "u",
+}
+
+UNSTRESSED_VOWELS = {
+    "a": "ɐ", "á": "a", "à": "a", "â": "ɐ",
+    "e": "ɨ", "é": "ɛ", "ê": "e",
+    "i": "i", "í": "i",
+    "o": "u", "ó": "ɔ", "ô": "o",
+    "u": "u", "ú": "u", "ü": "u",
+}
+
+NASAL_VOWELS = {
+    "a": "ɐ̃", "â": "ɐ̃", "ã": "ɐ̃",
+    "e": "ẽ", "ê": "ẽ", "é": "ẽ",
+    "i": "ĩ", "í": "ĩ",
+    "o": "õ", "ô": "õ", "õ": "õ", "ó": "õ",
+    "u": "ũ", "ú": "ũ",
+}
+
+# Nasal diphthongs spelled with a tilde
+NASAL_DIPHTHONGS = {
+    "ão": ("ɐ̃", "w̃"),
+    "ãe": ("ɐ̃", "j̃"),
+    "õe": ("õ", "j̃"),
+}
+
+SIMPLE_CONSONANTS = {
+    "b": "b", "d": "d", "f": "f", "k": "k", "p": "p", "t": "t",
+    "v": "v", "m": "m", "n": "n", "j": "ʒ", "ç": "s", "w": "w",
+}
+
+VOICED_CONSONANTS = set("bdgvzjmnlr")
+
+# Irregular words the rules do not get right
+LEXICON: Dict[str, Tuple[str, ...]] = {
+    "exame": ("i", "z", "ɐ", "m", "ɨ"),
+    "exemplo": ("i", "z", "ẽ", "p", "l", "u"),
+    "táxi": ("t", "a", "k", "s", "i"),
+    "próximo": ("p", "ɾ", "ɔ", "s", "i", "m", "u"),
+    "máximo": ("m", "a", "s", "i", "m", "u"),
+    "auxílio": ("a", "w", "s", "i", "l", "j", "u"),
+    "sexo": ("s", "ɛ", "k", "s", "u"),
+    "fixe": ("f", "i", "ʃ", "ɨ"),
+    "muito": ("m", "ũ", "j̃", "t", "u"),
+    "bem": ("b", "ɐ̃", "j̃"),
+    "também": ("t", "ɐ̃", "b", "ɐ̃", "j̃"),
+    # Unstressed function words
+    "o": ("u",),
+    "os": ("u", "ʃ"),
+    "e": ("i",),
+    "de": ("d", "ɨ"),
+    "do": ("d", "u"),
+    "dos": ("d", "u", "ʃ"),
+    "que": ("k", "ɨ"),
+    "se": ("s", "ɨ"),
+    "me": ("m", "ɨ"),
+    "te": ("t", "ɨ"),
+    "lhe": ("ʎ", "ɨ"),
+}
+
+# Therapy target sounds, as written in exercises, and their phonemes
+TARGET_SOUNDS: Dict[str, FrozenSet[str]] = {
+    "r": frozenset({"ɾ"}),
+    "rr": frozenset({"ʁ"}),
+    "l": frozenset({"l", "ɫ"}),
+    "lh": frozenset({"ʎ"}),
+    "nh": frozenset({"ɲ"}),
+    "s": frozenset({"s"}),
+    "z": frozenset({"z"}),
+    "ch": frozenset({"ʃ"}),
+    "x": frozenset({"ʃ"}),
+    "j": frozenset({"ʒ"}),
+    "g": frozenset({"g"}),
+    "c": frozenset({"k"}),
+    "k": frozenset({"k"}),
+    "q": frozenset({"k"}),
+    "p": frozenset({"p"}),
+    "b": frozenset({"b"}),
+    "t": frozenset({"t"}),
+    "d": frozenset({"d"}),
+    "f": frozenset({"f"}),
+    "v": frozenset({"v"}),
+    "m": frozenset({"m"}),
+    "n": frozenset({"n"}),
+}
+
+PHONEME_TO_VISEME = {
+    "a": "A", "ɐ": "A", "ɐ̃": "A",
+    "e": "E", "ɛ": "E", "ɨ": "E", "ẽ": "E",
+    "i": "I", "ĩ": "I", "j": "I", "j̃": "I",
+    "o": "O", "ɔ": "O", "õ": "O",
+    "u": "U", "ũ": "U", "w": "U", "w̃": "U",
+    "p": "B", "b": "B", "m": "B",
+    "f": "F", "v": "F",
+    "s": "S", "z": "S", "ʃ": "S", "ʒ": "S",
+    "t": "D", "d": "D", "n": "D", "ɲ": "D",
+    "ɾ": "R", "ʁ": "R",
+    "l": "L", "ɫ": "L", "ʎ": "L",
+    "k": "C", "g": "C",
+}
+
+VOWEL_PHONEMES = frozenset({
+    "a", "ɐ", "ɐ̃", "e", "ɛ", "ɨ", "ẽ", "i", "ĩ", "o", "ɔ", "õ", "u", "ũ"})
+
+_WORD_PATTERN = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*")
+
+
+def _is_vowel(word: str, index: int) -> bool:
+    """Whether the letter at index is pronounced as a vowel"""
+    if index < 0 or index >= len(word) or word[index] not in VOWELS:
+        return False
+    # The 'u' in que/qui/gue/gui is silent
+    if word[index] in "uü" and index > 0 and word[index - 1] in "qg" and \
+            index + 1 < len(word) and word[index + 1] in FRONT_VOWELS:
+        return False
+    return True
+
+
+def _nuclei(word: str) -> List[Tuple[int, int]]:
+    """
+    Split the spelling into vowel nuclei
+
+    Returns:
+        List of (start, end) letter spans; falling diphthongs such as
+        'ai', 'ou' or 'ão' count as a single nucleus.
+    """
+    spans = []
+    index = 0
+    while index < len(word):
+        if not _is_vowel(word, index):
+            index += 1
+            continue
+
+        end = index + 1
+        pair = word[index:index + 2]
+        if pair in NASAL_DIPHTHONGS:
+            end = index + 2
+        elif end < len(word) and word[end] in "iu" and word[index] not in "iu":
+            # Falling diphthong, unless the glide is followed by a nasal
+            # consonant ("ainda", "rainha"), which makes a hiatus
+            following = word[end + 1] if end + 1 < len(word) else ""
+            if not following or following not in "mn":
+                end += 1
+        spans.append((index, end))
+        index = end
+
+    return spans
+
+
+def _stressed_nucleus(word: str, nuclei: List[Tuple[int, int]]) -> int:
+    """Index (into nuclei) of the stressed syllable"""
+    if not nuclei:
+        return -1
+
+    for position, (start, end) in enumerate(nuclei):
+        if any(letter in STRESS_ACCENTS for letter in word[start:end]):
+            return position
+    for position, (start, end) in enumerate(nuclei):
+        if any(letter in NASAL_ACCENTS for letter in word[start:end]):
+            return position
+
+    if len(nuclei) > 1 and word.endswith(PAROXYTONE_ENDINGS):
+        return len(nuclei) - 2
+    return len(nuclei) - 1
+
+
+def _convert(word: str) -> Tuple[str, ...]:
+    """Apply the spelling rules to a single lowercase word"""
+    nuclei = _nuclei(word)
+    stressed = _stressed_nucleus(word, nuclei)
+    nucleus_at = {start: (position, end)
+                  for position, (start, end) in enumerate(nuclei)}
+
+    phonemes: List[str] = []
+    index = 0
+    length = len(word)
+
+    def next_letter(offset=1):
+        position = index + offset
+        return word[position] if position < length else ""
+
+    while index < length:
+        letter = word[index]
+
+        if index in nucleus_at:
+            position, end = nucleus_at[index]
+            is_stressed = position == stressed
+            spelling = word[index:end]
+
+            if spelling in NASAL_DIPHTHONGS:
+                phonemes.extend(NASAL_DIPHTHONGS[spelling])
+                index = end
+                continue
+
+            following = word[end] if end < length else ""
+            after_nasal = word[end + 1] if end + 1 < length else ""
+            nasal_coda = following in "mn" and following and \
+                (not after_nasal or (after_nasal not in VOWELS and after_nasal != "h"))
+
+            if nasal_coda:
+                phonemes.append(NASAL_VOWELS.get(spelling[0], spelling[0]))
+                if end + 1 == length:
+                    # Word-final -em/-am are nasal diphthongs
+                    if spelling[0] in "eé":
+                        phonemes[-1] = "ɐ̃"
+                        phonemes.append("j̃")
+                    elif spelling[0] == "a" and not is_stressed:
+                        phonemes.append("w̃")
+                index = end + 1
+                continue
+
+            table = STRESSED_VOWELS if is_stressed else UNSTRESSED_VOWELS
+            vowel = table.get(spelling[0], spelling[0])
+            if is_stressed and spelling[0] == "a" and following in "mn":
+                vowel = "ɐ"
+            if spelling[0] == "e" and not is_stressed and index == 0:
+                vowel = "i"
+            phonemes.append(vowel)
+
+            if len(spelling) == 2:
+                glide = spelling[1]
+                if spelling == "ou":
+                    phonemes[-1] = "o"
+                elif spelling == "ei" and is_stressed:
+                    phonemes[-1] = "ɐ"
+                    phonemes.append("j")
+                else:
+                    phonemes.append("j" if glide == "i" else "w")
+            index = end
+            continue
+
+        if letter in VOWELS:
+            # Silent 'u' of que/qui/gue/gui
+            index += 1
+            continue
+
+        pair = word[index:index + 2]
+        if pair == "lh":
+            phonemes.append("ʎ")
+            index += 2
+        elif pair == "nh":
+            phonemes.append("ɲ")
+            index += 2
+        elif pair == "ch":
+            phonemes.append("ʃ")
+            index += 2
+        elif pair == "rr":
+            phonemes.append("ʁ")
+            index += 2
+        elif pair == "ss":
+            phonemes.append("s")
+            index += 2
+        elif pair == "qu":
+            phonemes.append("k")
+            if next_letter(2) in "ao" and next_letter(2):
+                phonemes.append("w")
+            index += 2
+        elif letter == "c":
+            phonemes.append("s" if next_letter() in FRONT_VOWELS else "k")
+            index += 1
+        elif letter == "g":
+            phonemes.append("ʒ" if next_letter() in FRONT_VOWELS else "g")
+            index += 1
+        elif letter == "h":
+            index += 1
+        elif letter == "r":
+            previous = word[index - 1] if index > 0 else ""
+            phonemes.append("ʁ" if index == 0 or previous in "lns" else "ɾ")
+            index += 1
+        elif letter == "l":
+            nxt = next_letter()
+            phonemes.append("l" if nxt and _is_vowel(word, index + 1) else "ɫ")
+            index += 1
+        elif letter in "sz":
+            phonemes.append(_sibilant(word, index))
+            index += 1
+        elif letter == "x":
+            if index == 0 or next_letter() not in VOWELS:
+                phonemes.append("ʃ")
+            elif index == 1 and word[0] == "e":
+                phonemes.append("z")
+            else:
+                phonemes.append("ʃ")
+            index += 1
+        elif letter == "y":
+            phonemes.append("i")
+            index += 1
+        elif letter in SIMPLE_CONSONANTS:
+            phonemes.append(SIMPLE_CONSONANTS[letter])
+            index += 1
+        else:
+            index += 1
+
+    return tuple(phonemes)
+
+
+def _sibilant(word: str, index: int) -> str:
+    """Pronunciation of 's' or 'z' depending on its neighbours"""
+    letter = word[index]
+    previous = word[index - 1] if index > 0 else ""
+    following = word[index + 1] if index + 1 < len(word) else ""
+
+    if not following:
+        return "ʃ"
+    if following in VOWELS:
+        if letter == "z":
+            return "z"
+        return "z" if previous and previous in VOWELS else "s"
+    if following == "c" and index + 2 < len(word) and word[index + 2] in FRONT_VOWELS:
+        # "descer", "piscina": the cluster is a single /s/
+        return "ʃ"
+    return "ʒ" if following in VOICED_CONSONANTS else "ʃ"
+
+
+def _clean_word(word: str) -> str:
+    """Lowercase a word, keeping only letters"""
+    word = unicodedata.normalize("NFC", word.lower())
+    return "".join(letter for letter in word if letter.isalpha())
+
+
+@lru_cache(maxsize=65536)
+def word_to_phonemes(word: str) -> Tuple[str, ...]:
+    """
+    Convert a single word into its phonemes
+
+    Args:
+        word: Word in Portuguese spelling (case and punctuation are ignored)
+
+    Returns:
+        Tuple of IPA phonemes
+    """
+    if "-" in word:
+        return tuple(phoneme for part in word.split("-")
+                     for phoneme in word_to_phonemes(part))
+
+    cleaned = _clean_word(word)
+    if not cleaned:
+        return ()
+    if cleaned in LEXICON:
+        return LEXICON[cleaned]
+    return _convert(cleaned)
+
+
+def sentence_to_phonemes(text: str) -> List[Tuple[str, Tuple[str, ...]]]:
+    """
+    Convert a sentence into per-word phonemes
+
+    Returns:
+        List of (word, phonemes) tuples in reading order
+    """
+    return [(word, word_to_phonemes(word))
+            for word in _WORD_PATTERN.findall(text or "")]
+
+
+def transcribe(text: str) -> str:
+    """Readable IPA transcription of a word or sentence"""
+    return " ".join("".join(phonemes) for _, phonemes in sentence_to_phonemes(text))
+
+
+def phonemes_to_visemes(phonemes: Tuple[str, ...]) -> List[str]:
+    """Map phonemes to the avatar's mouth shapes"""
+    return [PHONEME_TO_VISEME.get(phoneme, "X") for phoneme in phonemes]
+
+
+@lru_cache(maxsize=65536)
+def target_sounds(word: str) -> FrozenSet[str]:
+    """
+    Therapy target sounds present in a word
+
+    Returns:
+        Set of target sounds as written in exercises (e.g. 'r', 'rr', 'lh')
+    """
+    phonemes = set()
+    for _, word_phonemes in sentence_to_phonemes(word):
+        phonemes.update(word_phonemes)
+    return frozenset(sound for sound, sound_phonemes in TARGET_SOUNDS.items()
+                     if phonemes & sound_phonemes)
+
+
+def has_target_sound(word: str, sound: str) -> bool:
+    """Whether a word contains the given therapy target sound"""
+    return sound.lower() in target_sounds(word)
+
+
+# Consonant pairs that always start a syllable together
+_ONSET_CLUSTERS = ("ch", "lh", "nh", "qu", "gu")
+_LIQUID_ONSET_FIRST = set("bcdfgkptv")
+
+
+def _onset_length(cluster: str) -> int:
+    """How many consonants at the end of a cluster open the next syllable"""
+    if not cluster:
+        return 0
+    tail = cluster[-2:]
+    if len(tail) == 2 and (tail in _ONSET_CLUSTERS or
+                           (tail[0] in _LIQUID_ONSET_FIRST and tail[1] in "lr")):
+        return 2
+    return 1
+
+
+@lru_cache(maxsize=65536)
+def syllables(word: str) -> Tuple[Tuple[str, ...], int]:
+    """
+    Split a word into written syllables
+
+    Returns:
+        (syllables, stressed) where stressed indexes the stressed syllable,
+        or ((), -1) for a word without vowels
+    """
+    if "-" in word:
+        # Compounds keep the stress of their last part
+        parts = [syllables(part) for part in word.split("-") if part]
+        split = tuple(syllable for part, _ in parts for syllable in part)
+        if not parts or parts[-1][1] < 0:
+            return split, -1
+        return split, len(split) - len(parts[-1][0]) + parts[-1][1]
+
+    cleaned = _clean_word(word)
+    # The 'u' of qua/gua glides into the next vowel
+    nuclei = [(start, end) for start, end in _nuclei(cleaned)
+              if not (cleaned[start:end] == "u" and start > 0 and cleaned[start - 1] in "qg"
+                      and end < len(cleaned) and _is_vowel(cleaned, end))]
+    if not nuclei:
+        return (), -1
+
+    boundaries = [0]
+    for (_, previous_end), (start, _) in zip(nuclei, nuclei[1:]):
+        boundaries.append(start - _onset_length(cleaned[previous_end:start]))
+    boundaries.append(len(cleaned))
+
+    split = tuple(cleaned[begin:end] for begin, end in zip(boundaries, boundaries[1:]))
+    return split, _stressed_nucleus(cleaned, nuclei)
@@ -1,10 +1,18 @@
 import os
+import io
+import wave
+import contextlib
 import subprocess
 import json
 import tempfile
 import logging
 from pathlib import Path
 
+import numpy as np
+
+from .g2p import (PHONEME_TO_VISEME, TARGET_SOUNDS, VOWEL_PHONEMES,
+                  phonemes_to_visemes, sentence_to_phonemes, word_to_phonemes)
+
 logger = logging.getLogger(__name__)
 
 class LipsyncGenerator:
@@ -91,88 +99,350 @@ class LipsyncGenerator:
             return self._generate_fallback_lipsync(audio_file, text)
     
     def _generate_fallback_lipsync(self, audio_file, text):
-        """Generate basic lipsync data without Rhubarb"""
+        """
+        Generate lipsync data without Rhubarb
+
+        The audio is decoded once and reduced to an RMS envelope. Visemes
+        derived from the text are then spread over the voiced regions of the
+        envelope in proportion to their expected length, so the mouth only
+        moves while there is actually sound and stops when the audio ends.
+        """
         try:
-            if not text:
-                # Without text, just create a simple animation
-                return [
-                    {'start': 0.0, 'end': 0.5, 'value': 'X'},  # Start with neutral
-                    {'start': 0.5, 'end': 1.0, 'value': 'A'},  # Open mouth
-                    {'start': 1.0, 'end': 1.5, 'value': 'X'}   # Back to neutral
-                ]
-            
-            # With text, create a simple animation based on the text
-            # This is very basic and doesn't account for actual speech timing
-            formatted_data = []
-            avg_phoneme_duration = 0.15  # seconds per phoneme (approximate)
-            current_time = 0.0
-            
-            # Simple mapping from letters to visemes
-            letter_to_viseme = {
-                'a': 'A', 'á': 'A', 'à': 'A', 'ã': 'A', 'â': 'A',
-                'e': 'E', 'é': 'E', 'ê': 'E',
-                'i': 'I', 'í': 'I',
-                'o': 'O', 'ó': 'O', 'ô': 'O', 'õ': 'O',
-                'u': 'U', 'ú': 'U',
-                'b': 'B', 'p': 'B', 'm': 'B',
-                'f': 'F', 'v': 'F',
-                's': 'S', 'z': 'S', 'ç': 'S',
-                't': 'D', 'd': 'D', 'n': 'D',
-                'r': 'R', 'l': 'L',
-                ' ': 'X',  # Space = neutral
-            }
-            
-            # Generate visemes based on text
-            for char in text.lower():
-                viseme = letter_to_viseme.get(char, 'X')
-                
-                # Skip consecutive identical visemes
-                if formatted_data and formatted_data[-1]['value'] == viseme:
-                    formatted_data[-1]['end'] = current_time + avg_phoneme_duration
-                else:
-                    formatted_data.append({
-                        'start': current_time,
-                        'end': current_time + avg_phoneme_duration,
-                        'value': viseme
-                    })
-                
-                current_time += avg_phoneme_duration
-            
-            return formatted_data
-            
+            samples, sample_rate = _decode_audio(audio_file)
+        except Exception as e:
+            logger.warning(
+                f"Could not decode audio for fallback lipsync: {str(e)}")
+            return self._generate_fixed_rate_lipsync(text)
+
+        try:
+            duration = len(samples) / float(sample_rate)
+            if duration <= 0:
+                return self._generate_fixed_rate_lipsync(text)
+
+            envelope = _rms_envelope(samples, sample_rate, FRAME_SECONDS)
+            regions = _voiced_regions(envelope, FRAME_SECONDS)
+
+            if not regions:
+                return [{'start': 0.0, 'end': round(duration, 3), 'value': 'X'}]
+
+            words = _text_to_word_visemes(text) if text else []
+            if words and len(words) == len(regions):
+                # One voiced region per word: keep each word inside its region
+                cues = []
+                for word, region in zip(words, regions):
+                    cues.extend(_fit_visemes_to_regions(word, [region]))
+            elif words:
+                cues = _fit_visemes_to_regions(_join_words(words), regions)
+            else:
+                cues = _envelope_to_visemes(envelope, regions, FRAME_SECONDS)
+
+            return _close_gaps(cues, duration)
+
         except Exception as e:
             logger.error(f"Error generating fallback lipsync: {str(e)}")
             return [{'start': 0.0, 'end': 1.0, 'value': 'A'}]  # Default animation
-    
+
+    def _generate_fixed_rate_lipsync(self, text):
+        """Last-resort lipsync used when the audio cannot be decoded"""
+        if not text:
+            # Without text, just create a simple animation
+            return [
+                {'start': 0.0, 'end': 0.5, 'value': 'X'},  # Start with neutral
+                {'start': 0.5, 'end': 1.0, 'value': 'A'},  # Open mouth
+                {'start': 1.0, 'end': 1.5, 'value': 'X'}   # Back to neutral
+            ]
+
+        formatted_data = []
+        current_time = 0.0
+        for viseme, weight in _text_to_visemes(text):
+            step = AVG_PHONEME_SECONDS * weight
+            formatted_data.append({
+                'start': round(current_time, 3),
+                'end': round(current_time + step, 3),
+                'value': viseme
+            })
+            current_time += step
+
+        return formatted_data
+
+    def lipsync_from_speech_marks(self, marks, duration=None):
+        """
+        Convert TTS viseme speech marks into lipsync data
+
+        Args:
+            marks: Polly-style marks ({'time': ms, 'type': 'viseme', 'value': ...})
+            duration: Optional audio length in seconds, used to end the last cue
+
+        Returns:
+            List of lipsync events with timing and viseme information
+        """
+        marks = [mark for mark in marks if mark.get('type', 'viseme') == 'viseme']
+        if not marks:
+            return []
+
+        cues = []
+        for index, mark in enumerate(marks):
+            start = mark['time'] / 1000.0
+            if index + 1 < len(marks):
+                end = marks[index + 1]['time'] / 1000.0
+            else:
+                end = max(duration or 0.0, start + AVG_PHONEME_SECONDS)
+            if end > start:
+                _append_cue(cues, start, end,
+                            POLLY_VISEME_TO_VISEME.get(mark['value'], 'X'))
+
+        return _close_gaps(cues, duration or cues[-1]['end'])
+
     def generate_lipsync_for_phoneme(self, phoneme):
         """
         Generate static lipsync data for a specific phoneme
         
         Args:
-            phoneme: The phoneme to visualize
+            phoneme: The phoneme to visualize, either a target sound as
+                written in exercises (e.g. 'lh', 'rr') or an IPA phoneme
             
         Returns:
             Viseme code for the phoneme
         """
-        # Phoneme to viseme mapping
-        phoneme_to_viseme = {
-            # Vowels
-            'a': 'A', 'e': 'E', 'i': 'I', 'o': 'O', 'u': 'U',
-            'á': 'A', 'é': 'E', 'í': 'I', 'ó': 'O', 'ú': 'U',
-            'â': 'A', 'ê': 'E', 'î': 'I', 'ô': 'O', 'û': 'U',
-            'ã': 'A', 'õ': 'O',
-            
-            # Consonants
-            'b': 'B', 'p': 'B', 'm': 'B',
-            'f': 'F', 'v': 'F',
-            'd': 'D', 't': 'D', 'n': 'D',
-            's': 'S', 'z': 'S',
-            'l': 'L',
-            'r': 'R',
-            'k': 'C', 'g': 'C',
-            'x': 'X'  # Default/neutral
-        }
-        
-        # Map the first character of the phoneme to a viseme
-        phoneme_char = phoneme[0].lower() if phoneme else 'x'
-        return phoneme_to_viseme.get(phoneme_char, 'X')
\ No newline at end of file
+        if not phoneme:
+            return 'X'
+
+        phoneme = phoneme.lower()
+        if phoneme in PHONEME_TO_VISEME:
+            return PHONEME_TO_VISEME[phoneme]
+        if phoneme in TARGET_SOUNDS:
+            return PHONEME_TO_VISEME.get(min(TARGET_SOUNDS[phoneme]), 'X')
+
+        # Spelled sounds such as 'ç' or 'é' go through the G2P engine
+        visemes = phonemes_to_visemes(word_to_phonemes(phoneme))
+        return visemes[0] if visemes else 'X'
+
+
+# Viseme symbols used by Amazon Polly speech marks
+POLLY_VISEME_TO_VISEME = {
+    'p': 'B', 'f': 'F', 't': 'D', 'T': 'D', 'k': 'C',
+    's': 'S', 'S': 'S', 'r': 'R',
+    'a': 'A', 'e': 'E', 'E': 'E', '@': 'E', 'i': 'I',
+    'o': 'O', 'O': 'O', 'u': 'U',
+    'sil': 'X',
+}
+
+# Length of one analysis frame of the RMS envelope, in seconds
+FRAME_SECONDS = 0.01
+
+# Approximate phoneme length used when no audio timing is available
+AVG_PHONEME_SECONDS = 0.15
+
+# Voiced regions separated by less than this are merged into one
+MIN_GAP_SECONDS = 0.08
+
+# Voiced regions shorter than this are treated as noise
+MIN_REGION_SECONDS = 0.04
+
+def _decode_audio(audio_file):
+    """
+    Decode an audio file into mono float samples
+
+    Args:
+        audio_file: Path to the audio file, or its raw bytes
+
+    Returns:
+        Tuple of (samples as float32 numpy array, sample rate)
+    """
+    source = io.BytesIO(audio_file) if isinstance(
+        audio_file, (bytes, bytearray)) else audio_file
+
+    try:
+        # WAV can be read without spawning ffmpeg
+        with contextlib.closing(wave.open(source, 'rb')) as wav:
+            sample_rate = wav.getframerate()
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            raw = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        from pydub import AudioSegment
+
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        segment = AudioSegment.from_file(source)
+        sample_rate = segment.frame_rate
+        channels = segment.channels
+        width = segment.sample_width
+        raw = segment.raw_data
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(
+            np.float32) - 128.0) / 128.0
+    elif width in (2, 4):
+        dtype = np.int16 if width == 2 else np.int32
+        samples = np.frombuffer(raw, dtype=dtype).astype(
+            np.float32) / float(np.iinfo(dtype).max)
+    else:
+        raise ValueError(f"Unsupported sample width: {width}")
+
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels]
+        samples = samples.reshape(-1, channels).mean(axis=1)
+
+    return samples, sample_rate
+
+
+def _rms_envelope(samples, sample_rate, frame_seconds):
+    """Compute the RMS energy of consecutive, non-overlapping frames"""
+    frame_length = max(1, int(sample_rate * frame_seconds))
+    frame_count = int(np.ceil(len(samples) / frame_length))
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    padded = np.zeros(frame_count * frame_length, dtype=np.float32)
+    padded[:len(samples)] = samples
+    frames = padded.reshape(frame_count, frame_length)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def _voiced_regions(envelope, frame_seconds):
+    """
+    Find the regions of the envelope that contain speech
+
+    Returns:
+        List of (start, end) tuples in seconds
+    """
+    if not len(envelope) or float(envelope.max()) <= 0.0:
+        return []
+
+    # Threshold relative to both the loud parts and the noise floor
+    noise_floor = float(np.percentile(envelope, 10))
+    peak = float(np.percentile(envelope, 95))
+    threshold = max(noise_floor * 2.0, peak * 0.1, 1e-4)
+
+    voiced = np.concatenate(([False], envelope > threshold, [False]))
+    edges = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+
+    regions = []
+    min_gap = int(round(MIN_GAP_SECONDS / frame_seconds))
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_gap:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    min_length = int(round(MIN_REGION_SECONDS / frame_seconds))
+    return [(start * frame_seconds, end * frame_seconds)
+            for start, end in regions if end - start >= min_length]
+
+
+def _text_to_word_visemes(text):
+    """
+    Convert text into one sequence of (viseme, relative weight) per word
+
+    Vowels hold the mouth shape longer than consonants. Consecutive
+    identical visemes within a word are merged.
+    """
+    words = []
+    for _, phonemes in sentence_to_phonemes(text):
+        visemes = []
+        for phoneme, viseme in zip(phonemes, phonemes_to_visemes(phonemes)):
+            weight = 1.0 if phoneme in VOWEL_PHONEMES else 0.6
+            if visemes and visemes[-1][0] == viseme:
+                visemes[-1][1] += weight
+            else:
+                visemes.append([viseme, weight])
+        if visemes:
+            words.append([tuple(item) for item in visemes])
+
+    return words
+
+
+def _join_words(words):
+    """Join per-word visemes with a short neutral viseme between words"""
+    visemes = []
+    for word in words:
+        if visemes:
+            visemes.append(('X', 0.3))
+        visemes.extend(word)
+    return visemes
+
+
+def _text_to_visemes(text):
+    """Convert text into a flat sequence of (viseme, relative weight) tuples"""
+    return _join_words(_text_to_word_visemes(text))
+
+
+def _fit_visemes_to_regions(visemes, regions):
+    """
+    Spread visemes over the voiced regions in proportion to their weights
+
+    The voiced regions are treated as one continuous timeline; a viseme that
+    straddles a pause is split so the mouth closes during the pause.
+    """
+    if not visemes:
+        visemes = [('A', 1.0)]
+
+    region_starts = np.array([start for start, _ in regions])
+    region_lengths = np.array([end - start for start, end in regions])
+    voiced_offsets = np.concatenate(([0.0], np.cumsum(region_lengths)))
+    total_voiced = voiced_offsets[-1]
+
+    weights = np.array([weight for _, weight in visemes], dtype=np.float64)
+    boundaries = np.concatenate(([0.0], np.cumsum(weights)))
+    boundaries *= total_voiced / boundaries[-1]
+
+    cues = []
+    for index, (viseme, _) in enumerate(visemes):
+        position, stop = boundaries[index], boundaries[index + 1]
+        while stop - position > 1e-9:
+            region = min(int(np.searchsorted(
+                voiced_offsets, position, side='right')) - 1, len(regions) - 1)
+            region_end = voiced_offsets[region + 1]
+            span_end = min(stop, region_end)
+            start = region_starts[region] + (position - voiced_offsets[region])
+            end = region_starts[region] + (span_end - voiced_offsets[region])
+            _append_cue(cues, float(start), float(end), viseme)
+            position = span_end
+
+    return cues
+
+
+def _envelope_to_visemes(envelope, regions, frame_seconds):
+    """Derive mouth openness from loudness alone when no text is known"""
+    peak = float(envelope.max())
+    cues = []
+    for start, end in regions:
+        first = int(round(start / frame_seconds))
+        last = int(round(end / frame_seconds))
+        levels = envelope[first:last] / peak
+        shapes = np.where(levels > 0.5, 'A', np.where(levels > 0.2, 'D', 'B'))
+        for offset, shape in enumerate(shapes):
+            frame_start = start + offset * frame_seconds
+            _append_cue(cues, frame_start, frame_start + frame_seconds, str(shape))
+
+    return cues
+
+
+def _append_cue(cues, start, end, value):
+    """Append a cue, extending the previous one when the viseme repeats"""
+    if cues and cues[-1]['value'] == value and start - cues[-1]['end'] < 1e-6:
+        cues[-1]['end'] = end
+    else:
+        cues.append({'start': start, 'end': end, 'value': value})
+
+
+def _close_gaps(cues, duration):
+    """Fill silences with the neutral viseme and round the timings"""
+    formatted_data = []
+    current_time = 0.0
+    for cue in cues:
+        if cue['start'] - current_time > 1e-6:
+            _append_cue(formatted_data, current_time, cue['start'], 'X')
+        _append_cue(formatted_data, cue['start'], cue['end'], cue['value'])
+        current_time = cue['end']
+
+    if duration - current_time > 1e-6:
+        _append_cue(formatted_data, current_time, duration, 'X')
+
+    return [{
+        'start': round(float(cue['start']), 3),
+        'end': round(float(cue['end']), 3),
+        'value': cue['value']
+    } for cue in formatted_data]
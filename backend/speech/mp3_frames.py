@@ -0,0 +1,153 @@
+"""
+Minimal MPEG audio (Layer III) frame parsing for lossless MP3 splicing
+
+MP3 clips can be joined without decoding by concatenating whole frames,
+as long as every clip uses the same MPEG version, sample rate and channel
+mode. Metadata (ID3 tags, Xing/Info headers) is dropped since it would
+describe only one of the clips.
+"""
+
+from typing import List, NamedTuple, Optional
+
+# Layer III bitrates in kbps, indexed by the header's bitrate field
+_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Sample rates indexed by the header's version and sample rate fields
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),   # MPEG 1
+    2: (22050, 24000, 16000),   # MPEG 2
+    0: (11025, 12000, 8000),    # MPEG 2.5
+}
+
+
+class FrameFormat(NamedTuple):
+    version: int
+    sample_rate: int
+    channel_mode: int
+
+
+class Frame(NamedTuple):
+    format: FrameFormat
+    bitrate: int
+    data: bytes
+
+    @property
+    def seconds(self) -> float:
+        samples = 1152 if self.format.version == 3 else 576
+        return samples / self.format.sample_rate
+
+
+def _parse_header(header: bytes) -> Optional[tuple]:
+    """
+    Parse a 4-byte Layer III frame header
+
+    Returns:
+        Tuple of (FrameFormat, bitrate in kbps, frame length), or None
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    channel_mode = (header[3] >> 6) & 0x03
+
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _BITRATES[1 if version == 3 else 2][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    coefficient = 144 if version == 3 else 72
+    length = coefficient * bitrate * 1000 // sample_rate + padding
+
+    return FrameFormat(version, sample_rate, channel_mode), bitrate, length
+
+
+def _skip_id3v2(data: bytes) -> int:
+    """Offset of the first byte after a leading ID3v2 tag"""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def parse_frames(data: bytes) -> List[Frame]:
+    """
+    Split an MP3 file into its audio frames
+
+    Garbage between frames is skipped; Xing/Info metadata frames are dropped.
+    """
+    frames = []
+    offset = _skip_id3v2(data)
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+
+    while offset + 4 <= end:
+        parsed = _parse_header(data[offset:offset + 4])
+        if not parsed or offset + parsed[2] > end:
+            offset += 1
+            continue
+
+        frame_format, bitrate, length = parsed
+        frame = data[offset:offset + length]
+        if not frames and (b"Xing" in frame[:64] or b"Info" in frame[:64]):
+            offset += length
+            continue
+
+        frames.append(Frame(frame_format, bitrate, frame))
+        offset += length
+
+    return frames
+
+
+def silent_frame(template: Frame) -> bytes:
+    """
+    A silent frame with the same format as ``template``
+
+    All side information is zero, so the frame also resets the bit
+    reservoir: the next clip starts cleanly.
+    """
+    header = bytearray(template.data[:4])
+    header[1] |= 0x01   # no CRC
+    header[2] &= 0xFD   # no padding
+    _, _, length = _parse_header(bytes(header))
+    return bytes(header) + bytes(length - 4)
+
+
+def splice(clips: List[bytes], gap_seconds: float = 0.0) -> Optional[bytes]:
+    """
+    Join MP3 clips frame by frame
+
+    Args:
+        clips: MP3 files to join in order
+        gap_seconds: Silence inserted between clips
+
+    Returns:
+        The joined MP3, or None if the clips cannot be joined losslessly
+        (no frames, or differing sample rate / channel mode)
+    """
+    parsed = [parse_frames(clip) for clip in clips]
+    if not parsed or any(not frames for frames in parsed):
+        return None
+
+    frame_format = parsed[0][0].format
+    if any(frame.format != frame_format for frames in parsed for frame in frames):
+        return None
+
+    gap = b""
+    if gap_seconds > 0:
+        template = parsed[0][0]
+        gap = silent_frame(template) * max(1, round(gap_seconds / template.seconds))
+
+    output = bytearray()
+    for index, frames in enumerate(parsed):
+        if index:
+            output += gap
+        for frame in frames:
+            output += frame.data
+    return bytes(output)
@@ -1,12 +1,18 @@
 import os
 import base64
+import asyncio
 import tempfile
 import logging
+import threading
 import boto3
 from pathlib import Path
 from dotenv import load_dotenv
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+from .audio_store import audio_store
+from .tts_backends import GTTSBackend, LocalBackend, PollyBackend
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -20,6 +26,17 @@ AWS_ACCESS_KEY = os.environ.get("AWS_ACCESS_KEY")
 AWS_SECRET_KEY = os.environ.get("AWS_SECRET_KEY")
 AWS_REGION = os.environ.get("AWS_REGION", "eu-west-1")
 
+# Per-backend concurrency caps and timeouts (seconds)
+TTS_TIMEOUT = float(os.environ.get("TTS_TIMEOUT", "15"))
+TTS_CONCURRENCY = {
+    "polly": int(os.environ.get("TTS_POLLY_CONCURRENCY", "8")),
+    "gtts": int(os.environ.get("TTS_GTTS_CONCURRENCY", "4")),
+    "local": int(os.environ.get("TTS_LOCAL_CONCURRENCY", "16")),
+}
+
+# Artificial latency of the local stand-in backend, for benchmarks
+LOCAL_TTS_LATENCY = float(os.environ.get("LOCAL_TTS_LATENCY", "0"))
+
 # Voice settings for Portuguese (European)
 DEFAULT_VOICE_SETTINGS = {
     "AMAZON": {
@@ -55,11 +72,17 @@ def get_polly_client():
                 logger.error("AWS credentials not configured")
                 return None
 
+            # Connection pool sized to the Polly concurrency cap
             _polly_client = boto3.Session(
                 aws_access_key_id=AWS_ACCESS_KEY,
                 aws_secret_access_key=AWS_SECRET_KEY,
                 region_name=AWS_REGION
-            ).client('polly')
+            ).client('polly', config=Config(
+                max_pool_connections=TTS_CONCURRENCY["polly"],
+                connect_timeout=5,
+                read_timeout=TTS_TIMEOUT,
+                retries={"max_attempts": 2}
+            ))
             logger.info("Amazon Polly client initialized")
         except Exception as e:
             logger.error(f"Error initializing Amazon Polly client: {str(e)}")
@@ -67,6 +90,43 @@ def get_polly_client():
     return _polly_client
 
 
+# TTS backend singletons, created on first use
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_tts_backend(name):
+    """
+    Get or create a TTS backend singleton
+
+    Args:
+        name (str): 'polly', 'gtts' or 'local'
+    """
+    with _backends_lock:
+        if name not in _backends:
+            if name == "polly":
+                backend = PollyBackend(get_polly_client, DEFAULT_VOICE_SETTINGS["AMAZON"],
+                                       TTS_CONCURRENCY["polly"], TTS_TIMEOUT)
+            elif name == "gtts":
+                backend = GTTSBackend(TTS_CONCURRENCY["gtts"], TTS_TIMEOUT)
+            elif name == "local":
+                backend = LocalBackend(TTS_CONCURRENCY["local"], TTS_TIMEOUT,
+                                       latency=LOCAL_TTS_LATENCY)
+            else:
+                raise ValueError(f"Unknown TTS backend: {name}")
+            _backends[name] = backend
+        return _backends[name]
+
+
+def _backend_order(voice_settings):
+    """Backends to try for a request, in order"""
+    if TTS_SERVICE == "LOCAL":
+        return ["local"]
+    if voice_settings and 'voice_id' in voice_settings:
+        return ["polly", "gtts"]
+    return ["gtts"]
+
+
 def synthesize_speech(text, voice_settings=None):
     """
     Sintetiza fala a partir de texto.
@@ -78,106 +138,180 @@ def synthesize_speech(text, voice_settings=None):
     Returns:
         bytes: Dados binários do áudio.
     """
-    try:
-        print(f"🔊 Configurações de voz: {voice_settings}")
+    print(f"🔊 Configurações de voz: {voice_settings}")
 
-        # Check if we should try to use Amazon Polly first
-        use_polly = False
-        if voice_settings and 'voice_id' in voice_settings:
-            use_polly = True
+    backends = _backend_order(voice_settings)
+    for index, name in enumerate(backends):
+        try:
+            audio_bytes = get_tts_backend(name).synthesize(text, voice_settings)
             print(
-                f"🔊 Tentando usar Amazon Polly com voz: {voice_settings['voice_id']}")
-            try:
-                polly_audio = _synthesize_amazon(text, voice_settings)
-                if polly_audio:
-                    print(f"✅ Áudio sintetizado com Amazon Polly")
-                    return base64.b64decode(polly_audio)
-            except Exception as polly_error:
-                print(f"⚠️ Erro com Amazon Polly: {str(polly_error)}")
-                print("Fallback para gTTS")
-
-        # If not using Polly or Polly failed, use gTTS
-        from gtts import gTTS
-        import io
-
-        # Usar o código de idioma apropriado, padrão pt-PT
-        lang_code = voice_settings.get(
-            'language_code', 'pt-PT') if voice_settings else 'pt-PT'
-
-        # Mapear códigos de idioma compatíveis com gTTS
-        lang_map = {
-            'pt-PT': 'pt',
-            'pt-BR': 'pt',
-            'en-US': 'en',
-            'es-ES': 'es'
-        }
-
-        # Usar o mapeamento ou o código original
-        lang = lang_map.get(lang_code, lang_code.split('-')[0])
-
-        # Criar objeto gTTS
-        tts = gTTS(text=text, lang=lang)
-
-        # Salvar em um buffer em memória
-        mp3_fp = io.BytesIO()
-        tts.write_to_fp(mp3_fp)
-        mp3_fp.seek(0)
-
-        # Ler o conteúdo binário
-        audio_bytes = mp3_fp.read()
-
-        print(
-            f"✅ Áudio sintetizado com gTTS. Tamanho: {len(audio_bytes)} bytes")
+                f"✅ Áudio sintetizado com {name}. Tamanho: {len(audio_bytes)} bytes")
+            return audio_bytes
+        except Exception as e:
+            if index == len(backends) - 1:
+                print(f"❌ Erro na síntese de fala: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                raise
+            print(f"⚠️ Erro com {name}: {str(e)}")
+            print(f"Fallback para {backends[index + 1]}")
+
+
+async def synthesize_speech_async(text, voice_settings=None):
+    """
+    Async version of synthesize_speech.
+
+    Runs on the backends' own worker pools, so concurrent calls overlap up
+    to each backend's concurrency cap without blocking the event loop.
+
+    Args:
+        text (str): Texto a ser sintetizado.
+        voice_settings (dict, optional): Configurações da voz.
+
+    Returns:
+        bytes: Dados binários do áudio.
+    """
+    audio_bytes, _ = await _synthesize_async_with_backend(text, voice_settings)
+    return audio_bytes
+
+
+async def _synthesize_async_with_backend(text, voice_settings):
+    """synthesize_speech_async, also returning the name of the backend that served it"""
+    backends = _backend_order(voice_settings)
+    for index, name in enumerate(backends):
+        try:
+            return await get_tts_backend(name).synthesize_async(text, voice_settings), name
+        except Exception as e:
+            if index == len(backends) - 1:
+                logger.error(f"Error in async speech synthesis: {str(e)}")
+                raise
+            logger.warning(
+                f"{name} TTS failed ({str(e)}), falling back to {backends[index + 1]}")
+
+
+def synthesize_speech_with_visemes(text, voice_settings=None):
+    """
+    Synthesize speech and request viseme speech marks in the same job.
+
+    Backends that cannot provide speech marks (gTTS) return None for them.
+
+    Args:
+        text (str): Texto a ser sintetizado.
+        voice_settings (dict, optional): Configurações da voz.
+
+    Returns:
+        tuple: (audio bytes, list of speech marks or None)
+    """
+    audio_bytes, marks, _ = _synthesize_with_backend(text, voice_settings, with_visemes=True)
+    return audio_bytes, marks
+
+
+def _synthesize_with_backend(text, voice_settings, with_visemes):
+    """
+    Synthesize with the first backend that succeeds.
+
+    Returns:
+        tuple: (audio bytes, speech marks or None, name of the backend)
+    """
+    backends = _backend_order(voice_settings)
+    for index, name in enumerate(backends):
+        try:
+            backend = get_tts_backend(name)
+            if with_visemes:
+                audio_bytes, marks = backend.synthesize_with_marks(text, voice_settings)
+            else:
+                audio_bytes, marks = backend.synthesize(text, voice_settings), None
+            return audio_bytes, marks, name
+        except Exception as e:
+            if index == len(backends) - 1:
+                logger.error(f"Error in speech synthesis: {str(e)}")
+                raise
+            logger.warning(
+                f"{name} TTS failed ({str(e)}), falling back to {backends[index + 1]}")
+
+
+def synthesize_to_store(text, voice_settings=None, with_visemes=False):
+    """
+    Synthesize speech into the content-addressed audio store.
+
+    Requests already synthesized with the same text and voice settings are
+    answered from the store without calling the TTS service again. Audio
+    from a fallback backend is stored but not remembered for the request,
+    so a later request retries the voice that was asked for.
+
+    Args:
+        text (str): Texto a ser sintetizado.
+        voice_settings (dict, optional): Configurações da voz.
+        with_visemes (bool): Also request viseme speech marks and store
+            them next to the audio (kind 'visemes').
+
+    Returns:
+        str: Content hash of the MP3 in the audio store.
+    """
+    audio_hash = audio_store.lookup(text, voice_settings)
+    if audio_hash and (not with_visemes or
+                       audio_store.get_metadata(audio_hash, "visemes") is not None):
+        logger.debug(f"Audio cache hit for '{text[:30]}'")
+        return audio_hash
+
+    audio_bytes, marks, backend = _synthesize_with_backend(text, voice_settings, with_visemes)
+    if not audio_bytes:
+        raise ValueError("Speech synthesis returned no audio")
+
+    audio_hash = audio_store.put(audio_bytes)
+    if with_visemes:
+        # An empty list records that this backend has no speech marks
+        audio_store.put_metadata(audio_hash, "visemes", marks or [])
+    if backend == _backend_order(voice_settings)[0]:
+        audio_store.remember(text, voice_settings, audio_hash)
+    return audio_hash
+
+
+async def synthesize_cached_async(text, voice_settings=None):
+    """
+    Async synthesis through the audio store.
+
+    Text already synthesized with the same voice settings is read back from
+    the store without waiting for a TTS worker; new audio is stored for the
+    next request.
+
+    Args:
+        text (str): Texto a ser sintetizado.
+        voice_settings (dict, optional): Configurações da voz.
+
+    Returns:
+        bytes: Dados binários do áudio.
+    """
+    # The store reads and writes files: keep them off the event loop
+    loop = asyncio.get_running_loop()
+    audio_bytes = await loop.run_in_executor(None, _cached_audio, text, voice_settings)
+    if audio_bytes:
+        logger.debug(f"Audio cache hit for '{text[:30]}'")
         return audio_bytes
 
-    except Exception as e:
-        print(f"❌ Erro na síntese de fala: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise
+    audio_bytes, backend = await _synthesize_async_with_backend(text, voice_settings)
+    if audio_bytes and backend == _backend_order(voice_settings)[0]:
+        await loop.run_in_executor(None, _remember_audio, text, voice_settings, audio_bytes)
+    return audio_bytes
 
 
-def _synthesize_amazon(text, custom_settings=None):
-    """Synthesize speech using Amazon Polly"""
-    try:
-        # Get Polly client
-        polly = get_polly_client()
-        if not polly:
-            logger.error("Failed to initialize Amazon Polly client")
-            return None
+def _cached_audio(text, voice_settings):
+    """Audio already in the store for a request, or None"""
+    audio_hash = audio_store.lookup(text, voice_settings)
+    return audio_store.get(audio_hash) if audio_hash else None
 
-        # Get voice settings
-        settings = dict(DEFAULT_VOICE_SETTINGS["AMAZON"])
-        if custom_settings:
-            settings.update(custom_settings)
-
-        # Use plain text instead of SSML for simplicity and compatibility
-        # This resolves the "This voice does not support one of the used SSML features" error
-
-        # Perform speech synthesis with plain text (no SSML)
-        response = polly.synthesize_speech(
-            Engine=settings["engine"],
-            OutputFormat="mp3",
-            SampleRate=settings["sample_rate"],
-            Text=text,
-            TextType="text",  # Always use plain text
-            VoiceId=settings["voice_id"],
-            LanguageCode=settings["language_code"]
-        )
-
-        # Check if we got a valid response with AudioStream
-        if "AudioStream" not in response:
-            logger.error("No AudioStream in Amazon Polly response")
-            return None
 
-        # Read and encode the audio stream
-        audio_data = base64.b64encode(
-            response["AudioStream"].read()).decode("utf-8")
+def _remember_audio(text, voice_settings, audio_bytes):
+    audio_store.remember(text, voice_settings, audio_store.put(audio_bytes))
+
 
+def _synthesize_amazon(text, custom_settings=None):
+    """Synthesize speech using Amazon Polly, returning base64 audio"""
+    try:
+        audio_bytes = get_tts_backend("polly").synthesize(text, custom_settings)
         logger.info(
             f"Successfully synthesized text: '{text[:30]}...' with Amazon Polly")
-        return audio_data
-
+        return base64.b64encode(audio_bytes).decode("utf-8")
     except ClientError as e:
         error_code = e.response.get("Error", {}).get("Code", "Unknown")
         error_message = e.response.get("Error", {}).get("Message", str(e))
@@ -189,26 +323,9 @@ def _synthesize_amazon(text, custom_settings=None):
 
 
 def get_available_voices():
-    """Get list of available voices from Amazon Polly"""
+    """Get list of available voices from Amazon Polly (cached)"""
     try:
-        polly = get_polly_client()
-        if not polly:
-            return []
-
-        # Use standard engine instead of neural to get compatible voices
-        response = polly.describe_voices(
-            Engine="standard",  # Changed from neural to standard
-            LanguageCode="pt-PT"
-        )
-
-        voices = [{
-            "id": voice["Id"],
-            "name": voice["Name"],
-            "gender": voice["Gender"],
-            "language": voice["LanguageCode"]
-        } for voice in response.get("Voices", [])]
-
-        return voices
+        return get_tts_backend("polly").get_available_voices()
     except Exception as e:
         logger.error(f"Error getting available voices: {str(e)}")
         return []
@@ -0,0 +1,361 @@
+"""
+Async TTS backends with pooled connections and per-backend concurrency caps
+
+Each backend runs its blocking SDK calls on its own small thread pool, sized
+to the backend's concurrency cap, so callers on any event loop (including
+the short-lived loops created by ``async_to_sync``) can overlap synthesis
+without flooding the provider or blocking the loop.
+"""
+
+import io
+import os
+import re
+import json
+import time
+import base64
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional
+
+from .g2p import sentence_to_phonemes
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached voice list stays valid
+VOICES_CACHE_SECONDS = int(os.environ.get("TTS_VOICES_CACHE_SECONDS", "3600"))
+
+
+class TTSTimeoutError(Exception):
+    """Raised when a backend does not answer within its timeout"""
+
+
+class TTSBackend:
+    name = "base"
+
+    def __init__(self, max_concurrency: int = 4, timeout: float = 15.0):
+        """
+        Initialize the backend
+
+        Args:
+            max_concurrency: Maximum number of requests in flight
+            timeout: Seconds to wait for one synthesis
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix=f"tts-{self.name}")
+        self._voices = None
+        self._voices_loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "in_flight": 0,
+                      "failures": 0, "timeouts": 0, "total_seconds": 0.0}
+
+    def synthesize(self, text: str, voice_settings: Optional[Dict] = None) -> bytes:
+        """Blocking synthesis, returns MP3 bytes"""
+        raise NotImplementedError
+
+    def list_voices(self) -> List[Dict]:
+        """Blocking voice listing"""
+        return []
+
+    def speech_marks(self, text: str, voice_settings: Optional[Dict] = None) -> Optional[List[Dict]]:
+        """
+        Blocking viseme speech marks for a text
+
+        Returns:
+            Marks in Polly's format ({'time': ms, 'type': 'viseme', 'value': ...}),
+            or None if the backend cannot provide them
+        """
+        return None
+
+    def synthesize_with_marks(self, text: str, voice_settings: Optional[Dict] = None):
+        """
+        Audio and viseme speech marks from the same job
+
+        Returns:
+            Tuple of (MP3 bytes, speech marks or None)
+        """
+        return self.synthesize(text, voice_settings), self.speech_marks(text, voice_settings)
+
+    async def synthesize_async(self, text: str, voice_settings: Optional[Dict] = None) -> bytes:
+        """
+        Synthesize without blocking the event loop
+
+        Requests beyond the concurrency cap wait for a free worker.
+
+        Raises:
+            TTSTimeoutError: If the backend takes longer than its timeout
+        """
+        return await self._run_async(self.synthesize, text, voice_settings)
+
+    async def synthesize_with_marks_async(self, text: str, voice_settings: Optional[Dict] = None):
+        """Async version of synthesize_with_marks"""
+        return await self._run_async(self.synthesize_with_marks, text, voice_settings)
+
+    def get_available_voices(self) -> List[Dict]:
+        """Voice list, cached for VOICES_CACHE_SECONDS"""
+        with self._lock:
+            if self._voices is not None and \
+                    time.monotonic() - self._voices_loaded_at < VOICES_CACHE_SECONDS:
+                return self._voices
+
+        voices = self.list_voices()
+        with self._lock:
+            # Only cache successful lookups so a provider outage is retried
+            if voices:
+                self._voices = voices
+                self._voices_loaded_at = time.monotonic()
+        return voices
+
+    async def _run_async(self, method, text, voice_settings):
+        """Run a blocking method on the backend's pool, bounded by the timeout"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, self._timed_call, method, text, voice_settings)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise TTSTimeoutError(
+                f"{self.name} TTS timed out after {self.timeout}s")
+
+    def _timed_call(self, method, text, voice_settings):
+        """Run a blocking method on a worker thread, keeping stats"""
+        self._count("requests")
+        self._count("in_flight")
+        start = time.monotonic()
+        try:
+            return method(text, voice_settings)
+        except Exception:
+            self._count("failures")
+            raise
+        finally:
+            self._count("in_flight", -1)
+            self._count("total_seconds", time.monotonic() - start)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+
+class PollyBackend(TTSBackend):
+    name = "polly"
+
+    def __init__(self, client_factory: Callable, default_settings: Dict,
+                 max_concurrency: int = 8, timeout: float = 15.0):
+        """
+        Args:
+            client_factory: Returns the shared boto3 Polly client (or None)
+            default_settings: Voice settings merged under each request's
+        """
+        super().__init__(max_concurrency, timeout)
+        self.client_factory = client_factory
+        self.default_settings = default_settings
+
+    def synthesize(self, text: str, voice_settings: Optional[Dict] = None) -> bytes:
+        polly = self.client_factory()
+        if not polly:
+            raise RuntimeError("Amazon Polly client not available")
+
+        settings = dict(self.default_settings)
+        if voice_settings:
+            settings.update(voice_settings)
+
+        # Plain text avoids "This voice does not support one of the used SSML features"
+        response = polly.synthesize_speech(
+            Engine=settings["engine"],
+            OutputFormat="mp3",
+            SampleRate=settings["sample_rate"],
+            Text=text,
+            TextType="text",
+            VoiceId=settings["voice_id"],
+            LanguageCode=settings["language_code"]
+        )
+
+        if "AudioStream" not in response:
+            raise RuntimeError("No AudioStream in Amazon Polly response")
+
+        with response["AudioStream"] as stream:
+            return stream.read()
+
+    def speech_marks(self, text: str, voice_settings: Optional[Dict] = None) -> Optional[List[Dict]]:
+        polly = self.client_factory()
+        if not polly:
+            return None
+
+        settings = dict(self.default_settings)
+        if voice_settings:
+            settings.update(voice_settings)
+
+        response = polly.synthesize_speech(
+            Engine=settings["engine"],
+            OutputFormat="json",
+            SpeechMarkTypes=["viseme"],
+            Text=text,
+            TextType="text",
+            VoiceId=settings["voice_id"],
+            LanguageCode=settings["language_code"]
+        )
+
+        # One JSON object per line
+        with response["AudioStream"] as stream:
+            return [json.loads(line) for line in stream.read().decode("utf-8").splitlines()
+                    if line.strip()]
+
+    def synthesize_with_marks(self, text: str, voice_settings: Optional[Dict] = None):
+        """
+        Audio and viseme speech marks, requested concurrently
+
+        Polly returns them from two separate calls, so both run at once on
+        the backend's pool (sequentially when already on it, which could
+        otherwise wait on itself).
+        """
+        if threading.current_thread().name.startswith(f"tts-{self.name}"):
+            return super().synthesize_with_marks(text, voice_settings)
+
+        audio = self._executor.submit(self._timed_call, self.synthesize, text, voice_settings)
+        marks = self._executor.submit(self._timed_call, self.speech_marks, text, voice_settings)
+        try:
+            return audio.result(self.timeout), marks.result(self.timeout)
+        except FutureTimeoutError:
+            self._count("timeouts")
+            raise TTSTimeoutError(
+                f"{self.name} TTS timed out after {self.timeout}s")
+
+    async def synthesize_with_marks_async(self, text: str, voice_settings: Optional[Dict] = None):
+        """Async version of synthesize_with_marks (both calls on the pool at once)"""
+        audio, marks = await asyncio.gather(
+            self._run_async(self.synthesize, text, voice_settings),
+            self._run_async(self.speech_marks, text, voice_settings))
+        return audio, marks
+
+    def list_voices(self) -> List[Dict]:
+        polly = self.client_factory()
+        if not polly:
+            return []
+
+        # Standard engine voices are the ones compatible with our settings
+        response = polly.describe_voices(Engine="standard", LanguageCode="pt-PT")
+        return [{
+            "id": voice["Id"],
+            "name": voice["Name"],
+            "gender": voice["Gender"],
+            "language": voice["LanguageCode"]
+        } for voice in response.get("Voices", [])]
+
+
+class GTTSBackend(TTSBackend):
+    name = "gtts"
+
+    # gTTS only needs the base language
+    LANG_MAP = {
+        'pt-PT': 'pt',
+        'pt-BR': 'pt',
+        'en-US': 'en',
+        'es-ES': 'es'
+    }
+
+    def __init__(self, max_concurrency: int = 4, timeout: float = 15.0):
+        super().__init__(max_concurrency, timeout)
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        # One keep-alive pool instead of a new session per gTTS request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def synthesize(self, text: str, voice_settings: Optional[Dict] = None) -> bytes:
+        from gtts import gTTS
+        from gtts.tts import gTTSError
+        from requests.exceptions import RequestException
+
+        lang_code = (voice_settings or {}).get('language_code', 'pt-PT')
+        lang = self.LANG_MAP.get(lang_code, lang_code.split('-')[0])
+        tts = gTTS(text=text, lang=lang, timeout=self.timeout)
+
+        # Same request/decoding as gTTS.stream() (gTTS 2.5, pinned in
+        # requirements.txt), over the shared session
+        audio = io.BytesIO()
+        for prepared in tts._prepare_requests():
+            try:
+                response = self.session.send(prepared, timeout=self.timeout)
+            except RequestException as e:
+                raise gTTSError(tts=tts) from e
+            if response.status_code >= 400:
+                raise gTTSError(tts=tts, response=response)
+
+            for line in response.iter_lines(chunk_size=1024):
+                decoded_line = line.decode("utf-8")
+                if "jQ1olc" not in decoded_line:
+                    continue
+                audio_search = re.search(r'jQ1olc","\[\\"(.*)\\"]', decoded_line)
+                if not audio_search:
+                    raise gTTSError(tts=tts, response=response)
+                audio.write(base64.b64decode(audio_search.group(1).encode("ascii")))
+
+        return audio.getvalue()
+
+
+class LocalBackend(TTSBackend):
+    name = "local"
+
+    # One silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, mono
+    FRAME = bytes([0xFF, 0xFB, 0x90, 0xC4]) + bytes(413)
+    FRAME_SECONDS = 1152 / 44100
+    SECONDS_PER_CHAR = 0.07
+
+    # IPA phonemes to the viseme symbols Polly uses in speech marks
+    PHONEME_TO_POLLY_VISEME = {
+        "p": "p", "b": "p", "m": "p",
+        "f": "f", "v": "f",
+        "t": "t", "d": "t", "n": "t", "ɲ": "t", "l": "t", "ɫ": "t", "ʎ": "t",
+        "s": "s", "z": "s", "ʃ": "S", "ʒ": "S",
+        "k": "k", "g": "k", "ɾ": "r", "ʁ": "r",
+        "a": "a", "ɐ": "a", "ɐ̃": "a",
+        "e": "e", "ẽ": "e", "ɛ": "E", "ɨ": "@",
+        "i": "i", "ĩ": "i", "j": "i", "j̃": "i",
+        "o": "o", "õ": "o", "ɔ": "O",
+        "u": "u", "ũ": "u", "w": "u", "w̃": "u",
+    }
+
+    def __init__(self, max_concurrency: int = 16, timeout: float = 15.0,
+                 latency: float = 0.0):
+        """
+        Offline stand-in returning silent MP3 whose length follows the text
+
+        Args:
+            latency: Seconds each request takes, to emulate a remote provider
+        """
+        super().__init__(max_concurrency, timeout)
+        self.latency = latency
+
+    def duration(self, text: str) -> float:
+        """Length in seconds of the audio produced for a text"""
+        frames = max(1, int(len(text) * self.SECONDS_PER_CHAR / self.FRAME_SECONDS))
+        return frames * self.FRAME_SECONDS
+
+    def synthesize(self, text: str, voice_settings: Optional[Dict] = None) -> bytes:
+        if self.latency:
+            time.sleep(self.latency)
+        frames = int(round(self.duration(text) / self.FRAME_SECONDS))
+        return self.FRAME * frames
+
+    def speech_marks(self, text: str, voice_settings: Optional[Dict] = None) -> Optional[List[Dict]]:
+        """Canned marks: the text's phonemes spread evenly over the audio"""
+        visemes = [self.PHONEME_TO_POLLY_VISEME.get(phoneme, "sil")
+                   for _, phonemes in sentence_to_phonemes(text) for phoneme in phonemes]
+        duration_ms = self.duration(text) * 1000
+        step = duration_ms / (len(visemes) + 1)
+
+        marks = [{"time": int(index * step), "type": "viseme", "value": viseme}
+                 for index, viseme in enumerate(visemes)]
+        marks.append({"time": int(len(visemes) * step), "type": "viseme", "value": "sil"})
+        return marks
+
+    def list_voices(self) -> List[Dict]:
+        return [{"id": "Local", "name": "Local", "gender": "Female",
+                 "language": "pt-PT"}]
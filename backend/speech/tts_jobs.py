@@ -0,0 +1,210 @@
+"""
+Background TTS jobs
+
+Synthesis requests are queued on a bounded worker pool instead of running
+inside the request that asked for them. The job id is the synthesis key of
+the request. Job states are recorded in the shared audio store directory and
+finished audio is indexed there, so a status poll or event stream that lands
+on another worker than the one running the job still sees it.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from .audio_store import audio_store
+from .synthesis import synthesize_to_store
+
+logger = logging.getLogger(__name__)
+
+TTS_JOB_WORKERS = int(os.environ.get("TTS_JOB_WORKERS", "4"))
+
+# Jobs queued or running before new submissions are rejected
+TTS_JOB_MAX_PENDING = int(os.environ.get("TTS_JOB_MAX_PENDING", "64"))
+
+# Finished jobs are forgotten after this many seconds
+TTS_JOB_TTL = int(os.environ.get("TTS_JOB_TTL", "600"))
+
+# How often a job run by another worker is checked for in the audio store
+_STORE_POLL_SECONDS = 0.25
+
+_FINISHED = ("done", "failed")
+
+
+class TTSQueueFullError(Exception):
+    """Raised when too many jobs are already pending"""
+
+
+class TTSJobQueue:
+    def __init__(self, max_workers: int = TTS_JOB_WORKERS,
+                 max_pending: int = TTS_JOB_MAX_PENDING, job_ttl: int = TTS_JOB_TTL):
+        """
+        Initialize the job queue
+
+        Args:
+            max_workers: Number of jobs synthesized at the same time
+            max_pending: Queued plus running jobs allowed before rejecting
+            job_ttl: Seconds a finished job is kept in memory
+        """
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tts-job")
+        self._jobs: Dict[str, Dict] = {}
+        self._events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "cache_hits": 0, "completed": 0,
+                      "failed": 0, "rejected": 0}
+
+    def submit(self, text: str, voice_settings: Optional[Dict] = None,
+               with_visemes: bool = False) -> Dict:
+        """
+        Queue a synthesis, unless its audio is already stored
+
+        Returns:
+            Job snapshot; status is 'done' right away on a cache hit
+
+        Raises:
+            TTSQueueFullError: If max_pending jobs are already waiting
+        """
+        job_id = audio_store.synthesis_key(text, voice_settings)
+
+        audio_hash = audio_store.lookup_key(job_id)
+        if audio_hash and (not with_visemes or
+                           audio_store.get_metadata(audio_hash, "visemes") is not None):
+            self._count("cache_hits")
+            return self._done_snapshot(job_id, audio_hash)
+
+        with self._lock:
+            self._forget_expired()
+            job = self._jobs.get(job_id)
+            if job and job["status"] in ("queued", "running"):
+                return dict(job)
+
+            pending = sum(1 for job in self._jobs.values()
+                          if job["status"] in ("queued", "running"))
+            if pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise TTSQueueFullError(
+                    f"{pending} TTS jobs pending, try again later")
+
+            job = {
+                "job_id": job_id,
+                "status": "queued",
+                "audio_hash": None,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None
+            }
+            self._jobs[job_id] = job
+            self._events[job_id] = threading.Event()
+            self.stats["submitted"] += 1
+            snapshot = dict(job)
+
+        self._publish(snapshot)
+        self._executor.submit(self._run, job_id, text, voice_settings, with_visemes)
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Current state of a job
+
+        Returns:
+            Job snapshot, or None if no worker knows the job (never
+            submitted, or expired) and its audio is not in the store
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+
+        # Submitted to another worker: its recorded state, unless expired
+        job = audio_store.get_job_state(job_id)
+        if job and not self._expired(job):
+            return job
+
+        audio_hash = audio_store.lookup_key(job_id)
+        return self._done_snapshot(job_id, audio_hash) if audio_hash else None
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """
+        Wait up to ``timeout`` seconds for a job to finish (long-poll)
+
+        Returns:
+            Job snapshot as of the end of the wait, or None if unknown
+        """
+        event = self._events.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+            return self.get(job_id)
+
+        # Submitted to another worker: watch the shared audio store
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in _FINISHED or time.monotonic() >= deadline:
+                return job
+            time.sleep(_STORE_POLL_SECONDS)
+
+    def _run(self, job_id, text, voice_settings, with_visemes):
+        """Worker thread: synthesize one job into the audio store"""
+        self._update(job_id, status="running")
+        try:
+            audio_hash = synthesize_to_store(text, voice_settings, with_visemes)
+            self._update(job_id, status="done", audio_hash=audio_hash,
+                         finished_at=time.time())
+            self._count("completed")
+        except Exception as e:
+            logger.error(f"TTS job {job_id[:12]} failed: {str(e)}")
+            self._update(job_id, status="failed", error=str(e),
+                         finished_at=time.time())
+            self._count("failed")
+        finally:
+            event = self._events.get(job_id)
+            if event is not None:
+                event.set()
+
+    def _done_snapshot(self, job_id, audio_hash):
+        return {"job_id": job_id, "status": "done", "audio_hash": audio_hash,
+                "error": None}
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            self._jobs[job_id].update(changes)
+            snapshot = dict(self._jobs[job_id])
+        self._publish(snapshot)
+
+    def _publish(self, job):
+        """Record a job's state where the other workers can read it"""
+        try:
+            audio_store.put_job_state(job["job_id"], job)
+        except OSError as e:
+            logger.warning(f"Could not record TTS job {job['job_id'][:12]}: {str(e)}")
+
+    def _expired(self, job) -> bool:
+        """Finished longer than the TTL ago, or abandoned (e.g. its worker died)"""
+        since = job.get("finished_at") or job.get("created_at") or 0
+        return since < time.time() - self.job_ttl
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _forget_expired(self):
+        """Drop finished jobs older than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._events.pop(job_id, None)
+            audio_store.forget_job_state(job_id)
+
+
+# Shared queue used by the API
+tts_jobs = TTSJobQueue()
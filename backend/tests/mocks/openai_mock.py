@@ -1,9 +1,365 @@
+"""
+OpenAI-compatible stand-in server for offline load and failure testing
+
+Serves /v1/chat/completions (plain, JSON mode and streaming) with canned or
+templated content, configurable latency distributions, random server errors
+and periodic 429 bursts. Point the backend at it with
+
+    python -m tests.mocks.openai_mock --port 8089 --latency lognormal:1.5:0.6
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python asgi.py
+
+or start it inside a test with ``MockOpenAIServer`` and pass
+``server.base_url`` to ``create_async_openai_client``.
+"""
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from unittest.mock import MagicMock
 
+
 def mock_openai_api():
     mock_response = MagicMock()
     mock_response.choices = [{'text': 'Hello, world!'}]
     return mock_response
 
 def mock_openai_completion_create(*args, **kwargs):
-    return mock_openai_api()
\ No newline at end of file
+    return mock_openai_api()
+
+
+# Latency distributions: callables returning a delay in seconds
+
+def fixed(seconds: float) -> Callable[[random.Random], float]:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Callable[[random.Random], float]:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float) -> Callable[[random.Random], float]:
+    """Long-tailed latency around a median (sigma 0.5 puts p99 near 3x the median)"""
+    return lambda rng: median * math.exp(sigma * rng.gauss(0, 1))
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """'0.5', 'uniform:0.2:1.5' or 'lognormal:1.5:0.6'"""
+    name, _, args = spec.partition(":")
+    if not args:
+        return fixed(float(name))
+    values = [float(value) for value in args.split(":")]
+    return {"fixed": fixed, "uniform": uniform, "lognormal": lognormal}[name](*values)
+
+
+GAME_WORDS = ["rato", "carro", "barco", "prato", "torre", "pera", "livro", "cabra"]
+
+
+def default_responder(body: Dict[str, Any]) -> str:
+    """
+    Templated completion content for a request
+
+    JSON mode answers game prompts (asking for "exercises") with a game and
+    other prompts with an object holding the keys the prompt quotes.
+    """
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    if not json_mode:
+        return "Muito bem! Continua a praticar."
+
+    if '"exercises"' in prompt:
+        return json.dumps({
+            "title": "Aventura dos Sons",
+            "game_type": "exercícios de pronúncia",
+            "difficulty": "iniciante",
+            "exercises": [{
+                "word": word,
+                "prompt": f"Diz a palavra '{word}'.",
+                "hint": "Fala devagar.",
+                "type": "pronúncia",
+                "feedback": {"correct": "Muito bem!", "incorrect": "Tenta outra vez."}
+            } for word in random.sample(GAME_WORDS, 5)]
+        }, ensure_ascii=False)
+
+    last = str((body.get("messages") or [{}])[-1].get("content", ""))
+    keys = []
+    for key in _quoted_words(last):
+        if key not in keys:
+            keys.append(key)
+    if not keys:
+        return json.dumps({"response": "ok"})
+    return json.dumps({key: [f"Texto de {key} 1", f"Texto de {key} 2"] if key.endswith("s")
+                       else f"Texto de {key}" for key in keys}, ensure_ascii=False)
+
+
+def _quoted_words(text: str) -> List[str]:
+    words = []
+    parts = text.split("'")
+    for index in range(1, len(parts), 2):
+        if parts[index].isidentifier():
+            words.append(parts[index])
+    return words
+
+
+class MockConfig:
+    def __init__(self, latency: Callable[[random.Random], float] = fixed(0.0),
+                 error_rate: float = 0.0, error_status: int = 500,
+                 rate_limit_every: int = 0, rate_limit_burst: int = 0,
+                 retry_after: float = 1.0, chunk_size: int = 8, chunk_delay: float = 0.0,
+                 responses: Optional[List[Tuple[str, str]]] = None,
+                 responder: Callable[[Dict[str, Any]], str] = default_responder,
+                 seed: Optional[int] = None):
+        """
+        Behaviour of the stand-in server
+
+        Args:
+            latency: Delay before the response (first chunk when streaming)
+            error_rate: Share of requests answered with error_status
+            rate_limit_every: Window of requests for 429 bursts (0 disables)
+            rate_limit_burst: Requests at the end of every window answered with 429
+            retry_after: Retry-After header of 429 responses (seconds)
+            chunk_size: Characters per streamed chunk
+            chunk_delay: Delay between streamed chunks
+            responses: (substring, content) pairs matched against the last
+                message, before falling back to the responder
+            responder: Builds the content of the other requests
+            seed: Seed for latency and error sampling
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_burst = rate_limit_burst
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.responses = responses or []
+        self.responder = responder
+        self.random = random.Random(seed)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_MockHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": "gpt-4o-mini", "object": "model", "created": 0, "owned_by": "mock"}]})
+        else:
+            self._send_json(404, _error("Not found", "invalid_request_error"))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, _error("Invalid JSON body", "invalid_request_error"))
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, _error("Not found", "invalid_request_error"))
+            return
+        self.server.mock.handle(self, body)
+
+    def _send_json(self, status: int, payload: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    mock: "MockOpenAIServer"
+
+
+def _error(message: str, error_type: str) -> Dict[str, Any]:
+    return {"error": {"message": message, "type": error_type, "param": None, "code": None}}
+
+
+class MockOpenAIServer:
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1",
+                 port: int = 0):
+        """
+        OpenAI-compatible HTTP server on a background thread
+
+        Args:
+            config: Latency, failure and content behaviour
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free one)
+        """
+        self.config = config or MockConfig()
+        self._httpd = _MockHTTPServer((host, port), _Handler)
+        self._httpd.mock = self
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._count = 0
+        self.statuses: Counter = Counter()
+        self.latencies: List[float] = []
+        self.requests: List[Dict[str, Any]] = []
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name="openai-mock", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Requests served by status, and latency percentiles of successful ones"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            statuses = dict(self.statuses)
+
+        def percentile(share):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(share * len(latencies)))]
+
+        return {"requests": sum(statuses.values()), "statuses": statuses,
+                "p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)}
+
+    def handle(self, handler: _Handler, body: Dict[str, Any]):
+        config = self.config
+        with self._lock:
+            index = self._count
+            self._count += 1
+            self.requests.append(body)
+            delay = max(0.0, config.latency(config.random))
+            fails = config.random.random() < config.error_rate
+
+        if config.rate_limit_every and \
+                index % config.rate_limit_every >= config.rate_limit_every - config.rate_limit_burst:
+            self._record(429)
+            handler._send_json(429, _error("Rate limit reached for requests", "requests"),
+                               headers={"Retry-After": str(config.retry_after)})
+            return
+
+        time.sleep(delay)
+        if fails:
+            self._record(config.error_status)
+            handler._send_json(config.error_status,
+                               _error("The server had an error while processing your request",
+                                      "server_error"))
+            return
+
+        content = self._content(body)
+        if body.get("stream"):
+            self._stream(handler, body, content)
+        else:
+            prompt_tokens = sum(len(str(message.get("content", "")))
+                                for message in body.get("messages", [])) // 4
+            completion_tokens = len(content) // 4
+            handler._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o-mini"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}
+            })
+        self._record(200, delay)
+
+    def _content(self, body: Dict[str, Any]) -> str:
+        last = str((body.get("messages") or [{}])[-1].get("content", ""))
+        for needle, content in self.config.responses:
+            if needle in last:
+                return content
+        return self.config.responder(body)
+
+    def _stream(self, handler: _Handler, body: Dict[str, Any], content: str):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        size = max(1, self.config.chunk_size)
+        deltas = [{"role": "assistant", "content": ""}] + \
+            [{"content": content[i:i + size]} for i in range(0, len(content), size)]
+        for position, delta in enumerate(deltas + [{}]):
+            if position > 1 and self.config.chunk_delay:
+                time.sleep(self.config.chunk_delay)
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                "model": body.get("model", "gpt-4o-mini"),
+                "choices": [{"index": 0, "delta": delta,
+                             "finish_reason": "stop" if position == len(deltas) else None}]
+            }
+            handler._send_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        handler._send_chunk(b"data: [DONE]\n\n")
+        handler._send_chunk(b"")
+
+    def _record(self, status: int, latency: Optional[float] = None):
+        with self._lock:
+            self.statuses[status] += 1
+            if latency is not None:
+                self.latencies.append(latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="0",
+                        help="'0.5', 'uniform:0.2:1.5' or 'lognormal:1.5:0.6' (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", default="",
+                        help="'every:burst': the last <burst> of every <every> requests get 429")
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    every, _, burst = args.rate_limit.partition(":")
+    config = MockConfig(latency=parse_latency(args.latency), error_rate=args.error_rate,
+                        rate_limit_every=int(every or 0), rate_limit_burst=int(burst or 0),
+                        chunk_delay=args.chunk_delay, seed=args.seed)
+    server = MockOpenAIServer(config, host=args.host, port=args.port)
+    print(f"OpenAI stand-in listening on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        print(server.metrics())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from backend.utils.aho_corasick import AhoCorasick
+from backend.utils.language_utils import (
+    find_ptbr_terms, find_ptbr_terms_in_game, fix_common_recognition_errors,
+    is_tongue_twister)
+
+
+def test_finds_overlapping_patterns():
+    automaton = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+
+    matches = {(start, end, pattern) for start, end, pattern, _ in automaton.iter_matches("ushers")}
+
+    assert matches == {(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")}
+    assert len(automaton) == 4
+
+
+def test_find_is_leftmost_longest_and_respects_words():
+    automaton = AhoCorasick([("rato", "a"), ("rato roeu", "b"), ("roeu", "c")])
+
+    assert [m[2] for m in automaton.find("o rato roeu")] == ["rato roeu"]
+    assert automaton.find("piratofobia", whole_words=True) == []
+
+
+def test_replace_in_one_pass():
+    automaton = AhoCorasick([("a", "b"), ("b", "a")])
+
+    assert automaton.replace("abba", lambda match: match[3]) == "baab"
+    assert automaton.replace("abba", lambda match: None) == "abba"
+
+
+def test_tongue_twisters():
+    assert is_tongue_twister("o rato roeu a roupa")
+    assert is_tongue_twister("Repete: O rato roeu a roupa do rei de Roma. Outra vez!")
+    assert not is_tongue_twister("casa")
+
+
+def test_recognition_fixes_need_the_expected_text():
+    assert fix_common_recognition_errors("Globo mau", "O lobo mau") == "o lobo mau"
+    assert fix_common_recognition_errors("globo azul", "um globo azul") == "globo azul"
+
+
+def test_ptbr_terms_are_detected_as_whole_words():
+    terms = find_ptbr_terms("O menino apanhou o Ônibus e bebeu suco.")
+
+    assert [(term["pt_br"], term["pt_pt"]) for term in terms] == [
+        ("ônibus", "Autocarro"), ("suco", "Sumo")]
+    assert find_ptbr_terms("sucos de fruta") == []
+
+
+def test_multi_word_ptbr_terms_are_found_longest_first():
+    terms = find_ptbr_terms("Tomei o café da manhã e usei creme dental.")
+
+    assert [term["pt_br"] for term in terms] == ["café da manhã", "creme dental"]
+
+
+def test_whole_game_is_validated():
+    game = {"title": "Jogo", "exercises": [
+        {"word": "Celular", "hint": "Usa o celular"},
+        {"word": "Sumo", "feedback": {"correct": "Boa!"}}]}
+
+    assert [term["pt_br"] for term in find_ptbr_terms_in_game(game)] == ["celular"]
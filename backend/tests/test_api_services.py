@@ -0,0 +1,79 @@
+import asyncio
+import importlib
+import io
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import backend.speech.feedback_audio as feedback_audio
+from backend.utils.idempotency import IdempotencyCache
+from services import games as game_service
+
+
+@pytest.fixture
+def evaluation_service(monkeypatch):
+    # conftest replaces the speech package; the service needs the real feedback module
+    monkeypatch.setitem(sys.modules, "speech.feedback_audio", feedback_audio)
+    monkeypatch.setitem(sys.modules, "routes.audio",
+                        MagicMock(GTTS_VOICE_SETTINGS={"language_code": "pt-PT"}))
+    monkeypatch.delitem(sys.modules, "services.evaluation", raising=False)
+    return importlib.import_module("services.evaluation")
+
+
+def test_generate_game_stores_and_shapes_the_game():
+    mcp = MagicMock()
+    mcp.server.process_message = AsyncMock(return_value={
+        "title": "Animais", "exercises": [{"word": "rato"}]})
+    db = MagicMock()
+    db.store_game.return_value = "game-1"
+
+    body, status = asyncio.run(game_service.generate_game(
+        mcp, db, "user-1", {"difficulty": "Beginner", "game_type": "rimas"}))
+
+    assert status == 200
+    assert body["game"] == {"game_id": "game-1", "title": "Animais", "difficulty": "iniciante",
+                            "game_type": "rimas", "content": [{"word": "rato"}]}
+    message = mcp.server.process_message.await_args.args[0]
+    assert message.params["difficulty"] == "iniciante"
+
+
+def test_stream_reports_errors_as_an_event():
+    async def failing_stream(*args):
+        yield {"event": "exercise", "index": 0, "exercise": {"word": "rato"}}
+        raise RuntimeError("model down")
+
+    mcp = MagicMock()
+    mcp.stream_game = failing_stream
+
+    async def collect():
+        return [event async for event in game_service.stream_game_events(mcp, MagicMock(), "u", {})]
+
+    events = asyncio.run(collect())
+
+    assert [name for name, _ in events] == ["exercise", "error"]
+
+
+def test_repeated_recording_is_replayed(evaluation_service):
+    mcp = MagicMock()
+    mcp.evaluate_pronunciation = AsyncMock(return_value={"success": True, "score": 8,
+                                                         "audio_feedback": "abc"})
+    cache = IdempotencyCache()
+
+    def evaluate():
+        return asyncio.run(evaluation_service.evaluate_pronunciation(
+            mcp, cache, "user-1", io.BytesIO(b"x" * 200), " rato ", "session-1"))
+
+    first, second = evaluate(), evaluate()
+
+    assert first[:2] == ({"success": True, "score": 8, "audio_feedback": "abc"}, 200)
+    assert second[2] == {"Idempotent-Replayed": "true"}
+    mcp.evaluate_pronunciation.assert_awaited_once()
+    assert mcp.evaluate_pronunciation.await_args.kwargs["expected_word"] == "rato"
+
+
+def test_small_recordings_are_rejected(evaluation_service):
+    body, status, _ = asyncio.run(evaluation_service.evaluate_pronunciation(
+        MagicMock(), IdempotencyCache(), "user-1", io.BytesIO(b"x"), "rato"))
+
+    assert status == 400 and body["error_code"] == "SMALL_AUDIO"
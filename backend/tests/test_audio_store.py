@@ -0,0 +1,69 @@
+import os
+
+from backend.speech.audio_store import AudioStore
+
+
+def test_put_is_content_addressed(tmp_path):
+    store = AudioStore(directory=str(tmp_path))
+    audio_hash = store.put(b"ID3 audio")
+
+    assert audio_hash == AudioStore.content_hash(b"ID3 audio")
+    assert store.put(b"ID3 audio") == audio_hash
+    assert store.get(audio_hash) == b"ID3 audio"
+    assert store.path(audio_hash).endswith(f"{audio_hash}.mp3")
+
+
+def test_lookup_survives_new_store(tmp_path):
+    settings = {'voice_id': 'Ines'}
+    store = AudioStore(directory=str(tmp_path))
+    audio_hash = store.put(b"ID3 rato")
+    store.remember("rato", settings, audio_hash)
+
+    other_worker = AudioStore(directory=str(tmp_path))
+    assert other_worker.lookup("rato", settings) == audio_hash
+    assert other_worker.lookup("rato", {'voice_id': 'Cristiano'}) is None
+
+
+def test_rejects_invalid_hashes(tmp_path):
+    store = AudioStore(directory=str(tmp_path))
+    assert store.path("../../etc/passwd") is None
+    assert store.get("abc") is None
+
+
+def test_memory_cache_is_bounded(tmp_path):
+    store = AudioStore(directory=str(tmp_path), memory_items=2)
+    hashes = [store.put(bytes([i]) * 10) for i in range(3)]
+
+    assert len(store._memory) == 2
+    assert store.get(hashes[0]) == bytes([0]) * 10
+
+
+def test_disk_budget_evicts_least_recently_used_clips(tmp_path):
+    store = AudioStore(directory=str(tmp_path), max_bytes=350)
+    hashes = []
+    for i in range(3):
+        hashes.append(store.put(bytes([i]) * 100))
+        store.remember(f"palavra {i}", None, hashes[-1])
+        # Older clips were last used earlier
+        os.utime(store.path(hashes[-1]), (1000 + i, 1000 + i))
+    store.put_metadata(hashes[0], "visemes", [])
+
+    store.put(bytes([3]) * 100)
+
+    assert store.path(hashes[0]) is None
+    assert store.get_metadata(hashes[0], "visemes") is None
+    assert store.lookup("palavra 0") is None
+    assert not os.path.exists(tmp_path / "index" / AudioStore.synthesis_key("palavra 0"))
+    assert store.get(hashes[0]) is None
+    assert store.lookup("palavra 2") == hashes[2]
+
+
+def test_request_index_is_bounded(tmp_path):
+    store = AudioStore(directory=str(tmp_path), index_items=2)
+    audio_hash = store.put(b"ID3 audio")
+    for word in ("rato", "roeu", "roupa"):
+        store.remember(word, None, audio_hash)
+
+    assert len(store._index) == 2
+    # Forgotten entries are read back from disk
+    assert store.lookup("rato") == audio_hash
@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.ai.server.client_middleware import (CompletionMiddleware, ObservedStream,
+                                                 wrap_client)
+
+
+class Recorder(CompletionMiddleware):
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    def create(self, call_next, **kwargs):
+        self.calls.append(self.name)
+        return call_next(**kwargs)
+
+    async def acreate(self, call_next, **kwargs):
+        self.calls.append(self.name)
+        return await call_next(**kwargs)
+
+
+def test_first_middleware_is_outermost():
+    calls = []
+    raw = MagicMock()
+    raw.chat.completions.create = AsyncMock(return_value="completion")
+    client = wrap_client(raw, [Recorder("outer", calls), Recorder("inner", calls)],
+                         is_async=True)
+
+    result = asyncio.run(client.chat.completions.create(model="m", messages=[]))
+
+    assert result == "completion" and calls == ["outer", "inner"]
+    raw.chat.completions.create.assert_awaited_once_with(model="m", messages=[])
+    # Everything else is forwarded to the wrapped client
+    assert client.models is raw.models
+    assert client.chat.completions.with_raw_response is raw.chat.completions.with_raw_response
+
+
+def test_observed_stream_reports_chunks_and_close_once():
+    chunks, closed = [], []
+    stream = ObservedStream(iter(["a", "b"]), on_chunk=chunks.append, on_close=closed.append)
+
+    assert list(stream) == ["a", "b"]
+    del stream
+
+    assert chunks == ["a", "b"] and closed == [False]
+
+
+def test_abandoned_stream_is_closed_as_failed():
+    closed = []
+    stream = ObservedStream(iter(["a"]), on_close=closed.append)
+    del stream
+
+    assert closed == [True]
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from backend.ai.server.completion_cache import CachedClient, CompletionCache, completion_key
+
+MESSAGES = [{"role": "system", "content": "És um terapeuta da fala."},
+            {"role": "user", "content": "Cria instruções."}]
+
+
+def make_completion(content):
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 1, "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}]})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CompletionCache(str(tmp_path / "completions.sqlite3"), ttl=60, max_entries=10)
+
+
+def make_client(cache, is_async=False):
+    raw = MagicMock()
+    create = AsyncMock() if is_async else MagicMock()
+    create.side_effect = lambda **kwargs: make_completion(f"resposta {create.call_count}")
+    raw.chat.completions.create = create
+    return CachedClient(raw, cache, is_async=is_async), create
+
+
+def test_key_ignores_argument_order_and_transport_options():
+    first = completion_key({"model": "gpt-4o-mini", "messages": MESSAGES,
+                            "response_format": {"type": "json_object"}})
+    second = completion_key({"response_format": {"type": "json_object"}, "timeout": 5,
+                             "messages": MESSAGES, "model": "gpt-4o-mini"})
+
+    assert first == second
+    assert first != completion_key({"model": "gpt-4o", "messages": MESSAGES,
+                                    "response_format": {"type": "json_object"}})
+
+
+def test_repeated_request_is_served_from_cache(cache):
+    client, create = make_client(cache)
+
+    first = client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+    second = client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+    assert create.call_count == 1
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert cache.metrics()["hits"] == 1
+
+
+def test_opt_out_and_streaming_bypass_the_cache(cache):
+    client, create = make_client(cache)
+
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, cache=False)
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, cache=False)
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, stream=True)
+
+    assert create.call_count == 3
+    assert "cache" not in create.call_args.kwargs
+    assert cache.metrics()["entries"] == 0
+
+
+def test_async_client_and_persistence(cache, tmp_path):
+    client, create = make_client(cache, is_async=True)
+
+    asyncio.run(client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES))
+
+    # Another process opening the same file sees the completion
+    reopened, create_again = make_client(
+        CompletionCache(cache.path, ttl=60, max_entries=10), is_async=True)
+    completion = asyncio.run(
+        reopened.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES))
+
+    assert completion.choices[0].message.content == "resposta 1"
+    assert create_again.call_count == 0
+
+
+def test_expired_entries_are_not_served(tmp_path):
+    cache = CompletionCache(str(tmp_path / "completions.sqlite3"), ttl=0, max_entries=10)
+    client, create = make_client(cache)
+
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+    time.sleep(0.01)
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+    assert create.call_count == 2
+
+
+def test_size_bound_drops_least_recently_used(tmp_path):
+    cache = CompletionCache(str(tmp_path / "completions.sqlite3"), ttl=60, max_entries=2)
+    for index in range(3):
+        cache.put(f"key-{index}", "{}")
+    cache.get("key-0")
+    cache._prune(cache._connect(), time.time())
+
+    assert cache.get("key-0") == "{}"
+    assert cache.get("key-1") is None
+    assert cache.metrics()["entries"] == 2
+
+
+def test_hits_do_not_write_until_a_batch_or_store(cache):
+    client, create = make_client(cache)
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+    before = cache._connect().total_changes
+
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+    assert cache._connect().total_changes == before
+
+    # The pending last use is written with the next store
+    client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+    assert not cache._touched
+
+
+def test_rate_governor_lane_does_not_change_the_key(cache):
+    client, create = make_client(cache)
+
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, lane="background")
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, lane="interactive")
+
+    assert create.call_count == 1
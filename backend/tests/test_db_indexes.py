@@ -0,0 +1,35 @@
+from unittest.mock import MagicMock
+
+import pymongo
+import pytest
+
+import backend.database.db_connector as db_connector_module
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    client = MagicMock()
+    monkeypatch.setattr(db_connector_module, "MongoClient", MagicMock(return_value=client))
+    return client.get_database.return_value
+
+
+def test_index_failure_keeps_the_connection(mongo):
+    mongo.idempotency_cache.create_index.side_effect = pymongo.errors.OperationFailure("denied")
+
+    db = db_connector_module.DatabaseConnector()
+
+    assert db.connected
+    mongo.pronunciation_evaluations.create_index.assert_called_once_with(
+        "idempotency_key", unique=True,
+        partialFilterExpression={"idempotency_key": {"$type": "string"}})
+
+
+def test_concurrent_retry_returns_the_first_evaluation(mongo):
+    evaluations = mongo.pronunciation_evaluations
+    evaluations.update_one.side_effect = pymongo.errors.DuplicateKeyError("duplicate")
+    evaluations.find_one.return_value = {"_id": "first"}
+    db = db_connector_module.DatabaseConnector()
+
+    assert db.save_pronunciation_evaluation("session-1", "rato", "rato", True, 9,
+                                            idempotency_key="key") == "first"
+    mongo.sessions.update_one.assert_not_called()
@@ -0,0 +1,129 @@
+import asyncio
+import sys
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import backend.speech.g2p as g2p
+from backend.ai.server.deadline import (
+    DeadlineExceeded, bind_deadline, deadline_after, remaining, within_deadline)
+from backend.ai.server.mcp_server import MCPServer, Message, ModelContext
+from backend.ai.server.rate_governor import GovernedClient
+
+
+def message(tool="slow"):
+    return Message(from_agent="api", to_agent="agent", tool=tool, params={})
+
+
+def test_handler_is_cancelled_at_the_deadline():
+    server = MCPServer()
+    seen = {}
+
+    async def handler(message, context):
+        seen["remaining"] = remaining()
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            seen["cancelled"] = True
+            raise
+
+    server.register_handler("agent", handler)
+
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(server.process_message(message(), ModelContext(timeout=0.1)))
+
+    assert time.perf_counter() - started < 0.5
+    assert 0 < seen["remaining"] <= 0.1
+    assert seen["cancelled"]
+
+
+def test_earlier_deadline_wins_and_tasks_inherit_it():
+    async def run():
+        with bind_deadline(deadline_after(1)):
+            with bind_deadline(deadline_after(10)):
+                return await asyncio.create_task(asyncio.sleep(0, result=remaining()))
+
+    assert 0 < asyncio.run(run()) <= 1
+    assert remaining() is None
+
+
+def test_completion_timeout_ends_at_the_deadline():
+    raw = MagicMock()
+    raw.chat.completions.create = AsyncMock(return_value=MagicMock(usage=None))
+    client = GovernedClient(raw, None)
+
+    async def call(timeout):
+        with bind_deadline(deadline_after(timeout)):
+            return await client.chat.completions.create(model="gpt-4o-mini", messages=[],
+                                                        timeout=60)
+
+    asyncio.run(call(2))
+    assert 0 < raw.chat.completions.create.call_args.kwargs["timeout"] <= 2
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(call(-1))
+
+
+def test_tutor_degrades_when_the_budget_is_short(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from ai.agents.tutor_agent import TutorAgent
+    # The agents' own copy of the module (imported as ai.*, not backend.ai.*)
+    from ai.server.deadline import bind_deadline, deadline_after
+
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock()
+    agent = TutorAgent(client=client)
+    agent.voice_enabled = True
+
+    async def synthesis(text, voice_config):
+        await asyncio.sleep(0.05 if text.startswith("Olá") else 2)
+        return b"audio"
+
+    agent._synthesize_speech_async = synthesis
+
+    async def run():
+        with bind_deadline(deadline_after(1.5)):
+            return await agent.create_instructions({"id": "user-1", "age": 7}, "iniciante")
+
+    started = time.perf_counter()
+    instructions = asyncio.run(run())
+
+    # No completion with too little time for it; only the fast segment is voiced
+    assert client.chat.completions.create.await_count == 0
+    assert instructions["greeting"].startswith("Olá")
+    assert instructions["audio"]["greeting"] == b"audio"
+    assert instructions["audio"]["explanation"] is None
+    assert time.perf_counter() - started < 1.5
+
+
+def test_slow_model_game_is_replaced_before_the_deadline(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setitem(sys.modules, "speech.g2p", g2p)
+    from ai.server import mcp_coordinator
+    from ai.server.deadline import bind_deadline, deadline_after, within_deadline
+
+    system = mcp_coordinator.MCPSystem(api_key="test-key", db_connector=MagicMock())
+    cancelled = []
+
+    async def slow_game(**kwargs):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    system._game_designer_instance = MagicMock()
+    system._game_designer_instance.create_game = slow_game
+
+    async def run():
+        with bind_deadline(deadline_after(1)):
+            return await within_deadline(system._design_game(
+                "user-1", "iniciante", "rimas", "llm", fallback=True))
+
+    started = time.perf_counter()
+    game, source = asyncio.run(run())
+
+    assert source == "template" and game["exercises"]
+    assert cancelled
+    assert time.perf_counter() - started < 1
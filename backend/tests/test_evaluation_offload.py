@@ -0,0 +1,42 @@
+import asyncio
+import io
+import sys
+import threading
+from unittest.mock import MagicMock
+
+import backend.speech.g2p as g2p
+
+
+def test_evaluation_keeps_the_event_loop_free(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setitem(sys.modules, "speech.g2p", g2p)
+    from ai.server import mcp_coordinator
+
+    system = mcp_coordinator.MCPSystem(api_key="test-key", db_connector=MagicMock())
+    system.game_pool = None
+    recognizing = threading.Event()
+    release = threading.Event()
+
+    def recognize(audio_data, language):
+        # Blocks its thread until the loop has shown it is still serving
+        recognizing.set()
+        assert release.wait(5)
+        return {"has_speech": False, "recognized_text": "", "hypotheses": [],
+                "conversion_failed": False}
+
+    system._recognize_audio = recognize
+
+    async def other_request():
+        while not recognizing.is_set():
+            await asyncio.sleep(0.01)
+        release.set()
+
+    async def run():
+        return await asyncio.gather(
+            system.evaluate_pronunciation(io.BytesIO(b"x" * 200), "rato", user_id="user-1"),
+            other_request())
+
+    result, _ = asyncio.run(run())
+
+    assert result["recognized_text"] == "(sem fala detectada)"
+    assert not result["isCorrect"]
@@ -0,0 +1,63 @@
+import sys
+
+import pytest
+
+import backend.speech.g2p as g2p
+from backend.utils.evaluation_plan import (
+    EVALUATION_PLAN_VERSION, compile_game_plan, exercise_plan, find_plan)
+
+
+@pytest.fixture
+def real_g2p(monkeypatch):
+    # conftest replaces the speech package with a mock
+    monkeypatch.setitem(sys.modules, "speech.g2p", g2p)
+
+
+def test_word_plan():
+    plan = exercise_plan("Rato!")
+
+    assert plan["normalized"] == "rato"
+    assert plan["is_sentence"] is False
+    assert plan["is_compound"] is False
+    assert plan["similarity_threshold"] == 80  # short word
+
+
+def test_compound_word_plan():
+    plan = exercise_plan("guarda-chuva")
+
+    assert plan["no_space"] == "guardachuva"
+    assert plan["is_compound"] is True
+    assert plan["similarity_threshold"] == 80
+
+
+def test_tongue_twister_plan():
+    plan = exercise_plan("O rato roeu a roupa do rei de Roma, o rato roeu")
+
+    assert plan["is_sentence"] is True
+    assert plan["is_tongue_twister"] is True
+    assert plan["sentence_threshold"] == 0.7
+    assert plan["fixes"] == ["leading_o"]
+
+
+def test_plans_are_memoized():
+    assert exercise_plan("sapato") is exercise_plan("sapato")
+
+
+def test_game_plan_includes_phonemes(real_g2p):
+    game = {"exercises": [{"word": "Rato"}, {"word": "Coelho"}, {"prompt": "sem palavra"}]}
+
+    plans = compile_game_plan(game)
+
+    assert set(plans) == {"rato", "coelho"}
+    assert "rr" in plans["rato"]["target_sounds"]
+    assert "lh" in plans["coelho"]["target_sounds"]
+    assert plans["rato"]["phonemes"]
+
+
+def test_find_plan_ignores_outdated_versions(real_g2p):
+    plans = compile_game_plan({"content": {"exercises": [{"word": "Mesa"}]}})
+
+    assert find_plan(plans, "mesa!")["normalized"] == "mesa"
+    plans["mesa"]["version"] = EVALUATION_PLAN_VERSION - 1
+    assert find_plan(plans, "mesa") is None
+    assert find_plan(None, "mesa") is None
@@ -0,0 +1,38 @@
+from backend.speech.feedback_audio import split_feedback
+from backend.speech.mp3_frames import Frame, parse_frames, silent_frame, splice
+
+
+def _mp3(frames, header=b"\xff\xfb\x90\xc4"):
+    """Silent MP3 made of identical frames (default: 128 kbps, 44.1 kHz, mono)"""
+    frame = silent_frame(Frame(None, 0, header))
+    return frame * frames
+
+
+def test_split_feedback_templates():
+    assert split_feedback("Boa pronúncia de 'rato'! Continue assim.") == [
+        "Boa pronúncia de", "rato", "Continue assim."]
+    assert split_feedback("Tente novamente. Eu ouvi 'pato' mas esperava 'rato'.") == [
+        "Tente novamente. Eu ouvi", "pato", "mas esperava", "rato"]
+
+
+def test_split_feedback_rejects_unusual_messages():
+    assert split_feedback("Muito bem!") is None
+    assert split_feedback(
+        "Tente novamente. Eu ouvi 'o gato comeu a sopa toda' mas esperava 'rato'.") is None
+
+
+def test_splice_keeps_every_frame():
+    first, second = _mp3(20), _mp3(8)
+    joined = splice([b"ID3\x03\x00\x00\x00\x00\x00\x00" + first, second], gap_seconds=0.05)
+
+    frames = parse_frames(joined)
+    gap = len(frames) - len(parse_frames(first)) - len(parse_frames(second))
+    assert gap == 2
+    assert joined.startswith(b"\xff\xfb")
+
+
+def test_splice_refuses_mixed_formats():
+    # Same frame at 48 kHz instead of 44.1 kHz
+    other_rate = _mp3(8, header=b"\xff\xfb\x94\xc4")
+    assert len(parse_frames(other_rate)) == 8
+    assert splice([_mp3(20), other_rate]) is None
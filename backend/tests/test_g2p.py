@@ -0,0 +1,46 @@
+from backend.speech.g2p import (phonemes_to_visemes, sentence_to_phonemes, syllables,
+                                target_sounds, transcribe, word_to_phonemes)
+from backend.speech.lipsync import LipsyncGenerator
+
+
+def test_word_to_phonemes_handles_digraphs():
+    assert transcribe("carro") == "kaʁu"
+    assert transcribe("rato") == "ʁatu"
+    assert transcribe("ninho") == "niɲu"
+    assert transcribe("coelho") == "kuɛʎu"
+    assert transcribe("escola") == "iʃkɔlɐ"
+
+
+def test_word_to_phonemes_is_memoized():
+    word_to_phonemes.cache_clear()
+    word_to_phonemes("Sapato")
+    word_to_phonemes("Sapato")
+    assert word_to_phonemes.cache_info().hits == 1
+
+
+def test_sentence_to_phonemes_keeps_word_order():
+    words = [word for word, _ in sentence_to_phonemes("O rato roeu a roupa!")]
+    assert words == ["O", "rato", "roeu", "a", "roupa"]
+
+
+def test_target_sounds():
+    assert "rr" in target_sounds("rato")
+    assert "r" not in target_sounds("rato")
+    assert "lh" in target_sounds("coelho")
+    assert "s" in target_sounds("caça")
+
+
+def test_syllables_and_stress():
+    assert syllables("carro") == (("car", "ro"), 0)
+    assert syllables("galinha") == (("ga", "li", "nha"), 1)
+    assert syllables("estrela") == (("es", "tre", "la"), 1)
+    assert syllables("helicóptero") == (("he", "li", "cóp", "te", "ro"), 2)
+    assert syllables("guarda-chuva") == (("guar", "da", "chu", "va"), 2)
+
+
+def test_phoneme_visemes():
+    assert phonemes_to_visemes(word_to_phonemes("bola")) == ["B", "O", "L", "A"]
+    generator = LipsyncGenerator(rhubarb_path=None)
+    assert generator.generate_lipsync_for_phoneme("lh") == "L"
+    assert generator.generate_lipsync_for_phoneme("f") == "F"
+    assert generator.generate_lipsync_for_phoneme("") == "X"
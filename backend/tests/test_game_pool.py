@@ -0,0 +1,109 @@
+import time
+
+from backend.ai.server.game_pool import GamePool, game_fingerprint
+
+CATALOGUE = {"iniciante": ["rimas", "sons"], "médio": ["frases"]}
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def make_pool(size=2):
+    calls = []
+
+    async def generate(difficulty, game_type):
+        calls.append((difficulty, game_type))
+        return {"title": f"{game_type} {len(calls)}", "game_type": game_type,
+                "difficulty": difficulty, "exercises": [{"word": f"palavra{len(calls)}"}]}
+
+    return GamePool(generate, CATALOGUE, size=size), calls
+
+
+def test_warm_fills_every_entry():
+    pool, calls = make_pool()
+    pool.warm()
+
+    wait_until(lambda: pool.metrics()["ready"] == 6)
+    assert pool.metrics()["depth"]["iniciante/rimas"] == 2
+    assert len(calls) == 6
+
+
+def test_take_refills_in_background():
+    pool, calls = make_pool()
+    pool.warm()
+    wait_until(lambda: pool.metrics()["ready"] == 6)
+
+    game = pool.take("user-1", "médio", "frases")
+
+    assert game["game_type"] == "frases"
+    wait_until(lambda: pool.metrics()["depth"]["médio/frases"] == 2)
+    assert pool.metrics()["hits"] == 1
+
+
+def test_user_does_not_get_a_game_twice():
+    pool, _ = make_pool(size=1)
+    pool.warm()
+    wait_until(lambda: pool.metrics()["ready"] == 3)
+
+    first = pool.take("user-1", "médio")
+    pool.mark_seen("user-2", first)
+    wait_until(lambda: pool.metrics()["ready"] == 3)
+
+    # Refill produced a different game; user-2 already has the first one
+    second = pool.take("user-2", "médio")
+    assert game_fingerprint(second) != game_fingerprint(first)
+
+
+def test_unknown_entries_are_not_pooled():
+    pool, calls = make_pool()
+
+    assert pool.take("user-1", "iniciante", "jogo personalizado") is None
+    assert pool.take("user-1", "desconhecido") is None
+    assert calls == []
+
+
+def test_failed_generation_is_counted():
+    async def generate(difficulty, game_type):
+        raise RuntimeError("model unavailable")
+
+    pool = GamePool(generate, {"iniciante": ["rimas"]}, size=1)
+    assert pool.take("user-1", "iniciante") is None
+
+    wait_until(lambda: pool.metrics()["failures"] == 1)
+    assert pool.metrics()["generating"] == 0
+    assert pool.metrics()["misses"] == 1
+
+
+class SeenStore:
+    """Stands in for the database shared by the workers"""
+
+    def __init__(self):
+        self.seen = {}
+
+    def get_seen_games(self, user_id):
+        return list(self.seen.get(user_id, []))
+
+    def add_seen_game(self, user_id, fingerprint, limit):
+        self.seen[user_id] = (self.seen.get(user_id, []) + [fingerprint])[-limit:]
+
+
+def test_games_seen_through_another_worker_are_skipped():
+    store = SeenStore()
+    pool, _ = make_pool(size=1)
+    other_worker, _ = make_pool(size=1)
+    pool._seen_store = other_worker._seen_store = store
+    pool.warm()
+    wait_until(lambda: pool.metrics()["ready"] == 3)
+
+    # The other worker handed out the same game to user-2
+    ready = pool._games[("médio", "frases")][0][1]
+    other_worker.mark_seen("user-2", ready)
+
+    assert pool.take("user-2", "médio", "frases") is None
+    assert pool.metrics()["skipped_seen"] == 1
+    game = pool.take("user-1", "médio", "frases")
+    assert store.seen["user-1"] == [game_fingerprint(game)]
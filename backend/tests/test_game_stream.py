@@ -0,0 +1,75 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from backend.utils.json_stream import ArrayItemStream
+
+GAME = {
+    "title": "Sons do {R}",
+    "exercises": [
+        {"word": "rato", "hint": "Diz \"rrr\" ]", "feedback": {"correct": "Boa!"}},
+        {"word": "carro", "hint": "Vibra a língua", "feedback": {"correct": "Muito bem!"}},
+    ],
+    "extra": [{"word": "not an exercise"}],
+}
+
+
+def test_items_are_emitted_as_each_object_closes():
+    text = json.dumps(GAME, ensure_ascii=False)
+    parser = ArrayItemStream("exercises")
+
+    emitted_at = []
+    items = []
+    for position in range(0, len(text), 7):
+        completed = parser.feed(text[position:position + 7])
+        items.extend(completed)
+        emitted_at.extend([position] * len(completed))
+
+    assert items == GAME["exercises"]
+    # The first exercise is available well before the document ends
+    assert emitted_at[0] < text.index("carro")
+    assert parser.document() == GAME
+
+
+def test_incomplete_document_raises():
+    parser = ArrayItemStream()
+    parser.feed('{"exercises": [{"word": "rato"}')
+
+    with pytest.raises(json.JSONDecodeError):
+        parser.document()
+
+
+class FakeStream:
+    def __init__(self, text, size=5):
+        self._pieces = [text[i:i + size] for i in range(0, len(text), size)]
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for piece in self._pieces:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
+def test_game_designer_streams_exercises(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from ai.agents.game_designer_agent import GameDesignerAgent
+
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(
+        return_value=FakeStream(json.dumps(GAME, ensure_ascii=False)))
+    agent = GameDesignerAgent(client=client)
+
+    async def collect():
+        return [event async for event in agent.stream_game("user-1", "iniciante", "rimas")]
+
+    events = asyncio.run(collect())
+
+    assert [event["event"] for event in events] == ["exercise", "exercise", "game"]
+    assert events[1]["exercise"]["word"] == "carro"
+    game = events[-1]["game"]
+    assert game["user_id"] == "user-1" and game["difficulty"] == "iniciante"
+    assert client.chat.completions.create.call_args.kwargs["stream"] is True
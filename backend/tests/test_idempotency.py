@@ -0,0 +1,79 @@
+import threading
+from unittest.mock import MagicMock
+
+from backend.utils.idempotency import IdempotencyCache, make_idempotency_key
+
+
+def test_key_depends_on_audio_and_fields():
+    key = make_idempotency_key(b"audio", "rato", "session-1")
+
+    assert key == make_idempotency_key(b"audio", "rato", "session-1")
+    assert key != make_idempotency_key(b"other audio", "rato", "session-1")
+    assert key != make_idempotency_key(b"audio", "rato", "session-2")
+    assert key != make_idempotency_key(b"audio", "rato", None)
+
+
+def test_cached_result_is_replayed_until_ttl():
+    cache = IdempotencyCache(ttl_seconds=60)
+    cache.set("key", {"success": True, "score": 9})
+
+    result = cache.get("key")
+    result["score"] = 0  # callers may mutate what they get back
+    assert cache.get("key") == {"success": True, "score": 9}
+
+    cache.ttl_seconds = -1
+    cache.set("expired", {"success": True})
+    assert cache.get("expired") is None
+
+
+def test_database_layer_serves_other_workers():
+    db = MagicMock()
+    db.get_idempotent_result.return_value = {"success": True, "score": 7}
+    cache = IdempotencyCache(ttl_seconds=60, db_connector=db)
+
+    assert cache.get("key") == {"success": True, "score": 7}
+    assert cache.get("key") == {"success": True, "score": 7}
+    db.get_idempotent_result.assert_called_once_with("key")
+
+    cache.set("other", {"success": True})
+    db.save_idempotent_result.assert_called_once_with(
+        "other", {"success": True}, 60)
+
+
+def test_concurrent_duplicate_waits_for_the_first_result():
+    cache = IdempotencyCache(ttl_seconds=60)
+    assert cache.claim("key") is None  # first request processes it
+
+    replayed = []
+    duplicate = threading.Thread(target=lambda: replayed.append(cache.claim("key")))
+    duplicate.start()
+    duplicate.join(0.1)
+    assert duplicate.is_alive()
+
+    cache.set("key", {"success": True, "score": 9})
+    duplicate.join(1)
+    assert replayed == [{"success": True, "score": 9}]
+
+
+def test_released_key_is_processed_by_the_waiting_request():
+    cache = IdempotencyCache(ttl_seconds=60)
+    assert cache.claim("key") is None
+
+    claimed = []
+    duplicate = threading.Thread(target=lambda: claimed.append(cache.claim("key")))
+    duplicate.start()
+    cache.release("key")
+    duplicate.join(1)
+
+    assert claimed == [None]
+    assert "key" in cache._in_flight
+
+
+def test_request_in_flight_in_another_worker_is_waited_for():
+    db = MagicMock()
+    db.get_idempotent_result.side_effect = [None, None, {"success": True}]
+    db.claim_idempotent_request.return_value = False
+    cache = IdempotencyCache(ttl_seconds=60, db_connector=db)
+
+    assert cache.claim("key") == {"success": True}
+    assert not cache._in_flight
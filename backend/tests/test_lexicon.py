@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from backend.utils.lexicon import Lexicon, LexiconFormatError, build_lexicon, open_lexicon
+
+ENTRIES = [
+    {"pt_pt": "Autocarro", "pt_br": "Ônibus", "meaning": "Transporte público."},
+    {"pt_pt": "Camisola", "pt_br": "Camiseta/Suéter", "meaning": "Peça de roupa."},
+    {"pt_pt": "Cão", "pt_br": "Cachorro", "meaning": "Animal doméstico."},
+    {"pt_pt": "Cão", "pt_br": "Cachorro", "meaning": "Animal doméstico."},
+    {"pt_pt": "Giro", "pt_br": "Legal", "meaning": "Bonito.", "ambiguous": "Legal"},
+    {"pt_pt": "Fixe", "pt_br": "Legal", "meaning": "Bom."},
+    {"pt_pt": "Pequeno-almoço", "pt_br": "Café da manhã", "meaning": "Refeição."},
+]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "words.json"
+    path.write_text(json.dumps(ENTRIES), encoding="utf-8")
+    return str(path)
+
+
+def test_lookup_by_either_variant(source, tmp_path):
+    path = str(tmp_path / "words.lex")
+    assert build_lexicon(source, path) == 6  # duplicate dropped
+
+    lexicon = Lexicon(path)
+
+    assert len(lexicon) == 6
+    assert lexicon.max_words == 3
+    assert lexicon.lookup_pt("cão")[0]["pt_br"] == "Cachorro"
+    assert lexicon.lookup_br("ÔNIBUS")[0]["pt_pt"] == "Autocarro"
+    assert lexicon.lookup_br("suéter")[0]["pt_pt"] == "Camisola"
+    assert [entry["pt_pt"] for entry in lexicon.lookup_br("legal")] == ["Giro", "Fixe"]
+    assert lexicon.lookup_br("legal")[0]["ambiguous"] == "Legal"
+    assert "ambiguous" not in lexicon.lookup_br("legal")[1]
+    assert lexicon.lookup_br("café da manhã")[0]["pt_pt"] == "Pequeno-almoço"
+    assert lexicon.lookup_br("sumo") == []
+
+
+def test_entries_keep_source_order(source, tmp_path):
+    path = str(tmp_path / "words.lex")
+    build_lexicon(source, path)
+
+    entries = list(Lexicon(path).entries(limit=2))
+
+    assert [entry["pt_pt"] for entry in entries] == ["Autocarro", "Camisola"]
+    assert entries[0] == ENTRIES[0]
+
+
+def test_rebuilt_when_missing_or_stale(source, tmp_path):
+    path = str(tmp_path / "words.lex")
+    assert len(open_lexicon(source, path)) == 6
+
+    with open(source, "w", encoding="utf-8") as f:
+        json.dump(ENTRIES[:1], f)
+    stale = os.path.getmtime(path) - 10
+    os.utime(path, (stale, stale))
+
+    assert len(open_lexicon(source, path)) == 1
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "bogus.lex"
+    path.write_bytes(b"not a lexicon at all, just some bytes")
+
+    with pytest.raises(LexiconFormatError):
+        Lexicon(str(path))
@@ -0,0 +1,91 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from backend.speech.lipsync import LipsyncGenerator
+
+
+SAMPLE_RATE = 16000
+
+
+def _wav_bytes(*segments):
+    """Build a mono 16-bit WAV from (seconds, is_voiced) segments"""
+    parts = []
+    for seconds, voiced in segments:
+        t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+        if voiced:
+            parts.append((0.5 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16))
+        else:
+            parts.append(np.zeros(len(t), dtype=np.int16))
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(np.concatenate(parts).tobytes())
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def generator():
+    lipsync = LipsyncGenerator(rhubarb_path=None)
+    lipsync.installed = False
+    return lipsync
+
+
+def test_fallback_lipsync_ends_with_audio(generator):
+    audio = _wav_bytes((0.3, False), (0.4, True), (0.3, False))
+    cues = generator.generate_lipsync(audio, "bola")
+
+    assert cues[0] == {'start': 0.0, 'end': 0.3, 'value': 'X'}
+    assert cues[-1]['end'] == pytest.approx(1.0)
+    assert cues[-1]['value'] == 'X'
+
+
+def test_fallback_lipsync_keeps_words_in_voiced_regions(generator):
+    audio = _wav_bytes((0.3, False), (0.4, True),
+                       (0.3, False), (0.4, True), (0.3, False))
+    cues = generator.generate_lipsync(audio, "bola azul")
+
+    pause = [cue for cue in cues if cue['start'] == pytest.approx(0.7)]
+    assert pause and pause[0]['value'] == 'X'
+    assert pause[0]['end'] == pytest.approx(1.0)
+
+    # Every non-neutral cue lies inside one of the voiced regions
+    for cue in cues:
+        if cue['value'] != 'X':
+            assert (0.3 <= cue['start'] and cue['end'] <= 0.7) or \
+                (1.0 <= cue['start'] and cue['end'] <= 1.4)
+
+
+def test_fallback_lipsync_without_text_follows_envelope(generator):
+    audio = _wav_bytes((0.2, False), (0.5, True), (0.2, False))
+    cues = generator.generate_lipsync(audio)
+
+    assert [cue['value'] for cue in cues] == ['X', 'A', 'X']
+    assert cues[1]['start'] == pytest.approx(0.2)
+    assert cues[1]['end'] == pytest.approx(0.7)
+
+
+def test_fallback_lipsync_silence_is_neutral(generator):
+    audio = _wav_bytes((0.5, False))
+    assert generator.generate_lipsync(audio, "olá") == [
+        {'start': 0.0, 'end': 0.5, 'value': 'X'}]
+
+
+def test_lipsync_from_speech_marks(generator):
+    marks = [
+        {'time': 0, 'type': 'viseme', 'value': 'p'},
+        {'time': 100, 'type': 'viseme', 'value': 'O'},
+        {'time': 250, 'type': 'viseme', 'value': 't'},
+        {'time': 300, 'type': 'viseme', 'value': 'a'},
+        {'time': 450, 'type': 'viseme', 'value': 'sil'},
+    ]
+    cues = generator.lipsync_from_speech_marks(marks, duration=0.6)
+
+    assert [cue['value'] for cue in cues] == ['B', 'O', 'D', 'A', 'X']
+    assert cues[1] == {'start': 0.1, 'end': 0.25, 'value': 'O'}
+    assert cues[-1]['end'] == pytest.approx(0.6)
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.ai.server.mcp_server import (
+    MCPServer, Message, ModelContext, WorkflowError, WorkflowStep)
+
+
+def make_server(delay=0.1):
+    server = MCPServer()
+    calls = []
+
+    async def handler(message, context):
+        calls.append(message.tool)
+        await asyncio.sleep(delay)
+        if message.tool == "fail":
+            return {"error": "model unavailable"}
+        return {"tool": message.tool, **message.params}
+
+    server.register_handler("agent", handler)
+    return server, calls
+
+
+def message(tool, **params):
+    return Message(from_agent="system", to_agent="agent", tool=tool, params=params)
+
+
+def test_independent_steps_run_concurrently():
+    server, _ = make_server(delay=0.1)
+    context = ModelContext()
+    steps = [WorkflowStep("persona", message("persona")),
+             WorkflowStep("difficulty", message("difficulty")),
+             WorkflowStep("game", lambda done: message("game", level=done["difficulty"]["tool"]),
+                          depends_on=["difficulty"])]
+
+    started = time.perf_counter()
+    result = asyncio.run(server.run_workflow(steps, context))
+    elapsed = time.perf_counter() - started
+
+    # Critical path is two steps long, not three
+    assert elapsed < 0.28
+    assert result["results"]["game"]["level"] == "difficulty"
+    assert context.get("persona")["tool"] == "persona"
+    assert result["timings"]["game"]["start"] >= result["timings"]["difficulty"]["duration"]
+
+
+def test_failed_step_cancels_the_rest():
+    server, calls = make_server(delay=0.05)
+    steps = [WorkflowStep("broken", message("fail"), description="Persona selection"),
+             WorkflowStep("slow", message("slow")),
+             WorkflowStep("after", message("after"), depends_on=["broken"])]
+
+    with pytest.raises(WorkflowError, match="Persona selection failed: model unavailable"):
+        asyncio.run(server.run_workflow(steps, ModelContext()))
+    assert "after" not in calls
+
+
+def test_invalid_graphs_are_rejected():
+    server, _ = make_server()
+
+    with pytest.raises(ValueError, match="unknown step"):
+        asyncio.run(server.run_workflow(
+            [WorkflowStep("a", message("a"), depends_on=["missing"])], ModelContext()))
+    with pytest.raises(ValueError, match="cycle"):
+        asyncio.run(server.run_workflow(
+            [WorkflowStep("a", message("a"), depends_on=["b"]),
+             WorkflowStep("b", message("b"), depends_on=["a"])], ModelContext()))
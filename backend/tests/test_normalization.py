@@ -0,0 +1,44 @@
+import re
+
+import pytest
+
+from backend.utils.normalization import normalize_expected, normalize_text
+from backend.utils.text_processing import normalize_text as text_processing_normalize
+
+
+def regex_normalize(text):
+    text = text.lower().replace('-', ' ')
+    text = re.sub(r'[^\w\s\']', '', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+@pytest.mark.parametrize("text", [
+    "Rato",
+    "guarda-chuva",
+    "O rato roeu a roupa do rei de Roma!",
+    "  Olá,   como estás?\t\n",
+    "d'água «aspas» — travessão…",
+    "Ελληνικά; текст, 中文。",
+    "emoji 🐭 rato 🎉!",
+    "snake_case 123",
+])
+def test_matches_regex_normalization(text):
+    assert normalize_text(text) == regex_normalize(text)
+
+
+def test_empty_text():
+    assert normalize_text("") == ""
+    assert normalize_text(None) == ""
+
+
+def test_expected_words_are_memoized():
+    normalize_expected.cache_clear()
+
+    assert normalize_expected("Guarda-Chuva!") == "guarda chuva"
+    normalize_expected("Guarda-Chuva!")
+
+    assert normalize_expected.cache_info().hits == 1
+
+
+def test_text_processing_delegates():
+    assert text_processing_normalize("Pato-Bravo!") == normalize_text("Pato-Bravo!")
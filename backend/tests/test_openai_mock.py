@@ -0,0 +1,92 @@
+import asyncio
+import json
+import random
+import time
+
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from backend.ai.server.openai_client import create_async_openai_client
+from backend.tests.mocks.openai_mock import MockConfig, MockOpenAIServer, fixed, parse_latency
+
+GAME_PROMPT = 'Retorne JSON: {"title": "...", "exercises": [...]}'
+
+
+def raw_client(server):
+    return AsyncOpenAI(api_key="test-key", base_url=server.base_url, max_retries=0)
+
+
+def test_json_mode_through_the_backend_client():
+    with MockOpenAIServer(MockConfig(latency=fixed(0.1))) as server:
+        client = create_async_openai_client("test-key", base_url=server.base_url)
+
+        started = time.perf_counter()
+        completion = asyncio.run(client.chat.completions.create(
+            model="gpt-4o-mini", messages=[{"role": "user", "content": GAME_PROMPT}],
+            response_format={"type": "json_object"}, cache=False))
+        elapsed = time.perf_counter() - started
+
+    game = json.loads(completion.choices[0].message.content)
+    assert len(game["exercises"]) == 5 and game["exercises"][0]["feedback"]
+    assert completion.usage.total_tokens > 0
+    assert elapsed >= 0.1
+
+
+def test_keys_quoted_in_the_prompt_are_filled():
+    with MockOpenAIServer() as server:
+        completion = asyncio.run(raw_client(server).chat.completions.create(
+            model="gpt-4o-mini", response_format={"type": "json_object"},
+            messages=[{"role": "user",
+                       "content": "Retorne JSON com 'greeting', 'explanation' e 'tips'."}]))
+
+    instructions = json.loads(completion.choices[0].message.content)
+    assert set(instructions) == {"greeting", "explanation", "tips"}
+    assert isinstance(instructions["tips"], list)
+
+
+def test_streaming_rebuilds_the_content():
+    config = MockConfig(responses=[("olá", "Olá! Vamos praticar o som R.")], chunk_size=4)
+    with MockOpenAIServer(config) as server:
+        async def collect():
+            stream = await raw_client(server).chat.completions.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": "olá"}], stream=True)
+            return [chunk.choices[0].delta.content or "" async for chunk in stream]
+
+        pieces = asyncio.run(collect())
+
+    assert len(pieces) > 3
+    assert "".join(pieces) == "Olá! Vamos praticar o som R."
+
+
+def test_rate_limit_bursts_and_errors():
+    config = MockConfig(rate_limit_every=3, rate_limit_burst=1, retry_after=0)
+    with MockOpenAIServer(config) as server:
+        client = raw_client(server)
+
+        async def call():
+            return await client.chat.completions.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": "x"}])
+
+        async def run():
+            await call()
+            await call()
+            with pytest.raises(openai.RateLimitError):
+                await call()
+
+            server.config = MockConfig(error_rate=1.0)
+            with pytest.raises(openai.InternalServerError):
+                await call()
+
+        asyncio.run(run())
+        metrics = server.metrics()
+
+    assert metrics["statuses"] == {200: 2, 429: 1, 500: 1}
+
+
+def test_latency_specs():
+    assert parse_latency("0.5")(None) == 0.5
+    rng = random.Random(1)
+    samples = [parse_latency("lognormal:1.0:0.5")(rng) for _ in range(200)]
+    assert all(sample > 0 for sample in samples)
+    assert 0.7 < sorted(samples)[100] < 1.4
@@ -0,0 +1,148 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from backend.ai.server.rate_governor import (
+    BACKGROUND, INTERACTIVE, GovernedClient, RateGovernor, RateLimitRejected, estimate_tokens)
+
+
+def test_requests_beyond_the_bucket_wait_for_refill():
+    # 600 requests per minute: one every 0.1s once the burst is used
+    governor = RateGovernor(rpm=600, tpm=10**6, max_wait=5)
+    governor.requests.level = 1
+
+    async def run():
+        await governor.acquire_async(INTERACTIVE, 10)
+        governor.release(10)
+        await governor.acquire_async(INTERACTIVE, 10)
+        governor.release(10)
+
+    asyncio.run(run())
+
+    lane = governor.metrics()["lanes"][INTERACTIVE]
+    assert lane["admitted"] == 2
+    assert 0.05 < lane["max_wait"] < 1
+
+
+def test_rejects_at_once_when_the_wait_is_too_long():
+    governor = RateGovernor(rpm=60, tpm=10**6, max_wait=0.5)
+    governor.requests.level = 0
+
+    with pytest.raises(RateLimitRejected):
+        governor.acquire(INTERACTIVE, 10)
+    assert governor.metrics()["lanes"][INTERACTIVE]["rejected"] == 1
+    assert governor.metrics()["lanes"][INTERACTIVE]["waiting"] == 0
+
+
+def test_rejects_when_the_queue_is_full():
+    governor = RateGovernor(rpm=60, tpm=10**6, max_queue=0)
+
+    with pytest.raises(RateLimitRejected):
+        governor.acquire(BACKGROUND, 10)
+
+
+def test_background_leaves_the_reserve_for_interactive():
+    governor = RateGovernor(rpm=600, tpm=1000, max_wait=0.2, background_reserve=0.5)
+    governor.tokens.level = 400
+
+    with pytest.raises(RateLimitRejected):
+        governor.acquire(BACKGROUND, 200)
+    governor.acquire(INTERACTIVE, 200)
+
+    assert governor.metrics()["in_flight"] == 1
+
+
+def test_reported_usage_corrects_the_estimate():
+    governor = RateGovernor(rpm=600, tpm=10000)
+    governor.acquire(INTERACTIVE, 1000)
+    governor.release(1000, used=300)
+
+    assert 9250 < governor.metrics()["tokens_available"] <= 10000
+    assert governor.metrics()["in_flight"] == 0
+
+
+def test_client_uses_its_lane_and_reports_usage():
+    governor = RateGovernor(rpm=600, tpm=10000)
+    raw = MagicMock()
+    raw.chat.completions.create = AsyncMock(
+        return_value=SimpleNamespace(usage=SimpleNamespace(total_tokens=42)))
+    client = GovernedClient(raw, governor, lane=BACKGROUND)
+
+    messages = [{"role": "user", "content": "x" * 400}]
+    asyncio.run(client.chat.completions.create(model="gpt-4o-mini", messages=messages,
+                                               max_tokens=100))
+
+    assert estimate_tokens({"messages": messages, "max_tokens": 100}) == 200
+    assert "lane" not in raw.chat.completions.create.call_args.kwargs
+    assert governor.metrics()["lanes"][BACKGROUND]["admitted"] == 1
+
+
+def test_workers_share_the_buckets(tmp_path):
+    path = str(tmp_path / "rate.sqlite3")
+    first = RateGovernor(rpm=60, tpm=10000, max_wait=0.2, state_path=path)
+    second = RateGovernor(rpm=60, tpm=10000, max_wait=0.2, state_path=path)
+
+    first.acquire(INTERACTIVE, 9000)
+    first.release(9000)
+
+    # The other worker sees the tokens the first one took
+    assert second.metrics()["shared"]
+    assert second.metrics()["tokens_available"] < 1100
+    with pytest.raises(RateLimitRejected):
+        second.acquire(INTERACTIVE, 5000)
+
+
+def test_stream_holds_its_slot_until_closed():
+    governor = RateGovernor(rpm=600, tpm=10000)
+    raw = MagicMock()
+
+    async def chunks():
+        for text in ("x" * 40, "y" * 40):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    raw.chat.completions.create = AsyncMock(return_value=chunks())
+    client = GovernedClient(raw, governor)
+    messages = [{"role": "user", "content": "x" * 400}]
+
+    async def run():
+        stream = await client.chat.completions.create(model="gpt-4o-mini", messages=messages,
+                                                      max_tokens=1000, stream=True)
+        assert governor.metrics()["in_flight"] == 1
+        return [chunk async for chunk in stream]
+
+    assert len(asyncio.run(run())) == 2
+    metrics = governor.metrics()
+    assert metrics["in_flight"] == 0
+    # The estimate (1100 tokens) is replaced by the prompt and streamed text (120)
+    assert metrics["tokens_available"] > 9800
+
+
+def test_unavailable_state_admits_this_workers_share_and_retries(tmp_path):
+    # A directory cannot be opened as the state file
+    governor = RateGovernor(rpm=60, tpm=1000, max_wait=0.1, state_path=str(tmp_path),
+                            workers=4)
+
+    governor.acquire(INTERACTIVE, 200)
+    with pytest.raises(RateLimitRejected):
+        governor.acquire(INTERACTIVE, 100)
+    assert governor.metrics()["tpm_limit"] == 250
+    assert not governor.metrics()["shared"]
+
+    # The shared state is used again once it works
+    governor.state_path = str(tmp_path / "rate.sqlite3")
+    governor._retry_at = 0.0
+    governor.acquire(INTERACTIVE, 500)
+    assert governor.metrics()["shared"]
+    assert governor.metrics()["tokens_available"] < 600
+
+
+def test_metrics_do_not_write_the_shared_state(tmp_path):
+    governor = RateGovernor(rpm=60, tpm=1000, state_path=str(tmp_path / "rate.sqlite3"))
+    governor.acquire(INTERACTIVE, 100)
+    changes = governor._connect().total_changes
+
+    governor.metrics()
+
+    assert governor._connect().total_changes == changes
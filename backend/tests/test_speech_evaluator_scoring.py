@@ -0,0 +1,74 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from ai.agents.speech_evaluator_agent import SpeechEvaluatorAgent
+
+
+@pytest.fixture
+def evaluator(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return SpeechEvaluatorAgent(client=MagicMock())
+
+
+def test_best_hypothesis_is_chosen_from_n_best(evaluator):
+    match = evaluator.score_hypotheses(["gato", "pato", "rato"], "rato")
+
+    assert match["text"] == "rato"
+    assert match["similarity"] == 100.0
+
+
+def test_confusion_with_other_game_word_is_reported(evaluator):
+    match = evaluator.score_hypotheses(["sapo"], "sopa", vocabulary=["sapo", "mesa", "sopa"])
+
+    assert match["text"] == "sapo"
+    assert match["closest_word"] == "sapo"
+    assert match["closest_similarity"] > match["similarity"]
+
+
+def test_compound_words_match_without_spaces(evaluator):
+    match = evaluator.score_hypotheses(["guarda chuva"], "guarda-chuva")
+
+    assert match["similarity"] == 100.0
+
+
+def test_empty_hypotheses(evaluator):
+    match = evaluator.score_hypotheses(["", "  "], "rato")
+
+    assert match["text"] == ""
+    assert match["similarity"] == 0.0
+
+
+def test_alignment_skips_extra_and_missing_words(evaluator):
+    expected = "o rato roeu a roupa do rei".split()
+
+    # A leading extra word must not push every later word out of place
+    assert evaluator._count_aligned_words(["eu"] + expected, expected) == len(expected)
+    # A missing word costs only that word
+    assert evaluator._count_aligned_words(expected[:3] + expected[4:], expected) == len(expected) - 1
+    assert evaluator._count_aligned_words([], expected) == 0
+
+
+def test_evaluation_uses_best_alternative(evaluator):
+    result = asyncio.run(evaluator.evaluate_pronunciation(
+        "pato", "rato", alternatives=["rato"]))
+
+    assert result["isCorrect"] is True
+    assert result["score"] == 10
+    assert result["debug_info"]["n_best"]["text"] == "rato"
+
+
+def test_evaluation_without_alternatives_is_unchanged(evaluator):
+    result = asyncio.run(evaluator.evaluate_pronunciation("pato", "rato"))
+
+    assert result["isCorrect"] is False
+    assert "n_best" not in result["debug_info"]
+
+
+def test_sentence_uses_plan_fixes(evaluator):
+    result = asyncio.run(evaluator.evaluate_pronunciation(
+        "globo mau comeu a avó", "O lobo mau comeu a avó"))
+
+    assert result["isCorrect"] is True
+    assert result["debug_info"]["sentence_match"] is True
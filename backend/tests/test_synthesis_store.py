@@ -0,0 +1,46 @@
+import pytest
+
+import backend.speech.synthesis as synthesis
+from backend.speech.audio_store import AudioStore
+
+
+class FailingBackend:
+    def synthesize(self, text, voice_settings=None):
+        raise RuntimeError("throttled")
+
+    def synthesize_with_marks(self, text, voice_settings=None):
+        raise RuntimeError("throttled")
+
+
+class FallbackBackend:
+    def synthesize(self, text, voice_settings=None):
+        return b"fallback " + text.encode("utf-8")
+
+    def synthesize_with_marks(self, text, voice_settings=None):
+        return self.synthesize(text, voice_settings), None
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = AudioStore(directory=str(tmp_path))
+    backends = {"polly": FailingBackend(), "gtts": FallbackBackend()}
+    monkeypatch.setattr(synthesis, "audio_store", store)
+    monkeypatch.setattr(synthesis, "TTS_SERVICE", "AMAZON")
+    monkeypatch.setattr(synthesis, "get_tts_backend", backends.__getitem__)
+    return store
+
+
+def test_fallback_audio_is_not_remembered_for_the_request(store):
+    voice = {"voice_id": "Ines"}
+
+    audio_hash = synthesis.synthesize_to_store("rato", voice, with_visemes=True)
+
+    assert store.get(audio_hash) == b"fallback rato"
+    # The next request tries the voice that was asked for again
+    assert store.lookup("rato", voice) is None
+
+
+def test_first_choice_audio_is_remembered(store):
+    audio_hash = synthesis.synthesize_to_store("rato")
+
+    assert store.lookup("rato", None) == audio_hash
@@ -0,0 +1,96 @@
+import asyncio
+import sys
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import backend.speech.g2p as g2p
+from backend.ai.agents.template_game_generator import LatencyTracker, TemplateGameGenerator
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setitem(sys.modules, "speech.g2p", g2p)
+    return TemplateGameGenerator(seed=7)
+
+
+def test_all_templates_are_loaded(generator):
+    assert len(generator.templates) == 9
+    assert generator.template_kind("jogos de rimas simples") == "rimas"
+    assert generator.template_kind("palavras cruzadas") == "palavras_cruzadas"
+    assert generator.template_kind("trava-línguas") == "desafios_de_pronúncia"
+    assert generator.template_kind("qualquer outro") == "exercícios_de_pronúncia"
+
+
+def test_games_follow_the_create_game_schema(generator):
+    for kind in generator.templates:
+        game = generator.create_game("user-1", "médio", kind.replace("_", " "))
+
+        assert game["template"] == kind
+        assert game["user_id"] == "user-1" and game["difficulty"] == "médio"
+        assert game["game_id"] and game["status"] == "active" and game["instructions"]
+        assert len(game["exercises"]) == 5
+        for exercise in game["exercises"]:
+            assert {"word", "prompt", "hint", "type", "feedback"} <= set(exercise)
+            assert {"correct", "incorrect"} <= set(exercise["feedback"])
+
+
+def test_words_match_difficulty_and_sound(generator):
+    game = generator.create_game("user-1", "iniciante", "exercícios de pronúncia", target_sound="r")
+
+    assert game["target_sound"] == "r"
+    assert "'r'" in " ".join(game["target_skills"])
+    for exercise in game["exercises"]:
+        syllables, _ = g2p.syllables(exercise["word"])
+        assert len(syllables) <= 2
+        assert g2p.has_target_sound(exercise["word"], "r")
+
+
+def test_kind_specific_fields(generator):
+    rhymes = generator.create_game("user-1", "iniciante", "rimas")
+    for exercise in rhymes["exercises"]:
+        assert exercise["rhymes"] and exercise["starter"] == exercise["word"]
+
+    stress = generator.create_game("user-1", "avançado", "sílaba tônica")
+    for exercise in stress["exercises"]:
+        assert exercise["correct_answer"] in exercise["options"]
+
+
+def test_generation_takes_milliseconds(generator):
+    started = time.perf_counter()
+    for _ in range(50):
+        generator.create_game("user-1", "médio", "trava-línguas")
+
+    assert (time.perf_counter() - started) / 50 < 0.01
+
+
+def test_slow_model_switches_to_templates_until_the_next_probe():
+    tracker = LatencyTracker(threshold=5, probe_interval=60)
+    tracker.record(2)
+    assert not tracker.use_templates()
+
+    tracker.record(30)
+    assert tracker.use_templates()
+
+    tracker.probe_interval = 0
+    assert not tracker.use_templates()
+
+
+def test_failed_model_falls_back_to_templates(monkeypatch, generator):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from ai.server import mcp_coordinator
+
+    monkeypatch.setattr(mcp_coordinator, "get_template_game_generator", lambda: generator)
+    system = mcp_coordinator.MCPSystem(api_key="test-key", db_connector=MagicMock())
+    system.game_pool = None
+    system._game_designer_instance = MagicMock()
+    system._game_designer_instance.create_game = AsyncMock(side_effect=RuntimeError("timeout"))
+
+    game, source = asyncio.run(system._design_game(
+        "user-1", "iniciante", "rimas", "llm", fallback=True))
+
+    assert source == "template" and game["template"] == "rimas"
+    assert system.llm_game_latency.latency == system.llm_game_latency.threshold * 2
+    with pytest.raises(RuntimeError):
+        asyncio.run(system._design_game("user-1", "iniciante", "rimas", "llm", fallback=False))
@@ -0,0 +1,142 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.ai.server.openai_client import create_async_openai_client
+from backend.ai.server.token_accounting import (
+    MeteredClient, PromptSection, TokenLedger, count_message_tokens, count_tokens,
+    fit_prompt, get_token_ledger)
+from backend.tests.mocks.openai_mock import MockOpenAIServer
+# The copy of the module the token accounting reads the running agent from
+from utils.agent_logger import agent_call
+
+
+def chunk(content):
+    return MagicMock(choices=[MagicMock(delta=MagicMock(content=content))])
+
+
+def test_optional_sections_are_dropped_lowest_priority_first():
+    texts = ["Olá " * 100, "banana " * 100, "cenoura " * 100, "Formato JSON."]
+    sections = [
+        PromptSection("intro", texts[0]),
+        PromptSection("examples", texts[1], optional=True, priority=2),
+        PromptSection("style", texts[2], optional=True, priority=1),
+        PromptSection("format", texts[3]),
+    ]
+    total = sum(count_tokens(text) for text in texts) + len(texts)
+
+    assert fit_prompt(sections, budget=total).count("\n\n") == 3
+    prompt = fit_prompt(sections, budget=total - count_tokens(texts[2]))
+    assert "banana" in prompt and "cenoura" not in prompt
+    # Required sections stay even over the budget
+    assert fit_prompt(sections, budget=10) == texts[0] + "\n\n" + texts[3]
+
+
+def test_calls_are_recorded_per_agent_method():
+    ledger = TokenLedger()
+    raw = MagicMock()
+    raw.chat.completions.create = AsyncMock(return_value=MagicMock(
+        usage=MagicMock(prompt_tokens=120, completion_tokens=30)))
+    client = MeteredClient(raw, ledger, is_async=True)
+
+    async def run():
+        with agent_call("TUTOR", "create_instructions"):
+            await client.chat.completions.create(model="gpt-4o-mini", messages=[])
+            await client.chat.completions.create(model="gpt-4o-mini", messages=[])
+        await client.chat.completions.create(model="gpt-4o-mini", messages=[])
+
+    asyncio.run(run())
+    metrics = ledger.metrics()
+
+    tutor = next(m for m in metrics["methods"] if m["agent"] == "TUTOR")
+    assert tutor["method"] == "create_instructions"
+    assert tutor["calls"] == 2 and tutor["prompt_tokens"] == 240
+    assert tutor["completion_tokens"] == 60 and tutor["budget"]
+    assert [m["agent"] for m in metrics["methods"]] == ["TUTOR", "UNKNOWN"]
+    assert len(metrics["recent"]) == 3
+
+
+def test_streams_are_counted_from_their_chunks():
+    ledger = TokenLedger()
+    raw = MagicMock()
+
+    async def stream():
+        for content in ["Olá, ", None, "vamos praticar o som R!"]:
+            yield chunk(content)
+
+    raw.chat.completions.create = AsyncMock(return_value=stream())
+    client = MeteredClient(raw, ledger, is_async=True)
+    messages = [{"role": "user", "content": "olá " * 50}]
+
+    async def run():
+        with agent_call("GAMEDESIGNER", "stream_game"):
+            result = await client.chat.completions.create(
+                model="gpt-4o-mini", messages=messages, stream=True)
+        return [c.choices[0].delta.content async for c in result]
+
+    asyncio.run(run())
+    call = ledger.metrics()["recent"][0]
+
+    assert call["method"] == "stream_game"
+    assert call["prompt_tokens"] == count_message_tokens(messages, "gpt-4o-mini")
+    assert call["completion_tokens"] > 0
+    assert call["first_token"] is not None and not call["error"]
+
+
+def test_failed_calls_are_recorded():
+    ledger = TokenLedger()
+    raw = MagicMock()
+    raw.chat.completions.create = MagicMock(side_effect=RuntimeError("boom"))
+    client = MeteredClient(raw, ledger, is_async=False)
+
+    try:
+        client.chat.completions.create(model="gpt-4o-mini", messages=[])
+    except RuntimeError:
+        pass
+
+    assert ledger.metrics()["methods"][0]["errors"] == 1
+
+
+def test_provider_usage_through_the_backend_client():
+    with MockOpenAIServer() as server:
+        client = create_async_openai_client("test-key", base_url=server.base_url)
+        before = len(get_token_ledger().metrics()["recent"])
+
+        async def run():
+            with agent_call("PROGRESSION", "analyze"):
+                return await client.chat.completions.create(
+                    model="gpt-4o-mini", cache=False,
+                    messages=[{"role": "user", "content": "Retorne JSON com 'level'."}])
+
+        completion = asyncio.run(run())
+
+    call = get_token_ledger().metrics()["recent"][before]
+    assert call["agent"] == "PROGRESSION"
+    assert call["prompt_tokens"] == completion.usage.prompt_tokens
+    assert call["completion_tokens"] == completion.usage.completion_tokens
+
+
+def test_tutor_drops_the_history_over_budget(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from ai.agents.tutor_agent import TutorAgent
+    from ai.server import token_accounting
+
+    monkeypatch.setitem(token_accounting.PROMPT_TOKEN_BUDGETS, "TUTOR", 60)
+    monkeypatch.setattr(token_accounting, "_token_ledger", TokenLedger())
+
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=MagicMock(choices=[MagicMock(
+        message=MagicMock(content='{"greeting": "Olá", "explanation": "x", '
+                                  '"encouragement": "y", "tips": []}'))]))
+    agent = TutorAgent(client=client)
+    agent.voice_enabled = False
+    agent.interaction_history["user-1"] = {"sessions": [{
+        "date": "2026-10-01", "game_type": "rimas", "target_sound": "r",
+        "performance": "bom " * 40}]}
+
+    asyncio.run(agent.create_instructions({"id": "user-1", "name": "Rita"}, "iniciante"))
+
+    prompt = client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+    assert "Rita" in prompt and "última sessão" not in prompt
+    trimmed = token_accounting.get_token_ledger().metrics()["methods"][0]
+    assert (trimmed["agent"], trimmed["method"]) == ("TUTOR", "create_instructions")
+    assert trimmed["trimmed"] == {"history": 1}
@@ -0,0 +1,118 @@
+import io
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.speech.tts_backends import LocalBackend, PollyBackend, TTSTimeoutError
+
+
+@pytest.mark.asyncio
+async def test_local_backend_overlaps_requests():
+    backend = LocalBackend(max_concurrency=4, latency=0.1)
+
+    start = time.monotonic()
+    results = await asyncio.gather(
+        *[backend.synthesize_async(f"frase {i}") for i in range(4)])
+    elapsed = time.monotonic() - start
+
+    assert all(audio.startswith(b"\xff\xfb") for audio in results)
+    assert elapsed < 0.3
+    assert backend.stats["requests"] == 4
+    assert backend.stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_queues_requests():
+    backend = LocalBackend(max_concurrency=1, latency=0.05)
+
+    start = time.monotonic()
+    await asyncio.gather(*[backend.synthesize_async("olá") for _ in range(3)])
+
+    assert time.monotonic() - start >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_timeout_raises():
+    backend = LocalBackend(timeout=0.05, latency=0.2)
+
+    with pytest.raises(TTSTimeoutError):
+        await backend.synthesize_async("olá")
+    assert backend.stats["timeouts"] == 1
+
+
+def test_audio_length_follows_text():
+    backend = LocalBackend()
+    assert len(backend.synthesize("a" * 100)) > len(backend.synthesize("a"))
+
+
+def test_voices_are_cached():
+    backend = LocalBackend()
+    calls = []
+    original = backend.list_voices
+    backend.list_voices = lambda: calls.append(1) or original()
+
+    assert backend.get_available_voices() == backend.get_available_voices()
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_local_backend_returns_canned_speech_marks():
+    backend = LocalBackend()
+    audio, marks = await backend.synthesize_with_marks_async("bola")
+
+    assert audio
+    assert [mark["value"] for mark in marks] == ["p", "O", "t", "a", "sil"]
+    assert all(mark["type"] == "viseme" for mark in marks)
+    assert marks[-1]["time"] < backend.duration("bola") * 1000
+
+
+def test_gtts_internals_used_by_the_backend_exist():
+    # GTTSBackend sends gTTS's own prepared requests over its session
+    from gtts import gTTS
+
+    tts = gTTS(text="olá", lang="pt")
+    requests = tts._prepare_requests()
+
+    assert requests and all(request.url and request.body for request in requests)
+    # The RPC id the backend looks for in the response
+    assert "jQ1olc" in requests[0].body
+
+
+class FakePolly:
+    """Answers only once the audio and marks requests are both in flight"""
+
+    def __init__(self):
+        self.both_in_flight = threading.Barrier(2, timeout=1)
+
+    def synthesize_speech(self, OutputFormat, **kwargs):
+        self.both_in_flight.wait()
+        if OutputFormat == "json":
+            return {"AudioStream": io.BytesIO(b'{"time": 0, "type": "viseme", "value": "p"}\n')}
+        return {"AudioStream": io.BytesIO(b"ID3 audio")}
+
+
+POLLY_SETTINGS = {"voice_id": "Ines", "engine": "standard",
+                  "language_code": "pt-PT", "sample_rate": "22050"}
+
+
+def test_polly_requests_audio_and_marks_concurrently():
+    polly = FakePolly()
+    backend = PollyBackend(lambda: polly, POLLY_SETTINGS, max_concurrency=2)
+
+    audio, marks = backend.synthesize_with_marks("pato")
+
+    assert audio == b"ID3 audio"
+    assert marks == [{"time": 0, "type": "viseme", "value": "p"}]
+
+
+@pytest.mark.asyncio
+async def test_polly_async_requests_audio_and_marks_concurrently():
+    polly = FakePolly()
+    backend = PollyBackend(lambda: polly, POLLY_SETTINGS, max_concurrency=2)
+
+    audio, marks = await backend.synthesize_with_marks_async("pato")
+
+    assert audio == b"ID3 audio" and marks[0]["value"] == "p"
+    assert backend.stats["requests"] == 2
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+import backend.speech.tts_jobs as tts_jobs_module
+from backend.speech.audio_store import AudioStore
+from backend.speech.tts_jobs import TTSJobQueue, TTSQueueFullError
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = AudioStore(directory=str(tmp_path))
+    release = threading.Event()
+
+    def fake_synthesize(text, voice_settings=None, with_visemes=False):
+        release.wait(5)
+        audio_hash = store.put(text.encode("utf-8"))
+        store.remember(text, voice_settings, audio_hash)
+        return audio_hash
+
+    monkeypatch.setattr(tts_jobs_module, "audio_store", store)
+    monkeypatch.setattr(tts_jobs_module, "synthesize_to_store", fake_synthesize)
+    store.release = release
+    return store
+
+
+def test_job_runs_in_background(store):
+    queue = TTSJobQueue(max_workers=1)
+    job = queue.submit("rato")
+    assert job["status"] in ("queued", "running")
+
+    # Submitting the same text again joins the pending job
+    assert queue.submit("rato")["job_id"] == job["job_id"]
+    assert queue.stats["submitted"] == 1
+
+    store.release.set()
+    finished = queue.wait(job["job_id"], 5)
+    assert finished["status"] == "done"
+    assert store.get(finished["audio_hash"]) == b"rato"
+
+
+def test_cached_audio_returns_immediately(store):
+    store.remember("bola", None, store.put(b"bola"))
+    queue = TTSJobQueue()
+
+    job = queue.submit("bola")
+    assert job["status"] == "done"
+    assert queue.stats["cache_hits"] == 1
+
+
+def test_other_workers_see_finished_jobs(store):
+    queue = TTSJobQueue()
+    store.release.set()
+    job = queue.submit("casa")
+    queue.wait(job["job_id"], 5)
+
+    other_worker = TTSJobQueue()
+    assert other_worker.get(job["job_id"])["status"] == "done"
+    assert other_worker.get("0" * 64) is None
+
+
+def test_rejects_when_saturated(store):
+    queue = TTSJobQueue(max_workers=1, max_pending=1)
+    queue.submit("um")
+
+    with pytest.raises(TTSQueueFullError):
+        queue.submit("dois")
+    store.release.set()
+
+
+def test_other_workers_see_pending_jobs(store):
+    queue = TTSJobQueue(max_workers=1)
+    job = queue.submit("pato")
+
+    other_worker = TTSJobQueue()
+    assert other_worker.get(job["job_id"])["status"] in ("queued", "running")
+
+    # A long-poll on another worker waits for the job to finish
+    threading.Timer(0.2, store.release.set).start()
+    finished = other_worker.wait(job["job_id"], 5)
+    assert finished["status"] == "done"
+    assert store.get(finished["audio_hash"]) == b"pato"
+
+
+def test_abandoned_jobs_expire(store):
+    queue = TTSJobQueue(max_workers=1, job_ttl=0)
+    job = queue.submit("gato")
+
+    assert TTSJobQueue(job_ttl=0).get(job["job_id"]) is None
+    store.release.set()
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import threading
+from unittest.mock import AsyncMock, MagicMock
+
+import backend.speech.synthesis as synthesis_module
+from backend.speech.audio_store import AudioStore
+
+
+def test_segments_are_synthesized_concurrently(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from ai.agents.tutor_agent import TutorAgent
+
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=MagicMock(choices=[MagicMock(
+        message=MagicMock(content=json.dumps({
+            "greeting": "Olá", "explanation": "Vamos jogar", "encouragement": "Força",
+            "tips": ["Fala devagar"]})))]))
+    agent = TutorAgent(client=client)
+    agent.voice_enabled = True
+
+    running = {"now": 0, "max": 0}
+
+    async def slow_synthesis(text, voice_config):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            running["now"] -= 1
+        if text == "Fala devagar":
+            raise RuntimeError("TTS unavailable")
+        return f"audio:{text}".encode("utf-8")
+
+    agent._synthesize_speech_async = slow_synthesis
+
+    instructions = asyncio.run(agent.create_instructions({"id": "user-1", "age": 7}, "iniciante"))
+
+    # All four segments were in flight together
+    assert running["max"] == 4
+    assert set(instructions["audio"]) == {"greeting", "explanation", "encouragement"}
+    assert instructions["audio"]["explanation"] == b"audio:Vamos jogar"
+
+
+def test_cached_segments_skip_synthesis(tmp_path, monkeypatch):
+    store = AudioStore(directory=str(tmp_path))
+    backend = MagicMock()
+    backend.synthesize_async = AsyncMock(return_value=b"mp3 bytes")
+    synthesize = backend.synthesize_async
+    monkeypatch.setattr(synthesis_module, "audio_store", store)
+    monkeypatch.setattr(synthesis_module, "get_tts_backend", lambda name: backend)
+    store_threads = []
+    lookup = store.lookup
+
+    def tracked_lookup(*args):
+        store_threads.append(threading.current_thread())
+        return lookup(*args)
+
+    monkeypatch.setattr(store, "lookup", tracked_lookup)
+
+    first = asyncio.run(synthesis_module.synthesize_cached_async("Olá", {"voice_id": "Ines"}))
+    second = asyncio.run(synthesis_module.synthesize_cached_async("Olá", {"voice_id": "Ines"}))
+
+    assert first == second == b"mp3 bytes"
+    assert synthesize.await_count == 1
+    # The store's file access never runs on the event loop's thread
+    assert store_threads and threading.main_thread() not in store_threads
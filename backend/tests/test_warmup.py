@@ -0,0 +1,69 @@
+import asyncio
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import backend.speech.g2p as g2p
+
+
+@pytest.fixture
+def system(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setitem(sys.modules, "speech.g2p", g2p)
+    from ai.server import mcp_coordinator
+
+    system = mcp_coordinator.MCPSystem(api_key="test-key", db_connector=MagicMock())
+    system.game_pool = None
+    return system
+
+
+def test_warm_up_builds_every_agent_before_ready(system):
+    assert not system.ready
+
+    asyncio.run(system.warm_up())
+
+    assert system.ready and system.warmup_seconds >= 0
+    assert system._tutor_instance.game_designer is system._game_designer_instance
+    for agent in (system._game_designer_instance, system._speech_evaluator_instance,
+                  system._tutor_instance):
+        assert agent.client is system.client
+
+
+def test_handlers_reuse_the_warm_agents(system):
+    asyncio.run(system.warm_up())
+    tutor = system._tutor_instance
+
+    asyncio.run(system._ensure_agents())
+
+    assert system._tutor_instance is tutor
+
+
+def test_handlers_initialize_agents_without_warm_up(system):
+    designer = MagicMock()
+    designer.initialize = AsyncMock()
+    system._game_designer_instance = designer
+
+    asyncio.run(system._ensure_agents())
+
+    # Agents already provided are kept and not initialized again
+    assert system._game_designer_instance is designer
+    designer.initialize.assert_not_awaited()
+    assert system._progression_manager_instance is not None
+    assert not system.ready
+
+
+def test_agents_without_a_model_build_no_client(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    from ai.agents.progression_manager_agent import ProgressionManagerAgent
+
+    assert ProgressionManagerAgent().client is None
+
+
+def test_game_pool_is_not_filled_at_startup_by_default(system):
+    system.game_pool = MagicMock()
+
+    asyncio.run(system.warm_up())
+
+    # Each worker would otherwise generate the whole catalogue on every deploy
+    system.game_pool.warm.assert_not_called()
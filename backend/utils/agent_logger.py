@@ -4,7 +4,27 @@ Utility functions for standardized agent logging across the application
 import logging
 import functools
 import inspect
-from typing import Optional, Callable, Any
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Callable, Any, Iterator, Tuple
+
+# Agent and method whose code is running (for token accounting of model calls)
+_agent_call: ContextVar[Tuple[str, str]] = ContextVar("agent_call", default=("UNKNOWN", "unknown"))
+
+
+def current_agent_call() -> Tuple[str, str]:
+    """(agent, method) of the innermost running agent call"""
+    return _agent_call.get()
+
+
+@contextmanager
+def agent_call(agent_name: str, method_name: str) -> Iterator[None]:
+    """Attribute the model calls made inside the block to an agent method"""
+    token = _agent_call.set((agent_name, method_name))
+    try:
+        yield
+    finally:
+        _agent_call.reset(token)
 
 
 def get_agent_logger(agent_name: str) -> logging.Logger:
@@ -97,7 +117,8 @@ def log_agent_call(func: Callable) -> Callable:
 
         logger.info(f"Starting {method_name}({params_str})")
         try:
-            result = await func(*args, **kwargs)
+            with agent_call(agent_name, method_name):
+                result = await func(*args, **kwargs)
 
             # Truncate result for logging if it's too long
             result_str = str(result)
@@ -129,7 +150,8 @@ def log_agent_call(func: Callable) -> Callable:
         logger.info(
             f"Starting {method_name} (args: {arg_count}, kwargs: {kwarg_count})")
         try:
-            result = func(*args, **kwargs)
+            with agent_call(agent_name, method_name):
+                result = func(*args, **kwargs)
             logger.info(f"Completed {method_name}")
             return result
         except Exception as e:
@@ -0,0 +1,156 @@
+"""
+Aho-Corasick automaton for multi-pattern search.
+
+Finds every occurrence of any number of patterns in a single pass over the
+text, so lexicon checks stay linear in the text length however many entries
+the lexicons have. Used for tongue twister detection, recognition error
+fixes and PT-BR vocabulary detection.
+"""
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# (start, end, pattern, value) of one occurrence; text[start:end] == pattern
+Match = Tuple[int, int, str, Any]
+
+
+class AhoCorasick:
+    """
+    Automaton built once from a set of patterns.
+
+    Patterns are matched exactly (callers lowercase or normalize both sides).
+    Each pattern carries a value, e.g. the replacement or lexicon entry.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]] = ()):
+        """
+        Build the automaton
+
+        Args:
+            patterns: (pattern, value) pairs; empty patterns are ignored and
+                a repeated pattern keeps its last value
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Pattern ending at each node, and the nearest pattern-ending suffix
+        self._pattern: List[Optional[Tuple[str, Any]]] = [None]
+        self._output_link: List[int] = [-1]
+
+        for pattern, value in patterns:
+            if pattern:
+                self._add(pattern, value)
+        self._build_links()
+
+    def __len__(self) -> int:
+        return sum(1 for pattern in self._pattern if pattern is not None)
+
+    def _add(self, pattern: str, value: Any):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._pattern.append(None)
+                self._output_link.append(-1)
+            node = next_node
+        self._pattern[node] = (pattern, value)
+
+    def _build_links(self):
+        """Breadth-first computation of failure and output links"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+
+                suffix = self._fail[child]
+                self._output_link[child] = (
+                    suffix if self._pattern[suffix] is not None
+                    else self._output_link[suffix])
+
+    def iter_matches(self, text: str) -> Iterator[Match]:
+        """
+        All occurrences of all patterns, overlapping ones included
+
+        Yields:
+            (start, end, pattern, value) in order of end position
+        """
+        goto, fail = self._goto, self._fail
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            match_node = node if self._pattern[node] is not None else self._output_link[node]
+            while match_node > 0:
+                pattern, value = self._pattern[match_node]
+                yield index + 1 - len(pattern), index + 1, pattern, value
+                match_node = self._output_link[match_node]
+
+    def contains_any(self, text: str) -> bool:
+        """Whether any pattern occurs in the text"""
+        return next(self.iter_matches(text), None) is not None
+
+    def find(self, text: str, whole_words: bool = False) -> List[Match]:
+        """
+        Leftmost-longest, non-overlapping occurrences
+
+        Args:
+            text: Text to search
+            whole_words: Only accept occurrences not glued to letters or
+                digits on either side
+
+        Returns:
+            Matches in text order
+        """
+        candidates = self.iter_matches(text)
+        if whole_words:
+            candidates = (match for match in candidates
+                          if _is_word_boundary(text, match[0], match[1]))
+
+        selected: List[Match] = []
+        for match in sorted(candidates, key=lambda match: (match[0], -match[1])):
+            if not selected or match[0] >= selected[-1][1]:
+                selected.append(match)
+        return selected
+
+    def replace(self, text: str, replacement: Callable[[Match], Optional[str]],
+                whole_words: bool = False) -> str:
+        """
+        Replace occurrences in one pass
+
+        Args:
+            text: Text to rewrite
+            replacement: Called with each match; returns the new text, or
+                None to keep the occurrence unchanged
+            whole_words: See find()
+
+        Returns:
+            The rewritten text
+        """
+        parts = []
+        position = 0
+        for match in self.find(text, whole_words):
+            new_text = replacement(match)
+            if new_text is None:
+                continue
+            parts.append(text[position:match[0]])
+            parts.append(new_text)
+            position = match[1]
+        parts.append(text[position:])
+        return "".join(parts)
+
+
+def _is_word_boundary(text: str, start: int, end: int) -> bool:
+    """Whether text[start:end] is not part of a longer word"""
+    return ((start == 0 or not text[start - 1].isalnum()) and
+            (end == len(text) or not text[end].isalnum()))
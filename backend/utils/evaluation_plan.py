@@ -0,0 +1,127 @@
+"""
+Per-exercise evaluation plans.
+
+Everything the pronunciation scorer needs to know about an expected word or
+phrase (normalized forms, tokens, thresholds, recognition fixes) depends
+only on the exercise. Plans are compiled once when a game is stored and
+saved with it, together with the exercise's phonemes and target sounds, so
+evaluating an utterance is reduced to lookups plus the similarity kernel.
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from .normalization import normalize_expected
+
+# Bump when the plan layout or the rules below change; stored plans with
+# another version are ignored and compiled again on use
+EVALUATION_PLAN_VERSION = 1
+
+# Expected texts with at least this many words are scored as sentences
+SENTENCE_MIN_WORDS = 4
+
+# Fuzzy similarity (0-100) needed to accept a word
+SHORT_OR_COMPOUND_THRESHOLD = 80
+WORD_THRESHOLD = 90
+
+# Share of words, in order, needed to accept a sentence
+TONGUE_TWISTER_THRESHOLD = 0.7
+SENTENCE_THRESHOLD = 0.8
+
+
+def _recognition_fixes(normalized: str) -> List[str]:
+    """Portuguese recognition errors worth correcting for a phrase"""
+    fixes = []
+    if "o lobo" in normalized:
+        fixes.append("globo")       # "o lobo" heard as "globo"
+    if normalized.startswith("o "):
+        fixes.append("leading_o")   # "o" heard as "ou"
+    if normalized.startswith("a "):
+        fixes.append("leading_a")   # initial article dropped
+    return fixes
+
+
+@lru_cache(maxsize=4096)
+def _compile(expected: str) -> Dict[str, Any]:
+    normalized = normalize_expected(expected)
+    tokens = normalized.split()
+    is_compound = " " in normalized
+    is_tongue_twister = len(tokens) > 5 and len(set(tokens)) < len(tokens) * 0.8
+
+    return {
+        "version": EVALUATION_PLAN_VERSION,
+        "expected": expected,
+        "normalized": normalized,
+        "no_space": normalized.replace(" ", ""),
+        "tokens": tokens,
+        "is_sentence": len(tokens) >= SENTENCE_MIN_WORDS,
+        "is_compound": is_compound,
+        "is_tongue_twister": is_tongue_twister,
+        "similarity_threshold": (SHORT_OR_COMPOUND_THRESHOLD
+                                 if len(normalized) <= 4 or is_compound
+                                 else WORD_THRESHOLD),
+        "sentence_threshold": (TONGUE_TWISTER_THRESHOLD if is_tongue_twister
+                               else SENTENCE_THRESHOLD),
+        "fixes": _recognition_fixes(normalized),
+    }
+
+
+def exercise_plan(expected: str) -> Dict[str, Any]:
+    """
+    Evaluation plan for an expected word or phrase, memoized.
+
+    The returned dict is shared between calls and must not be modified.
+
+    Args:
+        expected: Text the user should say
+
+    Returns:
+        Plan used by the pronunciation scorer
+    """
+    return _compile(expected or "")
+
+
+def compile_game_plan(game_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Evaluation plans for every exercise of a game, to store with it.
+
+    Args:
+        game_data: Game as generated (with 'exercises') or as stored
+
+    Returns:
+        Plans keyed by the normalized expected word, including phonemes
+        and therapy target sounds
+    """
+    from speech.g2p import target_sounds, transcribe
+
+    exercises = game_data.get("exercises")
+    if exercises is None:
+        content = game_data.get("content", [])
+        exercises = content.get("exercises", []) if isinstance(content, dict) else content
+
+    plans = {}
+    for exercise in exercises or []:
+        if not isinstance(exercise, dict) or not exercise.get("word"):
+            continue
+        plan = dict(exercise_plan(exercise["word"]))
+        plan["tokens"] = list(plan["tokens"])
+        plan["fixes"] = list(plan["fixes"])
+        plan["phonemes"] = transcribe(exercise["word"])
+        plan["target_sounds"] = sorted(target_sounds(exercise["word"]))
+        plans[plan["normalized"]] = plan
+    return plans
+
+
+def find_plan(game_plans: Optional[Dict[str, Dict[str, Any]]],
+              expected: str) -> Optional[Dict[str, Any]]:
+    """
+    Stored plan for an expected word, if present and up to date.
+
+    Returns:
+        The plan, or None if the game has no current plan for the word
+    """
+    if not game_plans:
+        return None
+    plan = game_plans.get(normalize_expected(expected))
+    if plan and plan.get("version") == EVALUATION_PLAN_VERSION:
+        return plan
+    return None
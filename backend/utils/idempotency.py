@@ -0,0 +1,176 @@
+"""
+Idempotency cache for retried requests.
+
+Clinic networks often make the frontend resubmit the same recording. Results
+are cached under a key derived from the request content for a short TTL, in
+memory and (when MongoDB is available) in the database so a retry that lands
+on another worker is answered too.
+
+A request being processed is marked in flight (an event per key in this
+worker, a "processing" document in the database for the others), so a retry
+arriving before the first attempt finishes waits for its result instead of
+evaluating the recording a second time.
+"""
+import os
+import copy
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long a result is replayed for identical requests, in seconds
+EVALUATION_IDEMPOTENCY_TTL = int(
+    os.environ.get("EVALUATION_IDEMPOTENCY_TTL", "300"))
+
+# How long a retry waits for the attempt in flight before processing anyway
+EVALUATION_IDEMPOTENCY_WAIT = float(
+    os.environ.get("EVALUATION_IDEMPOTENCY_WAIT", "30"))
+
+# Seconds after which another worker may take over a request whose worker
+# stopped without storing a result
+EVALUATION_PROCESSING_LEASE = int(
+    os.environ.get("EVALUATION_PROCESSING_LEASE", "60"))
+
+# Interval between database checks while another worker processes a request
+_POLL_INTERVAL = 0.2
+
+
+def make_idempotency_key(payload: bytes, *parts: Optional[str]) -> str:
+    """
+    Build an idempotency key from request content.
+
+    Args:
+        payload: Raw request body (e.g. the uploaded audio)
+        parts: Other fields identifying the request (None is allowed)
+
+    Returns:
+        Hex sha256 key
+    """
+    payload_hash = hashlib.sha256(payload).hexdigest()
+    return hashlib.sha256(
+        json.dumps([payload_hash, *parts]).encode("utf-8")).hexdigest()
+
+
+class IdempotencyCache:
+    """
+    TTL cache of request results, with an optional database layer.
+    """
+
+    def __init__(self, ttl_seconds: int = EVALUATION_IDEMPOTENCY_TTL,
+                 max_entries: int = 1024, db_connector=None,
+                 wait_seconds: float = EVALUATION_IDEMPOTENCY_WAIT,
+                 lease_seconds: int = EVALUATION_PROCESSING_LEASE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_connector = db_connector
+        self.wait_seconds = wait_seconds
+        self.lease_seconds = lease_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "waits": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for a key, or None if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return copy.deepcopy(entry[1])
+            if entry:
+                del self._entries[key]
+
+        result = None
+        if self.db_connector is not None:
+            result = self.db_connector.get_idempotent_result(key)
+        if result is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        self._remember(key, result, now)
+        return result
+
+    def claim(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Result for a key, waiting while an identical request is in flight
+
+        Returns:
+            The result of a previous or concurrent identical request. None
+            means the caller now processes the request and must call set()
+            with its result, or release() if it fails; identical requests
+            arriving meanwhile wait for it (up to wait_seconds, after which
+            they process it too).
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            result = self.get(key)
+            if result is not None:
+                return result
+
+            with self._lock:
+                event = self._in_flight.get(key)
+                if event is None:
+                    self._in_flight[key] = threading.Event()
+            if event is None:
+                break
+
+            # Another thread of this worker is processing it
+            self.stats["waits"] += 1
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                logger.warning(f"Request {key[:12]} still in flight, processing it again")
+                return None
+
+        if self.db_connector is None:
+            return None
+        # This worker owns the key; another worker may be processing it
+        while not self.db_connector.claim_idempotent_request(key, self.lease_seconds):
+            result = self.db_connector.get_idempotent_result(key)
+            if result is not None:
+                self._remember(key, result, time.monotonic())
+                self._finish(key)
+                return result
+            if time.monotonic() >= deadline:
+                logger.warning(f"Request {key[:12]} still in flight, processing it again")
+                break
+            self.stats["waits"] += 1
+            time.sleep(_POLL_INTERVAL)
+        return None
+
+    def set(self, key: str, result: Dict[str, Any]):
+        """Cache a result for the TTL and wake the requests waiting for it"""
+        self._remember(key, result, time.monotonic())
+        try:
+            if self.db_connector is not None:
+                self.db_connector.save_idempotent_result(
+                    key, result, self.ttl_seconds)
+        finally:
+            self._finish(key)
+
+    def release(self, key: str):
+        """Give up a claimed key (no result): a waiting request processes it"""
+        try:
+            if self.db_connector is not None:
+                self.db_connector.release_idempotent_request(key)
+        finally:
+            self._finish(key)
+
+    def _finish(self, key):
+        with self._lock:
+            event = self._in_flight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _remember(self, key, result, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,93 @@
+"""
+Incremental parsing of a JSON object arriving in pieces.
+
+A language model streams a game as JSON text, a few characters at a time.
+ArrayItemStream scans the text once as it arrives and hands back each
+element of one top-level array (the game's ``exercises``) as soon as that
+element's closing brace arrives, long before the rest of the document.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+
+class ArrayItemStream:
+    """Yields the objects of ``document[key]`` while the document streams in"""
+
+    def __init__(self, key: str = "exercises"):
+        self.key = key
+        self._text = ""
+        self._position = 0
+        # Open containers: "{" or "["
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        # Depth of the target array once it is open
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add text to the document
+
+        Returns:
+            Array elements completed by this chunk, in order
+        """
+        self._text += chunk
+        completed = []
+        text = self._text
+        for position in range(self._position, len(text)):
+            char = text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = json.loads(text[self._string_start:position + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char == ":" and len(self._stack) == 1:
+                self._current_key = self._last_string
+            elif char in "{[":
+                if (char == "[" and self._stack == ["{"]
+                        and self._current_key == self.key):
+                    self._array_depth = 2
+                elif (char == "{" and self._array_depth is not None
+                        and len(self._stack) == self._array_depth):
+                    self._item_start = position
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if (char == "}" and self._item_start is not None
+                        and len(self._stack) == self._array_depth):
+                    item = json.loads(text[self._item_start:position + 1])
+                    if isinstance(item, dict):
+                        completed.append(item)
+                    self._item_start = None
+                elif char == "]" and len(self._stack) == 1 and self._array_depth:
+                    self._array_depth = None
+        self._position = len(text)
+        return completed
+
+    @property
+    def text(self) -> str:
+        """Document received so far"""
+        return self._text
+
+    def document(self) -> Dict[str, Any]:
+        """
+        Parse the whole document once the stream has ended
+
+        Raises:
+            json.JSONDecodeError: If the document is incomplete or invalid
+        """
+        return json.loads(self._text)
@@ -5,9 +5,13 @@ import json
 import os
 import logging
 import re
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple, Union
 
+from .aho_corasick import AhoCorasick
+from .lexicon import get_lexicon, word_spans
+
 logger = logging.getLogger(__name__)
 
 # Common Portuguese tongue twisters for practice
@@ -25,29 +29,20 @@ def load_pt_word_dictionary() -> List[Dict[str, str]]:
     """
     Load the Portuguese words dictionary that maps PT-PT to PT-BR variants
 
+    Entries come from the compiled lexicon (see utils.lexicon), which is
+    memory-mapped once per process instead of parsing the JSON each time.
+
     Returns:
         List of word mappings with pt_pt, pt_br, and meaning fields
     """
     try:
-        dict_path = Path(__file__).parent.parent / \
-            "speech" / "words_pt_ptbr.json"
-
-        if not os.path.exists(dict_path):
-            logger.warning(
-                f"Portuguese word dictionary not found at {dict_path}")
-            return []
-
-        with open(dict_path, 'r', encoding='utf-8') as f:
-            word_dict = json.load(f)
-
-        logger.info(
-            f"Loaded Portuguese word dictionary with {len(word_dict)} entries")
-        return word_dict
+        return list(get_lexicon().entries())
     except Exception as e:
         logger.error(f"Error loading Portuguese word dictionary: {str(e)}")
         return []
 
 
+@lru_cache(maxsize=16)
 def get_pt_avoid_examples(max_examples: int = 10) -> str:
     """
     Get examples of PT-BR words to avoid with their PT-PT equivalents
@@ -59,12 +54,10 @@ def get_pt_avoid_examples(max_examples: int = 10) -> str:
         Formatted string with examples to include in LLM prompts
     """
     try:
-        word_dict = load_pt_word_dictionary()
-        if not word_dict:
-            return ""
-
         # Select a subset of the most common/relevant examples
-        examples = word_dict[:max_examples]
+        examples = list(get_lexicon().entries(limit=max_examples))
+        if not examples:
+            return ""
 
         # Format as a list of substitutions
         formatted_examples = "\n".join([
@@ -82,12 +75,115 @@ Examples of Brazilian Portuguese (PT-BR) words to AVOID and their European Portu
         return ""
 
 
+# Common recognition errors: (heard, meant)
+RECOGNITION_FIXES = [
+    ("globo", "o lobo"),
+    ("ou ", "o "),
+    ("ah ", "a "),
+    ("uh ", "o ")
+]
+
+
+# Automata are built once, at import
+_TWISTER_AUTOMATON = AhoCorasick(
+    (twister.lower(), twister) for twister in PORTUGUESE_TONGUE_TWISTERS)
+_TWISTER_CORPUS = "\0".join(twister.lower() for twister in PORTUGUESE_TONGUE_TWISTERS)
+_RECOGNITION_FIX_AUTOMATON = AhoCorasick(RECOGNITION_FIXES)
+
+
+def _ptbr_entry(lexicon, term: str) -> Optional[Dict[str, str]]:
+    """
+    Dictionary entry for a PT-BR term, unless it is also used in PT-PT
+
+    Terms are skipped when they are a PT-PT word of the lexicon too, or
+    when an entry marks them as ambiguous (everyday PT-PT words that would
+    make the detector flag correct European Portuguese).
+    """
+    entries = lexicon.lookup_br(term)
+    if not entries or lexicon.lookup_pt(term):
+        return None
+    for entry in entries:
+        ambiguous = entry.get("ambiguous", "").lower().split("/")
+        if term in (word.strip() for word in ambiguous):
+            return None
+    return entries[0]
+
+
+def find_ptbr_terms(text: str) -> List[Dict[str, str]]:
+    """
+    Find Brazilian Portuguese words in a text
+
+    Each run of up to the lexicon's longest term in words is looked up in the
+    compiled lexicon, longest first, so nothing is loaded per process.
+
+    Args:
+        text: Text to check
+
+    Returns:
+        One entry per occurrence with the PT-BR term found, the PT-PT word
+        to use instead and its meaning
+    """
+    try:
+        lexicon = get_lexicon()
+    except Exception as e:
+        logger.error(f"Error loading Portuguese word dictionary: {str(e)}")
+        return []
+
+    lowered = text.lower()
+    spans = word_spans(lowered)
+
+    found = []
+    position = 0
+    while position < len(spans):
+        longest = min(lexicon.max_words, len(spans) - position)
+        for count in range(longest, 0, -1):
+            term = lowered[spans[position][0]:spans[position + count - 1][1]]
+            item = _ptbr_entry(lexicon, term)
+            if item is not None:
+                found.append({"pt_br": term, "pt_pt": item["pt_pt"],
+                              "meaning": item.get("meaning", "")})
+                position += count
+                break
+        else:
+            position += 1
+    return found
+
+
+def _collect_strings(value: Any, strings: List[str]):
+    if isinstance(value, str):
+        strings.append(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_strings(item, strings)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_strings(item, strings)
+
+
+def find_ptbr_terms_in_game(game_data: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    Find Brazilian Portuguese words anywhere in a generated game
+
+    All text fields are scanned in a single pass.
+
+    Returns:
+        Distinct PT-BR terms found, with their PT-PT equivalents
+    """
+    strings: List[str] = []
+    _collect_strings(game_data, strings)
+
+    found = {}
+    for term in find_ptbr_terms("\n".join(strings)):
+        found.setdefault(term["pt_br"], term)
+    return list(found.values())
+
+
 def is_tongue_twister(text: str) -> bool:
     """Check if a text is likely a tongue twister in Portuguese"""
-    # Check if it's one of the known tongue twisters
-    for twister in PORTUGUESE_TONGUE_TWISTERS:
-        if text.lower() in twister.lower() or twister.lower() in text.lower():
-            return True
+    # Check if it's one of the known tongue twisters, or part of one
+    lowered = text.lower()
+    if lowered in _TWISTER_CORPUS or _TWISTER_AUTOMATON.contains_any(lowered):
+        return True
 
     # Check for repeating sounds/syllables
     words = text.lower().split()
@@ -109,22 +205,17 @@ def is_tongue_twister(text: str) -> bool:
 
 def fix_common_recognition_errors(recognized: str, expected: str) -> str:
     """Fix common errors in Portuguese speech recognition"""
-    fixed = recognized.lower()
-
-    # Common replacements
-    replacements = [
-        ("globo", "o lobo"),
-        ("ou ", "o "),
-        ("ah ", "a "),
-        ("uh ", "o ")
-    ]
-
-    for wrong, correct in replacements:
-        if wrong in fixed and correct in expected.lower():
-            fixed = fixed.replace(wrong, correct)
-            logger.debug(f"Applied fix: '{wrong}' -> '{correct}'")
-
-    return fixed
+    expected_lower = expected.lower()
+
+    def apply_fix(match):
+        _, _, wrong, correct = match
+        if correct not in expected_lower:
+            return None
+        logger.debug(f"Applied fix: '{wrong}' -> '{correct}'")
+        return correct
+
+    # All replacements in a single pass
+    return _RECOGNITION_FIX_AUTOMATON.replace(recognized.lower(), apply_fix)
 
 
 def evaluate_sentence_similarity(recognized: str, expected: str) -> Tuple[float, str]:
@@ -0,0 +1,275 @@
+"""
+Compiled, memory-mapped PT-PT/PT-BR lexicon.
+
+speech/words_pt_ptbr.json is compiled into a binary file holding the
+records and two sorted key indexes (one per variant). Workers map the file
+read-only, so the operating system shares its pages between them, and a
+lookup by either variant is a binary search over the index: nothing is
+parsed up front however large the lexicon grows.
+
+File layout (little-endian):
+    header   magic, version, record count, count and offset of the PT-PT
+             index and of the PT-BR index, then the most words in a key
+    records  per entry: pt_pt, pt_br, meaning, ambiguous as (u16 length,
+             UTF-8 bytes)
+    keys     lowercased lookup keys as (u16 length, UTF-8 bytes)
+    indexes  sorted arrays of (key offset u32, record offset u32)
+
+The compiled file is rebuilt automatically when it is missing or older
+than the JSON source; scripts/build_lexicon.py builds it ahead of time.
+"""
+import os
+import re
+import json
+import mmap
+import struct
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LEXICON_SOURCE = os.environ.get(
+    "LEXICON_SOURCE",
+    str(Path(__file__).parent.parent / "speech" / "words_pt_ptbr.json"))
+LEXICON_PATH = os.environ.get(
+    "LEXICON_PATH", os.path.splitext(LEXICON_SOURCE)[0] + ".lex")
+
+_MAGIC = b"PTLX"
+_VERSION = 3
+_HEADER = struct.Struct("<4sIIIIIII")
+_LENGTH = struct.Struct("<H")
+_INDEX_ENTRY = struct.Struct("<II")
+_FIELDS = ("pt_pt", "pt_br", "meaning", "ambiguous")
+# Left out of decoded entries when empty, as they are in the source
+_OPTIONAL_FIELDS = ("ambiguous",)
+_WORD = re.compile(r"[^\W_]+")
+
+
+class LexiconFormatError(Exception):
+    """Raised when a compiled lexicon file is invalid"""
+
+
+def _lookup_keys(text: str) -> List[str]:
+    """Keys a word is indexed under ('a/b' entries list alternatives)"""
+    return [part.strip().lower() for part in text.split("/") if part.strip()]
+
+
+def word_spans(text: str) -> List[tuple]:
+    """(start, end) of each word in a text (runs of letters and digits)"""
+    return [match.span() for match in _WORD.finditer(text)]
+
+
+def _pack_string(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return _LENGTH.pack(len(data)) + data
+
+
+def build_lexicon(source: str = LEXICON_SOURCE, path: str = LEXICON_PATH) -> int:
+    """
+    Compile the JSON lexicon into the memory-mappable format
+
+    Args:
+        source: JSON list of {pt_pt, pt_br, meaning} entries; ``ambiguous``
+            lists the PT-BR alternatives that are also everyday PT-PT words
+        path: Where to write the compiled file (replaced atomically)
+
+    Returns:
+        Number of entries written (exact duplicates are dropped)
+    """
+    with open(source, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    records = bytearray()
+    record_offsets = []
+    seen = set()
+    for entry in entries:
+        fields = tuple(str(entry.get(field, "")) for field in _FIELDS)
+        if fields in seen:
+            continue
+        seen.add(fields)
+        record_offsets.append((_HEADER.size + len(records), fields))
+        for value in fields:
+            records += _pack_string(value)
+
+    keys = bytearray()
+    key_offsets: Dict[str, int] = {}
+    indexes = {}
+    max_words = 0
+    keys_start = _HEADER.size + len(records)
+    for field in ("pt_pt", "pt_br"):
+        position = _FIELDS.index(field)
+        index = []
+        for record_offset, fields in record_offsets:
+            for key in _lookup_keys(fields[position]):
+                if key not in key_offsets:
+                    key_offsets[key] = keys_start + len(keys)
+                    keys += _pack_string(key)
+                    max_words = max(max_words, len(word_spans(key)))
+                index.append((key.encode("utf-8"), key_offsets[key], record_offset))
+        index.sort(key=lambda item: (item[0], item[2]))
+        indexes[field] = index
+
+    pt_offset = keys_start + len(keys)
+    br_offset = pt_offset + _INDEX_ENTRY.size * len(indexes["pt_pt"])
+    header = _HEADER.pack(_MAGIC, _VERSION, len(record_offsets),
+                          len(indexes["pt_pt"]), pt_offset,
+                          len(indexes["pt_br"]), br_offset, max_words)
+
+    output = bytearray(header) + records + keys
+    for field in ("pt_pt", "pt_br"):
+        for _, key_offset, record_offset in indexes[field]:
+            output += _INDEX_ENTRY.pack(key_offset, record_offset)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(output)
+        # Readable by workers running as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logger.info(f"Compiled lexicon with {len(record_offsets)} entries into {path}")
+    return len(record_offsets)
+
+
+class Lexicon:
+    """
+    Read-only view of a compiled lexicon file
+
+    ``max_words`` is the most words in any lookup key, so callers scanning
+    a text know how long a run of words to try.
+    """
+
+    def __init__(self, path: str):
+        """
+        Map a compiled lexicon
+
+        Raises:
+            LexiconFormatError: If the file is not a compiled lexicon
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._data) < _HEADER.size:
+            raise LexiconFormatError(f"{path} is too short")
+        (magic, version, self._record_count, pt_count, pt_offset,
+         br_count, br_offset, self.max_words) = _HEADER.unpack_from(self._data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise LexiconFormatError(f"{path} is not a version {_VERSION} lexicon")
+        self._indexes = {"pt_pt": (pt_offset, pt_count), "pt_br": (br_offset, br_count)}
+
+    def __len__(self) -> int:
+        return self._record_count
+
+    def _string(self, offset: int) -> tuple:
+        """String stored at an offset, and the offset after it"""
+        (length,) = _LENGTH.unpack_from(self._data, offset)
+        start = offset + _LENGTH.size
+        return self._data[start:start + length], start + length
+
+    def _record(self, offset: int) -> tuple:
+        """Record stored at an offset, and the offset of the next one"""
+        record = {}
+        for field in _FIELDS:
+            value, offset = self._string(offset)
+            if value or field not in _OPTIONAL_FIELDS:
+                record[field] = value.decode("utf-8")
+        return record, offset
+
+    def _search(self, field: str, word: str) -> List[Dict[str, str]]:
+        """Binary search of one index; all records for the key"""
+        key = word.strip().lower().encode("utf-8")
+        index_offset, count = self._indexes[field]
+
+        def key_at(position):
+            key_offset, record_offset = _INDEX_ENTRY.unpack_from(
+                self._data, index_offset + position * _INDEX_ENTRY.size)
+            return self._string(key_offset)[0], record_offset
+
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if key_at(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        records = []
+        while low < count:
+            found, record_offset = key_at(low)
+            if found != key:
+                break
+            records.append(self._record(record_offset)[0])
+            low += 1
+        return records
+
+    def lookup_pt(self, word: str) -> List[Dict[str, str]]:
+        """Entries whose PT-PT word (or one of its alternatives) is ``word``"""
+        return self._search("pt_pt", word)
+
+    def lookup_br(self, word: str) -> List[Dict[str, str]]:
+        """Entries whose PT-BR word (or one of its alternatives) is ``word``"""
+        return self._search("pt_br", word)
+
+    def entries(self, limit: Optional[int] = None) -> Iterator[Dict[str, str]]:
+        """Entries in source order, decoded lazily"""
+        offset = _HEADER.size
+        for count in range(self._record_count):
+            if limit is not None and count >= limit:
+                return
+            record, offset = self._record(offset)
+            yield record
+
+
+def _is_stale(path: str, source: str) -> bool:
+    if not os.path.exists(path):
+        return True
+    return os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(path)
+
+
+def open_lexicon(source: str = LEXICON_SOURCE, path: str = LEXICON_PATH) -> Lexicon:
+    """
+    Open the compiled lexicon, (re)building it if missing or stale
+
+    When the lexicon's directory is not writable the compiled file is kept
+    in the temporary directory instead.
+    """
+    if _is_stale(path, source):
+        try:
+            build_lexicon(source, path)
+        except OSError as e:
+            fallback = os.path.join(tempfile.gettempdir(), os.path.basename(path))
+            logger.warning(f"Cannot write {path} ({str(e)}), using {fallback}")
+            path = fallback
+            if _is_stale(path, source):
+                build_lexicon(source, path)
+
+    try:
+        return Lexicon(path)
+    except LexiconFormatError:
+        # Written by another version of this module
+        build_lexicon(source, path)
+        return Lexicon(path)
+
+
+_lexicon: Optional[Lexicon] = None
+_lexicon_lock = threading.Lock()
+
+
+def get_lexicon() -> Lexicon:
+    """Shared lexicon of this process, opened on first use"""
+    global _lexicon
+    with _lexicon_lock:
+        if _lexicon is None:
+            _lexicon = open_lexicon()
+        return _lexicon
@@ -0,0 +1,61 @@
+"""
+Text normalization shared by the speech evaluator and text utilities.
+
+Recognized and expected text are lowercased, hyphens become spaces (so
+compound words compare with or without them), punctuation other than
+apostrophes is removed and whitespace is collapsed. Latin-1 text (all of
+Portuguese) is filtered with a bytes translation table built once at import;
+anything else goes through the equivalent regex. Expected words repeat
+across attempts, so their normalized form is cached.
+"""
+
+import re
+from functools import lru_cache
+
+# Characters that are not word characters, whitespace or apostrophes
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s']")
+
+# Latin-1 fast path: '-' becomes ' ', what the pattern removes is deleted
+_LATIN_TABLE = bytes(range(256)).replace(b"-", b" ")
+_LATIN_DELETE = bytes(codepoint for codepoint in range(256)
+                      if codepoint != ord("-") and _PUNCTUATION_PATTERN.match(chr(codepoint)))
+
+# Cached normalizations of expected words and phrases
+EXPECTED_CACHE_SIZE = 4096
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for comparison.
+
+    Lowercases, turns hyphens into spaces, removes punctuation except
+    apostrophes and collapses whitespace.
+
+    Args:
+        text: Text to normalize
+
+    Returns:
+        Normalized text
+    """
+    if not text:
+        return ""
+
+    text = text.lower()
+    try:
+        text = text.encode("latin-1").translate(
+            _LATIN_TABLE, _LATIN_DELETE).decode("latin-1")
+    except UnicodeEncodeError:
+        text = _PUNCTUATION_PATTERN.sub("", text.replace("-", " "))
+
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=EXPECTED_CACHE_SIZE)
+def normalize_expected(text: str) -> str:
+    """
+    Normalize an expected word or phrase, memoized.
+
+    Use for targets that repeat across attempts (exercise words); recognized
+    text is nearly always new and should go through normalize_text.
+    """
+    return normalize_text(text)
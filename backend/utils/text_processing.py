@@ -4,10 +4,11 @@ Provides enhanced handling for compound words, monosyllabic words, and special
 pronunciation cases in Portuguese.
 """
 
-import re
 from typing import Tuple, List, Dict, Any
 from rapidfuzz import fuzz
 
+from .normalization import normalize_text as _normalize_text
+
 
 def normalize_text(text: str) -> str:
     """
@@ -19,25 +20,7 @@ def normalize_text(text: str) -> str:
     Returns:
         Normalized text
     """
-    if not text:
-        return ""
-
-    # Convert to lowercase
-    text = text.lower()
-
-    # Remove accents - optional, uncomment if needed
-    # text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
-
-    # Replace hyphens with spaces for compound word flexibility
-    text = text.replace('-', ' ')
-
-    # Remove punctuation except apostrophes
-    text = re.sub(r'[^\w\s\']', '', text)
-
-    # Replace multiple spaces with a single space and trim
-    text = re.sub(r'\s+', ' ', text).strip()
-
-    return text
+    return _normalize_text(text)
 
 
 def is_compound_word(word: str) -> bool: